@@ -0,0 +1,188 @@
+"""
+This module contains the dependencies for the admin API.
+
+The dependencies in this module expose the diagnostics collected by the
+service at runtime.
+
+The following dependencies are defined in this module:
+
+* `get_slow_queries_dependency`: Gets the last slow queries and their plans.
+* `get_loop_stalls_dependency`: Gets the last stalls of the event loop.
+* `get_metrics_dependency`: Gets the current values of the service metrics.
+* `archive_orders_dependency`: Enqueues the order archival job.
+* `get_archival_job_dependency`: Gets an order archival job by ID.
+* `export_orders_dependency`: Enqueues the export of completed orders.
+* `get_export_job_dependency`: Gets an order export job by ID.
+"""
+
+from datetime import date
+from typing import Annotated, Optional
+
+from fastapi import Depends, Path, Query
+from fastapi.exceptions import RequestValidationError
+from pydantic.error_wrappers import ErrorWrapper
+
+from app.api.dependencies.database import get_repository
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import metrics
+from app.database import db_engine
+from app.database.repositories.jobs import JobsRepository
+from app.jobs import job_runner
+from app.jobs.archival import ARCHIVAL_JOB
+from app.jobs.export import EXPORT_JOB
+from app.schemas.models.common import int64
+from app.schemas.models.jobs import JobDto
+from app.schemas.responses.admin import (LoopStallsResponse, MetricsResponse,
+                                         SlowQueriesResponse)
+
+
+async def get_slow_queries_dependency() -> SlowQueriesResponse:
+    """
+    Gets the last slow queries and their captured execution plans.
+
+    Returns:
+        A `SlowQueriesResponse` object, most recent entries first.
+    """
+
+    recorder = db_engine.slow_queries
+    return SlowQueriesResponse(
+        threshold_ms=recorder.threshold_ms,
+        queries=list(reversed(recorder.queries)),
+        plans=list(reversed(recorder.plans)),
+    )
+
+
+async def get_loop_stalls_dependency() -> LoopStallsResponse:
+    """
+    Gets the last stalls of the event loop with the stacks that caused them.
+
+    Returns:
+        A `LoopStallsResponse` object, most recent stalls first.
+    """
+
+    return LoopStallsResponse(
+        threshold_ms=loop_monitor.threshold_ms,
+        stalls=list(reversed(loop_monitor.stalls)),
+    )
+
+
+async def get_metrics_dependency() -> MetricsResponse:
+    """
+    Gets the current values of the service metrics.
+
+    Returns:
+        A `MetricsResponse` object with every registered metric.
+    """
+
+    return MetricsResponse(metrics=metrics.snapshot())
+
+
+async def archive_orders_dependency(
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Enqueues the order archival job, at most one a day.
+
+    Parameters:
+        jobs_repo: The repository that stores the jobs.
+
+    Returns:
+        A `JobDto` object of the new or the already active job.
+    """
+
+    today = date.today().isoformat()
+    job = await jobs_repo.enqueue_job(
+        kind=ARCHIVAL_JOB, dedup_key=today, params={"date": today}
+    )
+    job_runner.notify()
+    return job
+
+
+async def get_archival_job_dependency(
+    job_id: Annotated[int64, Path(description="Job identifier")],
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Gets an order archival job by ID.
+
+    Parameters:
+        job_id: The ID of the job to get.
+        jobs_repo: The repository that stores the jobs.
+
+    Returns:
+        A `JobDto` object with the status and the result of the job.
+    """
+
+    return await jobs_repo.get_job(job_id=job_id, kind=ARCHIVAL_JOB)
+
+
+async def export_orders_dependency(
+    start_date: Annotated[
+        Optional[date],
+        Query(
+            description="Первый день выгрузки (UTC). Если не указан, "
+            "выгрузка продолжается с последнего выгруженного дня",
+        ),
+    ] = None,
+    end_date: Annotated[
+        Optional[date],
+        Query(
+            description="Последний день выгрузки (UTC). Если не указан, "
+            "используется текущий день",
+        ),
+    ] = None,
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Enqueues the export of completed orders, one export at a time.
+
+    Parameters:
+        start_date: The first day to export, the last exported day if not
+            given.
+        end_date: The last day to export, today if not given.
+        jobs_repo: The repository that stores the jobs.
+
+    Returns:
+        A `JobDto` object of the new or the already active export job.
+    """
+
+    end_date = end_date or date.today()
+    if start_date is not None and start_date > end_date:
+        raise RequestValidationError(
+            [
+                ErrorWrapper(
+                    ValueError("start_date is after end_date"),
+                    loc=("query", "start_date"),
+                )
+            ]
+        )
+    # Exports write the same files, an active export is returned instead of
+    # starting another one
+    job = await jobs_repo.enqueue_job(
+        kind=EXPORT_JOB,
+        dedup_key=EXPORT_JOB,
+        params={
+            "start_date": start_date and start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+        },
+    )
+    job_runner.notify()
+    return job
+
+
+async def get_export_job_dependency(
+    job_id: Annotated[int64, Path(description="Job identifier")],
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Gets an order export job by ID.
+
+    Parameters:
+        job_id: The ID of the job to get.
+        jobs_repo: The repository that stores the jobs.
+
+    Returns:
+        A `JobDto` object with the status and the result of the job.
+    """
+
+    return await jobs_repo.get_job(job_id=job_id, kind=EXPORT_JOB)
@@ -0,0 +1,102 @@
+"""
+This module contains the dependencies shared by the API routers.
+
+The following dependencies are defined in this module:
+
+* `ids_query_dependency`: Parses a list of IDs from the query string.
+* `ids_body_dependency`: Reads a list of IDs from the request body.
+"""
+
+from typing import Annotated
+
+from fastapi import Query
+from fastapi.exceptions import RequestValidationError
+from pydantic.error_wrappers import ErrorWrapper
+
+from app.core.config import settings
+from app.schemas.models.common import INT64_MAX, INT64_MIN
+from app.schemas.requests.common import IdsRequest
+
+
+def unique_ids(ids: list[int], loc: tuple[str, ...]) -> list[int]:
+    """
+    Removes repeated IDs keeping the order of the first ones.
+
+    Parameters:
+        ids: The requested IDs.
+        loc: The location of the IDs in the request, for the error.
+
+    Returns:
+        The IDs, each once.
+
+    Raises:
+        RequestValidationError: If there are no IDs or more than
+            `MULTI_GET_MAX_IDS`.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not 1 <= len(ids) <= settings.MULTI_GET_MAX_IDS:
+        raise RequestValidationError(
+            [
+                ErrorWrapper(
+                    ValueError(
+                        f"expected from 1 to {settings.MULTI_GET_MAX_IDS} ids"
+                    ),
+                    loc=loc,
+                )
+            ]
+        )
+    return ids
+
+
+async def ids_query_dependency(
+    ids: Annotated[
+        str,
+        Query(
+            description="Идентификаторы через запятую. Повторы "
+            "возвращаются один раз",
+            example="1,2,3",
+        ),
+    ],
+) -> list[int]:
+    """
+    Parses a list of IDs from the query string.
+
+    Parameters:
+        ids: Comma separated IDs.
+
+    Returns:
+        The IDs in the requested order, each once.
+    """
+
+    try:
+        parsed = [int(item) for item in ids.split(",")]
+    except ValueError:
+        parsed = None
+    if parsed is None or not all(
+        INT64_MIN <= item <= INT64_MAX for item in parsed
+    ):
+        raise RequestValidationError(
+            [
+                ErrorWrapper(
+                    ValueError("expected comma separated integers"),
+                    loc=("query", "ids"),
+                )
+            ]
+        )
+    return unique_ids(parsed, ("query", "ids"))
+
+
+async def ids_body_dependency(request: IdsRequest) -> list[int]:
+    """
+    Reads a list of IDs from the request body.
+
+    Used for lists too long for a query string.
+
+    Parameters:
+        request: The request object containing the IDs.
+
+    Returns:
+        The IDs in the requested order, each once.
+    """
+
+    return unique_ids(request.ids, ("body", "ids"))
@@ -10,23 +10,99 @@ The following dependencies are defined in this module:
 * `date_to_datetime_start_dependency`: Converts a date to a `datetime` object.
 * `date_to_datetime_end_dependency`: Converts a date to a `datetime` object.
 * `get_courier_metadata_dependency`: Gets the metadata for a courier.
-* `get_couriers_assignments_dependency`: Gets the list of courier assignments for a given date.
+* `get_couriers_assignments_dependency`: Gets the encoded courier assignments for a given date.
 * `get_courier_orders_in_time_interval_dependency`: Gets the list of orders for a given courier in a given time interval.
 * `get_couriers_in_range_dependency`: Gets a list of couriers, paginated by offset and limit.
+* `get_couriers_by_ids_dependency`: Gets couriers by a list of IDs from the query string.
+* `get_couriers_by_ids_body_dependency`: Gets couriers by a list of IDs from the body.
+* `courier_ids_dependency`: Parses a list of courier IDs.
+* `courier_etag_dependency`: Checks the entity tag of the data of a courier.
+* `couriers_assignments_etag_dependency`: Checks the entity tag of courier assignments.
+* `couriers_etag_dependency`: Checks the entity tag of the data of all couriers.
+* `get_couriers_order_stats_dependency`: Gets the order statistics of many couriers page by page.
+* `courier_events_dependency`: Checks the courier of an event stream exists.
 """
 
 from datetime import date, datetime, time
-from typing import Annotated, Optional
+from typing import Annotated, AsyncIterator, Optional
 
-from fastapi import Depends, Path, Query
+from fastapi import Depends, Path, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic.error_wrappers import ErrorWrapper
+from sqlalchemy import Row
 
+from app.api.dependencies.common import (ids_body_dependency,
+                                         ids_query_dependency)
 from app.api.dependencies.database import get_repository
+from app.core.config import settings
+from app.core.exceptions import NotModifiedError
+from app.core.metrics import metrics
+from app.core.response_cache import assignments_cache
+from app.core.single_flight import read_flights
+from app.database import db_engine
 from app.database.repositories.couriers import CouriersRepository
-from app.schemas.models.common import int32, int64
+from app.database.repositories.raw import repository_class
+from app.database.versions import data_versions
+from app.schemas.models.common import (INT32_MAX, INT64_MAX, INT64_MIN, int32,
+                                       int64)
 from app.schemas.models.couriers import CourierDto
-from app.schemas.models.orders import CouriersGroupOrders, OrderDto
+from app.schemas.models.orders import OrderDto
 from app.schemas.requests.couriers import CreateCourierRequest
-from app.schemas.responses.couriers import GetCourierMetaInfoResponse
+from app.schemas.responses.couriers import (GetCourierMetaInfoResponse,
+                                            GetCouriersByIdsResponse)
+from app.schemas.responses.orders import OrderAssignResponse
+
+not_modified_ratio = metrics.ratio(
+    "http_not_modified_ratio",
+    "Share of conditional courier reads answered with 304 Not Modified",
+)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Checks an `If-None-Match` header against an entity tag.
+
+    Parameters:
+        if_none_match: The value of the header.
+        etag: The current entity tag.
+
+    Returns:
+        Whether the client already has the current representation.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag
+        for tag in if_none_match.split(",")
+    )
+
+
+def check_not_modified(request: Request, response: Response, etag: str) -> str:
+    """
+    Answers a conditional read before its data is loaded.
+
+    Parameters:
+        request: The request with an optional `If-None-Match` header.
+        response: The response to set the `ETag` header on.
+        etag: The current entity tag of the requested data.
+
+    Returns:
+        The entity tag.
+
+    Raises:
+        NotModifiedError: If the client already has the current data.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    not_modified = if_none_match is not None and etag_matches(
+        if_none_match, etag
+    )
+    not_modified_ratio.observe(not_modified)
+    if not_modified:
+        raise NotModifiedError(etag)
+    response.headers["ETag"] = etag
+    return etag
 
 
 async def create_courier_dependency(
@@ -68,7 +144,10 @@ async def get_courier_dependency(
         A `CourierDto` object representing the courier.
     """
 
-    return await couriers_repo.get_courier(courier_id=courier_id)
+    return await read_flights.do(
+        ("courier", courier_id, data_versions.courier_tag(courier_id)),
+        lambda: couriers_repo.get_courier(courier_id=courier_id),
+    )
 
 
 async def date_to_datetime_start_dependency(
@@ -133,16 +212,14 @@ async def get_courier_metadata_dependency(
 
 
 async def get_couriers_assignments_dependency(
-    assignments_date: Optional[
-        Annotated[
-            date,
-            Query(
-                alias="date",
-                description="Дата распределения заказов. "
-                "Если не указана, то используется текущий день",
-            ),
-        ]
-    ] = date.today(),
+    assignments_date: Annotated[
+        Optional[date],
+        Query(
+            alias="date",
+            description="Дата распределения заказов. "
+            "Если не указана, то используется текущий день",
+        ),
+    ] = None,
     courier_id: Optional[
         Annotated[
             int64,
@@ -157,9 +234,13 @@ async def get_couriers_assignments_dependency(
     couriers_repo: CouriersRepository = Depends(
         get_repository(CouriersRepository)
     ),
-) -> list[CouriersGroupOrders]:
+) -> bytes:
     """
-    Gets the list of courier assignments for a given date.
+    Gets the encoded courier assignments for a given date.
+
+    The responses of the days that are over are cached, they change only
+    if orders are completed later or the plan of the day is rewritten.
+    Identical concurrent requests share one query.
 
     Parameters:
         assignments_date: The date for which to get the assignments. If not specified, the current day will be used.
@@ -167,11 +248,37 @@ async def get_couriers_assignments_dependency(
         couriers_repo: Repo dependency
 
     Returns:
-        A list of `CouriersGroupOrders` objects, each representing a group of orders assigned to a single courier.
+        The encoded `OrderAssignResponse` with a list of
+        `CouriersGroupOrders` objects, each representing a group of orders
+        assigned to a single courier.
     """
 
-    return await couriers_repo.get_couriers_assignments(
-        courier_id=courier_id, date=assignments_date
+    assignments_date = assignments_date or date.today()
+    closed = assignments_date < date.today()
+    # The tag is read before the data, so the data is never older than it
+    tag = data_versions.assignments_tag(assignments_date, courier_id)
+    if closed:
+        body = assignments_cache.get((assignments_date, courier_id), tag)
+        if body is not None:
+            return body
+
+    async def load() -> bytes:
+        couriers = await couriers_repo.get_couriers_assignments(
+            courier_id=courier_id, date=assignments_date
+        )
+        body = JSONResponse(
+            jsonable_encoder(
+                OrderAssignResponse(date=assignments_date, couriers=couriers),
+                exclude_none=True,
+            )
+        ).body
+        if closed:
+            assignments_cache.put((assignments_date, courier_id), tag, body)
+        return body
+
+    # Identical concurrent requests share one query and its encoded result
+    return await read_flights.do(
+        ("assignments", assignments_date, courier_id, tag), load
     )
 
 
@@ -196,8 +303,17 @@ async def get_courier_orders_in_time_interval_dependency(
         A list of `OrderDto` objects, each representing an order.
     """
 
-    return await couriers_repo.get_courier_orders_in_time_interval(
-        courier_id=courier_id, start_date=start_date, end_date=end_date
+    return await read_flights.do(
+        (
+            "courier_orders",
+            courier_id,
+            start_date,
+            end_date,
+            data_versions.courier_tag(courier_id),
+        ),
+        lambda: couriers_repo.get_courier_orders_in_time_interval(
+            courier_id=courier_id, start_date=start_date, end_date=end_date
+        ),
     )
 
 
@@ -245,3 +361,240 @@ async def get_couriers_in_range_dependency(
     """
 
     return await couriers_repo.get_couriers_in_range(limit=limit, offset=offset)
+
+
+async def get_couriers_by_ids_dependency(
+    courier_ids: list[int] = Depends(ids_query_dependency),
+    couriers_repo: CouriersRepository = Depends(
+        get_repository(CouriersRepository)
+    ),
+) -> GetCouriersByIdsResponse:
+    """
+    Gets couriers by a list of IDs from the query string.
+
+    Parameters:
+        courier_ids: The IDs of the couriers to get.
+        couriers_repo: The repository that stores the couriers.
+
+    Returns:
+        A `GetCouriersByIdsResponse` with the couriers found in the requested
+        order and the IDs not found.
+    """
+
+    couriers, missing_ids = await couriers_repo.get_couriers_by_ids(
+        courier_ids=courier_ids
+    )
+    return GetCouriersByIdsResponse(couriers=couriers, missing_ids=missing_ids)
+
+
+async def get_couriers_by_ids_body_dependency(
+    courier_ids: list[int] = Depends(ids_body_dependency),
+    couriers_repo: CouriersRepository = Depends(
+        get_repository(CouriersRepository)
+    ),
+) -> GetCouriersByIdsResponse:
+    """
+    Gets couriers by a list of IDs from the request body.
+
+    Parameters:
+        courier_ids: The IDs of the couriers to get.
+        couriers_repo: The repository that stores the couriers.
+
+    Returns:
+        A `GetCouriersByIdsResponse` with the couriers found in the requested
+        order and the IDs not found.
+    """
+
+    return await get_couriers_by_ids_dependency(courier_ids, couriers_repo)
+
+
+async def courier_ids_dependency(
+    courier_ids: Annotated[
+        str,
+        Query(
+            description="Идентификаторы курьеров через запятую или all для "
+            "всех курьеров",
+            example="1,2,3",
+        ),
+    ] = "all",
+) -> Optional[list[int]]:
+    """
+    Parses a list of courier IDs.
+
+    Parameters:
+        courier_ids: Comma separated IDs, or "all".
+
+    Returns:
+        The list of IDs, or `None` for all couriers.
+    """
+
+    if courier_ids == "all":
+        return None
+    try:
+        ids = [int(courier_id) for courier_id in courier_ids.split(",")]
+    except ValueError:
+        ids = None
+    if not ids or not all(
+        INT64_MIN <= courier_id <= INT64_MAX for courier_id in ids
+    ):
+        raise RequestValidationError(
+            [
+                ErrorWrapper(
+                    ValueError("expected comma separated integers or all"),
+                    loc=("query", "courier_ids"),
+                )
+            ]
+        )
+    return ids
+
+
+async def get_couriers_order_stats_dependency(
+    start_date: datetime = Depends(date_to_datetime_start_dependency),
+    end_date: datetime = Depends(date_to_datetime_end_dependency),
+    courier_ids: Optional[list[int]] = Depends(courier_ids_dependency),
+    offset: Annotated[
+        int,
+        Query(
+            description="Количество курьеров, которое нужно пропустить "
+            "для отображения текущей страницы",
+            ge=0,
+            le=INT32_MAX,
+            example=0,
+        ),
+    ] = 0,
+    limit: Annotated[
+        Optional[int],
+        Query(
+            description="Максимальное количество курьеров в выдаче. "
+            "Если параметр не передан, то выдаются все курьеры",
+            ge=1,
+            le=INT32_MAX,
+            example=100,
+        ),
+    ] = None,
+    couriers_repo: CouriersRepository = Depends(
+        get_repository(CouriersRepository)
+    ),
+) -> AsyncIterator[list[Row]]:
+    """
+    Gets the order statistics of many couriers page by page.
+
+    Parameters:
+        start_date: The start date of the time interval.
+        end_date: The end date of the time interval.
+        courier_ids: The couriers to get statistics for, all if `None`.
+        offset: The number of couriers to skip.
+        limit: The maximum number of couriers, all if not given.
+        couriers_repo: Repo dependency
+
+    Returns:
+        An iterator over pages of rows with the courier, the number of
+        completed orders and their total cost. The rows are read while the
+        response is streamed.
+    """
+
+    return couriers_repo.iter_couriers_order_stats(
+        start_date=start_date,
+        end_date=end_date,
+        courier_ids=courier_ids,
+        offset=offset,
+        limit=limit,
+        page_size=settings.COURIERS_META_INFO_PAGE_SIZE,
+    )
+
+
+async def courier_etag_dependency(
+    request: Request,
+    response: Response,
+    courier_id: int64 = Path(description="Courier identifier"),
+) -> str:
+    """
+    Checks the entity tag of the data of a courier.
+
+    Must be the first dependency of an endpoint, so that a 304 response is
+    sent without touching the database.
+
+    Parameters:
+        request: The request.
+        response: The response to set the `ETag` header on.
+        courier_id: The ID of the courier.
+
+    Returns:
+        The current entity tag.
+    """
+
+    return check_not_modified(
+        request, response, data_versions.courier_tag(courier_id)
+    )
+
+
+async def couriers_assignments_etag_dependency(
+    request: Request,
+    response: Response,
+    assignments_date: Annotated[Optional[date], Query(alias="date")] = None,
+    courier_id: Annotated[Optional[int64], Query()] = None,
+) -> str:
+    """
+    Checks the entity tag of the courier assignments of a date.
+
+    Parameters:
+        request: The request.
+        response: The response to set the `ETag` header on.
+        assignments_date: The date of the assignments, today by default.
+        courier_id: The ID of the courier, all couriers if not given.
+
+    Returns:
+        The current entity tag.
+    """
+
+    return check_not_modified(
+        request,
+        response,
+        data_versions.assignments_tag(
+            assignments_date or date.today(), courier_id
+        ),
+    )
+
+
+async def couriers_etag_dependency(
+    request: Request, response: Response
+) -> str:
+    """
+    Checks the entity tag of the data of all couriers.
+
+    Parameters:
+        request: The request.
+        response: The response to set the `ETag` header on.
+
+    Returns:
+        The current entity tag.
+    """
+
+    return check_not_modified(request, response, data_versions.couriers_tag())
+
+
+async def courier_events_dependency(
+    courier_id: int64 = Path(description="Courier identifier"),
+) -> int64:
+    """
+    Checks that the courier of an event stream exists.
+
+    The courier is read with a session of its own, closed before the
+    stream starts, so that a stream does not hold a database connection.
+
+    Parameters:
+        courier_id: The ID of the courier.
+
+    Returns:
+        The ID of the courier.
+
+    Raises:
+        NotFoundInDBError: If there is no such courier.
+    """
+
+    async with db_engine.create_session() as session:
+        couriers_repo = repository_class(
+            CouriersRepository, settings.REPOSITORY_BACKEND
+        )(session)
+        await couriers_repo.get_courier(courier_id=courier_id)
+    return courier_id
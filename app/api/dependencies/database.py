@@ -3,14 +3,18 @@ from typing import Callable, Type
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.database import db_engine
 from app.database.repositories.base import BaseRepository
+from app.database.repositories.raw import repository_class
 
 
 def get_repository(
     repo: Type[BaseRepository],
 ) -> Callable[[AsyncSession], BaseRepository]:
     def _get_repo(session: AsyncSession = Depends(db_engine.session)):
-        return repo(session)
+        # The backend is read per request, `raw` repositories serve the hot
+        # reads with asyncpg when `REPOSITORY_BACKEND` is `asyncpg`
+        return repository_class(repo, settings.REPOSITORY_BACKEND)(session)
 
     return _get_repo
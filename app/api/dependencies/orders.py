@@ -7,22 +7,49 @@ The following dependencies are defined in this module:
 
 * `get_order_by_id`: Gets an order by ID.
 * `get_orders_in_range`: Gets a list of orders, paginated by offset and limit.
+* `get_orders_by_ids`: Gets orders by a list of IDs from the query string.
+* `get_orders_by_ids_body`: Gets orders by a list of IDs from the body.
 * `add_orders`: Creates new orders.
 * `get_completed_orders`: Gets a list of completed orders.
 * `complete_order`: Marks an order as completed.
+* `assign_orders`: Enqueues an assignment run for a date.
+* `get_assignment_job`: Gets an assignment job by ID.
+* `cancel_assignment_job`: Cancels an assignment job.
+* `score_assignment`: Simulates the saved plan of a date.
+* `get_candidate_groups`: Gets the orders that can share a courier trip.
 
 """
 
+import asyncio
+from datetime import date
 from typing import Annotated, Optional
 
 from fastapi import Depends, Path, Query
 
+from app.api.dependencies.common import (ids_body_dependency,
+                                         ids_query_dependency)
 from app.api.dependencies.database import get_repository
+from app.assignment.candidates import SLOT_MINUTES, candidate_groups
+from app.assignment.rules import COURIER_RULES
+from app.assignment.simulator import ShiftSimulation, Violation, score_plan
+from app.core.config import settings
+from app.database import completion_coalescer
+from app.database.repositories.assignments import AssignmentsRepository
+from app.database.repositories.jobs import JobsRepository
 from app.database.repositories.orders import OrdersRepository
+from app.jobs import job_runner
+from app.jobs.assignment import ASSIGNMENT_JOB
 from app.schemas.models.common import int32, int64
-from app.schemas.models.orders import OrderDto
+from app.schemas.models.couriers import CourierTypeEnum
+from app.schemas.models.jobs import JobDto
+from app.schemas.models.orders import (AssignmentModeEnum, CandidateGroupDto,
+                                       CourierScoreDto, DeliveryScoreDto,
+                                       GroupScoreDto, OrderDto)
 from app.schemas.requests.orders import (CompleteOrderRequestDto,
                                          CreateOrderRequest)
+from app.schemas.responses.orders import (AssignmentScoreResponse,
+                                          CandidateGroupsResponse,
+                                          GetOrdersByIdsResponse)
 
 
 async def get_order_by_id(
@@ -89,6 +116,53 @@ async def get_orders_in_range(
     return await orders_repo.get_orders_in_range(offset=offset, limit=limit)
 
 
+async def get_orders_by_ids(
+    order_ids: list[int] = Depends(ids_query_dependency),
+    orders_repo: OrdersRepository = Depends(get_repository(OrdersRepository)),
+) -> GetOrdersByIdsResponse:
+    """
+    Gets orders by a list of IDs from the query string.
+
+    Parameters:
+
+        * order_ids: The IDs of the orders to get.
+        * orders_repo: The repository that stores the orders.
+
+    Returns:
+
+        * A `GetOrdersByIdsResponse` with the orders found in the requested
+          order and the IDs not found.
+
+    """
+
+    orders, missing_ids = await orders_repo.get_orders_by_ids(
+        order_ids=order_ids
+    )
+    return GetOrdersByIdsResponse(orders=orders, missing_ids=missing_ids)
+
+
+async def get_orders_by_ids_body(
+    order_ids: list[int] = Depends(ids_body_dependency),
+    orders_repo: OrdersRepository = Depends(get_repository(OrdersRepository)),
+) -> GetOrdersByIdsResponse:
+    """
+    Gets orders by a list of IDs from the request body.
+
+    Parameters:
+
+        * order_ids: The IDs of the orders to get.
+        * orders_repo: The repository that stores the orders.
+
+    Returns:
+
+        * A `GetOrdersByIdsResponse` with the orders found in the requested
+          order and the IDs not found.
+
+    """
+
+    return await get_orders_by_ids(order_ids, orders_repo)
+
+
 async def add_orders(
     create_order_request: CreateOrderRequest,
     orders_repo: OrdersRepository = Depends(get_repository(OrdersRepository)),
@@ -126,8 +200,15 @@ async def get_completed_orders(
 
         * A list of `OrderDto` objects, each representing a completed order.
 
+    When completion batching is enabled, the request is merged with other
+    concurrent completions into one transaction.
+
     """
 
+    if completion_coalescer.running:
+        return await completion_coalescer.submit(
+            complete_order_request.complete_info
+        )
     return await orders_repo.complete_orders(
         complete_orders=complete_order_request.complete_info
     )
@@ -151,3 +232,323 @@ async def complete_order(
     """
 
     return completed_orders
+
+
+async def assign_orders(
+    assignment_date: Annotated[
+        Optional[date],
+        Query(
+            alias="date",
+            description="Дата распределения заказов. "
+            "Если не указана, то используется текущий день",
+        ),
+    ] = None,
+    replace: Annotated[
+        bool,
+        Query(
+            description="Заменить сохраненный план дня. Незавершенные заказы "
+            "плана распределяются заново",
+        ),
+    ] = False,
+    mode: Annotated[
+        AssignmentModeEnum,
+        Query(
+            description="Способ распределения: жадный или оптимизирующий "
+            "стоимость в пределах отведенного времени",
+        ),
+    ] = AssignmentModeEnum.greedy,
+    budget_ms: Annotated[
+        Optional[int],
+        Query(
+            description="Время на оптимизирующее распределение в "
+            "миллисекундах",
+            ge=1,
+            le=settings.ASSIGNMENT_MAX_BUDGET_MS,
+        ),
+    ] = None,
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Enqueues an assignment run for a date.
+
+    Parameters:
+
+        * assignment_date: The date to assign orders for, today by default.
+        * replace: Whether to replace the saved plan of the date.
+        * mode: The assignment strategy.
+        * budget_ms: The time the optimal strategy may take, the
+          `ASSIGNMENT_BUDGET_MS` setting by default.
+        * jobs_repo: The repository that stores the jobs.
+
+    Returns:
+
+        * A `JobDto` object of the new job, or of the job already queued or
+          running for the same date.
+
+    """
+
+    assignment_date = assignment_date or date.today()
+    job = await jobs_repo.enqueue_job(
+        kind=ASSIGNMENT_JOB,
+        dedup_key=assignment_date.isoformat(),
+        params={
+            "date": assignment_date.isoformat(),
+            "replace": replace,
+            "mode": mode.value,
+            "budget_ms": budget_ms or settings.ASSIGNMENT_BUDGET_MS,
+        },
+    )
+    job_runner.notify()
+    return job
+
+
+async def get_assignment_job(
+    job_id: Annotated[int64, Path(description="Job identifier")],
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Gets an assignment job by ID.
+
+    Parameters:
+
+        * job_id: The ID of the job to get.
+        * jobs_repo: The repository that stores the jobs.
+
+    Returns:
+
+        * A `JobDto` object with the status, progress and result of the job.
+
+    """
+
+    return await jobs_repo.get_job(job_id=job_id, kind=ASSIGNMENT_JOB)
+
+
+async def cancel_assignment_job(
+    job_id: Annotated[int64, Path(description="Job identifier")],
+    jobs_repo: JobsRepository = Depends(get_repository(JobsRepository)),
+) -> JobDto:
+    """
+    Cancels an assignment job.
+
+    A pending job is cancelled at once, a running one stops at its next
+    heartbeat without saving the plan.
+
+    Parameters:
+
+        * job_id: The ID of the job to cancel.
+        * jobs_repo: The repository that stores the jobs.
+
+    Returns:
+
+        * A `JobDto` object of the job.
+
+    """
+
+    return await jobs_repo.cancel_job(job_id=job_id, kind=ASSIGNMENT_JOB)
+
+
+async def score_assignment(
+    assignment_date: Annotated[
+        Optional[date],
+        Query(
+            alias="date",
+            description="Дата плана. Если не указана, то используется "
+            "текущий день",
+        ),
+    ] = None,
+    timeline: Annotated[
+        bool,
+        Query(
+            description="Включить в ответ время доставки каждого заказа",
+        ),
+    ] = False,
+    assignments_repo: AssignmentsRepository = Depends(
+        get_repository(AssignmentsRepository)
+    ),
+) -> AssignmentScoreResponse:
+    """
+    Simulates the saved plan of a date.
+
+    Parameters:
+
+        * assignment_date: The date of the plan, today by default.
+        * timeline: Whether to include the delivery timeline of every courier.
+        * assignments_repo: The repository that stores the plans.
+
+    Returns:
+
+        * An `AssignmentScoreResponse` with the cost, the violations and the
+          utilisation of the couriers of the plan.
+
+    The simulation runs in a thread, NumPy releases the GIL for the array
+    operations.
+
+    """
+
+    assignment_date = assignment_date or date.today()
+    couriers, orders, plan = await assignments_repo.get_saved_day_plan(
+        assignment_date=assignment_date
+    )
+    simulation = await asyncio.get_running_loop().run_in_executor(
+        None, score_plan, couriers, orders, plan
+    )
+    objective = simulation.objective()
+    return AssignmentScoreResponse(
+        date=assignment_date,
+        groups=len(plan.groups),
+        assigned_orders=plan.assigned_orders,
+        unassigned_orders=len(plan.unassigned_order_ids),
+        late_orders=int((~simulation.on_time).sum()),
+        cost=simulation.cost,
+        saved_cost=plan.cost,
+        objective=objective if simulation.feasible else None,
+        feasible=simulation.feasible,
+        utilisation=_total_utilisation(simulation),
+        violations=simulation.violation_counts(),
+        couriers=_courier_scores(simulation, timeline),
+    )
+
+
+async def get_candidate_groups(
+    region: Annotated[int32, Query(description="Район заказов")],
+    minute: Annotated[
+        int,
+        Query(
+            description="Минута дня, в которую курьер начинает поездку",
+            ge=0,
+            le=24 * 60 - 1,
+        ),
+    ],
+    courier_type: Annotated[
+        CourierTypeEnum, Query(description="Тип курьера")
+    ],
+    assignments_repo: AssignmentsRepository = Depends(
+        get_repository(AssignmentsRepository)
+    ),
+) -> CandidateGroupsResponse:
+    """
+    Gets the orders that can share a courier trip.
+
+    The unassigned orders of the region whose delivery hours touch the time
+    slot of the minute are read from the candidate buckets and packed into
+    the groups a courier of the type can deliver from the start of the slot.
+
+    Parameters:
+
+        * region: The region of the orders.
+        * minute: The minute of the day the trip starts.
+        * courier_type: The type of the courier.
+        * assignments_repo: The repository that stores the plans.
+
+    Returns:
+
+        * A `CandidateGroupsResponse` with the groups of the slot.
+
+    """
+
+    slot = minute // SLOT_MINUTES
+    orders = await assignments_repo.get_candidate_orders(
+        region=region, slot=slot
+    )
+    groups = candidate_groups(
+        orders, COURIER_RULES[courier_type], slot * SLOT_MINUTES
+    )
+    return CandidateGroupsResponse(
+        region=region,
+        slot_start_minute=slot * SLOT_MINUTES,
+        courier_type=courier_type,
+        groups=[
+            CandidateGroupDto(
+                order_ids=list(group.order_ids),
+                start_minute=group.start_minute,
+                end_minute=group.end_minute,
+                weight=group.weight,
+                cost=group.cost,
+            )
+            for group in groups
+        ],
+    )
+
+
+def _total_utilisation(simulation: ShiftSimulation) -> float:
+    shift_minutes = simulation.courier_shift_minutes.sum()
+    if not shift_minutes:
+        return 0.0
+    return float(simulation.courier_busy_minutes.sum() / shift_minutes)
+
+
+def _courier_scores(
+    simulation: ShiftSimulation, timeline: bool
+) -> list[CourierScoreDto]:
+    plan = simulation.plan
+    utilisation = simulation.utilisation.tolist()
+    timelines: dict[int, list[GroupScoreDto]] = {}
+    if timeline:
+        deliveries: list[list[DeliveryScoreDto]] = [
+            [] for _ in range(len(plan.group_ids))
+        ]
+        for group, order_id, minute, on_time in zip(
+            plan.order_groups.tolist(),
+            plan.order_ids.tolist(),
+            simulation.delivered.tolist(),
+            simulation.on_time.tolist(),
+        ):
+            deliveries[group].append(
+                DeliveryScoreDto(
+                    order_id=order_id, delivered_minute=minute, on_time=on_time
+                )
+            )
+        for group, (courier, *fields) in enumerate(
+            zip(
+                plan.group_couriers.tolist(),
+                plan.group_ids.tolist(),
+                plan.group_starts.tolist(),
+                simulation.group_ends.tolist(),
+                simulation.group_costs.tolist(),
+                simulation.group_violations.tolist(),
+            )
+        ):
+            group_id, start_minute, end_minute, cost, violations = fields
+            timelines.setdefault(courier, []).append(
+                GroupScoreDto(
+                    group_order_id=group_id,
+                    start_minute=start_minute,
+                    end_minute=end_minute,
+                    cost=cost,
+                    violations=[
+                        violation.name.lower()
+                        for violation in Violation
+                        if violations & violation
+                    ],
+                    deliveries=deliveries[group],
+                )
+            )
+    return [
+        CourierScoreDto(
+            courier_id=courier_id,
+            groups=groups,
+            orders=orders,
+            cost=cost,
+            busy_minutes=busy_minutes,
+            shift_minutes=shift_minutes,
+            utilisation=utilisation[row],
+            timeline=timelines.get(row, []) if timeline else None,
+        )
+        for row, (
+            courier_id,
+            groups,
+            orders,
+            cost,
+            busy_minutes,
+            shift_minutes,
+        ) in enumerate(
+            zip(
+                plan.courier_ids.tolist(),
+                simulation.courier_groups.tolist(),
+                simulation.courier_orders.tolist(),
+                simulation.courier_costs.tolist(),
+                simulation.courier_busy_minutes.tolist(),
+                simulation.courier_shift_minutes.tolist(),
+            )
+        )
+    ]
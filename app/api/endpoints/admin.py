@@ -0,0 +1,160 @@
+from fastapi import APIRouter, Depends
+from starlette import status
+
+from app.api.dependencies.admin import (archive_orders_dependency,
+                                        export_orders_dependency,
+                                        get_archival_job_dependency,
+                                        get_export_job_dependency,
+                                        get_loop_stalls_dependency,
+                                        get_metrics_dependency,
+                                        get_slow_queries_dependency)
+from app.schemas.models.jobs import JobDto
+from app.schemas.responses.admin import (LoopStallsResponse, MetricsResponse,
+                                         SlowQueriesResponse)
+from app.schemas.responses.common import BadRequestResponse, NotFoundResponse
+
+router = APIRouter(tags=["admin-controller"], prefix="/admin")
+
+
+@router.get(
+    "/slow-queries",
+    name="admin::get-slow-queries",
+    operation_id="getSlowQueries",
+    summary="Последние медленные запросы к базе данных и их планы",
+    status_code=status.HTTP_200_OK,
+    response_model=SlowQueriesResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": SlowQueriesResponse,
+            "description": "ok",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def get_slow_queries(
+    slow_queries: SlowQueriesResponse = Depends(get_slow_queries_dependency),
+):
+    return slow_queries
+
+
+@router.get(
+    "/loop-stalls",
+    name="admin::get-loop-stalls",
+    operation_id="getLoopStalls",
+    summary="Последние блокировки цикла событий и стеки блокирующего кода",
+    status_code=status.HTTP_200_OK,
+    response_model=LoopStallsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": LoopStallsResponse,
+            "description": "ok",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def get_loop_stalls(
+    loop_stalls: LoopStallsResponse = Depends(get_loop_stalls_dependency),
+):
+    return loop_stalls
+
+
+@router.get(
+    "/metrics",
+    name="admin::get-metrics",
+    operation_id="getMetrics",
+    summary="Метрики сервиса",
+    status_code=status.HTTP_200_OK,
+    response_model=MetricsResponse,
+    responses={
+        status.HTTP_200_OK: {"model": MetricsResponse, "description": "ok"},
+    },
+    tags=["admin-controller"],
+)
+async def get_metrics(
+    service_metrics: MetricsResponse = Depends(get_metrics_dependency),
+):
+    return service_metrics
+
+
+@router.post(
+    "/order-archival",
+    name="admin::archive-orders",
+    operation_id="archiveOrders",
+    summary="Создать партиции заказов на следующие месяцы и перенести "
+    "старые завершенные заказы в архив",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobDto,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": JobDto,
+            "description": "Задача поставлена в очередь",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def archive_orders(job: JobDto = Depends(archive_orders_dependency)):
+    return job
+
+
+@router.get(
+    "/order-archival/jobs/{job_id}",
+    name="admin::get-archival-job",
+    operation_id="getArchivalJob",
+    summary="Статус задачи архивации заказов",
+    status_code=status.HTTP_200_OK,
+    response_model=JobDto,
+    responses={
+        status.HTTP_200_OK: {"model": JobDto, "description": "ok"},
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "not found",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def get_archival_job(job: JobDto = Depends(get_archival_job_dependency)):
+    return job
+
+
+@router.post(
+    "/order-exports",
+    name="admin::export-orders",
+    operation_id="exportOrders",
+    summary="Выгрузить завершенные заказы и их назначения в колоночные "
+    "файлы, по файлу на день",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobDto,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": JobDto,
+            "description": "Задача поставлена в очередь",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def export_orders(job: JobDto = Depends(export_orders_dependency)):
+    return job
+
+
+@router.get(
+    "/order-exports/jobs/{job_id}",
+    name="admin::get-export-job",
+    operation_id="getExportJob",
+    summary="Статус задачи выгрузки заказов",
+    status_code=status.HTTP_200_OK,
+    response_model=JobDto,
+    responses={
+        status.HTTP_200_OK: {"model": JobDto, "description": "ok"},
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "not found",
+        },
+    },
+    tags=["admin-controller"],
+)
+async def get_export_job(job: JobDto = Depends(get_export_job_dependency)):
+    return job
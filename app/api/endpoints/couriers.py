@@ -1,22 +1,33 @@
-from datetime import date, datetime
-from typing import Annotated, Optional
+import json
+from datetime import datetime
+from typing import Annotated, AsyncIterator, Optional
 
+import numpy as np
 from fastapi import APIRouter, Depends
 from fastapi.params import Query
+from sqlalchemy import Row
 from starlette import status
+from starlette.responses import Response, StreamingResponse
 
 from app.api.dependencies.couriers import (
+    courier_etag_dependency, courier_events_dependency,
+    couriers_assignments_etag_dependency, couriers_etag_dependency,
     create_courier_dependency, date_to_datetime_end_dependency,
     date_to_datetime_start_dependency, get_courier_dependency,
     get_courier_metadata_dependency,
     get_courier_orders_in_time_interval_dependency,
-    get_couriers_assignments_dependency, get_couriers_in_range_dependency)
-from app.schemas.models.common import int32
+    get_couriers_assignments_dependency, get_couriers_by_ids_body_dependency,
+    get_couriers_by_ids_dependency, get_couriers_in_range_dependency,
+    get_couriers_order_stats_dependency)
+from app.database.change_feed import change_feed
+from app.schemas.models.common import INT32_MAX, int32, int64
 from app.schemas.models.couriers import CourierDto, CourierTypeEnum
-from app.schemas.models.orders import CouriersGroupOrders, OrderDto
+from app.schemas.models.orders import OrderDto
 from app.schemas.responses.common import BadRequestResponse, NotFoundResponse
 from app.schemas.responses.couriers import (CreateCouriersResponse,
                                             GetCourierMetaInfoResponse,
+                                            GetCouriersByIdsResponse,
+                                            GetCouriersMetaInfoResponse,
                                             GetCouriersResponse)
 from app.schemas.responses.orders import OrderAssignResponse
 
@@ -32,8 +43,125 @@ courier_rating_coefficients = {
     CourierTypeEnum.auto: 1,
 }
 
+# Coefficients by the position of the courier type in `CourierTypeEnum`
+courier_type_index = {
+    courier_type.value: index
+    for index, courier_type in enumerate(CourierTypeEnum)
+}
+courier_earning_coefficients_array = np.array(
+    [courier_earning_coefficients[type_] for type_ in CourierTypeEnum]
+)
+courier_rating_coefficients_array = np.array(
+    [courier_rating_coefficients[type_] for type_ in CourierTypeEnum]
+)
+
 router = APIRouter(tags=["courier-controller"], prefix="/couriers")
 
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def couriers_meta_info_columns(
+    courier_types: list[str],
+    orders_counts: np.ndarray,
+    cost_sums: np.ndarray,
+    hours: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the ratings and the earnings of many couriers at once.
+
+    Matches `get_courier_meta_info` courier by courier, the values of
+    couriers without orders are meaningless and must be omitted.
+
+    Parameters:
+        courier_types: The types of the couriers.
+        orders_counts: The numbers of completed orders.
+        cost_sums: The total costs of the completed orders.
+        hours: The length of the time interval in whole hours.
+
+    Returns:
+        The ratings and the earnings of the couriers.
+    """
+    type_indexes = np.fromiter(
+        map(courier_type_index.__getitem__, courier_types),
+        dtype=np.intp,
+        count=len(courier_types),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratings = np.round(
+            orders_counts
+            / hours
+            * courier_rating_coefficients_array[type_indexes]
+        )
+    earnings = cost_sums * courier_earning_coefficients_array[type_indexes]
+    return ratings, earnings
+
+
+async def stream_couriers_meta_info(
+    pages: AsyncIterator[list[Row]],
+    hours: float,
+    offset: int,
+    limit: Optional[int],
+) -> AsyncIterator[str]:
+    # Объект ответа собирается по страницам курьеров, каждая страница
+    # отправляется клиенту сразу после расчета
+    yield '{"couriers":['
+    separator = ""
+    async for rows in pages:
+        orders_counts = np.array([row.orders_count for row in rows])
+        ratings, earnings = couriers_meta_info_columns(
+            [row.courier_type for row in rows],
+            orders_counts,
+            np.array([row.cost_sum for row in rows]),
+            hours,
+        )
+        couriers = []
+        for row, orders_count, rating, earning in zip(
+            rows, orders_counts.tolist(), ratings.tolist(), earnings.tolist()
+        ):
+            courier = {
+                "courier_type": row.courier_type,
+                "regions": row.regions,
+                "working_hours": row.working_hours,
+                "courier_id": row.courier_id,
+            }
+            if orders_count:
+                courier["rating"] = int(rating)
+                courier["earnings"] = earning
+            couriers.append(courier)
+        yield separator + json.dumps(couriers, separators=(",", ":"))[1:-1]
+        separator = ","
+    yield f'],"limit":{json.dumps(limit)},"offset":{offset}}}'
+
+
+async def stream_change_events(
+    courier_id: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    # Подписка создается при первом шаге потока: поток, не начатый из-за
+    # отключения клиента, не оставляет подписки. События отправляются
+    # пачками по мере поступления, пустая пачка отправляется комментарием,
+    # чтобы соединение не закрывалось по простою. Поток заканчивается при
+    # отключении клиента или остановке сервиса
+    subscription = change_feed.subscribe(courier_id)
+    try:
+        yield b": subscribed\n\n"
+        while True:
+            frames = await subscription.get()
+            if frames is None:
+                return
+            yield b"".join(frames) if frames else b": keepalive\n\n"
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+def event_stream_response(
+    courier_id: Optional[int] = None,
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_change_events(courier_id),
+        media_type="text/event-stream",
+        headers=EVENT_STREAM_HEADERS,
+    )
+
 
 @router.post(
     "/",
@@ -76,21 +204,190 @@ async def add_couriers(
     response_model_exclude_none=True,
 )
 async def get_couriers_assignments(
-    assignments_date: Optional[
-        Annotated[
-            date,
-            Query(
-                alias="date",
-                description="Дата распределения заказов. "
-                "Если не указана, то используется текущий день",
-            ),
-        ]
-    ] = date.today(),
-    couriers: list[CouriersGroupOrders] = Depends(
-        get_couriers_assignments_dependency
+    etag: str = Depends(couriers_assignments_etag_dependency),
+    body: bytes = Depends(get_couriers_assignments_dependency),
+):
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
+
+@router.get(
+    "/meta-info",
+    name="couriers::get_couriers_meta_info",
+    operation_id="getCouriersMetaInfo",
+    status_code=status.HTTP_200_OK,
+    response_model=GetCouriersMetaInfoResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": GetCouriersMetaInfoResponse,
+            "description": "OK",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["courier-controller"],
+)
+async def get_couriers_meta_info(
+    etag: str = Depends(couriers_etag_dependency),
+    start_date: datetime = Depends(date_to_datetime_start_dependency),
+    end_date: datetime = Depends(date_to_datetime_end_dependency),
+    offset: Annotated[int, Query(ge=0, le=INT32_MAX)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1, le=INT32_MAX)] = None,
+    pages: AsyncIterator[list[Row]] = Depends(
+        get_couriers_order_stats_dependency
     ),
 ):
-    return OrderAssignResponse(date=assignments_date, couriers=couriers)
+    """
+    Gets the ratings and the earnings of many couriers.
+
+    Parameters:
+        * start_date: The start date of the time interval.
+        * end_date: The end date of the time interval.
+        * offset: The number of couriers to skip.
+        * limit: The maximum number of couriers, all if not given.
+        * pages: The pages of the order statistics of the couriers.
+
+    Returns:
+
+        * A `GetCouriersMetaInfoResponse` object streamed page by page,
+          rating and earnings are omitted for couriers without orders.
+
+    """
+
+    hours = ((end_date - start_date).total_seconds()) // 3600
+    return StreamingResponse(
+        stream_couriers_meta_info(pages, hours, offset, limit),
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
+
+
+@router.get(
+    "/by-ids",
+    operation_id="getCouriersByIds",
+    name="couriers::get-couriers-by-ids",
+    status_code=status.HTTP_200_OK,
+    description="Получить курьеров по списку идентификаторов одним "
+    "запросом. Курьеры возвращаются в порядке запроса, не найденные "
+    "идентификаторы перечисляются в missing_ids",
+    response_model=GetCouriersByIdsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": GetCouriersByIdsResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["courier-controller"],
+)
+async def get_couriers_by_ids(
+    couriers: GetCouriersByIdsResponse = Depends(
+        get_couriers_by_ids_dependency
+    ),
+):
+    return couriers
+
+
+@router.post(
+    "/by-ids",
+    operation_id="getCouriersByIdsBody",
+    name="couriers::get-couriers-by-ids-body",
+    status_code=status.HTTP_200_OK,
+    description="Получить курьеров по списку идентификаторов в теле "
+    "запроса, для списков, не помещающихся в строку запроса",
+    response_model=GetCouriersByIdsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": GetCouriersByIdsResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["courier-controller"],
+)
+async def get_couriers_by_ids_body(
+    couriers: GetCouriersByIdsResponse = Depends(
+        get_couriers_by_ids_body_dependency
+    ),
+):
+    return couriers
+
+
+@router.get(
+    "/events",
+    name="couriers::get-events",
+    operation_id="getEvents",
+    summary="Поток событий назначений и завершения заказов всех курьеров "
+    "(Server-Sent Events)",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "События `assignment`, `completion` и `resync`",
+        },
+    },
+    tags=["courier-controller"],
+)
+async def get_events():
+    """
+    Streams the changes of the assignments and the completed orders of all
+    couriers, see `get_courier_events`.
+    """
+
+    return event_stream_response()
+
+
+@router.get(
+    "/{courier_id}/events",
+    name="couriers::get-courier-events",
+    operation_id="getCourierEvents",
+    summary="Поток событий назначений и завершения заказов курьера "
+    "(Server-Sent Events)",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "События `assignment`, `completion` и `resync`",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "not found",
+        },
+    },
+    tags=["courier-controller"],
+)
+async def get_courier_events(
+    courier_id: int64 = Depends(courier_events_dependency),
+):
+    """
+    Streams the changes of the assignments and the completed orders of a
+    courier.
+
+    Events:
+
+        * `assignment`: The orders assigned to the courier for a date.
+        * `completion`: An order completed by the courier.
+        * `resync`: Events may have been missed, the current state should
+          be read again.
+
+    """
+
+    return event_stream_response(courier_id)
 
 
 @router.get(
@@ -113,6 +410,7 @@ async def get_couriers_assignments(
     tags=["courier-controller"],
 )
 async def get_courier_by_id(
+    etag: str = Depends(courier_etag_dependency),
     courier: CourierDto = Depends(get_courier_dependency),
 ):
     return courier
@@ -181,6 +479,7 @@ async def get_couriers_in_range(
     response_model_exclude_unset=True,
 )
 async def get_courier_meta_info(
+    etag: str = Depends(courier_etag_dependency),
     courier_meta_info: GetCourierMetaInfoResponse = Depends(
         get_courier_metadata_dependency
     ),
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends
 from starlette import status
 
-from app.api.dependencies.orders import (add_orders, complete_order,
-                                         get_order_by_id, get_orders_in_range)
+from app.api.dependencies.orders import (add_orders, assign_orders,
+                                         cancel_assignment_job, complete_order,
+                                         get_assignment_job,
+                                         get_candidate_groups, get_order_by_id,
+                                         get_orders_by_ids,
+                                         get_orders_by_ids_body,
+                                         get_orders_in_range, score_assignment)
+from app.schemas.models.jobs import JobDto
 from app.schemas.models.orders import OrderDto
 from app.schemas.responses.common import BadRequestResponse, NotFoundResponse
+from app.schemas.responses.orders import (AssignmentScoreResponse,
+                                          CandidateGroupsResponse,
+                                          GetOrdersByIdsResponse)
 
 router = APIRouter(tags=["order-controller"], prefix="/orders")
 
@@ -30,6 +39,61 @@ async def get_orders_in_range(
     return orders
 
 
+@router.get(
+    "/by-ids",
+    name="orders::get-orders-by-ids",
+    operation_id="getOrdersByIds",
+    status_code=status.HTTP_200_OK,
+    description="Получить заказы по списку идентификаторов одним запросом. "
+    "Заказы возвращаются в порядке запроса, не найденные идентификаторы "
+    "перечисляются в missing_ids",
+    response_model=GetOrdersByIdsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": GetOrdersByIdsResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["order-controller"],
+    response_model_exclude_none=True,
+)
+async def get_orders_by_ids(
+    orders: GetOrdersByIdsResponse = Depends(get_orders_by_ids),
+):
+    return orders
+
+
+@router.post(
+    "/by-ids",
+    name="orders::get-orders-by-ids-body",
+    operation_id="getOrdersByIdsBody",
+    status_code=status.HTTP_200_OK,
+    description="Получить заказы по списку идентификаторов в теле запроса, "
+    "для списков, не помещающихся в строку запроса",
+    response_model=GetOrdersByIdsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": GetOrdersByIdsResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["order-controller"],
+    response_model_exclude_none=True,
+)
+async def get_orders_by_ids_body(
+    orders: GetOrdersByIdsResponse = Depends(get_orders_by_ids_body),
+):
+    return orders
+
+
 @router.get(
     "/{order_id}",
     name="orders::get-order-by-id",
@@ -96,3 +160,131 @@ async def complete_order(
     completed_orders: list[OrderDto] = Depends(complete_order),
 ):
     return completed_orders
+
+
+@router.post(
+    "/assign",
+    name="orders::assign-orders",
+    operation_id="ordersAssign",
+    status_code=status.HTTP_202_ACCEPTED,
+    description="Запустить распределение заказов по курьерам на дату. "
+    "Распределение выполняется в фоне, ответ содержит задачу, статус "
+    "которой можно получить по её идентификатору. Если распределение на "
+    "эту дату уже выполняется, возвращается существующая задача",
+    response_model=JobDto,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": JobDto,
+            "description": "Задача поставлена в очередь",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["order-controller"],
+)
+async def assign_orders(job: JobDto = Depends(assign_orders)):
+    return job
+
+
+@router.get(
+    "/assign/score",
+    name="orders::score-assignment",
+    operation_id="scoreAssignment",
+    status_code=status.HTTP_200_OK,
+    description="Смоделировать смены курьеров по сохраненному плану дня: "
+    "время доставки каждого заказа, нарушения окон доставки, рабочих "
+    "интервалов и ограничений типа курьера, загрузку курьеров и стоимость. "
+    "Целевая функция возвращается только для допустимого плана",
+    response_model=AssignmentScoreResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": AssignmentScoreResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["order-controller"],
+    response_model_exclude_none=True,
+)
+async def score_assignment(
+    score: AssignmentScoreResponse = Depends(score_assignment),
+):
+    return score
+
+
+@router.get(
+    "/assign/candidates",
+    name="orders::candidate-groups",
+    operation_id="candidateGroups",
+    status_code=status.HTTP_200_OK,
+    description="Получить группы нераспределенных заказов района, которые "
+    "курьер заданного типа может доставить за одну поездку, начатую в "
+    "получасовой интервал указанной минуты",
+    response_model=CandidateGroupsResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": CandidateGroupsResponse,
+            "description": "ok",
+        },
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+    },
+    tags=["order-controller"],
+)
+async def get_candidate_groups(
+    groups: CandidateGroupsResponse = Depends(get_candidate_groups),
+):
+    return groups
+
+
+@router.get(
+    "/assign/jobs/{job_id}",
+    name="orders::get-assignment-job",
+    operation_id="getAssignmentJob",
+    status_code=status.HTTP_200_OK,
+    response_model=JobDto,
+    responses={
+        status.HTTP_200_OK: {"model": JobDto, "description": "ok"},
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "bad request",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "not found",
+        },
+    },
+    tags=["order-controller"],
+)
+async def get_assignment_job(job: JobDto = Depends(get_assignment_job)):
+    return job
+
+
+@router.delete(
+    "/assign/jobs/{job_id}",
+    name="orders::cancel-assignment-job",
+    operation_id="cancelAssignmentJob",
+    status_code=status.HTTP_200_OK,
+    response_model=JobDto,
+    responses={
+        status.HTTP_200_OK: {"model": JobDto, "description": "ok"},
+        status.HTTP_400_BAD_REQUEST: {
+            "model": BadRequestResponse,
+            "description": "Задача уже завершена",
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "not found",
+        },
+    },
+    tags=["order-controller"],
+)
+async def cancel_assignment_job(job: JobDto = Depends(cancel_assignment_job)):
+    return job
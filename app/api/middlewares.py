@@ -1,13 +1,70 @@
 """
-This module provides a function for getting the SlowAPIMiddleware class.
+This module provides the middlewares of the application.
 
 The `get_middleware()` function returns the `SlowAPIMiddleware` class.
 This class can be used to add slow request handling to a FastAPI application.
+
+The `ConcurrencyLimitMiddleware` class admits requests through an
+`AdaptiveConcurrencyLimiter` and sheds the ones it refuses with
+`503 Service Unavailable` and a `Retry-After` header.
+
+The `LoopStallMiddleware` class registers the requests in flight with the
+`LoopStallMonitor`, so that the code blocking the event loop is reported
+with the route it serves.
+
+The `AccessLogMiddleware` class writes an access log entry per request, the
+entry is formatted and written by the thread of the `LogQueue`.
 """
 
+import logging
+import re
+import sys
+import time
 from typing import Type
 
 from slowapi.middleware import SlowAPIMiddleware
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.concurrency import AdaptiveConcurrencyLimiter, Priority
+from app.core.loop_monitor import LoopStallMonitor
+from app.core.metrics import metrics
+
+# (method, path pattern, route class, priority), the first match wins.
+# Completions and the polls of couriers are kept under overload, reports
+# and background work are shed first
+ROUTE_PRIORITIES = [
+    ("POST", r"/orders/complete/?", "orders_complete", Priority.CRITICAL),
+    (
+        "GET",
+        r"/couriers/assignments/?",
+        "couriers_assignments",
+        Priority.CRITICAL,
+    ),
+    ("GET", r"/couriers/meta-info(/.*)?", "couriers_meta_info", Priority.LOW),
+    ("GET", r"/couriers/\d+/?", "courier", Priority.CRITICAL),
+    ("POST", r"/orders/assign/?", "orders_assign", Priority.LOW),
+    ("GET", r"/orders/assign/score/?", "orders_assign_score", Priority.LOW),
+    ("POST", r"/admin/order-archival/?", "order_archival", Priority.LOW),
+    ("POST", r"/admin/order-exports/?", "order_exports", Priority.LOW),
+    ("GET", r"/admin/metrics/?", "admin_metrics", Priority.CRITICAL),
+]
+# Event streams stay open for hours, they are not counted as requests in
+# flight
+UNLIMITED_ROUTES = re.compile(r"/couriers/(\d+/)?events/?")
+ROUTE_PATTERNS = [
+    (method, re.compile(pattern), route, priority)
+    for method, pattern, route, priority in ROUTE_PRIORITIES
+]
+
+shed_counters = {
+    priority: metrics.counter(
+        f"http_shed_{priority.name.lower()}_total",
+        f"Requests of {priority.name.lower()} priority shed under overload",
+    )
+    for priority in Priority
+}
 
 
 def get_middleware() -> Type[SlowAPIMiddleware]:
@@ -18,3 +75,165 @@ def get_middleware() -> Type[SlowAPIMiddleware]:
         The SlowAPIMiddleware class.
     """
     return SlowAPIMiddleware
+
+
+def classify_request(method: str, path: str) -> tuple[str, Priority]:
+    """
+    Finds the route class and the priority of a request.
+
+    Returns:
+        The route class, used to keep latency baselines per route, and the
+        priority, normal for the routes not listed in `ROUTE_PRIORITIES`.
+    """
+    for route_method, pattern, route, priority in ROUTE_PATTERNS:
+        if method == route_method and pattern.fullmatch(path):
+            return route, priority
+    return f"{method} {path.split('/')[1]}", Priority.NORMAL
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    An ASGI middleware limiting the number of requests in flight.
+
+    __app(ASGIApp):
+        The wrapped application.
+    __limiter(AdaptiveConcurrencyLimiter):
+        The limiter admitting the requests.
+    __retry_after_s(int):
+        The value of the `Retry-After` header of shed requests.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: AdaptiveConcurrencyLimiter,
+        retry_after_s: int = 1,
+    ) -> None:
+        self.__app = app
+        self.__limiter = limiter
+        self.__retry_after_s = retry_after_s
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or UNLIMITED_ROUTES.fullmatch(
+            scope["path"]
+        ):
+            await self.__app(scope, receive, send)
+            return
+        route, priority = classify_request(scope["method"], scope["path"])
+        ticket = await self.__limiter.acquire(priority)
+        if ticket is None:
+            shed_counters[priority].inc()
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Service is overloaded, retry later"},
+                headers={"Retry-After": str(self.__retry_after_s)},
+            )
+            await response(scope, receive, send)
+            return
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.__app(scope, receive, send_with_status)
+        finally:
+            self.__limiter.release(
+                ticket,
+                route,
+                (time.perf_counter() - started) * 1000,
+                failed=status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class LoopStallMiddleware:
+    """
+    An ASGI middleware registering requests with the loop stall monitor.
+
+    The frame of the middleware must be on the stack of the endpoint, so it
+    is added inside the middlewares running the inner application in
+    another task, e.g. the ones built on `BaseHTTPMiddleware`.
+
+    __app(ASGIApp):
+        The wrapped application.
+    __monitor(LoopStallMonitor):
+        The monitor the requests are registered with.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: LoopStallMonitor) -> None:
+        self.__app = app
+        self.__monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.__app(scope, receive, send)
+            return
+        # The frame of this coroutine is on the stack of everything the
+        # request runs, the monitor finds the request by it
+        frame = sys._getframe()
+        self.__monitor.requests[frame] = scope
+        try:
+            await self.__app(scope, receive, send)
+        finally:
+            del self.__monitor.requests[frame]
+
+
+class AccessLogMiddleware:
+    """
+    An ASGI middleware writing the access log.
+
+    __app(ASGIApp):
+        The wrapped application.
+    __logger(logging.Logger):
+        The logger the entries are written to.
+    """
+
+    def __init__(self, app: ASGIApp, logger: logging.Logger) -> None:
+        self.__app = app
+        self.__logger = logger
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.__logger.isEnabledFor(
+            logging.INFO
+        ):
+            await self.__app(scope, receive, send)
+            return
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        sent_bytes = 0
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code, sent_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.__app(scope, receive, send_with_status)
+        finally:
+            client = scope.get("client")
+            self.__logger.info(
+                "%s %s %d",
+                scope["method"],
+                scope["path"],
+                status_code,
+                extra={
+                    "fields": {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "query": scope["query_string"].decode("latin-1"),
+                        "status": status_code,
+                        "duration_ms": round(
+                            (time.perf_counter() - started) * 1000, 3
+                        ),
+                        "bytes": sent_bytes,
+                        "client": client[0] if client else None,
+                    }
+                },
+            )
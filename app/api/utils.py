@@ -2,27 +2,36 @@ from fastapi import APIRouter
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-from app.api.endpoints import couriers, orders
+from app.api.endpoints import admin, couriers, orders
+from app.core.config import settings
 
 
 def get_limiter() -> Limiter:
     """
     Returns a limiter that limits requests to 10 per second per remote address.
 
+    The limit can be changed with `RATE_LIMIT_DEFAULT` and the limiter can be
+    turned off with `RATE_LIMIT_ENABLED`, e.g. for local load testing.
+
     Returns:
         Limiter: A limiter that limits requests to 10 per second per remote address.
     """
-    return Limiter(key_func=get_remote_address, default_limits=["10/second"])
+    return Limiter(
+        key_func=get_remote_address,
+        default_limits=[settings.RATE_LIMIT_DEFAULT],
+        enabled=settings.RATE_LIMIT_ENABLED,
+    )
 
 
 def get_router() -> APIRouter:
     """
-    Returns an API router that includes the `orders` and `couriers` routers.
+    Returns an API router that includes the `orders`, `couriers` and `admin` routers.
 
     Returns:
-        APIRouter: An API router that includes the `orders` and `couriers` routers.
+        APIRouter: An API router that includes the `orders`, `couriers` and `admin` routers.
     """
     router = APIRouter()
     router.include_router(couriers.router)
     router.include_router(orders.router)
+    router.include_router(admin.router)
     return router
@@ -0,0 +1,226 @@
+"""
+This module provides the candidate-group index of unassigned orders.
+
+Orders are bucketed by region and by the time slots their delivery windows
+touch, so that the orders a courier can deliver around a minute are found
+without scanning every order of its regions. For a bucket and a courier type
+the index derives the feasible groups of the bucket: the orders sorted by
+urgency are packed into trips starting at the slot, each within the count
+and weight limits of the type and delivered inside its delivery window.
+
+The same buckets are persisted in the `order_slot` table, see
+`app.database.models.order_slot`.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable
+
+from app.assignment.plan import Interval, PlanningOrder, delivery_window_end
+from app.assignment.rules import COURIER_RULES, CourierRules, group_cost
+from app.schemas.models.couriers import CourierTypeEnum
+
+SLOT_MINUTES = 30
+
+Bucket = tuple[int, int]
+
+
+def window_slots(windows: Iterable[Interval]) -> list[int]:
+    """
+    Lists the time slots touched by delivery windows.
+
+    Parameters:
+        windows: The delivery windows in minutes.
+
+    Returns:
+        The sorted slot numbers, a slot is `SLOT_MINUTES` long.
+    """
+    return sorted(
+        {
+            slot
+            for start, end in windows
+            for slot in range(start // SLOT_MINUTES, end // SLOT_MINUTES + 1)
+        }
+    )
+
+
+@dataclass(frozen=True)
+class CandidateGroup:
+    """
+    Orders of one region that a courier can deliver in one trip.
+
+    Attributes:
+        order_ids: The orders in delivery order.
+        start_minute: The minute the trip starts, the start of the slot.
+        end_minute: The minute the last order is delivered.
+        weight: The total weight of the orders.
+        cost: The cost of the group.
+    """
+
+    order_ids: tuple[int, ...]
+    start_minute: int
+    end_minute: int
+    weight: float
+    cost: float
+
+
+def candidate_groups(
+    orders: Iterable[PlanningOrder], rules: CourierRules, start_minute: int
+) -> list[CandidateGroup]:
+    """
+    Packs the orders of one region into trips starting at a minute.
+
+    Orders are taken in the order of the end of the window they are
+    delivered in, then by cost, most expensive first. An order joins the
+    first group it fits into by weight and count and delivery time, the
+    orders that can not be delivered from that minute are left out.
+
+    Parameters:
+        orders: Orders of one region.
+        rules: The rules of the courier type.
+        start_minute: The minute the trips start.
+
+    Returns:
+        The groups in the order they were opened.
+    """
+    deliverable = []
+    for order in orders:
+        if order.weight > rules.max_weight:
+            continue
+        window_end = delivery_window_end(
+            order, start_minute + rules.first_order_minutes
+        )
+        if window_end is None:
+            continue
+        deliverable.append((window_end, -order.cost, order.order_id, order))
+    packs: list[list[PlanningOrder]] = []
+    for _, _, _, order in sorted(deliverable):
+        for pack in packs:
+            if len(pack) == rules.max_orders:
+                continue
+            if sum(item.weight for item in pack) + order.weight > (
+                rules.max_weight
+            ):
+                continue
+            delivered = (
+                start_minute
+                + rules.first_order_minutes
+                + len(pack) * rules.next_order_minutes
+            )
+            if delivery_window_end(order, delivered) is not None:
+                pack.append(order)
+                break
+        else:
+            packs.append([order])
+    return [
+        CandidateGroup(
+            order_ids=tuple(order.order_id for order in pack),
+            start_minute=start_minute,
+            end_minute=start_minute
+            + rules.first_order_minutes
+            + (len(pack) - 1) * rules.next_order_minutes,
+            weight=sum(order.weight for order in pack),
+            cost=group_cost([order.cost for order in pack]),
+        )
+        for pack in packs
+    ]
+
+
+class CandidateIndex:
+    """
+    Orders bucketed by region and time slot.
+
+    Orders are added and removed one by one, the groups of a bucket are
+    derived on the first lookup and kept until the bucket changes.
+    """
+
+    def __init__(self, orders: Iterable[PlanningOrder] = ()) -> None:
+        self._buckets: dict[Bucket, dict[int, PlanningOrder]] = {}
+        self._groups: dict[
+            tuple[Bucket, CourierTypeEnum], list[CandidateGroup]
+        ] = {}
+        self._orders: dict[int, PlanningOrder] = {}
+        for order in orders:
+            self.add(order)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def add(self, order: PlanningOrder) -> None:
+        """Adds an order, replacing the order with the same ID."""
+        self.remove(order.order_id)
+        self._orders[order.order_id] = order
+        for slot in window_slots(order.windows):
+            bucket = (order.region, slot)
+            self._buckets.setdefault(bucket, {})[order.order_id] = order
+            self._invalidate(bucket)
+
+    def remove(self, order_id: int) -> None:
+        """Removes an order if it is indexed."""
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return
+        for slot in window_slots(order.windows):
+            bucket = (order.region, slot)
+            orders = self._buckets[bucket]
+            del orders[order_id]
+            if not orders:
+                del self._buckets[bucket]
+            self._invalidate(bucket)
+
+    def orders(self) -> list[PlanningOrder]:
+        """Lists the indexed orders."""
+        return list(self._orders.values())
+
+    def bucket(self, region: int, slot: int) -> list[PlanningOrder]:
+        """Lists the orders of a region whose windows touch a slot."""
+        return list(self._buckets.get((region, slot), {}).values())
+
+    def candidates(
+        self, regions: Iterable[int], start: int, end: int
+    ) -> list[PlanningOrder]:
+        """
+        Lists the orders of regions whose windows touch an interval.
+
+        Parameters:
+            regions: The regions of the orders.
+            start: The first minute of the interval.
+            end: The last minute of the interval.
+
+        Returns:
+            The orders, each once.
+        """
+        found: dict[int, PlanningOrder] = {}
+        for region in regions:
+            for slot in range(start // SLOT_MINUTES, end // SLOT_MINUTES + 1):
+                found.update(self._buckets.get((region, slot), {}))
+        return list(found.values())
+
+    def groups(
+        self, region: int, slot: int, courier_type: CourierTypeEnum
+    ) -> list[CandidateGroup]:
+        """
+        Gets the feasible groups of a bucket for a courier type.
+
+        Parameters:
+            region: The region of the orders.
+            slot: The slot the trips start at.
+            courier_type: The type of the courier delivering the groups.
+
+        Returns:
+            The groups, see `candidate_groups`.
+        """
+        key = ((region, slot), courier_type)
+        if key not in self._groups:
+            self._groups[key] = candidate_groups(
+                self.bucket(region, slot),
+                COURIER_RULES[courier_type],
+                slot * SLOT_MINUTES,
+            )
+        return self._groups[key]
+
+    def _invalidate(self, bucket: Bucket) -> None:
+        for courier_type in CourierTypeEnum:
+            self._groups.pop((bucket, courier_type), None)
@@ -0,0 +1,226 @@
+"""
+This module provides the greedy order assignment.
+
+Couriers are processed one by one, larger vehicles first. Every working
+interval of a courier is filled with delivery groups from its start: a group
+starts with the most urgent order that can be delivered in time and is
+extended while the weight, count and region limits of the courier type allow
+and the next delivery still falls into the order's delivery window and the
+courier's working interval. The orders a group may take are looked up in a
+`CandidateIndex` by the regions of the courier and the minutes the group can
+last.
+"""
+
+from typing import Callable, Optional
+
+from app.assignment.candidates import CandidateIndex
+from app.assignment.plan import (DayPlan, DeliveryGroup, Interval,
+                                 PlanningCourier, PlanningOrder,
+                                 delivery_window_end)
+from app.assignment.rules import COURIER_RULES, CourierRules, group_cost
+from app.schemas.models.couriers import CourierTypeEnum
+
+COURIER_TYPE_PRIORITY = {
+    CourierTypeEnum.auto: 0,
+    CourierTypeEnum.bike: 1,
+    CourierTypeEnum.foot: 2,
+}
+
+Progress = Callable[[float], None]
+
+
+def next_window_start(
+    orders: list[PlanningOrder], minute: int, lead_minutes: int
+) -> Optional[int]:
+    """
+    Finds the nearest minute after `minute` when some order could be taken.
+
+    Returns:
+        The minute to start a trip at, or `None` if no window opens later.
+    """
+    starts = [
+        start - lead_minutes
+        for order in orders
+        for start, _ in order.windows
+        if start - lead_minutes > minute
+    ]
+    return min(starts, default=None)
+
+
+def candidate_key(
+    order: PlanningOrder,
+    rules: CourierRules,
+    regions: list[int],
+    weight: float,
+    minute: int,
+    shift_end: int,
+) -> Optional[tuple[tuple, int]]:
+    """
+    Checks whether an order can be added to a group.
+
+    Parameters:
+        order: The order to add.
+        rules: The rules of the courier type.
+        regions: The regions of the orders already in the group.
+        weight: The weight of the orders already in the group.
+        minute: The minute the last order of the group is delivered.
+        shift_end: The end of the courier's working interval.
+
+    Returns:
+        The key ordering the feasible orders, the smallest is added first,
+        and the minute the order is delivered, or `None` if the order can
+        not be added.
+    """
+    if weight + order.weight > rules.max_weight:
+        return None
+    if order.region in regions:
+        delivered = minute + rules.next_order_minutes
+        same_region = 0
+    elif len(regions) < rules.max_regions:
+        delivered = minute + rules.first_order_minutes
+        same_region = 1
+    else:
+        return None
+    if delivered > shift_end:
+        return None
+    window_end = delivery_window_end(order, delivered)
+    if window_end is None:
+        return None
+    # Prefer staying in the region, then the most urgent order, then the
+    # most expensive one
+    return (same_region, window_end, -order.cost, order.order_id), delivered
+
+
+def build_group(
+    courier: PlanningCourier,
+    rules: CourierRules,
+    candidates: list[PlanningOrder],
+    start_minute: int,
+    shift_end: int,
+    first: Optional[PlanningOrder] = None,
+) -> Optional[DeliveryGroup]:
+    """
+    Builds the best group the courier can start at the given minute.
+
+    Parameters:
+        courier: The courier to build the group for.
+        rules: The rules of the courier type.
+        candidates: Unassigned orders in the courier's regions.
+        start_minute: The minute the trip starts.
+        shift_end: The end of the courier's working interval.
+        first: The order to start the group with, one of `candidates`.
+
+    Returns:
+        The group, or `None` if no order can be delivered in time.
+    """
+    group: list[PlanningOrder] = []
+    regions: list[int] = []
+    weight, minute = 0.0, start_minute
+    while len(group) < rules.max_orders:
+        best, best_key, best_minute = None, None, None
+        for order in candidates if group or first is None else [first]:
+            checked = candidate_key(
+                order, rules, regions, weight, minute, shift_end
+            )
+            if checked is not None and (
+                best_key is None or checked[0] < best_key
+            ):
+                best, (best_key, best_minute) = order, checked
+        if best is None:
+            break
+        group.append(best)
+        candidates.remove(best)
+        if best.region not in regions:
+            regions.append(best.region)
+        weight += best.weight
+        minute = best_minute
+    if not group:
+        return None
+    return DeliveryGroup(
+        courier_id=courier.courier_id,
+        start_minute=start_minute,
+        end_minute=minute,
+        order_ids=[order.order_id for order in group],
+        cost=group_cost([order.cost for order in group]),
+    )
+
+
+def assign_greedy(
+    couriers: list[PlanningCourier],
+    orders: list[PlanningOrder],
+    progress: Optional[Progress] = None,
+) -> DayPlan:
+    """
+    Assigns orders to couriers with the greedy strategy.
+
+    Parameters:
+        couriers: Couriers available for the day.
+        orders: Unassigned orders.
+        progress: Optional callback receiving the share of processed couriers.
+
+    Returns:
+        A `DayPlan` with the delivery groups and unassigned orders.
+    """
+    index = CandidateIndex(orders)
+    plan = DayPlan()
+    ordered_couriers = sorted(
+        couriers,
+        key=lambda item: (
+            COURIER_TYPE_PRIORITY[item.courier_type],
+            item.courier_id,
+        ),
+    )
+    for position, courier in enumerate(ordered_couriers):
+        rules = COURIER_RULES[courier.courier_type]
+        for shift_start, shift_end in courier.shifts:
+            plan.groups.extend(
+                assign_shift(courier, rules, index, (shift_start, shift_end))
+            )
+        if progress:
+            progress((position + 1) / len(ordered_couriers))
+    plan.unassigned_order_ids = sorted(
+        order.order_id for order in index.orders()
+    )
+    return plan
+
+
+def assign_shift(
+    courier: PlanningCourier,
+    rules: CourierRules,
+    index: CandidateIndex,
+    shift: Interval,
+) -> list[DeliveryGroup]:
+    """
+    Fills one working interval of a courier with delivery groups.
+
+    Assigned orders are removed from `index`.
+    """
+    shift_start, shift_end = shift
+    # Every order of a group is delivered at most the time of a first order
+    # after the previous one
+    horizon = rules.max_orders * rules.first_order_minutes
+    groups = []
+    minute = shift_start
+    while minute < shift_end:
+        candidates = index.candidates(
+            courier.regions, minute, min(minute + horizon, shift_end)
+        )
+        group = build_group(courier, rules, candidates, minute, shift_end)
+        if group is None:
+            minute = next_window_start(
+                index.candidates(
+                    courier.regions,
+                    minute,
+                    shift_end + rules.first_order_minutes,
+                ),
+                minute,
+                rules.first_order_minutes,
+            )
+            if minute is None:
+                break
+            continue
+        for order_id in group.order_ids:
+            index.remove(order_id)
+        groups.append(group)
+        minute = group.end_minute
+    return groups
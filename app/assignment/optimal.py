@@ -0,0 +1,386 @@
+"""
+This module provides the time-budgeted optimising order assignment.
+
+The greedy plan is made first, it is both the starting point and the
+fallback. The day is then split into subproblems, one per working interval
+of a courier, taken in the order of the greedy assignment. The orders of a
+subproblem are the orders of the greedy groups of the interval and the
+orders nobody has taken in the regions of the courier.
+
+A subproblem is solved by branch-and-bound over candidate groups: a node is
+the minute the courier is free at and the orders left, a branch is the next
+group started with one of the cheapest orders that can be delivered first,
+since only the first order of a group is paid in full. A node is pruned when
+its cost plus a lower bound of the orders left is not better than the best
+schedule found, which starts as the greedy one. The groups are filled the
+way the greedy assignment fills them, so the search is exact over these
+candidates rather than over all subsets of the orders.
+
+The budget is shared between the subproblems, the time a subproblem does not
+use is left to the next ones. Once the budget runs out the remaining
+working intervals keep their greedy groups, and if the optimised plan is not
+better than the greedy one as a whole, the greedy plan is returned.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Optional
+
+from app.assignment.greedy import (COURIER_TYPE_PRIORITY, Progress,
+                                   assign_greedy, build_group,
+                                   next_window_start)
+from app.assignment.plan import (DayPlan, DeliveryGroup, Interval,
+                                 PlanningCourier, PlanningOrder,
+                                 delivery_window_end)
+from app.assignment.rules import (COURIER_RULES, NEXT_ORDER_COST_SHARE,
+                                  CourierRules)
+from app.assignment.simulator import UNASSIGNED_ORDER_PENALTY, score_plan
+
+# The number of first orders a node branches on besides the greedy group
+BRANCHING = 3
+# Nodes searched between checks of the deadline
+DEADLINE_CHECK_NODES = 64
+
+
+@dataclass
+class OptimisationResult:
+    """
+    The result of an optimising assignment run.
+
+    Attributes:
+        plan: The best plan found.
+        objective: The objective of the plan, see `ShiftSimulation`.
+        greedy_objective: The objective of the greedy plan.
+        lower_bound: A lower bound of the objective of any plan of the day.
+        subproblems: The number of working intervals.
+        searched_subproblems: The intervals whose search tree was exhausted.
+        timed_out: Whether the budget ran out before the search ended.
+        fell_back: Whether the greedy plan is returned.
+    """
+
+    plan: DayPlan
+    objective: float
+    greedy_objective: float
+    lower_bound: float
+    subproblems: int
+    searched_subproblems: int
+    timed_out: bool
+    fell_back: bool
+
+    @property
+    def gap(self) -> float:
+        """The share of the objective the optimum may be below it."""
+        if math.isinf(self.objective):
+            return 1.0
+        if not self.objective:
+            return 0.0
+        return max(0.0, 1 - self.lower_bound / self.objective)
+
+
+class _Timeout(Exception):
+    pass
+
+
+def lower_bound(
+    couriers: list[PlanningCourier],
+    orders: list[PlanningOrder],
+    penalty: float = UNASSIGNED_ORDER_PENALTY,
+) -> float:
+    """
+    Bounds the objective of any plan of the day from below.
+
+    Orders of regions without couriers are never delivered. The couriers can
+    not deliver more orders than their working minutes divided by the time
+    of a next order, and a group pays at most `max_orders` orders at 80%.
+
+    Parameters:
+        couriers: The couriers of the day.
+        orders: The orders to assign.
+        penalty: The penalty of an unassigned order, see `objective`.
+
+    Returns:
+        The bound of the objective.
+    """
+    served = {region for courier in couriers for region in courier.regions}
+    capacity = sum(
+        (end - start) // COURIER_RULES[courier.courier_type].next_order_minutes
+        for courier in couriers
+        for start, end in courier.shifts
+    )
+    max_orders = max(
+        (
+            COURIER_RULES[courier.courier_type].max_orders
+            for courier in couriers
+        ),
+        default=1,
+    )
+    unserved = sum(
+        order.cost for order in orders if order.region not in served
+    )
+    return (1 + penalty) * unserved + _bound(
+        [order.cost for order in orders if order.region in served],
+        capacity,
+        max_orders,
+        penalty,
+    )
+
+
+def _bound(
+    costs: list[int], capacity: int, max_orders: int, penalty: float
+) -> float:
+    """
+    Bounds the objective of orders delivered by at most `capacity` orders.
+
+    Every order is paid at least 80%. The orders over the capacity are not
+    delivered and are paid in full with the penalty, and every
+    `max_orders` delivered orders pay one order in full: the cheapest
+    orders are taken for both.
+    """
+    costs = sorted(costs)
+    unassigned = max(0, len(costs) - capacity)
+    firsts = unassigned + math.ceil((len(costs) - unassigned) / max_orders)
+    prefix = [0, *accumulate(costs)]
+    return (
+        NEXT_ORDER_COST_SHARE * prefix[-1]
+        + (1 - NEXT_ORDER_COST_SHARE) * prefix[firsts]
+        + penalty * prefix[unassigned]
+    )
+
+
+def assign_optimal(
+    couriers: list[PlanningCourier],
+    orders: list[PlanningOrder],
+    budget_ms: float,
+    progress: Optional[Progress] = None,
+    penalty: float = UNASSIGNED_ORDER_PENALTY,
+) -> OptimisationResult:
+    """
+    Assigns orders to couriers minimizing the objective within a budget.
+
+    Parameters:
+        couriers: Couriers available for the day.
+        orders: Unassigned orders.
+        budget_ms: The time the optimisation may take, the greedy run
+            included.
+        progress: Optional callback receiving the share of processed
+            working intervals.
+        penalty: The penalty of an unassigned order, see `objective`.
+
+    Returns:
+        An `OptimisationResult` with the plan and its distance to the lower
+        bound.
+    """
+    deadline = time.monotonic() + budget_ms / 1000
+    greedy = assign_greedy(couriers, orders)
+    greedy_objective = score_plan(couriers, orders, greedy).objective(penalty)
+    by_id = {order.order_id: order for order in orders}
+    shifts = [
+        (courier, shift)
+        for courier in sorted(
+            couriers,
+            key=lambda item: (
+                COURIER_TYPE_PRIORITY[item.courier_type],
+                item.courier_id,
+            ),
+        )
+        for shift in courier.shifts
+    ]
+    greedy_groups: dict[tuple[int, Interval], list[DeliveryGroup]] = {}
+    shifts_by_courier = {
+        courier.courier_id: courier.shifts for courier in couriers
+    }
+    for group in greedy.groups:
+        shift = next(
+            (start, end)
+            for start, end in shifts_by_courier[group.courier_id]
+            if start <= group.start_minute <= end
+        )
+        greedy_groups.setdefault((group.courier_id, shift), []).append(group)
+
+    pool = set(greedy.unassigned_order_ids)
+    plan, searched, timed_out = DayPlan(), 0, False
+    for index, (courier, shift) in enumerate(shifts):
+        groups = greedy_groups.get((courier.courier_id, shift), [])
+        own = [
+            by_id[order_id] for group in groups for order_id in group.order_ids
+        ]
+        now = time.monotonic()
+        if now < deadline:
+            free = [
+                by_id[order_id]
+                for order_id in sorted(pool)
+                if by_id[order_id].region in courier.regions
+            ]
+            # An interval may take twice its share of the time left, most
+            # intervals need less and leave the rest to the next ones
+            groups, exhausted = _search_shift(
+                courier,
+                shift,
+                own + free,
+                groups,
+                penalty,
+                now + (deadline - now) * min(1, 2 / (len(shifts) - index)),
+            )
+            searched += exhausted
+        else:
+            timed_out = True
+        pool.update(order.order_id for order in own)
+        pool.difference_update(
+            order_id for group in groups for order_id in group.order_ids
+        )
+        plan.groups.extend(groups)
+        if progress:
+            progress((index + 1) / len(shifts))
+    plan.unassigned_order_ids = sorted(pool)
+
+    objective = score_plan(couriers, orders, plan).objective(penalty)
+    fell_back = not objective < greedy_objective
+    return OptimisationResult(
+        plan=greedy if fell_back else plan,
+        objective=greedy_objective if fell_back else objective,
+        greedy_objective=greedy_objective,
+        lower_bound=lower_bound(couriers, orders, penalty),
+        subproblems=len(shifts),
+        searched_subproblems=searched,
+        timed_out=timed_out or searched < len(shifts),
+        fell_back=fell_back,
+    )
+
+
+def _search_shift(
+    courier: PlanningCourier,
+    shift: Interval,
+    candidates: list[PlanningOrder],
+    incumbent: list[DeliveryGroup],
+    penalty: float,
+    deadline: float,
+) -> tuple[list[DeliveryGroup], bool]:
+    """
+    Searches the best groups of one working interval of a courier.
+
+    The objective of the interval is the cost of its groups plus the
+    penalised cost of the candidates left.
+
+    Returns:
+        The best groups found, the incumbent ones if none is better, and
+        whether the search tree was exhausted before the deadline.
+    """
+    rules = COURIER_RULES[courier.courier_type]
+    shift_end = shift[1]
+    taken = {order_id for group in incumbent for order_id in group.order_ids}
+    best_groups = incumbent
+    best_objective = sum(group.cost for group in incumbent) + (
+        1 + penalty
+    ) * sum(order.cost for order in candidates if order.order_id not in taken)
+    nodes = 0
+
+    def search(
+        minute: int,
+        left: list[PlanningOrder],
+        groups: list[DeliveryGroup],
+        cost: float,
+    ) -> None:
+        nonlocal best_groups, best_objective, nodes
+        nodes += 1
+        if nodes % DEADLINE_CHECK_NODES == 0 and time.monotonic() > deadline:
+            raise _Timeout
+        bound = _shift_bound(rules, left, minute, shift_end, penalty)
+        if cost + bound >= best_objective - 1e-9:
+            return
+        options = _branch_groups(courier, rules, left, minute, shift_end)
+        if not options:
+            start = next_window_start(left, minute, rules.first_order_minutes)
+            if start is not None and start < shift_end:
+                search(start, left, groups, cost)
+                return
+            # The bound prices the orders left below their penalty, a leaf
+            # passing the prune may still be worse than the best one
+            leaf = cost + (1 + penalty) * sum(order.cost for order in left)
+            if leaf < best_objective:
+                best_groups, best_objective = groups, leaf
+            return
+        for group in options:
+            assigned = set(group.order_ids)
+            search(
+                group.end_minute,
+                [order for order in left if order.order_id not in assigned],
+                [*groups, group],
+                cost + group.cost,
+            )
+
+    try:
+        search(shift[0], sorted(candidates, key=_cost_key), [], 0.0)
+    except _Timeout:
+        return best_groups, False
+    return best_groups, True
+
+
+def _shift_bound(
+    rules: CourierRules,
+    left: list[PlanningOrder],
+    minute: int,
+    shift_end: int,
+    penalty: float,
+) -> float:
+    """
+    Bounds the objective of the orders left in a working interval.
+
+    Orders whose delivery windows end before the courier can reach them are
+    never delivered.
+    """
+    earliest = minute + rules.next_order_minutes
+    late = sum(
+        order.cost
+        for order in left
+        if all(end < earliest for _, end in order.windows)
+    )
+    return (1 + penalty) * late + _bound(
+        [
+            order.cost
+            for order in left
+            if any(end >= earliest for _, end in order.windows)
+        ],
+        (shift_end - minute) // rules.next_order_minutes,
+        rules.max_orders,
+        penalty,
+    )
+
+
+def _branch_groups(
+    courier: PlanningCourier,
+    rules: CourierRules,
+    left: list[PlanningOrder],
+    minute: int,
+    shift_end: int,
+) -> list[DeliveryGroup]:
+    """
+    Builds the groups a node branches on.
+
+    The greedy group comes first, then the groups started with the cheapest
+    orders that can be delivered first, `left` is sorted by cost.
+    """
+    options = {}
+    group = build_group(courier, rules, list(left), minute, shift_end)
+    if group is not None:
+        options[tuple(group.order_ids)] = group
+    delivered = minute + rules.first_order_minutes
+    seeds = 0
+    for order in left:
+        if seeds == BRANCHING or delivered > shift_end:
+            break
+        if order.weight > rules.max_weight:
+            continue
+        if delivery_window_end(order, delivered) is None:
+            continue
+        seeds += 1
+        group = build_group(
+            courier, rules, list(left), minute, shift_end, first=order
+        )
+        options.setdefault(tuple(group.order_ids), group)
+    return list(options.values())
+
+
+def _cost_key(order: PlanningOrder) -> tuple[int, int]:
+    return order.cost, order.order_id
@@ -0,0 +1,103 @@
+"""
+This module provides the data structures of an assignment run.
+
+The structures are plain dataclasses with times in minutes since midnight,
+so that they are cheap to create and can be sent to worker processes.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.schemas.models.common import parse_hours
+from app.schemas.models.couriers import CourierTypeEnum
+
+Interval = tuple[int, int]
+
+
+def parse_intervals(hours: list[str]) -> tuple[Interval, ...]:
+    """
+    Converts "HH:MM-HH:MM" strings into sorted intervals in minutes.
+
+    Parameters:
+        hours: The hours strings as stored in the database.
+
+    Returns:
+        A tuple of `(start, end)` intervals sorted by start.
+    """
+    intervals = (parse_hours(hour.strip()) for hour in hours or [])
+    return tuple(sorted(interval for interval in intervals if interval))
+
+
+@dataclass(frozen=True)
+class PlanningOrder:
+    order_id: int
+    weight: float
+    region: int
+    cost: int
+    windows: tuple[Interval, ...]
+
+
+@dataclass(frozen=True)
+class PlanningCourier:
+    courier_id: int
+    courier_type: CourierTypeEnum
+    regions: frozenset[int]
+    shifts: tuple[Interval, ...]
+
+
+def delivery_window_end(order: PlanningOrder, minute: int) -> Optional[int]:
+    """
+    Finds the delivery window of an order that contains a minute.
+
+    Returns:
+        The end of the window, or `None` if the order can not be delivered
+        at that minute.
+    """
+    for start, end in order.windows:
+        if start <= minute <= end:
+            return end
+    return None
+
+
+@dataclass
+class DeliveryGroup:
+    """
+    Orders delivered by a courier in one trip.
+
+    Attributes:
+        courier_id: The courier delivering the group.
+        start_minute: The minute the trip starts.
+        end_minute: The minute the last order is delivered.
+        order_ids: The orders in delivery order.
+        cost: The cost of the group.
+        group_id: The ID of a saved group.
+    """
+
+    courier_id: int
+    start_minute: int
+    end_minute: int
+    order_ids: list[int]
+    cost: float
+    group_id: Optional[int] = None
+
+
+@dataclass
+class DayPlan:
+    """
+    The result of an assignment run.
+
+    Attributes:
+        groups: Delivery groups ordered by courier and start.
+        unassigned_order_ids: Orders that no courier could take.
+    """
+
+    groups: list[DeliveryGroup] = field(default_factory=list)
+    unassigned_order_ids: list[int] = field(default_factory=list)
+
+    @property
+    def cost(self) -> float:
+        return sum(group.cost for group in self.groups)
+
+    @property
+    def assigned_orders(self) -> int:
+        return sum(len(group.order_ids) for group in self.groups)
@@ -0,0 +1,56 @@
+"""
+This module provides the delivery rules of the courier types.
+
+The rules describe how many orders and regions a courier can take into one
+delivery group, how long the deliveries take and how the group is priced.
+"""
+
+from dataclasses import dataclass
+
+from app.schemas.models.couriers import CourierTypeEnum
+
+NEXT_ORDER_COST_SHARE = 0.8
+
+
+@dataclass(frozen=True)
+class CourierRules:
+    """
+    Delivery rules of a courier type.
+
+    Attributes:
+        max_weight: The maximum total weight of a group.
+        max_orders: The maximum number of orders in a group.
+        max_regions: The maximum number of regions visited by a group.
+        first_order_minutes: Minutes to deliver the first order in a region.
+        next_order_minutes: Minutes to deliver each next order in a region.
+    """
+
+    max_weight: float
+    max_orders: int
+    max_regions: int
+    first_order_minutes: int
+    next_order_minutes: int
+
+
+COURIER_RULES = {
+    CourierTypeEnum.foot: CourierRules(10, 2, 1, 25, 10),
+    CourierTypeEnum.bike: CourierRules(20, 4, 2, 12, 8),
+    CourierTypeEnum.auto: CourierRules(40, 7, 3, 8, 4),
+}
+
+
+def group_cost(costs: list[int]) -> float:
+    """
+    Calculates the cost of a delivery group.
+
+    The first order of a group is paid in full and every next one at 80%.
+
+    Parameters:
+        costs: The costs of the orders in delivery order.
+
+    Returns:
+        The cost of the group.
+    """
+    if not costs:
+        return 0
+    return costs[0] + NEXT_ORDER_COST_SHARE * sum(costs[1:])
@@ -0,0 +1,454 @@
+"""
+This module provides the vectorized simulation of courier shifts.
+
+A day plan is flattened into NumPy arrays, one row per courier, working
+interval, delivery group, order and delivery window, with the orders sorted
+by group and delivery sequence. Every rule of the courier types is then
+checked for all the orders and groups at once:
+
+* the minute every order is delivered at: the first order of a group in a
+  region takes `first_order_minutes` of the courier type, every next one in
+  the same region `next_order_minutes`;
+* the delivery windows of the orders;
+* the working intervals of the couriers and overlapping trips of a courier;
+* the weight, order count and region limits of the groups and the regions
+  of the couriers;
+* the cost of the groups, the first order in full and every next one at
+  80%.
+
+The simulation is the objective of plan optimisation: `objective` is the cost
+of a feasible plan with every unassigned order priced at a penalty.
+"""
+
+import enum
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.assignment.plan import DayPlan, PlanningCourier, PlanningOrder
+from app.assignment.rules import COURIER_RULES, NEXT_ORDER_COST_SHARE
+from app.schemas.models.couriers import CourierTypeEnum
+
+COURIER_TYPES = list(CourierTypeEnum)
+TYPE_CODES = {
+    courier_type: code for code, courier_type in enumerate(COURIER_TYPES)
+}
+FIRST_ORDER_MINUTES = np.array(
+    [COURIER_RULES[item].first_order_minutes for item in COURIER_TYPES]
+)
+NEXT_ORDER_MINUTES = np.array(
+    [COURIER_RULES[item].next_order_minutes for item in COURIER_TYPES]
+)
+MAX_WEIGHT = np.array(
+    [COURIER_RULES[item].max_weight for item in COURIER_TYPES]
+)
+MAX_ORDERS = np.array(
+    [COURIER_RULES[item].max_orders for item in COURIER_TYPES]
+)
+MAX_REGIONS = np.array(
+    [COURIER_RULES[item].max_regions for item in COURIER_TYPES]
+)
+# An unassigned order costs this share of its price more than a delivered one
+UNASSIGNED_ORDER_PENALTY = 2.0
+
+
+class Violation(enum.IntFlag):
+    """The rules a delivery group can break."""
+
+    LATE = 1
+    OUT_OF_SHIFT = 2
+    OVERLAP = 4
+    OVERWEIGHT = 8
+    TOO_MANY_ORDERS = 16
+    TOO_MANY_REGIONS = 32
+    FOREIGN_REGION = 64
+
+
+@dataclass
+class PlanArrays:
+    """
+    A day plan flattened into arrays.
+
+    Couriers, groups and orders are referred to by their row numbers. The
+    orders are sorted by group and delivery sequence, the working intervals
+    by courier.
+    """
+
+    courier_ids: np.ndarray
+    courier_types: np.ndarray
+    courier_region_couriers: np.ndarray
+    courier_region_values: np.ndarray
+    shift_couriers: np.ndarray
+    shift_starts: np.ndarray
+    shift_ends: np.ndarray
+    group_ids: np.ndarray
+    group_couriers: np.ndarray
+    group_starts: np.ndarray
+    order_ids: np.ndarray
+    order_groups: np.ndarray
+    weights: np.ndarray
+    regions: np.ndarray
+    costs: np.ndarray
+    window_orders: np.ndarray
+    window_starts: np.ndarray
+    window_ends: np.ndarray
+    unassigned_costs: np.ndarray
+
+    @classmethod
+    def build(
+        cls,
+        couriers: list[PlanningCourier],
+        orders: list[PlanningOrder],
+        plan: DayPlan,
+    ) -> "PlanArrays":
+        """
+        Flattens a plan.
+
+        Parameters:
+            couriers: The couriers of the plan, others may be included.
+            orders: The orders of the plan and its unassigned orders.
+            plan: The plan, the orders of every group in delivery order.
+
+        Returns:
+            The arrays of the plan.
+        """
+        orders_by_id = {order.order_id: order for order in orders}
+        courier_rows = {
+            courier.courier_id: row for row, courier in enumerate(couriers)
+        }
+        courier_regions = [
+            (row, region)
+            for row, courier in enumerate(couriers)
+            for region in courier.regions
+        ]
+        shifts = [
+            (row, start, end)
+            for row, courier in enumerate(couriers)
+            for start, end in courier.shifts
+        ]
+        group_orders = [
+            (row, orders_by_id[order_id])
+            for row, group in enumerate(plan.groups)
+            for order_id in group.order_ids
+        ]
+        windows = [
+            (row, start, end)
+            for row, (_, order) in enumerate(group_orders)
+            for start, end in order.windows
+        ]
+        return cls(
+            courier_ids=_int_array(courier.courier_id for courier in couriers),
+            courier_types=_int_array(
+                TYPE_CODES[courier.courier_type] for courier in couriers
+            ),
+            courier_region_couriers=_int_array(
+                row for row, _ in courier_regions
+            ),
+            courier_region_values=_int_array(
+                region for _, region in courier_regions
+            ),
+            shift_couriers=_int_array(row for row, _, _ in shifts),
+            shift_starts=_int_array(start for _, start, _ in shifts),
+            shift_ends=_int_array(end for _, _, end in shifts),
+            group_ids=_int_array(
+                row if group.group_id is None else group.group_id
+                for row, group in enumerate(plan.groups)
+            ),
+            group_couriers=_int_array(
+                courier_rows[group.courier_id] for group in plan.groups
+            ),
+            group_starts=_int_array(
+                group.start_minute for group in plan.groups
+            ),
+            order_ids=_int_array(order.order_id for _, order in group_orders),
+            order_groups=_int_array(row for row, _ in group_orders),
+            weights=np.fromiter(
+                (order.weight for _, order in group_orders), dtype=np.float64
+            ),
+            regions=_int_array(order.region for _, order in group_orders),
+            costs=_int_array(order.cost for _, order in group_orders),
+            window_orders=_int_array(row for row, _, _ in windows),
+            window_starts=_int_array(start for _, start, _ in windows),
+            window_ends=_int_array(end for _, _, end in windows),
+            unassigned_costs=_int_array(
+                orders_by_id[order_id].cost
+                for order_id in plan.unassigned_order_ids
+            ),
+        )
+
+
+@dataclass
+class ShiftSimulation:
+    """
+    The simulated day.
+
+    Attributes:
+        plan: The simulated plan.
+        delivered: The delivery minute of every order.
+        on_time: Whether every order is delivered in one of its windows.
+        group_ends: The minute the last order of every group is delivered.
+        group_costs: The cost of every group.
+        group_violations: The `Violation` flags of every group.
+        courier_groups: The number of groups of every courier.
+        courier_orders: The number of orders of every courier.
+        courier_costs: The cost of the groups of every courier.
+        courier_busy_minutes: The minutes every courier spends delivering.
+        courier_shift_minutes: The working minutes of every courier.
+    """
+
+    plan: PlanArrays
+    delivered: np.ndarray
+    on_time: np.ndarray
+    group_ends: np.ndarray
+    group_costs: np.ndarray
+    group_violations: np.ndarray
+    courier_groups: np.ndarray
+    courier_orders: np.ndarray
+    courier_costs: np.ndarray
+    courier_busy_minutes: np.ndarray
+    courier_shift_minutes: np.ndarray
+
+    @property
+    def cost(self) -> float:
+        return float(self.group_costs.sum())
+
+    @property
+    def feasible(self) -> bool:
+        return not self.group_violations.any()
+
+    @property
+    def utilisation(self) -> np.ndarray:
+        """The share of the working minutes every courier is delivering."""
+        return np.divide(
+            self.courier_busy_minutes,
+            self.courier_shift_minutes,
+            out=np.zeros(len(self.courier_busy_minutes)),
+            where=self.courier_shift_minutes > 0,
+        )
+
+    def violation_counts(self) -> dict[str, int]:
+        """Counts the groups breaking every rule."""
+        return {
+            violation.name.lower(): int(
+                np.count_nonzero(self.group_violations & violation)
+            )
+            for violation in Violation
+        }
+
+    def objective(self, penalty: float = UNASSIGNED_ORDER_PENALTY) -> float:
+        """
+        The value a plan optimisation minimizes.
+
+        Parameters:
+            penalty: The share of the price added to every unassigned order.
+
+        Returns:
+            The cost of the groups and of the unassigned orders priced at
+            `1 + penalty`, infinity if the plan breaks any rule.
+        """
+        if not self.feasible:
+            return float("inf")
+        return self.cost + (1 + penalty) * float(
+            self.plan.unassigned_costs.sum()
+        )
+
+
+def simulate(plan: PlanArrays) -> ShiftSimulation:
+    """
+    Simulates the shifts of the couriers of a plan.
+
+    Parameters:
+        plan: The flattened plan.
+
+    Returns:
+        The delivery timeline, the violations and the totals of the plan.
+    """
+    groups, couriers = len(plan.group_ids), len(plan.courier_ids)
+    orders = len(plan.order_ids)
+    order_groups = plan.order_groups
+    group_types = plan.courier_types[plan.group_couriers]
+    # The first and the last order of every group
+    firsts = np.flatnonzero(np.diff(order_groups, prepend=-1))
+    lasts = np.append(firsts[1:], orders)[:groups] - 1
+
+    # The first order of a group in a region takes longer than the next
+    # ones, both keys of a region of a group fit into 64 bits
+    region_base = int(plan.regions.max(initial=0)) + 1
+    region_keys, first_in_region = np.unique(
+        order_groups * region_base + plan.regions, return_index=True
+    )
+    new_region = np.zeros(orders, dtype=bool)
+    new_region[first_in_region] = True
+    order_types = group_types[order_groups]
+    steps = np.where(
+        new_region,
+        FIRST_ORDER_MINUTES[order_types],
+        NEXT_ORDER_MINUTES[order_types],
+    )
+    elapsed = np.cumsum(steps)
+    elapsed_before = (elapsed - steps)[firsts]
+    delivered = (
+        plan.group_starts[order_groups]
+        + elapsed
+        - elapsed_before[order_groups]
+    )
+    group_ends = delivered[lasts]
+
+    window_delivered = delivered[plan.window_orders]
+    in_window = (plan.window_starts <= window_delivered) & (
+        window_delivered <= plan.window_ends
+    )
+    on_time = np.bincount(
+        plan.window_orders, weights=in_window, minlength=orders
+    ).astype(bool)
+
+    group_regions = np.bincount(region_keys // region_base, minlength=groups)
+    group_sizes = np.diff(np.r_[firsts, orders])
+    group_weights = _sum_by_group(plan.weights, firsts)
+    group_totals = _sum_by_group(plan.costs.astype(np.float64), firsts)
+    first_costs = plan.costs[firsts]
+    group_costs = first_costs + NEXT_ORDER_COST_SHARE * (
+        group_totals - first_costs
+    )
+
+    courier_base = max(
+        region_base, int(plan.courier_region_values.max(initial=0)) + 1
+    )
+    foreign = ~np.isin(
+        plan.group_couriers[order_groups] * courier_base + plan.regions,
+        plan.courier_region_couriers * courier_base
+        + plan.courier_region_values,
+    )
+
+    # Pair every group with every working interval of its courier
+    shift_counts = np.bincount(plan.shift_couriers, minlength=couriers)
+    shift_offsets = np.r_[0, np.cumsum(shift_counts)[:-1]]
+    pair_counts = shift_counts[plan.group_couriers]
+    pair_groups = np.repeat(np.arange(groups), pair_counts)
+    pair_shifts = np.arange(pair_counts.sum()) + np.repeat(
+        shift_offsets[plan.group_couriers]
+        - np.r_[0, np.cumsum(pair_counts)[:-1]],
+        pair_counts,
+    )
+    in_shift = (
+        plan.shift_starts[pair_shifts] <= plan.group_starts[pair_groups]
+    ) & (group_ends[pair_groups] <= plan.shift_ends[pair_shifts])
+    in_any_shift = np.bincount(
+        pair_groups, weights=in_shift, minlength=groups
+    ).astype(bool)
+
+    # A trip overlaps an earlier one of its courier if it starts before the
+    # latest end of them. The ends are offset by the position of the
+    # courier, so that the running maximum starts over with every courier
+    by_start = np.lexsort((plan.group_starts, plan.group_couriers))
+    sorted_couriers = plan.group_couriers[by_start]
+    same_courier = sorted_couriers[1:] == sorted_couriers[:-1]
+    sorted_ends = group_ends[by_start].astype(np.int64)
+    first_end = sorted_ends.min(initial=0)
+    end_span = sorted_ends.max(initial=0) - first_end + 1
+    courier_offsets = np.r_[0, np.cumsum(~same_courier)] * end_span
+    latest_ends = (
+        np.maximum.accumulate(sorted_ends - first_end + courier_offsets)
+        - courier_offsets
+        + first_end
+    )
+    overlapping = same_courier & (
+        plan.group_starts[by_start][1:] < latest_ends[:-1]
+    )
+    overlaps = np.zeros(groups, dtype=bool)
+    overlaps[by_start[1:][overlapping]] = True
+
+    violations = np.zeros(groups, dtype=np.uint8)
+    for violation, broken in (
+        (Violation.LATE, _any_by_group(~on_time, order_groups, groups)),
+        (Violation.OUT_OF_SHIFT, ~in_any_shift),
+        (Violation.OVERLAP, overlaps),
+        (Violation.OVERWEIGHT, group_weights > MAX_WEIGHT[group_types]),
+        (Violation.TOO_MANY_ORDERS, group_sizes > MAX_ORDERS[group_types]),
+        (Violation.TOO_MANY_REGIONS, group_regions > MAX_REGIONS[group_types]),
+        (
+            Violation.FOREIGN_REGION,
+            _any_by_group(foreign, order_groups, groups),
+        ),
+    ):
+        violations[broken] |= np.uint8(violation)
+
+    def by_courier(values) -> np.ndarray:
+        return np.bincount(
+            plan.group_couriers, weights=values, minlength=couriers
+        )
+
+    return ShiftSimulation(
+        plan=plan,
+        delivered=delivered,
+        on_time=on_time,
+        group_ends=group_ends,
+        group_costs=group_costs,
+        group_violations=violations,
+        courier_groups=by_courier(None).astype(np.int64),
+        courier_orders=by_courier(group_sizes).astype(np.int64),
+        courier_costs=by_courier(group_costs),
+        courier_busy_minutes=by_courier(group_ends - plan.group_starts),
+        courier_shift_minutes=np.bincount(
+            plan.shift_couriers,
+            weights=plan.shift_ends - plan.shift_starts,
+            minlength=couriers,
+        ),
+    )
+
+
+def score_plan(
+    couriers: list[PlanningCourier],
+    orders: list[PlanningOrder],
+    plan: DayPlan,
+) -> ShiftSimulation:
+    """Flattens and simulates a plan, see `PlanArrays.build`."""
+    return simulate(PlanArrays.build(couriers, orders, plan))
+
+
+def delivery_sequence(orders: list[PlanningOrder]) -> list[PlanningOrder]:
+    """
+    Orders a group the way the greedy assignment delivers it.
+
+    The sequence of a saved group is not stored. The regions are visited
+    starting with the one of the most urgent order, the orders of a region
+    are delivered by urgency.
+
+    Parameters:
+        orders: The orders of a group.
+
+    Returns:
+        The orders in delivery order.
+    """
+
+    def urgency(order: PlanningOrder) -> tuple[int, int]:
+        return (
+            min((end for _, end in order.windows), default=0),
+            order.order_id,
+        )
+
+    region_urgency = {}
+    for order in sorted(orders, key=urgency):
+        region_urgency.setdefault(order.region, len(region_urgency))
+    return sorted(
+        orders,
+        key=lambda order: (region_urgency[order.region], urgency(order)),
+    )
+
+
+def _int_array(values) -> np.ndarray:
+    return np.fromiter(values, dtype=np.int64)
+
+
+def _sum_by_group(values: np.ndarray, firsts: np.ndarray) -> np.ndarray:
+    if not len(firsts):
+        return np.zeros(0, dtype=values.dtype)
+    return np.add.reduceat(values, firsts)
+
+
+def _any_by_group(
+    flags: np.ndarray, order_groups: np.ndarray, groups: int
+) -> np.ndarray:
+    return np.bincount(order_groups, weights=flags, minlength=groups).astype(
+        bool
+    )
@@ -0,0 +1,244 @@
+"""
+The concurrency module - adaptive limiting of the requests in flight.
+
+Classes:
+    Priority - the priority classes of requests.
+    AdaptiveConcurrencyLimiter - admits requests up to a limit that follows
+    the latency of the service and the pressure on the connection pool.
+
+Notes:
+    The limit is adjusted with AIMD, the way TCP adjusts its window. Every
+    finished request is a sample: it signals congestion if it failed, took
+    much longer than the lowest recent latency of its route or if requests
+    recently waited long for a database connection. On congestion the limit
+    is multiplied by the backoff ratio, at most once per round of requests:
+    the requests admitted before the last decrease do not decrease it again.
+    Otherwise, while the limit is actually used, it grows by one per limit
+    samples.
+
+    Priorities share the limit unevenly. Low priority requests are only
+    admitted below a share of the limit, so they are shed first when the
+    service slows down, normal priority ones below a larger share and
+    critical ones up to the whole limit. Critical requests that find the
+    limit reached wait in a queue for a short time instead of being shed.
+    The queue is served newest first: under a sustained overload the oldest
+    waiters would miss their deadlines anyway, while the newest ones still
+    have the whole of it.
+"""
+
+import asyncio
+from collections import deque
+from enum import IntEnum
+from typing import Callable, Optional
+
+from app.core.metrics import metrics
+
+concurrency_limit_histogram = metrics.histogram(
+    "http_concurrency_limit",
+    "Concurrency limit after each adjustment",
+    buckets=(2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+admission_wait_histogram = metrics.histogram(
+    "http_admission_wait_ms",
+    "Time critical requests waited in the admission queue",
+)
+
+
+class Priority(IntEnum):
+    LOW = 0
+    NORMAL = 1
+    CRITICAL = 2
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An AIMD concurrency limiter with priority classes.
+
+    Attributes:
+        limit: The current concurrency limit.
+        min_limit: The limit is never decreased below this value.
+        max_limit: The limit is never increased above this value.
+        latency_tolerance: A sample is congested if its latency exceeds the
+            baseline of its route this many times.
+        latency_slack_ms: Added to the tolerated latency, keeps fast routes
+            from reacting to jitter.
+        pool_wait_threshold_ms: A sample is congested if the recent wait for
+            a database connection exceeds this value.
+        backoff_ratio: The limit is multiplied by it on congestion.
+        priority_shares: The share of the limit each priority may use.
+        queue_timeout_s: The longest time critical requests wait for a slot.
+        baseline_window: The number of samples of a route the baseline
+            latency is the minimum of.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        latency_tolerance: float = 2.0,
+        latency_slack_ms: float = 5.0,
+        pool_wait_threshold_ms: float = 50.0,
+        backoff_ratio: float = 0.9,
+        low_priority_share: float = 0.5,
+        normal_priority_share: float = 0.8,
+        queue_timeout_s: float = 0.25,
+        baseline_window: int = 500,
+        pool_wait_ms: Callable[[], float] = lambda: 0.0,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack_ms = latency_slack_ms
+        self.pool_wait_threshold_ms = pool_wait_threshold_ms
+        self.backoff_ratio = backoff_ratio
+        self.priority_shares = {
+            Priority.LOW: low_priority_share,
+            Priority.NORMAL: normal_priority_share,
+            Priority.CRITICAL: 1.0,
+        }
+        self.queue_timeout_s = queue_timeout_s
+        self.baseline_window = baseline_window
+        self._pool_wait_ms = pool_wait_ms
+        self._in_flight = 0
+        self._next_ticket = 0
+        self._decrease_ticket = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Route -> [minimum of the previous window, of the current window,
+        # samples in the current window]
+        self._baselines: dict[str, list] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """The number of admitted requests that have not finished yet."""
+        return self._in_flight
+
+    def baseline_ms(self, route: str) -> Optional[float]:
+        """
+        Returns the baseline latency of a route.
+
+        Returns:
+            The lowest latency of the last one or two windows of samples,
+            `None` if the route has no samples.
+        """
+        baseline = self._baselines.get(route)
+        return min(baseline[0], baseline[1]) if baseline else None
+
+    def try_acquire(self, priority: Priority) -> Optional[int]:
+        """
+        Admits a request if its priority may use one more slot.
+
+        Parameters:
+            priority: The priority of the request.
+
+        Returns:
+            The ticket of the admitted request, to be passed to `release`,
+            or `None` if the request must be shed.
+        """
+        if self._in_flight >= self.limit * self.priority_shares[priority]:
+            return None
+        return self._admit()
+
+    async def acquire(self, priority: Priority) -> Optional[int]:
+        """
+        Admits a request, critical ones wait for a slot if needed.
+
+        Parameters:
+            priority: The priority of the request.
+
+        Returns:
+            The ticket of the admitted request or `None` if it must be shed.
+        """
+        ticket = self.try_acquire(priority)
+        if ticket is not None or priority != Priority.CRITICAL:
+            return ticket
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(future)
+        started = loop.time()
+        timer = loop.call_later(self.queue_timeout_s, self._expire, future)
+        try:
+            ticket = await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._waiters.remove(future)
+            elif future.result() is not None:
+                # The slot was granted right before the cancellation
+                self.release(future.result())
+            raise
+        finally:
+            timer.cancel()
+        admission_wait_histogram.observe((loop.time() - started) * 1000)
+        return ticket
+
+    def release(
+        self,
+        ticket: int,
+        route: Optional[str] = None,
+        latency_ms: Optional[float] = None,
+        failed: bool = False,
+    ) -> None:
+        """
+        Frees the slot of a finished request and adjusts the limit.
+
+        Parameters:
+            ticket: The ticket returned on admission.
+            route: The route class of the request, the limit is not adjusted
+                without it.
+            latency_ms: The time the request took after its admission.
+            failed: Whether the request failed on the server side.
+        """
+        self._in_flight -= 1
+        if route is not None and latency_ms is not None:
+            self._sample(ticket, route, latency_ms, failed)
+        self._grant()
+
+    def _admit(self) -> int:
+        self._in_flight += 1
+        self._next_ticket += 1
+        return self._next_ticket
+
+    def _grant(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.pop()
+            if not future.done():
+                future.set_result(self._admit())
+
+    def _expire(self, future: asyncio.Future) -> None:
+        if not future.done():
+            self._waiters.remove(future)
+            future.set_result(None)
+
+    def _sample(
+        self, ticket: int, route: str, latency_ms: float, failed: bool
+    ) -> None:
+        baseline = self._update_baseline(route, latency_ms)
+        congested = (
+            failed
+            or self._pool_wait_ms() > self.pool_wait_threshold_ms
+            or latency_ms
+            > baseline * self.latency_tolerance + self.latency_slack_ms
+        )
+        if congested:
+            # Requests admitted before the last decrease already saw the
+            # congestion it reacted to
+            if ticket <= self._decrease_ticket:
+                return
+            self._decrease_ticket = self._next_ticket
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        elif self._in_flight + 1 >= self.limit * 0.5:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            return
+        concurrency_limit_histogram.observe(self.limit)
+
+    def _update_baseline(self, route: str, latency_ms: float) -> float:
+        baseline = self._baselines.setdefault(
+            route, [latency_ms, latency_ms, 0]
+        )
+        baseline[1] = min(baseline[1], latency_ms)
+        baseline[2] += 1
+        if baseline[2] >= self.baseline_window:
+            baseline[:] = [baseline[1], latency_ms, 0]
+        return min(baseline[0], baseline[1])
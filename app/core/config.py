@@ -14,6 +14,161 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = Field(env="POSTGRES_PORT", default="5432")
     SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
 
+    RATE_LIMIT_ENABLED: bool = Field(env="RATE_LIMIT_ENABLED", default=True)
+    RATE_LIMIT_DEFAULT: str = Field(
+        env="RATE_LIMIT_DEFAULT", default="10/second"
+    )
+
+    ORDER_COMPLETION_BATCHING: bool = Field(
+        env="ORDER_COMPLETION_BATCHING", default=False
+    )
+    ORDER_COMPLETION_BATCH_WINDOW_MS: float = Field(
+        env="ORDER_COMPLETION_BATCH_WINDOW_MS", default=5.0, ge=0
+    )
+    ORDER_COMPLETION_BATCH_SIZE: int = Field(
+        env="ORDER_COMPLETION_BATCH_SIZE", default=200, ge=1
+    )
+    ORDER_COMPLETION_ATTEMPTS: int = Field(
+        env="ORDER_COMPLETION_ATTEMPTS", default=5, ge=1
+    )
+    ORDER_COMPLETION_RETRY_BACKOFF_MS: float = Field(
+        env="ORDER_COMPLETION_RETRY_BACKOFF_MS", default=10.0, ge=0
+    )
+
+    LOG_LEVEL: str = Field(
+        env="LOG_LEVEL", default="INFO", regex=r"^(DEBUG|INFO|WARNING|ERROR)$"
+    )
+    LOG_FILE: Optional[str] = Field(env="LOG_FILE", default=None)
+    LOG_QUEUE_SIZE: int = Field(env="LOG_QUEUE_SIZE", default=10_000, ge=1)
+    ACCESS_LOG_ENABLED: bool = Field(env="ACCESS_LOG_ENABLED", default=True)
+
+    SLOW_QUERY_THRESHOLD_MS: float = Field(
+        env="SLOW_QUERY_THRESHOLD_MS", default=100.0
+    )
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = Field(
+        env="SLOW_QUERY_EXPLAIN_SAMPLE_RATE", default=0.1, ge=0, le=1
+    )
+    SLOW_QUERY_HISTORY_SIZE: int = Field(
+        env="SLOW_QUERY_HISTORY_SIZE", default=50, ge=1
+    )
+
+    LOOP_STALL_THRESHOLD_MS: float = Field(
+        env="LOOP_STALL_THRESHOLD_MS", default=100.0, gt=0
+    )
+    LOOP_LAG_INTERVAL_MS: float = Field(
+        env="LOOP_LAG_INTERVAL_MS", default=20.0, gt=0
+    )
+    LOOP_STALL_HISTORY_SIZE: int = Field(
+        env="LOOP_STALL_HISTORY_SIZE", default=50, ge=1
+    )
+
+    ORDER_PARTITIONS_AHEAD_MONTHS: int = Field(
+        env="ORDER_PARTITIONS_AHEAD_MONTHS", default=2, ge=0
+    )
+    ORDER_ARCHIVE_AFTER_MONTHS: int = Field(
+        env="ORDER_ARCHIVE_AFTER_MONTHS", default=12, ge=1
+    )
+    ORDER_ARCHIVE_SCHEMA: str = Field(
+        env="ORDER_ARCHIVE_SCHEMA",
+        default="archive",
+        regex=r"^[a-z_][a-z0-9_]*$",
+    )
+    EXPORT_DIR: str = Field(env="EXPORT_DIR", default="exports")
+    EXPORT_FORMAT: str = Field(
+        env="EXPORT_FORMAT", default="auto", regex=r"^(auto|arrow|csv)$"
+    )
+    EXPORT_LAG_S: float = Field(env="EXPORT_LAG_S", default=60.0, ge=0)
+
+    COURIERS_META_INFO_PAGE_SIZE: int = Field(
+        env="COURIERS_META_INFO_PAGE_SIZE", default=1000, ge=1
+    )
+    MULTI_GET_MAX_IDS: int = Field(
+        env="MULTI_GET_MAX_IDS", default=1000, ge=1
+    )
+    REPOSITORY_BACKEND: str = Field(
+        env="REPOSITORY_BACKEND", default="orm", regex=r"^(orm|asyncpg)$"
+    )
+
+    COURIER_REPLICA_ENABLED: bool = Field(
+        env="COURIER_REPLICA_ENABLED", default=True
+    )
+    COURIER_REPLICA_POLL_INTERVAL_S: float = Field(
+        env="COURIER_REPLICA_POLL_INTERVAL_S", default=5.0, gt=0
+    )
+
+    EVENT_STREAM_BUFFER_SIZE: int = Field(
+        env="EVENT_STREAM_BUFFER_SIZE", default=100, ge=1
+    )
+    EVENT_STREAM_DISPATCHER_BUFFER_SIZE: int = Field(
+        env="EVENT_STREAM_DISPATCHER_BUFFER_SIZE", default=10_000, ge=1
+    )
+    EVENT_STREAM_KEEPALIVE_S: float = Field(
+        env="EVENT_STREAM_KEEPALIVE_S", default=15.0, gt=0
+    )
+    EVENT_STREAM_NOTIFY: bool = Field(env="EVENT_STREAM_NOTIFY", default=True)
+
+    READ_COALESCING: bool = Field(env="READ_COALESCING", default=True)
+    ASSIGNMENTS_CACHE_MEMORY_BYTES: int = Field(
+        env="ASSIGNMENTS_CACHE_MEMORY_BYTES", default=64 * 2**20, ge=0
+    )
+    ASSIGNMENTS_CACHE_SPILL_PATH: Optional[str] = Field(
+        env="ASSIGNMENTS_CACHE_SPILL_PATH", default=None
+    )
+    ASSIGNMENTS_CACHE_SPILL_BYTES: int = Field(
+        env="ASSIGNMENTS_CACHE_SPILL_BYTES", default=512 * 2**20, ge=1
+    )
+
+    CONCURRENCY_LIMIT_ENABLED: bool = Field(
+        env="CONCURRENCY_LIMIT_ENABLED", default=True
+    )
+    CONCURRENCY_LIMIT_INITIAL: int = Field(
+        env="CONCURRENCY_LIMIT_INITIAL", default=20, ge=1
+    )
+    CONCURRENCY_LIMIT_MIN: int = Field(
+        env="CONCURRENCY_LIMIT_MIN", default=2, ge=1
+    )
+    CONCURRENCY_LIMIT_MAX: int = Field(
+        env="CONCURRENCY_LIMIT_MAX", default=200, ge=1
+    )
+    CONCURRENCY_LATENCY_TOLERANCE: float = Field(
+        env="CONCURRENCY_LATENCY_TOLERANCE", default=2.0, gt=1
+    )
+    CONCURRENCY_POOL_WAIT_THRESHOLD_MS: float = Field(
+        env="CONCURRENCY_POOL_WAIT_THRESHOLD_MS", default=50.0, ge=0
+    )
+    CONCURRENCY_LOW_PRIORITY_SHARE: float = Field(
+        env="CONCURRENCY_LOW_PRIORITY_SHARE", default=0.5, gt=0, le=1
+    )
+    CONCURRENCY_NORMAL_PRIORITY_SHARE: float = Field(
+        env="CONCURRENCY_NORMAL_PRIORITY_SHARE", default=0.8, gt=0, le=1
+    )
+    CONCURRENCY_QUEUE_TIMEOUT_S: float = Field(
+        env="CONCURRENCY_QUEUE_TIMEOUT_S", default=0.25, ge=0
+    )
+    CONCURRENCY_RETRY_AFTER_S: int = Field(
+        env="CONCURRENCY_RETRY_AFTER_S", default=1, ge=0
+    )
+
+    JOBS_WORKER_ENABLED: bool = Field(env="JOBS_WORKER_ENABLED", default=True)
+    JOBS_WORKERS: int = Field(env="JOBS_WORKERS", default=2, ge=1)
+    JOBS_POLL_INTERVAL_S: float = Field(
+        env="JOBS_POLL_INTERVAL_S", default=1.0, gt=0
+    )
+    JOBS_HEARTBEAT_INTERVAL_S: float = Field(
+        env="JOBS_HEARTBEAT_INTERVAL_S", default=2.0, gt=0
+    )
+    JOBS_STALE_AFTER_S: float = Field(
+        env="JOBS_STALE_AFTER_S", default=30.0, gt=0
+    )
+    JOBS_MAX_ATTEMPTS: int = Field(env="JOBS_MAX_ATTEMPTS", default=3, ge=1)
+
+    ASSIGNMENT_BUDGET_MS: int = Field(
+        env="ASSIGNMENT_BUDGET_MS", default=2000, ge=1
+    )
+    ASSIGNMENT_MAX_BUDGET_MS: int = Field(
+        env="ASSIGNMENT_MAX_BUDGET_MS", default=60000, ge=1
+    )
+
     @validator("SQLALCHEMY_DATABASE_URI", pre=True)
     def assemble_db_connection(
         cls, v: Optional[str], values: Dict[str, Any]
@@ -1,17 +1,59 @@
 from typing import Callable
 
-from app.database import DatabaseEngine
+from app.core.config import settings
+from app.core.loop_monitor import LoopStallMonitor
+from app.core.response_cache import ResponseCache
+from app.core.structured_logging import LogQueue
+from app.database import CompletionCoalescer, DatabaseEngine
+from app.database.change_feed import ChangeFeed
+from app.database.replica import CourierReplica
+from app.jobs.runner import JobRunner
 
 
-def create_startup_handler(db_engine: DatabaseEngine) -> Callable:
+def create_startup_handler(
+    db_engine: DatabaseEngine,
+    completion_coalescer: CompletionCoalescer,
+    job_runner: JobRunner,
+    assignments_cache: ResponseCache,
+    loop_monitor: LoopStallMonitor,
+    courier_replica: CourierReplica,
+    change_feed: ChangeFeed,
+    log_queue: LogQueue,
+) -> Callable:
     async def startup() -> None:
+        log_queue.start()
+        loop_monitor.start()
         await db_engine.start()
+        assignments_cache.start()
+        if settings.COURIER_REPLICA_ENABLED:
+            courier_replica.start()
+        change_feed.start()
+        if settings.ORDER_COMPLETION_BATCHING:
+            completion_coalescer.start()
+        if settings.JOBS_WORKER_ENABLED:
+            job_runner.start()
 
     return startup
 
 
-def create_shutdown_handler(db_engine: DatabaseEngine) -> Callable:
+def create_shutdown_handler(
+    db_engine: DatabaseEngine,
+    completion_coalescer: CompletionCoalescer,
+    job_runner: JobRunner,
+    assignments_cache: ResponseCache,
+    loop_monitor: LoopStallMonitor,
+    courier_replica: CourierReplica,
+    change_feed: ChangeFeed,
+    log_queue: LogQueue,
+) -> Callable:
     async def shutdown() -> None:
+        await change_feed.stop()
+        await courier_replica.stop()
+        await job_runner.stop()
+        await completion_coalescer.stop()
         await db_engine.finalize()
+        assignments_cache.close()
+        await loop_monitor.stop()
+        log_queue.stop()
 
     return shutdown
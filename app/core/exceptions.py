@@ -3,11 +3,24 @@ from typing import Callable
 from fastapi.exceptions import RequestValidationError
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 from app.database.error import ConflictWithRequestDBError, NotFoundInDBError
 
 
+class NotModifiedError(Exception):
+    """
+    Raised when the representation cached by the client is still current.
+
+    Attributes:
+        etag: The entity tag of the current representation.
+    """
+
+    def __init__(self, etag: str) -> None:
+        super().__init__(etag)
+        self.etag = etag
+
+
 def create_validation_exception_handler() -> Callable:
     async def validation_exception_handler(
         _: Request, exc: RequestValidationError
@@ -42,3 +55,15 @@ def create_request_db_conflict_handler() -> Callable:
         )
 
     return not_found_handler
+
+
+def create_not_modified_handler() -> Callable:
+    async def not_modified_handler(
+        _: Request, exc: NotModifiedError
+    ) -> Response:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": exc.etag},
+        )
+
+    return not_modified_handler
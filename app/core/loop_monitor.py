@@ -0,0 +1,193 @@
+"""
+The loop monitor module - detection of the event loop being blocked.
+
+Classes:
+    LoopStallMonitor - measures the lag of the event loop and captures the
+    stack of the code blocking it.
+
+Notes:
+    A heartbeat task sleeps for a short interval in a loop, the time it
+    oversleeps is the lag of the event loop: how long ready callbacks, e.g.
+    the requests waiting for a response from the database, waited for the
+    loop. The lags are exported as the `event_loop_lag_ms` histogram.
+
+    While the loop is blocked the heartbeat cannot run, so a watchdog thread
+    checks the time of the last heartbeat. Once it is older than the
+    threshold, the watchdog takes the current stack of the loop thread, which
+    is the stack of the blocking code, and logs it. The request being served
+    is found by walking the stack: the middleware of every request registers
+    its own frame in `requests` together with the ASGI scope, the routing
+    adds the endpoint to the scope. Only code objects and registered frames
+    are looked at, the locals of the running frames are never read from the
+    watchdog thread.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from types import FrameType
+from typing import Optional
+
+from starlette.types import Scope
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.models.loop import LoopStallDto
+
+logger = logging.getLogger(__name__)
+
+STACK_LIMIT = 40
+
+loop_lag_histogram = metrics.histogram(
+    "event_loop_lag_ms", "Delay of the event loop heartbeat in milliseconds"
+)
+loop_stalls_total = metrics.counter(
+    "event_loop_stalls_total", "Times the event loop was blocked too long"
+)
+
+
+def describe_request(scope: Scope) -> tuple[str, Optional[str]]:
+    """
+    Finds the route of a request.
+
+    Parameters:
+        scope: The ASGI scope of the request.
+
+    Returns:
+        The name of the route, or the method and the path of the request if
+        it has not been routed yet, and the name of the endpoint.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return f"{scope['method']} {scope['path']}", None
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.name, endpoint.__qualname__
+    return f"{scope['method']} {scope['path']}", endpoint.__qualname__
+
+
+class LoopStallMonitor:
+    """
+    A watchdog of the event loop.
+
+    Attributes:
+        threshold_ms: The shortest blocking of the loop that is captured.
+        interval_ms: The interval of the heartbeat and of the watchdog.
+        stalls: The last captured stalls.
+        requests: The frames of the requests in flight mapped to their ASGI
+            scopes.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 100.0,
+        interval_ms: float = 20.0,
+        history_size: int = 50,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.stalls: deque[LoopStallDto] = deque(maxlen=history_size)
+        self.requests: dict[FrameType, Scope] = {}
+        self._beat = 0.0
+        self._captured_beat: Optional[float] = None
+        self._current_stall: Optional[LoopStallDto] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Starts the heartbeat on the running loop and the watchdog."""
+        if self._heartbeat is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(
+            self._run_heartbeat()
+        )
+        self._watchdog = threading.Thread(
+            target=self._run_watchdog, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stops the heartbeat and the watchdog."""
+        if self._heartbeat is None:
+            return
+        self._stopped.set()
+        self._heartbeat.cancel()
+        await asyncio.gather(self._heartbeat, return_exceptions=True)
+        self._watchdog.join()
+        self._heartbeat = self._watchdog = None
+
+    async def _run_heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = self.interval_ms / 1000
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, loop.time() - expected) * 1000
+            self._beat = time.monotonic()
+            loop_lag_histogram.observe(lag_ms)
+            stall, self._current_stall = self._current_stall, None
+            if stall is not None:
+                # The stall is over, its whole length is known now
+                stall.blocked_ms = lag_ms
+                logger.warning(
+                    "Event loop was blocked for %.1f ms in %s",
+                    lag_ms,
+                    stall.route or "background task",
+                )
+
+    def _run_watchdog(self) -> None:
+        while not self._stopped.wait(self.interval_ms / 1000):
+            beat = self._beat
+            blocked_ms = (time.monotonic() - beat) * 1000
+            if blocked_ms >= self.threshold_ms and beat != self._captured_beat:
+                self._captured_beat = beat
+                self._capture(blocked_ms)
+
+    def _capture(self, blocked_ms: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        route = endpoint = None
+        current = frame
+        while current is not None:
+            scope = self.requests.get(current)
+            if scope is not None:
+                route, endpoint = describe_request(scope)
+                break
+            current = current.f_back
+        stack = traceback.format_stack(frame, limit=STACK_LIMIT)
+        del frame, current
+        stall = LoopStallDto(
+            route=route,
+            endpoint=endpoint,
+            blocked_ms=blocked_ms,
+            stack=[line.rstrip() for line in stack],
+            recorded_at=datetime.now(timezone.utc),
+        )
+        loop_stalls_total.inc()
+        self.stalls.append(stall)
+        self._current_stall = stall
+        logger.warning(
+            "Event loop blocked for %.1f ms in %s, stack:\n%s",
+            blocked_ms,
+            route or "background task",
+            "".join(stack),
+        )
+
+
+loop_monitor = LoopStallMonitor(
+    threshold_ms=settings.LOOP_STALL_THRESHOLD_MS,
+    interval_ms=settings.LOOP_LAG_INTERVAL_MS,
+    history_size=settings.LOOP_STALL_HISTORY_SIZE,
+)
@@ -0,0 +1,219 @@
+"""
+The metrics module - in-process counters and histograms.
+
+Classes:
+    Counter - a monotonically increasing value.
+    Histogram - a bucketed distribution of observed values.
+    Ratio - the share of observations that were hits.
+    MetricsRegistry - a named collection of counters and histograms.
+
+Notes:
+    Metrics are kept per worker process and exposed through the admin API.
+    Updates are guarded by a lock so that they can be made from background
+    threads as well as from the event loop.
+"""
+
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Sequence
+
+DEFAULT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Counter:
+    """
+    A counter that can only be increased.
+
+    Attributes:
+        name: The name of the counter.
+        description: Human-readable meaning of the counter.
+        value: The current value of the counter.
+    """
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        """
+        Increases the counter.
+
+        Parameters:
+            amount: The value to add to the counter.
+        """
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"type": "counter", "value": self.value}
+
+
+class Histogram:
+    """
+    A histogram with fixed upper bounds for its buckets.
+
+    Attributes:
+        name: The name of the histogram.
+        description: Human-readable meaning of the histogram.
+        buckets: Sorted upper bounds of the buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Records a single observation.
+
+        Parameters:
+            value: The observed value.
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "type": "histogram",
+            "count": count,
+            "sum": total,
+            "buckets": dict(zip(bounds, counts)),
+        }
+
+
+class Ratio:
+    """
+    The share of hits among observed events, e.g. of cache hits.
+
+    Attributes:
+        name: The name of the ratio.
+        description: Human-readable meaning of the ratio.
+    """
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self.name = name
+        self.description = description
+        self._hits = 0
+        self._total = 0
+        self._lock = Lock()
+
+    def observe(self, hit: bool) -> None:
+        """
+        Records a single event.
+
+        Parameters:
+            hit: Whether the event was a hit.
+        """
+        with self._lock:
+            self._hits += hit
+            self._total += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            hits, total = self._hits, self._total
+        return {
+            "type": "ratio",
+            "value": hits / total if total else 0.0,
+            "hits": hits,
+            "total": total,
+        }
+
+
+class MetricsRegistry:
+    """
+    A registry of named metrics.
+
+    Metrics are created on first access, so modules can declare the metrics
+    they use at import time without coordinating with each other.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Ratio] = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """
+        Returns the counter with the given name, creating it if needed.
+
+        Parameters:
+            name: The name of the counter.
+            description: Human-readable meaning of the counter.
+
+        Returns:
+            The `Counter` registered under the name.
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, description)
+            return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """
+        Returns the histogram with the given name, creating it if needed.
+
+        Parameters:
+            name: The name of the histogram.
+            description: Human-readable meaning of the histogram.
+            buckets: Upper bounds of the buckets, used on creation only.
+
+        Returns:
+            The `Histogram` registered under the name.
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, buckets)
+            return self._metrics[name]
+
+    def ratio(self, name: str, description: str = "") -> Ratio:
+        """
+        Returns the ratio with the given name, creating it if needed.
+
+        Parameters:
+            name: The name of the ratio.
+            description: Human-readable meaning of the ratio.
+
+        Returns:
+            The `Ratio` registered under the name.
+        """
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Ratio(name, description)
+            return self._metrics[name]
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns the current values of all the metrics.
+
+        Returns:
+            A dictionary mapping metric names to their values.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,223 @@
+"""
+The response cache module - a cache of encoded responses that can not
+change any more.
+
+Classes:
+    SpillStore - a fixed-size ring of entries in a memory-mapped file.
+    ResponseCache - an LRU cache of encoded responses with a memory budget.
+
+Notes:
+    Every entry is stored with the version tag of the data it was built
+    from and is only returned for the same tag, so an entry outlived by a
+    write is never served. Entries evicted from memory are written to the
+    spill store when it is configured and are promoted back on a hit.
+
+    The cache is used from the event loop only and is not thread safe.
+"""
+
+import mmap
+import os
+from collections import OrderedDict, deque
+from typing import Hashable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# Approximate memory taken by an entry besides its body
+ENTRY_OVERHEAD = 200
+
+cache_hit_ratio = metrics.ratio(
+    "assignments_cache_hit_ratio",
+    "Share of closed-date assignment reads served from the response cache",
+)
+cache_evictions_total = metrics.counter(
+    "assignments_cache_evictions_total",
+    "Entries evicted from the memory of the response cache",
+)
+
+
+class SpillStore:
+    """
+    A ring of entries in a memory-mapped file.
+
+    Entries are written one after another and the oldest ones are
+    overwritten when the file is full.
+
+    Attributes:
+        path: The path of the file.
+        size: The size of the file in bytes.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = size
+        self._file = open(path, "w+b")
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._entries: dict[Hashable, tuple[str, int, int]] = {}
+        # Offsets, lengths and keys in the order of writing
+        self._ring: deque[tuple[int, int, Hashable]] = deque()
+        self._head = 0
+
+    def put(self, key: Hashable, tag: str, body: bytes) -> None:
+        length = len(body)
+        if length > self.size:
+            return
+        start = self._head
+        if start + length > self.size:
+            # The oldest entries are at the end of the file, skip them
+            while self._ring and self._ring[0][0] >= start:
+                self._drop_oldest()
+            start = 0
+        while self._ring and start <= self._ring[0][0] < start + length:
+            self._drop_oldest()
+        self._mmap[start:start + length] = body
+        self._entries[key] = (tag, start, length)
+        self._ring.append((start, length, key))
+        self._head = start + length
+
+    def pop(self, key: Hashable, tag: str) -> Optional[bytes]:
+        """
+        Removes an entry.
+
+        Returns:
+            The body of the entry, or `None` if there is no entry of the key
+            with the tag.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[0] != tag:
+            return None
+        _, offset, length = entry
+        return bytes(self._mmap[offset:offset + length])
+
+    def discard(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def keys(self) -> list[Hashable]:
+        return list(self._entries)
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+        os.remove(self.path)
+
+    def _drop_oldest(self) -> None:
+        offset, _, key = self._ring.popleft()
+        entry = self._entries.get(key)
+        # The key may have been written again at another offset
+        if entry is not None and entry[1] == offset:
+            del self._entries[key]
+
+
+class ResponseCache:
+    """
+    An LRU cache of encoded responses.
+
+    Attributes:
+        memory_budget: The maximum number of bytes kept in memory.
+        spill_path: The path of the spill file, no spilling if not given.
+        spill_size: The size of the spill file in bytes.
+        spill: The store of entries evicted from memory, once started.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int,
+        spill_path: Optional[str] = None,
+        spill_size: int = 0,
+    ) -> None:
+        self.memory_budget = memory_budget
+        self.spill_path = spill_path
+        self.spill_size = spill_size
+        self.spill: Optional[SpillStore] = None
+        self._entries: OrderedDict[Hashable, tuple[str, bytes]] = (
+            OrderedDict()
+        )
+        self._memory = 0
+
+    def start(self) -> None:
+        """Creates the spill store if it is configured."""
+        if self.spill_path and self.spill is None:
+            self.spill = SpillStore(self.spill_path, self.spill_size)
+
+    def get(self, key: Hashable, tag: str) -> Optional[bytes]:
+        """
+        Gets the body cached for the current version of the data.
+
+        Parameters:
+            key: The key of the response.
+            tag: The current version tag of the data of the response.
+
+        Returns:
+            The encoded body, or `None` on a miss.
+        """
+        body = None
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] == tag:
+                self._entries.move_to_end(key)
+                body = entry[1]
+            else:
+                self._remove(key)
+        elif self.spill is not None:
+            body = self.spill.pop(key, tag)
+            if body is not None:
+                self.put(key, tag, body)
+        cache_hit_ratio.observe(body is not None)
+        return body
+
+    def put(self, key: Hashable, tag: str, body: bytes) -> None:
+        """
+        Caches a body, evicting the least recently used entries over the
+        memory budget.
+
+        Parameters:
+            key: The key of the response.
+            tag: The version tag of the data the body was built from.
+            body: The encoded body.
+        """
+        self._remove(key)
+        self._entries[key] = (tag, body)
+        self._memory += len(body) + ENTRY_OVERHEAD
+        while self._memory > self.memory_budget and self._entries:
+            evicted_key, (evicted_tag, evicted_body) = self._entries.popitem(
+                last=False
+            )
+            self._memory -= len(evicted_body) + ENTRY_OVERHEAD
+            cache_evictions_total.inc()
+            if self.spill is not None:
+                self.spill.put(evicted_key, evicted_tag, evicted_body)
+
+    def invalidate(self, predicate) -> None:
+        """
+        Drops the entries whose keys match a predicate.
+
+        Parameters:
+            predicate: A function of a key returning whether to drop it.
+        """
+        for key in [key for key in self._entries if predicate(key)]:
+            self._remove(key)
+        if self.spill is not None:
+            for key in filter(predicate, self.spill.keys()):
+                self.spill.discard(key)
+
+    def close(self) -> None:
+        self._entries.clear()
+        self._memory = 0
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._memory -= len(entry[1]) + ENTRY_OVERHEAD
+        if self.spill is not None:
+            self.spill.discard(key)
+
+
+assignments_cache = ResponseCache(
+    settings.ASSIGNMENTS_CACHE_MEMORY_BYTES,
+    spill_path=settings.ASSIGNMENTS_CACHE_SPILL_PATH,
+    spill_size=settings.ASSIGNMENTS_CACHE_SPILL_BYTES,
+)
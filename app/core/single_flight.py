@@ -0,0 +1,92 @@
+"""
+The single flight module - sharing one execution between identical
+concurrent calls.
+
+Classes:
+    SingleFlight - runs a coroutine once for all the concurrent calls with
+    the same key.
+
+Notes:
+    The first call of a key, the leader, runs the coroutine itself, e.g. on
+    the database session of its own request. The calls made while it runs
+    wait for its result instead of running their own. The result is shared
+    and must not be modified by the callers. If the leader is cancelled,
+    e.g. because its client went away, the waiting calls start over and one
+    of them becomes the new leader.
+
+    Keys must include everything the result depends on, in particular the
+    version of the data, so that a call made after a write never receives a
+    result read before it.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+coalesced_ratio = metrics.ratio(
+    "read_coalesced_ratio",
+    "Share of read calls served by an identical call already in flight",
+)
+
+
+class SingleFlight:
+    """
+    A registry of the calls in flight.
+
+    Attributes:
+        enabled: Whether calls are shared, every call runs on its own if not.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs a coroutine function or waits for the run already in flight.
+
+        Parameters:
+            key: The normalized parameters of the call.
+            func: The function to run when there is no call in flight.
+
+        Returns:
+            The result of the call, shared with the concurrent callers.
+        """
+        if not self.enabled:
+            return await func()
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            coalesced_ratio.observe(True)
+            try:
+                # A cancelled follower must not cancel the shared result
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+        coalesced_ratio.observe(False)
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # Followers get the error, do not report it as never retrieved
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+
+read_flights = SingleFlight(enabled=settings.READ_COALESCING)
@@ -0,0 +1,170 @@
+"""
+The structured logging module - JSON access and audit logs written off the
+event loop.
+
+Classes:
+    JsonFormatter - formats records as JSON lines.
+    DroppingQueueHandler - puts records into a bounded queue, dropping them
+    when it is full.
+    LogQueue - sends the records of the service through the queue to a
+    handler running on a background thread.
+
+Functions:
+    audit - writes an entry of the audit log.
+
+Notes:
+    A handler writing to a file or a pipe from the event loop stalls every
+    request while the write waits for the disk or the reader. On the loop a
+    record is only created and put into a queue, unformatted: the
+    arguments of a record must not be changed after logging it. A
+    `QueueListener` thread formats the records and writes them. When the
+    writer falls behind and the queue is full, new records are dropped and
+    counted in `log_records_dropped_total` instead of blocking the loop.
+
+    The records of all the loggers of the service, `app` and below, go
+    through the queue: the access log `app.access`, the audit log
+    `app.audit` and the warnings of the modules. The fields of an entry are
+    passed in the `fields` extra attribute of a record.
+"""
+
+import json
+import logging
+import queue
+import sys
+from datetime import date, datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+access_logger = logging.getLogger("app.access")
+audit_logger = logging.getLogger("app.audit")
+
+records_dropped_total = metrics.counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a JSON object on one line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", ()))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=_json_default, separators=(",", ":"))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    A handler putting records into a bounded queue without blocking.
+
+    The queue is a `SimpleQueue`, cheaper to put into than a `Queue`, its
+    size is checked before putting, so the bound is approximate.
+
+    Attributes:
+        max_size: The number of queued records after which new records are
+            dropped.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int) -> None:
+        super().__init__(log_queue)
+        self.max_size = max_size
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatted by the listener thread, not here
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_size:
+            records_dropped_total.inc()
+            return
+        self.queue.put_nowait(record)
+
+
+class LogQueue:
+    """
+    Routes the records of the service through a bounded queue.
+
+    Attributes:
+        max_size: The bound of the queue.
+        level: The level of the `app` logger.
+        path: The file the records are appended to, standard output if not
+            given.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        level: str = "INFO",
+        path: Optional[str] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.level = level
+        self.path = path
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._handler: Optional[DroppingQueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        """Starts the writer thread and sends the records to the queue."""
+        if self._listener is not None:
+            return
+        target = (
+            logging.FileHandler(self.path)
+            if self.path
+            else logging.StreamHandler(sys.stdout)
+        )
+        target.setFormatter(JsonFormatter())
+        self._listener = QueueListener(self.queue, target)
+        self._listener.start()
+        self._handler = DroppingQueueHandler(self.queue, self.max_size)
+        logger = logging.getLogger("app")
+        logger.addHandler(self._handler)
+        logger.setLevel(self.level)
+
+    def stop(self) -> None:
+        """Writes the queued records and stops the writer thread."""
+        if self._listener is None:
+            return
+        logging.getLogger("app").removeHandler(self._handler)
+        listener, self._listener = self._listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def audit(event: str, **fields: Any) -> None:
+    """
+    Writes an entry of the audit log.
+
+    Parameters:
+        event: The name of the audited action.
+        fields: The fields of the entry, JSON serializable, dates and
+            datetimes are written in ISO format.
+    """
+    if audit_logger.isEnabledFor(logging.INFO):
+        audit_logger.info(event, extra={"fields": {"event": event, **fields}})
+
+
+log_queue = LogQueue(
+    max_size=settings.LOG_QUEUE_SIZE,
+    level=settings.LOG_LEVEL,
+    path=settings.LOG_FILE,
+)
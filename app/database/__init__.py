@@ -2,9 +2,24 @@
 This module provides a function for creating a `DatabaseEngine` instance.
 
 The `DatabaseEngine` class provides a connection to the database.
+The `CompletionCoalescer` instance merges concurrent order completions
+into shared transactions when `ORDER_COMPLETION_BATCHING` is enabled.
 """
 
 from app.core.config import settings
+from app.database.batching import CompletionCoalescer
 from app.database.engine import DatabaseEngine
 
-db_engine = DatabaseEngine(settings.SQLALCHEMY_DATABASE_URI)
+db_engine = DatabaseEngine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    slow_query_threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    slow_query_explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    slow_query_history_size=settings.SLOW_QUERY_HISTORY_SIZE,
+    order_partitions_ahead=settings.ORDER_PARTITIONS_AHEAD_MONTHS,
+)
+
+completion_coalescer = CompletionCoalescer(
+    db_engine,
+    window_ms=settings.ORDER_COMPLETION_BATCH_WINDOW_MS,
+    max_batch_size=settings.ORDER_COMPLETION_BATCH_SIZE,
+)
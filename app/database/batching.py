@@ -0,0 +1,136 @@
+"""
+The batching module - the module that coalesces concurrent order completion
+requests into shared transactions.
+
+Classes:
+    CompletionCoalescer - class that merges completion requests arriving
+    within a short window into one set-based transaction.
+
+Notes:
+    Every merged request is still applied atomically on its own: a request
+    that conflicts with the database or with an earlier request of the same
+    batch gets its own error and does not affect the others. Requests are
+    applied in the order of their arrival.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.metrics import metrics
+from app.database.engine import DatabaseEngine
+from app.database.repositories.orders import OrdersRepository
+from app.schemas.models.orders import CompleteOrder, OrderDto
+
+logger = logging.getLogger(__name__)
+
+batches_total = metrics.counter(
+    "order_completion_batches_total", "Transactions of coalesced completions"
+)
+batch_size = metrics.histogram(
+    "order_completion_batch_size",
+    "Completion requests merged into one transaction",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+
+
+class CompletionCoalescer:
+    """
+    A write coalescer for `POST /orders/complete`.
+
+    __db_engine(DatabaseEngine):
+        The engine used to open a session per batch.
+    window(float):
+        Seconds to wait for more requests after the first one of a batch.
+    max_batch_size(int):
+        The maximum number of requests merged into one transaction.
+    """
+
+    def __init__(
+        self, db_engine: DatabaseEngine, window_ms: float, max_batch_size: int
+    ) -> None:
+        self.__db_engine = db_engine
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether requests are coalesced at the moment.
+
+        Returns:
+            `True` if the coalescer has been started and not stopped.
+        """
+        return self.__worker is not None
+
+    def start(self) -> None:
+        """Starts the background task that commits the batches."""
+        if self.__worker is None:
+            self.__queue = asyncio.Queue()
+            self.__worker = asyncio.get_running_loop().create_task(
+                self._run()
+            )
+
+    async def stop(self) -> None:
+        """Commits the requests that are already queued and stops."""
+        if self.__worker is None:
+            return
+        worker, self.__worker = self.__worker, None
+        await self.__queue.join()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    async def submit(
+        self, complete_orders: list[CompleteOrder]
+    ) -> list[OrderDto]:
+        """
+        Completes orders as a part of the next batch.
+
+        Parameters:
+            complete_orders: The orders of a single request.
+
+        Returns:
+            A list of `OrderDto` objects, each representing a completed order.
+
+        Raises:
+            BaseDBError: If the request conflicts with the database.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.__queue.put_nowait((complete_orders, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self.__queue.get()]
+            if self.__queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch_size and not self.__queue.empty():
+                batch.append(self.__queue.get_nowait())
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self.__queue.task_done()
+
+    async def _commit(self, batch: list[tuple[list, asyncio.Future]]) -> None:
+        batches_total.inc()
+        batch_size.observe(len(batch))
+        try:
+            async with self.__db_engine.create_session() as session:
+                results = await OrdersRepository(
+                    session
+                ).complete_orders_batch(
+                    complete_orders_batch=[request for request, _ in batch]
+                )
+        except Exception as error:
+            logger.exception("Failed to commit a batch of completions")
+            results = [error] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
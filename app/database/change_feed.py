@@ -0,0 +1,582 @@
+"""
+The change feed module - pushes assignment changes and order completions to
+the subscribers of the event streams.
+
+Classes:
+    ChangeEvent - an event encoded once as a Server-Sent Events frame.
+    Subscription - the events of one subscriber.
+    CourierSubscription - the events of a courier in a bounded buffer.
+    EventLog - the bounded log of the last events.
+    LogSubscription - all the events, read from the shared log.
+    ChangeFeed - fans the events out to the subscriptions of the process and
+    relays them between the processes with NOTIFY.
+
+Functions:
+    assignment_event - builds the event of a changed assignment of a courier.
+    completion_event - builds the event of a completed order.
+    reset_event - builds the event resetting the data versions of the other
+    processes.
+
+Notes:
+    The repositories publish the events of a write after it is committed,
+    the subscriptions of the process get them at once. Other processes get
+    them through the `change_events` channel: the events are sent with
+    `pg_notify` in the transaction of the write, so they are delivered only
+    if it commits. A process skips the notifications it sent itself.
+
+    The relayed events also bump the `data_versions` of the process, so that
+    its entity tags and the responses cached by them change with the writes
+    of the other processes. They change when the notification arrives, a
+    moment after the commit. The versions are reset when the relay
+    reconnects, as the events sent meanwhile may be lost. A `reset` event
+    only resets the versions and is not streamed.
+
+    A subscription of a courier buffers at most `buffer_size` events. The
+    subscriptions to all the events read one shared log of the last
+    `dispatcher_buffer_size` events, each from its own position, so that a
+    day plan, which changes the assignments of every courier, is not copied
+    into every subscription. The oldest events are dropped when a
+    subscriber is slower than the writes. An idle subscription holds no
+    buffer, only the future it waits on. A subscriber that may have missed
+    events, because of a full buffer or of a lost connection of the relay,
+    gets a `resync` event and should read the current state again.
+
+    Every `keepalive_s` seconds the idle subscriptions are woken up to send
+    a comment, so that proxies keep the connections open and closed
+    connections are noticed.
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import date, datetime
+from itertools import islice
+from secrets import token_hex
+from typing import Iterable, Optional
+
+import asyncpg
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, TEXT
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.versions import data_versions
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "change_events"
+RESET_KIND = "reset"
+APPLICATION_NAME = "lavka-change-feed"
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD = 7999
+NOTIFY_QUERY = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+).bindparams(bindparam("payloads", type_=ARRAY(TEXT)))
+
+events_published_total = metrics.counter(
+    "change_events_published_total", "Change events published by writes"
+)
+events_relayed_total = metrics.counter(
+    "change_events_relayed_total",
+    "Change events received from other processes",
+)
+events_delivered_total = metrics.counter(
+    "change_events_delivered_total", "Change events put into subscriptions"
+)
+events_dropped_total = metrics.counter(
+    "change_events_dropped_total",
+    "Change events dropped from the full buffers of slow subscribers",
+)
+
+
+class ChangeEvent:
+    """
+    A change event with its Server-Sent Events frame.
+
+    Attributes:
+        kind: The name of the event, `assignment` or `completion`.
+        courier_id: The courier the event is about.
+        data: The JSON encoded fields of the event.
+        frame: The event encoded as a frame of an event stream.
+    """
+
+    __slots__ = ("kind", "courier_id", "data", "frame")
+
+    def __init__(self, kind: str, courier_id: int, data: str) -> None:
+        self.kind = kind
+        self.courier_id = courier_id
+        self.data = data
+        self.frame = f"event: {kind}\ndata: {data}\n\n".encode()
+
+
+def _encode(fields: dict) -> str:
+    return json.dumps(fields, separators=(",", ":"))
+
+
+def assignment_event(
+    courier_id: int, assignment_date: date, order_ids: Iterable[int]
+) -> ChangeEvent:
+    """
+    Builds the event of a changed assignment of a courier.
+
+    Parameters:
+        courier_id: The courier whose assignment changed.
+        assignment_date: The date of the assignment.
+        order_ids: The orders assigned to the courier by the write, empty
+            if the orders of the courier were only released.
+    """
+    return ChangeEvent(
+        "assignment",
+        courier_id,
+        _encode(
+            {
+                "courier_id": courier_id,
+                "date": assignment_date.isoformat(),
+                "order_ids": sorted(order_ids),
+            }
+        ),
+    )
+
+
+def completion_event(
+    order_id: int, courier_id: int, complete_time: datetime
+) -> ChangeEvent:
+    """Builds the event of an order completed by a courier."""
+    return ChangeEvent(
+        "completion",
+        courier_id,
+        _encode(
+            {
+                "order_id": order_id,
+                "courier_id": courier_id,
+                "complete_time": complete_time.isoformat(),
+            }
+        ),
+    )
+
+
+def reset_event() -> ChangeEvent:
+    """Builds the event resetting the data versions of the other processes."""
+    return ChangeEvent(RESET_KIND, 0, "{}")
+
+
+def event_versions(kind: str, data: str) -> tuple[list[int], list[date]]:
+    """
+    Finds the data versions changed by an event.
+
+    Returns:
+        The couriers and the assignment dates whose data changed.
+    """
+    fields = json.loads(data)
+    if kind == "assignment":
+        changed_date = date.fromisoformat(fields["date"])
+    else:
+        changed_date = datetime.fromisoformat(fields["complete_time"]).date()
+    return [fields["courier_id"]], [changed_date]
+
+
+def resync_frame(**fields) -> bytes:
+    return f"event: resync\ndata: {_encode(fields)}\n\n".encode()
+
+
+class Subscription(ABC):
+    """
+    The events of one subscriber.
+
+    Attributes:
+        courier_id: The courier of the events, `None` for all the events.
+        dropped: The number of events dropped since the last read.
+    """
+
+    __slots__ = ("courier_id", "dropped", "_waiter", "_closed")
+
+    def __init__(self, courier_id: Optional[int]) -> None:
+        self.courier_id = courier_id
+        self.dropped = 0
+        self._waiter: Optional[asyncio.Future] = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def wake(self) -> None:
+        """Wakes up the reader, with no frames if there are no new events."""
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def close(self) -> None:
+        """Ends the subscription, the reader gets `None`."""
+        self._closed = True
+        self.wake()
+
+    async def get(self) -> Optional[list[bytes]]:
+        """
+        Waits for new events and takes their frames.
+
+        Returns:
+            The frames, a `resync` frame first if some were dropped, an
+            empty list on a keepalive, `None` once the subscription is
+            closed.
+        """
+        if not self._pending() and not self._closed:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        if self._closed:
+            return None
+        frames = self._take()
+        if self.dropped:
+            frames.insert(
+                0, resync_frame(reason="overflow", dropped=self.dropped)
+            )
+            self.dropped = 0
+        return frames
+
+    @abstractmethod
+    def _pending(self) -> bool:
+        """Whether there are events to take."""
+
+    @abstractmethod
+    def _take(self) -> list[bytes]:
+        """Takes the frames of the new events."""
+
+
+class CourierSubscription(Subscription):
+    """
+    The events of a courier in a buffer of the subscription.
+
+    Attributes:
+        limit: The maximum number of buffered events.
+    """
+
+    __slots__ = ("limit", "_frames")
+
+    def __init__(self, courier_id: int, limit: int) -> None:
+        super().__init__(courier_id)
+        self.limit = limit
+        self._frames: Optional[deque[bytes]] = None
+
+    def put(self, frame: bytes) -> None:
+        """Buffers a frame, dropping the oldest one if the buffer is full."""
+        if self._frames is None:
+            self._frames = deque(maxlen=self.limit)
+        elif len(self._frames) == self.limit:
+            self.dropped += 1
+            events_dropped_total.inc()
+        self._frames.append(frame)
+        self.wake()
+
+    def _pending(self) -> bool:
+        return self._frames is not None
+
+    def _take(self) -> list[bytes]:
+        frames, self._frames = list(self._frames or ()), None
+        return frames
+
+
+class EventLog:
+    """
+    The last events shared by the subscriptions to all the events.
+
+    Events are numbered in the order of publishing, a reader keeps the
+    number of the next event it reads. The readers woken up by a write
+    usually read the same events, the frames of the last read range are
+    joined once and shared.
+
+    Attributes:
+        frames: The frames of the kept events.
+        start: The number of the first kept event.
+    """
+
+    __slots__ = ("frames", "start", "_read_range", "_read_chunk")
+
+    def __init__(self, limit: int) -> None:
+        self.frames: deque[bytes] = deque(maxlen=limit)
+        self.start = 0
+        self._read_range = (0, 0)
+        self._read_chunk = b""
+
+    @property
+    def end(self) -> int:
+        """The number of the next event."""
+        return self.start + len(self.frames)
+
+    def append(self, frame: bytes) -> None:
+        if len(self.frames) == self.frames.maxlen:
+            self.start += 1
+        self.frames.append(frame)
+
+    def read(self, cursor: int) -> bytes:
+        """
+        Gets the frames of the events from a kept one to the last one.
+
+        Parameters:
+            cursor: The number of the first event to read, not before
+                `start`.
+
+        Returns:
+            The frames joined into one chunk.
+        """
+        if self._read_range != (cursor, self.end):
+            self._read_chunk = b"".join(
+                islice(self.frames, cursor - self.start, None)
+            )
+            self._read_range = (cursor, self.end)
+        return self._read_chunk
+
+
+class LogSubscription(Subscription):
+    """All the events, read from the shared `EventLog`."""
+
+    __slots__ = ("_log", "_cursor")
+
+    def __init__(self, log: EventLog) -> None:
+        super().__init__(None)
+        self._log = log
+        self._cursor = log.end
+
+    def _pending(self) -> bool:
+        return self._cursor != self._log.end
+
+    def _take(self) -> list[bytes]:
+        log = self._log
+        if self._cursor == log.end:
+            return []
+        if self._cursor < log.start:
+            dropped = log.start - self._cursor
+            self.dropped += dropped
+            events_dropped_total.inc(dropped)
+            self._cursor = log.start
+        chunk = log.read(self._cursor)
+        self._cursor = log.end
+        return [chunk]
+
+
+class ChangeFeed:
+    """
+    Fans the change events out to the subscriptions of the process.
+
+    Attributes:
+        buffer_size: The buffer limit of the subscriptions of a courier.
+        dispatcher_buffer_size: The buffer limit of the subscriptions to all
+            the events.
+        keepalive_s: The interval of waking up idle subscriptions.
+        relay: Whether the events are relayed between the processes.
+        reconnect_delay_s: The delay before reconnecting to the database.
+        origin: The token of the process in the relayed events.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        buffer_size: int = 100,
+        dispatcher_buffer_size: int = 10_000,
+        keepalive_s: float = 15.0,
+        relay: bool = True,
+        reconnect_delay_s: float = 1.0,
+    ) -> None:
+        # asyncpg accepts the URL of the engine without the dialect
+        self._dsn = make_url(database_url).set(drivername="postgresql")
+        self.buffer_size = buffer_size
+        self.dispatcher_buffer_size = dispatcher_buffer_size
+        self.keepalive_s = keepalive_s
+        self.relay = relay
+        self.reconnect_delay_s = reconnect_delay_s
+        self.origin = token_hex(8)
+        self._couriers: dict[int, list[CourierSubscription]] = {}
+        self._dispatchers: set[LogSubscription] = set()
+        self._log = EventLog(dispatcher_buffer_size)
+        self._workers: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._dispatchers) + sum(map(len, self._couriers.values()))
+
+    def subscribe(self, courier_id: Optional[int] = None) -> Subscription:
+        """
+        Subscribes to the events of a courier or to all the events.
+
+        The subscription must be passed to `unsubscribe` when it is no
+        longer read.
+        """
+        if courier_id is None:
+            subscription = LogSubscription(self._log)
+            self._dispatchers.add(subscription)
+            return subscription
+        subscription = CourierSubscription(courier_id, self.buffer_size)
+        self._couriers.setdefault(courier_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        if subscription.courier_id is None:
+            self._dispatchers.discard(subscription)
+            return
+        subscriptions = self._couriers.get(subscription.courier_id, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if not subscriptions:
+            self._couriers.pop(subscription.courier_id, None)
+
+    def publish(self, events: Iterable[ChangeEvent]) -> None:
+        """
+        Puts the events of a committed write into the subscriptions.
+
+        Parameters:
+            events: The events, in the order of the changes.
+        """
+        delivered = logged = 0
+        for event in events:
+            for subscription in self._couriers.get(event.courier_id, ()):
+                subscription.put(event.frame)
+                delivered += 1
+            if self._dispatchers:
+                self._log.append(event.frame)
+                logged += 1
+        # The subscriptions to all the events read the shared log, a write
+        # wakes each of them once whatever the number of its events
+        if logged:
+            for subscription in self._dispatchers:
+                subscription.wake()
+        events_delivered_total.inc(delivered + logged * len(self._dispatchers))
+
+    async def notify(
+        self,
+        connection: AsyncSession | AsyncConnection,
+        events: list[ChangeEvent],
+    ) -> None:
+        """
+        Sends the events of a write to the other processes.
+
+        Must be called in the transaction of the write, before the commit.
+        Events too long for a notification are sent without the lists of
+        their orders.
+        """
+        if not self.relay or not events:
+            return
+        await connection.execute(
+            NOTIFY_QUERY,
+            {
+                "channel": CHANNEL,
+                "payloads": [self._payload(event) for event in events],
+            },
+        )
+        events_published_total.inc(len(events))
+
+    def _payload(self, event: ChangeEvent) -> str:
+        payload = f"{self.origin} {event.kind} {event.courier_id} {event.data}"
+        if len(payload.encode()) <= MAX_PAYLOAD:
+            return payload
+        fields = {
+            name: value
+            for name, value in json.loads(event.data).items()
+            if not isinstance(value, list)
+        }
+        fields["truncated"] = True
+        return (
+            f"{self.origin} {event.kind} {event.courier_id} "
+            f"{_encode(fields)}"
+        )
+
+    def start(self) -> None:
+        """Starts the keepalives and the relay of the events."""
+        if self._workers:
+            return
+        loop = asyncio.get_running_loop()
+        self._workers.append(loop.create_task(self._keep_alive()))
+        if self.relay:
+            self._workers.append(loop.create_task(self._listen()))
+
+    async def stop(self) -> None:
+        """Stops the relay and ends all the subscriptions."""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for subscription in self._subscriptions():
+            subscription.close()
+
+    def _subscriptions(self) -> list[Subscription]:
+        subscriptions = list(self._dispatchers)
+        for courier_subscriptions in self._couriers.values():
+            subscriptions.extend(courier_subscriptions)
+        return subscriptions
+
+    def _broadcast(self, frame: bytes) -> None:
+        for courier_subscriptions in self._couriers.values():
+            for subscription in courier_subscriptions:
+                subscription.put(frame)
+        if self._dispatchers:
+            self._log.append(frame)
+            for subscription in self._dispatchers:
+                subscription.wake()
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_s)
+            for subscription in self._subscriptions():
+                subscription.wake()
+
+    def _on_notify(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload
+    ) -> None:
+        origin, kind, courier_id, data = payload.split(" ", 3)
+        if origin == self.origin:
+            return
+        events_relayed_total.inc()
+        if kind == RESET_KIND:
+            data_versions.reset()
+            return
+        courier_ids, assignment_dates = event_versions(kind, data)
+        data_versions.bump(
+            courier_ids=courier_ids, assignment_dates=assignment_dates
+        )
+        self.publish([ChangeEvent(kind, int(courier_id), data)])
+
+    async def _listen(self) -> None:
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    self._dsn.render_as_string(hide_password=False),
+                    server_settings={"application_name": APPLICATION_NAME},
+                )
+                await connection.add_listener(CHANNEL, self._on_notify)
+                if connected_before:
+                    # Events of other processes may have been lost
+                    data_versions.reset()
+                    self._broadcast(resync_frame(reason="reconnect"))
+                connected_before = True
+                while True:
+                    await asyncio.sleep(self.keepalive_s)
+                    # A query notices a connection lost without a reset
+                    await asyncio.wait_for(
+                        connection.fetchval("SELECT 1"), self.keepalive_s
+                    )
+            except (
+                asyncio.TimeoutError,
+                OSError,
+                asyncpg.PostgresError,
+                asyncpg.InterfaceError,
+            ) as error:
+                logger.warning("Change feed disconnected: %s", error)
+            finally:
+                if connection is not None:
+                    connection.terminate()
+            await asyncio.sleep(self.reconnect_delay_s)
+
+
+change_feed = ChangeFeed(
+    settings.SQLALCHEMY_DATABASE_URI,
+    buffer_size=settings.EVENT_STREAM_BUFFER_SIZE,
+    dispatcher_buffer_size=settings.EVENT_STREAM_DISPATCHER_BUFFER_SIZE,
+    keepalive_s=settings.EVENT_STREAM_KEEPALIVE_S,
+    relay=settings.EVENT_STREAM_NOTIFY,
+)
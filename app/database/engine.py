@@ -3,18 +3,126 @@ The engine module - the engine module that provides the class working
 with asynchronous database.
 
 Classes:
+    TimedQueuePool - the connection pool that measures the wait for a
+    connection.
     DatabaseEngine - class that provides the interface for the database management.
 
 Notes:
     The main feature of this module is simplification of working with
     database engine and sessions.
 """
-from typing import AsyncGenerator
+import time
+from datetime import date
+from typing import AsyncContextManager, AsyncGenerator
 
-from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
-                                    create_async_engine)
+from sqlalchemy import Connection, event, text
+from sqlalchemy.ext.asyncio import (AsyncConnection, AsyncSession,
+                                    async_sessionmaker, create_async_engine)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.core.metrics import metrics
 from app.database.base import Base
+from app.database.order_slots import sync_order_slots
+from app.database.partitions import (ensure_order_partitions, month_start,
+                                     upgrade_order_table)
+from app.database.replica import install_courier_versioning
+from app.database.slow_queries import SlowQueryRecorder
+
+commits_total = metrics.counter(
+    "db_commits_total", "Transactions committed by the database engine"
+)
+
+pool_wait_histogram = metrics.histogram(
+    "db_pool_wait_ms", "Time spent waiting for a pooled connection"
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default pool of asyncpg engines that measures checkout waits.
+
+    Attributes:
+        wait_ms(float):
+            The moving average of the recent waits for a connection.
+        wait_decay_s(float):
+            The average decays to zero over this time without checkouts, an
+            idle pool is not under pressure.
+    """
+
+    wait_smoothing = 0.2
+    wait_decay_s = 1.0
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_ms = 0.0
+        self._last_checkout = 0.0
+
+    def recent_wait_ms(self) -> float:
+        """
+        Returns the average wait for a connection, decayed by idle time.
+        """
+        idle = time.monotonic() - self._last_checkout
+        return self.wait_ms * max(0.0, 1 - idle / self.wait_decay_s)
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            self._last_checkout = time.monotonic()
+            wait_ms = (self._last_checkout - started) * 1000
+            pool_wait_histogram.observe(wait_ms)
+            self.wait_ms += (wait_ms - self.wait_ms) * self.wait_smoothing
+
+
+def create_missing_indexes(conn: Connection) -> None:
+    """
+    Creates the indexes of the models that are missing in the database.
+
+    `create_all` skips the tables that exist, so an index added to a model
+    later is only created here.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def upgrade_assignment_order_table(conn: AsyncConnection) -> bool:
+    """
+    Adds the primary key to an `assignment_order` table of an older version.
+
+    Duplicate links and links without an assignment are removed first.
+
+    Returns:
+        `True` if the table was upgraded.
+    """
+    missing = await conn.scalar(
+        text(
+            "SELECT to_regclass('assignment_order') IS NOT NULL "
+            "AND NOT EXISTS (SELECT FROM pg_constraint "
+            "WHERE conrelid = to_regclass('assignment_order') "
+            "AND contype = 'p')"
+        )
+    )
+    if not missing:
+        return False
+    await conn.execute(
+        text(
+            "DELETE FROM assignment_order a USING assignment_order b "
+            "WHERE a.ctid > b.ctid AND a.order_id = b.order_id "
+            "AND a.assignment_id = b.assignment_id"
+        )
+    )
+    await conn.execute(
+        text("DELETE FROM assignment_order WHERE assignment_id IS NULL")
+    )
+    await conn.execute(
+        text(
+            "ALTER TABLE assignment_order ADD CONSTRAINT "
+            "assignment_order_pkey PRIMARY KEY (assignment_id, order_id)"
+        )
+    )
+    return True
 
 
 class DatabaseEngine:
@@ -29,26 +137,77 @@ class DatabaseEngine:
         The async engine instance
     __session_maker(async_sessionmaker):
         The sessionmaker class. Used to create new database sessions.
+    __slow_queries(SlowQueryRecorder):
+        The recorder of statements slower than the configured threshold.
+    order_partitions_ahead(int):
+        The number of months to create `order` partitions ahead for.
     """
 
-    def __init__(self, database_url: str):
-        self.__engine = create_async_engine(database_url)
+    def __init__(
+        self,
+        database_url: str,
+        slow_query_threshold_ms: float = 100.0,
+        slow_query_explain_sample_rate: float = 0.1,
+        slow_query_history_size: int = 50,
+        order_partitions_ahead: int = 2,
+    ):
+        self.__engine = create_async_engine(
+            database_url, poolclass=TimedQueuePool
+        )
         self.__session_maker = async_sessionmaker(
             bind=self.__engine,
             autocommit=False,
             class_=AsyncSession,
             autoflush=False,
         )
+        self.__slow_queries = SlowQueryRecorder(
+            self.__engine,
+            threshold_ms=slow_query_threshold_ms,
+            explain_sample_rate=slow_query_explain_sample_rate,
+            history_size=slow_query_history_size,
+        )
+        event.listen(
+            self.__engine.sync_engine, "commit", lambda _: commits_total.inc()
+        )
+        self.order_partitions_ahead = order_partitions_ahead
+
+    @property
+    def slow_queries(self) -> SlowQueryRecorder:
+        """
+        Get the recorder of slow statements.
+
+        Returns:
+            The `SlowQueryRecorder` attached to the engine.
+        """
+        return self.__slow_queries
+
+    def pool_wait_ms(self) -> float:
+        """
+        Get the recent average wait for a pooled connection.
+
+        Returns:
+            The wait in milliseconds, zero for an idle pool.
+        """
+        return self.__engine.sync_engine.pool.recent_wait_ms()
 
     async def start(self) -> None:
         """
         Prepares database for usage.
 
-        The method to create all the tables in the database. Usually, it is
-        done on initialization of app stage.
+        The method to create all the tables in the database and the
+        partitions of the `order` table and to fill the candidate buckets of
+        the open orders. Usually, it is done on initialization of app stage.
         """
         async with self.__engine.begin() as conn:
+            await upgrade_order_table(conn)
             await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+            await upgrade_assignment_order_table(conn)
+            await install_courier_versioning(conn)
+            await conn.run_sync(create_missing_indexes)
+            await ensure_order_partitions(
+                conn, month_start(date.today(), self.order_partitions_ahead)
+            )
+            await sync_order_slots(conn)
 
     async def session(self) -> AsyncGenerator[AsyncSession, None]:
         """
@@ -60,6 +219,26 @@ class DatabaseEngine:
         async with self.__session_maker() as session:
             yield session
 
+    def create_session(self) -> AsyncSession:
+        """
+        Creates a new session outside of a request.
+
+        Returns:
+            session: async session, to be used as an async context manager
+        """
+        return self.__session_maker()
+
+    def begin(self) -> AsyncContextManager[AsyncConnection]:
+        """
+        Opens a connection with a transaction outside of a request.
+
+        Returns:
+            connection: async connection, to be used as an async context
+            manager that commits on exit
+        """
+        return self.__engine.begin()
+
     async def finalize(self) -> None:
         """Finalizes the engine instance."""
+        await self.__slow_queries.finalize()
         await self.__engine.dispose()
@@ -49,6 +49,9 @@ class AssignmentDB(Base):
     orders = relationship(
         "OrderDB",
         secondary=assignment_order_table,
+        primaryjoin="AssignmentDB.assignment_id"
+        " == foreign(assignment_order.c.assignment_id)",
+        secondaryjoin="OrderDB.order_id == foreign(assignment_order.c.order_id)",
         back_populates="assignments",
     )
     courier = relationship("CourierDB", back_populates="assignments")
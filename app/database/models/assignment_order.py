@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Table
+from sqlalchemy import Column, ForeignKey, Index, PrimaryKeyConstraint, Table
 from sqlalchemy.dialects.postgresql import BIGINT
 
 from app.database.base import Base
@@ -6,6 +6,18 @@ from app.database.base import Base
 assignment_order_table = Table(
     "assignment_order",
     Base.metadata,
-    Column("order_id", BIGINT, ForeignKey("order.order_id")),
-    Column("assignment_id", BIGINT, ForeignKey("assignment.assignment_id")),
+    # No foreign key: `order` is partitioned and can not have a unique
+    # constraint on `order_id` alone
+    Column("order_id", BIGINT, nullable=False),
+    Column(
+        "assignment_id",
+        BIGINT,
+        ForeignKey("assignment.assignment_id"),
+        nullable=False,
+    ),
+    # The primary key serves lookups by assignment, the index by order
+    PrimaryKeyConstraint(
+        "assignment_id", "order_id", name="assignment_order_pkey"
+    ),
+    Index("ix_assignment_order_order_id", "order_id"),
 )
@@ -20,4 +20,8 @@ class CourierDB(Base):
         "regions", ARRAY(INTEGER), CheckConstraint("0 < ALL(regions)")
     )
     working_hours = Column("working_hours", ARRAY(CHAR(11)))
+    # Set by a trigger, see `app.database.replica`
+    version = Column(
+        "version", BIGINT, nullable=False, server_default="0", index=True
+    )
     assignments = relationship("AssignmentDB", back_populates="courier")
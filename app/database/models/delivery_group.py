@@ -0,0 +1,39 @@
+"""
+This module provides a `DeliveryGroupDB` class for representing delivery
+groups in the database.
+
+The `DeliveryGroupDB` class has the following attributes:
+
+* `group_id`: The ID of the group, the `group_order_id` of its orders.
+* `assignment_id`: The ID of the assignment the group belongs to.
+* `start_minute`: The minute of the day the trip starts.
+* `end_minute`: The minute of the day the last order is delivered.
+* `cost`: The cost of the group.
+"""
+
+from sqlalchemy import FLOAT, Column, ForeignKey
+from sqlalchemy.dialects.postgresql import BIGINT, SMALLINT
+
+from app.database.base import Base
+from app.database.models.order import group_order_id_seq
+
+
+class DeliveryGroupDB(Base):
+    __tablename__ = "delivery_group"
+    group_id = Column(
+        "group_id",
+        BIGINT,
+        group_order_id_seq,
+        primary_key=True,
+        server_default=group_order_id_seq.next_value(),
+    )
+    assignment_id = Column(
+        "assignment_id",
+        BIGINT,
+        ForeignKey("assignment.assignment_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    start_minute = Column("start_minute", SMALLINT, nullable=False)
+    end_minute = Column("end_minute", SMALLINT, nullable=False)
+    cost = Column("cost", FLOAT, nullable=False)
@@ -0,0 +1,76 @@
+"""
+This module provides a `JobDB` class for representing background jobs in the
+database.
+
+The `JobDB` class has the following attributes:
+
+* `job_id`: The ID of the job.
+* `kind`: The kind of the job, e.g. `assignment`.
+* `dedup_key`: The key of the work, only one job per kind and key can be
+  active at a time.
+* `status`: One of `pending`, `running`, `succeeded`, `failed` and
+  `cancelled`.
+* `progress`: The share of the work done, from 0 to 1.
+* `params`: The parameters of the job.
+* `result`: The result of a succeeded job.
+* `error`: The error of a failed job.
+* `cancel_requested`: Whether the job was asked to stop.
+* `attempts`: The number of times the job was started.
+* `created_at`, `started_at`, `finished_at`, `heartbeat_at`: Timestamps of
+  the job life cycle.
+"""
+
+from sqlalchemy import (BOOLEAN, FLOAT, Column, Index, Integer, String, func,
+                        text)
+from sqlalchemy.dialects.postgresql import BIGINT, JSONB, TIMESTAMP
+
+from app.database.base import Base
+
+ACTIVE_JOB_STATUSES = ("pending", "running")
+
+
+class JobDB(Base):
+    __tablename__ = "job"
+    job_id = Column(
+        "job_id", BIGINT, primary_key=True, autoincrement=True, index=True
+    )
+    kind = Column("kind", String(32), nullable=False)
+    dedup_key = Column("dedup_key", String(64), nullable=False)
+    status = Column("status", String(16), nullable=False, default="pending")
+    progress = Column("progress", FLOAT, nullable=False, default=0)
+    params = Column("params", JSONB, nullable=False, default=dict)
+    result = Column("result", JSONB, nullable=True)
+    error = Column("error", String, nullable=True)
+    cancel_requested = Column(
+        "cancel_requested", BOOLEAN, nullable=False, default=False
+    )
+    attempts = Column("attempts", Integer, nullable=False, default=0)
+    created_at = Column(
+        "created_at",
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    started_at = Column("started_at", TIMESTAMP(timezone=True), nullable=True)
+    finished_at = Column(
+        "finished_at", TIMESTAMP(timezone=True), nullable=True
+    )
+    heartbeat_at = Column(
+        "heartbeat_at", TIMESTAMP(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Only one active job per kind and key, e.g. per assignment date
+        Index(
+            "ix_job_active_dedup",
+            "kind",
+            "dedup_key",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+        Index(
+            "ix_job_active_created",
+            "created_at",
+            postgresql_where=text("status IN ('pending', 'running')"),
+        ),
+    )
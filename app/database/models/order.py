@@ -1,4 +1,22 @@
-from sqlalchemy import FLOAT, CheckConstraint, Column
+"""
+This module provides a `OrderDB` class for representing orders in the
+database.
+
+The `order` table is partitioned by range of `complete_time`. Completed
+orders are stored in monthly partitions, open orders, whose `complete_time`
+is `NULL`, in the default partition `order_open`. The partitions are managed
+by `app.database.partitions`.
+
+A unique constraint on a partitioned table must include the partition key,
+so `order_id` is the primary key of the mapper only and is generated by the
+`order_order_id_seq` sequence. Check constraints are named explicitly,
+Postgres matches them by name when a table is attached as a partition.
+
+History queries by `complete_time` use a BRIN index, queries of one courier
+a B-tree on `(courier_id, complete_time)`.
+"""
+
+from sqlalchemy import FLOAT, CheckConstraint, Column, Index, Sequence
 from sqlalchemy.dialects.postgresql import (ARRAY, BIGINT, CHAR, INTEGER,
                                             TIMESTAMP)
 from sqlalchemy.orm import relationship
@@ -6,21 +24,36 @@ from sqlalchemy.orm import relationship
 from app.database.base import Base
 from app.database.models.assignment_order import assignment_order_table
 
+# Identifiers of delivery groups, shared by all assignment runs
+group_order_id_seq = Sequence("group_order_id_seq", metadata=Base.metadata)
+# The name of the sequence of a former `BIGSERIAL` column, so that existing
+# databases keep their numbering
+order_id_seq = Sequence("order_order_id_seq", metadata=Base.metadata)
+
 
 class OrderDB(Base):
     __tablename__ = "order"
     order_id = Column(
         "order_id",
         BIGINT,
-        primary_key=True,
-        unique=True,
-        autoincrement=True,
+        nullable=False,
+        server_default=order_id_seq.next_value(),
         index=True,
     )
-    weight = Column("weight", FLOAT, CheckConstraint("weight>=0"))
+    weight = Column(
+        "weight",
+        FLOAT,
+        CheckConstraint("weight>=0", name="order_weight_check"),
+    )
     delivery_hours = Column("delivery_hours", ARRAY(CHAR(11)))
-    regions = Column("regions", INTEGER, CheckConstraint("regions>0"))
-    cost = Column("cost", INTEGER, CheckConstraint("cost>0"))
+    regions = Column(
+        "regions",
+        INTEGER,
+        CheckConstraint("regions>0", name="order_regions_check"),
+    )
+    cost = Column(
+        "cost", INTEGER, CheckConstraint("cost>0", name="order_cost_check")
+    )
     complete_time = Column(
         "complete_time", TIMESTAMP(timezone=True), nullable=True
     )
@@ -31,5 +64,23 @@ class OrderDB(Base):
     assignments = relationship(
         "AssignmentDB",
         secondary=assignment_order_table,
+        primaryjoin="OrderDB.order_id == foreign(assignment_order.c.order_id)",
+        secondaryjoin="AssignmentDB.assignment_id"
+        " == foreign(assignment_order.c.assignment_id)",
         back_populates="orders",
     )
+
+    __table_args__ = (
+        # complete_time grows with the insertion order of completed rows, a
+        # block range index is a tiny fraction of a B-tree for range scans
+        Index(
+            "ix_order_complete_time_brin",
+            "complete_time",
+            postgresql_using="brin",
+        ),
+        Index(
+            "ix_order_courier_id_complete_time", "courier_id", "complete_time"
+        ),
+        {"postgresql_partition_by": "RANGE (complete_time)"},
+    )
+    __mapper_args__ = {"primary_key": [order_id]}
@@ -0,0 +1,27 @@
+"""
+This module provides the `order_slot` table, the candidate buckets of open
+orders.
+
+An open order has a row for every time slot its delivery windows touch, see
+`app.assignment.candidates`. The rows are written with the order and deleted
+when it is completed, so a bucket is read with one index range scan of the
+primary key.
+"""
+
+from sqlalchemy import Column, Index, PrimaryKeyConstraint, Table
+from sqlalchemy.dialects.postgresql import BIGINT, INTEGER, SMALLINT
+
+from app.database.base import Base
+
+order_slot_table = Table(
+    "order_slot",
+    Base.metadata,
+    # No foreign key: `order` is partitioned and can not have a unique
+    # constraint on `order_id` alone
+    Column("order_id", BIGINT, nullable=False),
+    Column("region", INTEGER, nullable=False),
+    Column("slot", SMALLINT, nullable=False),
+    # The primary key serves lookups by bucket, the index the deletes by order
+    PrimaryKeyConstraint("region", "slot", "order_id", name="order_slot_pkey"),
+    Index("ix_order_slot_order_id", "order_id"),
+)
@@ -0,0 +1,76 @@
+"""
+The order slots module - the module that maintains the `order_slot` table.
+
+Functions:
+    order_slot_rows - builds the rows of the candidate buckets of an order.
+    sync_order_slots - adds the rows of the open orders that have none and
+    deletes the rows of the orders that are not open anymore.
+
+Notes:
+    The rows are written by `OrdersRepository` in the transactions that add
+    and complete orders. `sync_order_slots` runs on start: it fills the table
+    for the orders created by an older version and repairs it after orders
+    were changed bypassing the repository.
+"""
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.operators import eq
+
+from app.assignment.candidates import window_slots
+from app.assignment.plan import parse_intervals
+from app.database.models.order import OrderDB
+from app.database.models.order_slot import order_slot_table
+
+
+def order_slot_rows(
+    order_id: int, region: int, delivery_hours: list[str]
+) -> list[dict]:
+    """
+    Builds the `order_slot` rows of an order.
+
+    Parameters:
+        order_id: The ID of the order.
+        region: The region of the order.
+        delivery_hours: The delivery hours of the order.
+
+    Returns:
+        A row for every time slot the delivery hours touch.
+    """
+    return [
+        {"order_id": order_id, "region": region, "slot": slot}
+        for slot in window_slots(parse_intervals(delivery_hours))
+    ]
+
+
+async def sync_order_slots(conn: AsyncConnection) -> int:
+    """
+    Brings the `order_slot` table in line with the open orders.
+
+    Parameters:
+        conn: A connection inside a transaction.
+
+    Returns:
+        The number of rows added.
+    """
+    open_order = select(OrderDB.order_id).where(
+        eq(OrderDB.order_id, order_slot_table.c.order_id),
+        eq(OrderDB.complete_time, None),
+    )
+    await conn.execute(delete(order_slot_table).where(~exists(open_order)))
+    result = await conn.execute(
+        select(
+            OrderDB.order_id, OrderDB.regions, OrderDB.delivery_hours
+        ).where(
+            eq(OrderDB.complete_time, None),
+            ~exists().where(eq(order_slot_table.c.order_id, OrderDB.order_id)),
+        )
+    )
+    rows = [
+        row
+        for order_id, region, delivery_hours in result
+        for row in order_slot_rows(order_id, region, delivery_hours)
+    ]
+    if rows:
+        await conn.execute(insert(order_slot_table), rows)
+    return len(rows)
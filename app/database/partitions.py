@@ -0,0 +1,247 @@
+"""
+The partitions module - the module that manages the partitions of the
+`order` table.
+
+Functions:
+    upgrade_order_table - converts a plain `order` table of an older version
+    into the default partition of the partitioned one.
+    ensure_order_partitions - creates the default partition and the monthly
+    partitions up to a given month.
+    archive_order_partitions - detaches old monthly partitions and moves them
+    to the archive schema.
+
+Notes:
+    Open orders have no `complete_time` and live in the default partition
+    `order_open`, a completed order is moved to the partition of its month
+    by the `UPDATE` that completes it. If that partition does not exist yet,
+    the order stays in the default partition; it is moved out when the
+    partition is created, since Postgres refuses to attach a partition whose
+    rows are present in the default one.
+"""
+
+import logging
+from datetime import date, datetime, time, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "order_open"
+PARTITION_PREFIX = "order_p"
+LEGACY_INDEXES = {
+    "order_pkey": f"{DEFAULT_PARTITION}_pkey",
+    "ix_order_order_id": f"ix_{DEFAULT_PARTITION}_order_id",
+    "ix_order_group_order_id": f"ix_{DEFAULT_PARTITION}_group_order_id",
+}
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """
+    Finds the first day of a month.
+
+    Parameters:
+        day: Any day of the base month.
+        months: The number of months to shift by, may be negative.
+
+    Returns:
+        The first day of the shifted month.
+    """
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+async def upgrade_order_table(conn: AsyncConnection) -> bool:
+    """
+    Turns a plain `order` table into the default partition.
+
+    Must run before the tables are created. The rows stay where they are,
+    completed ones are moved to monthly partitions by
+    `ensure_order_partitions`.
+
+    Returns:
+        `True` if the table was converted.
+    """
+    relkind = await conn.scalar(
+        text(
+            "SELECT relkind::text FROM pg_class "
+            "WHERE oid = to_regclass('\"order\"')"
+        )
+    )
+    if relkind != "r":
+        return False
+    logger.warning("Converting table order into a partitioned table")
+    await conn.execute(
+        text(
+            "ALTER TABLE assignment_order "
+            "DROP CONSTRAINT IF EXISTS assignment_order_order_id_fkey"
+        )
+    )
+    await conn.execute(
+        text(f'ALTER TABLE "order" RENAME TO {DEFAULT_PARTITION}')
+    )
+    # Index names are unique per schema, free them for the partitioned table
+    for index, new_name in LEGACY_INDEXES.items():
+        await conn.execute(
+            text(f"ALTER INDEX IF EXISTS {index} RENAME TO {new_name}")
+        )
+    return True
+
+
+async def ensure_order_partitions(
+    conn: AsyncConnection, until: date, since: Optional[date] = None
+) -> list[str]:
+    """
+    Creates missing partitions of the `order` table.
+
+    Parameters:
+        conn: A connection inside a transaction.
+        until: Monthly partitions are created up to the month of this day.
+        since: The first month to create partitions for, by default the
+            month of the oldest completed order in the default partition or
+            the current month.
+
+    Returns:
+        The names of the created partitions.
+    """
+    default_exists = await conn.scalar(
+        text(
+            "SELECT EXISTS (SELECT FROM pg_inherits "
+            "WHERE inhparent = '\"order\"'::regclass "
+            "AND inhrelid = to_regclass(:name))"
+        ),
+        {"name": DEFAULT_PARTITION},
+    )
+    if not default_exists:
+        if await conn.scalar(
+            text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}
+        ):
+            # The former plain table left by `upgrade_order_table`
+            await conn.execute(
+                text(
+                    f'ALTER TABLE "order" ATTACH PARTITION '
+                    f"{DEFAULT_PARTITION} DEFAULT"
+                )
+            )
+        else:
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {DEFAULT_PARTITION} "
+                    'PARTITION OF "order" DEFAULT'
+                )
+            )
+    oldest = await conn.scalar(
+        text(
+            f"SELECT min(complete_time) FROM {DEFAULT_PARTITION} "
+            "WHERE complete_time IS NOT NULL"
+        )
+    )
+    first = since or date.today()
+    if oldest:
+        first = min(first, oldest.date())
+    month = month_start(min(first, until))
+    created = []
+    while month <= until:
+        name = partition_name(month)
+        if not await conn.scalar(
+            text("SELECT to_regclass(:name)"), {"name": name}
+        ):
+            await _create_partition(conn, name, month, month_start(month, 1))
+            created.append(name)
+        month = month_start(month, 1)
+    return created
+
+
+async def archive_order_partitions(
+    conn: AsyncConnection, before: date, archive_schema: str
+) -> list[str]:
+    """
+    Detaches the monthly partitions that end before a day.
+
+    The detached tables are moved to `archive_schema` and are no longer seen
+    by the queries of the service. The `assignment_order` rows of their
+    orders are moved to the table of the same name in `archive_schema`, no
+    row of the service refers to an archived order.
+
+    Returns:
+        The names of the archived partitions.
+    """
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = inhrelid "
+            "WHERE inhparent = '\"order\"'::regclass "
+            "AND child.relname LIKE :prefix ORDER BY child.relname"
+        ),
+        {"prefix": f"{PARTITION_PREFIX}%"},
+    )
+    last = partition_name(month_start(before, -1))
+    names = [name for (name,) in result if name <= last]
+    if names:
+        await conn.execute(
+            text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}")
+        )
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {archive_schema}.assignment_order "
+                "(LIKE assignment_order)"
+            )
+        )
+    for name in names:
+        await conn.execute(
+            text(f'ALTER TABLE "order" DETACH PARTITION {name}')
+        )
+        await conn.execute(
+            text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}")
+        )
+        # No foreign key protects the rows of the detached orders
+        await conn.execute(
+            text(
+                "WITH moved AS (DELETE FROM assignment_order WHERE order_id "
+                f"IN (SELECT order_id FROM {archive_schema}.{name}) "
+                f"RETURNING *) INSERT INTO {archive_schema}.assignment_order "
+                "SELECT * FROM moved"
+            )
+        )
+    return names
+
+
+async def _create_partition(
+    conn: AsyncConnection, name: str, start: date, end: date
+) -> None:
+    # Partitions are bounded by UTC midnights
+    bounds = {
+        "start": datetime.combine(start, time.min, timezone.utc),
+        "end": datetime.combine(end, time.min, timezone.utc),
+    }
+    await conn.execute(
+        text(
+            f'CREATE TABLE {name} (LIKE "order" INCLUDING DEFAULTS '
+            "INCLUDING CONSTRAINTS)"
+        )
+    )
+    # No order of the month may reach the default partition until the new
+    # one is attached
+    await conn.execute(
+        text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE")
+    )
+    # Move completed orders of the month out of the default partition
+    await conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            "WHERE complete_time >= :start AND complete_time < :end "
+            f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    await conn.execute(
+        text(
+            f'ALTER TABLE "order" ATTACH PARTITION {name} '
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        )
+    )
@@ -0,0 +1,558 @@
+"""
+The replica module - the in-memory replica of the `courier` table.
+
+Classes:
+    CourierColumns - the columnar storage of couriers with region and type
+    indexes.
+    CourierReplica - keeps a `CourierColumns` replica up to date with the
+    database.
+
+Functions:
+    install_courier_versioning - creates the version counter of couriers and
+    the triggers that maintain it and notify about changes.
+
+Notes:
+    Every transaction that writes couriers takes the next value of the
+    one-row counter `courier_version` and stamps it on the rows it writes.
+    The row lock on the counter is held until the commit, so writers of
+    couriers are serialized: versions have no gaps and are committed in
+    their order. After every statement the version is sent to the
+    `courier_changes` channel with `NOTIFY`.
+
+    The replica listens to the channel before loading the table, then
+    after every notification it reads the rows with versions above the last
+    applied one. A version more than one above the applied one is a gap,
+    e.g. notifications lost while the connection was down, and is filled by
+    the same query. The counter is also polled, so a lost notification
+    delays an update by the poll interval at most. While the replica is not
+    loaded or is disconnected, reads go to the database. Couriers are never
+    deleted by the service, deletions are not replicated.
+
+    The couriers read after the first load bump the `data_versions` of the
+    process, so the entity tags of couriers written by other processes
+    change too.
+"""
+
+import asyncio
+import logging
+import sys
+from array import array
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+import asyncpg
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.database.versions import data_versions
+from app.schemas.models.common import construct_many
+from app.schemas.models.couriers import CourierDto, CourierTypeEnum
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "courier_changes"
+APPLICATION_NAME = "lavka-courier-replica"
+VERSION_SETTING = "lavka.courier_version"
+COURIER_COLUMNS = "courier_id, courier_type, regions, working_hours, version"
+DTO_FIELDS = ("courier_id", "courier_type", "regions", "working_hours")
+COURIER_TYPES = list(CourierTypeEnum)
+TYPE_CODES = {
+    courier_type.value: code for code, courier_type in enumerate(COURIER_TYPES)
+}
+VERSIONING_DDL = (
+    "CREATE TABLE IF NOT EXISTS courier_version (version bigint NOT NULL)",
+    "INSERT INTO courier_version SELECT 0 "
+    "WHERE NOT EXISTS (SELECT FROM courier_version)",
+    "ALTER TABLE courier ADD COLUMN IF NOT EXISTS version bigint "
+    "NOT NULL DEFAULT 0",
+    f"""
+    CREATE OR REPLACE FUNCTION courier_set_version() RETURNS trigger AS $$
+    DECLARE
+        tx_version text := current_setting('{VERSION_SETTING}', true);
+    BEGIN
+        IF tx_version IS NULL OR tx_version = '' THEN
+            UPDATE courier_version SET version = version + 1
+            RETURNING version::text INTO tx_version;
+            PERFORM set_config('{VERSION_SETTING}', tx_version, true);
+        END IF;
+        NEW.version := tx_version::bigint;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION courier_notify() RETURNS trigger AS $$
+    DECLARE
+        tx_version text := current_setting('{VERSION_SETTING}', true);
+    BEGIN
+        IF tx_version <> '' THEN
+            PERFORM pg_notify('{CHANNEL}', tx_version);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+)
+TRIGGERS = {
+    "courier_set_version": "BEFORE INSERT OR UPDATE ON courier "
+    "FOR EACH ROW EXECUTE FUNCTION courier_set_version()",
+    "courier_notify": "AFTER INSERT OR UPDATE ON courier "
+    "FOR EACH STATEMENT EXECUTE FUNCTION courier_notify()",
+}
+
+replica_reads = metrics.ratio(
+    "courier_replica_read_ratio",
+    "Share of courier reads served by the in-memory replica",
+)
+replica_updates_total = metrics.counter(
+    "courier_replica_updates_total", "Courier rows applied to the replica"
+)
+replica_gaps_total = metrics.counter(
+    "courier_replica_gaps_total",
+    "Courier versions skipped by notifications and read from the database",
+)
+
+
+async def install_courier_versioning(conn: AsyncConnection) -> None:
+    """
+    Creates the version counter of couriers and its triggers if missing.
+
+    Rows of an older version of the table get version 0.
+    """
+    for statement in VERSIONING_DDL:
+        await conn.execute(text(statement))
+    for name, definition in TRIGGERS.items():
+        exists = await conn.scalar(
+            text(
+                "SELECT EXISTS (SELECT FROM pg_trigger WHERE tgname = :name "
+                "AND tgrelid = 'courier'::regclass)"
+            ),
+            {"name": name},
+        )
+        if not exists:
+            await conn.execute(text(f"CREATE TRIGGER {name} {definition}"))
+
+
+class CourierColumns:
+    """
+    Couriers stored column by column in typed arrays.
+
+    Courier IDs are kept sorted in `ids` with the number of the row of every
+    courier in `rows`, the other columns are indexed by row. Lists of
+    regions and of working hours of all the couriers are concatenated, a
+    row refers to its slice by its start and its length. A changed list is
+    appended and the old slice becomes garbage, collected once it takes more
+    than half of the values. Working hours are interned, the values are
+    indexes into the list of distinct intervals.
+
+    The region and the type indexes map every region and type to the sorted
+    IDs of its couriers.
+    """
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.rows = array("q")
+        self.versions = array("q")
+        self.types = array("b")
+        self.region_starts = array("q")
+        self.region_counts = array("I")
+        self.region_values = array("i")
+        self.hours_starts = array("q")
+        self.hours_counts = array("I")
+        self.hours_values = array("I")
+        self.hours: list[str] = []
+        self._hours_codes: dict[str, int] = {}
+        self._region_garbage = 0
+        self._hours_garbage = 0
+        self.by_region: dict[int, array] = {}
+        self.by_type = [array("q") for _ in COURIER_TYPES]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory taken by the arrays and the interned hours."""
+        arrays = [
+            self.ids,
+            self.rows,
+            self.versions,
+            self.types,
+            self.region_starts,
+            self.region_counts,
+            self.region_values,
+            self.hours_starts,
+            self.hours_counts,
+            self.hours_values,
+            *self.by_region.values(),
+            *self.by_type,
+        ]
+        return (
+            sum(column.itemsize * len(column) for column in arrays)
+            + sum(map(sys.getsizeof, self.hours))
+            + sys.getsizeof(self.hours)
+            + sys.getsizeof(self._hours_codes)
+        )
+
+    def upsert(
+        self,
+        courier_id: int,
+        courier_type: str,
+        regions: Iterable[int],
+        working_hours: Iterable[str],
+        version: int,
+    ) -> bool:
+        """
+        Adds a courier or replaces an older version of it.
+
+        Returns:
+            `True` if the courier was changed.
+        """
+        type_code = TYPE_CODES[courier_type]
+        regions = list(regions or ())
+        position = bisect_left(self.ids, courier_id)
+        if position < len(self.ids) and self.ids[position] == courier_id:
+            row = self.rows[position]
+            if self.versions[row] > version:
+                return False
+            self.versions[row] = version
+            self._move_type(courier_id, self.types[row], type_code)
+            self.types[row] = type_code
+            self._move_regions(courier_id, self._regions_of(row), regions)
+            self._region_garbage += self.region_counts[row]
+            self._hours_garbage += self.hours_counts[row]
+            self._set_lists(row, regions, working_hours)
+            self._collect_garbage()
+            return True
+        row = len(self.versions)
+        self.ids.insert(position, courier_id)
+        self.rows.insert(position, row)
+        self.versions.append(version)
+        self.types.append(type_code)
+        self.region_starts.append(0)
+        self.region_counts.append(0)
+        self.hours_starts.append(0)
+        self.hours_counts.append(0)
+        self._set_lists(row, regions, working_hours)
+        self._move_type(courier_id, None, type_code)
+        self._move_regions(courier_id, (), regions)
+        return True
+
+    def get(self, courier_id: int) -> Optional[CourierDto]:
+        position = bisect_left(self.ids, courier_id)
+        if position == len(self.ids) or self.ids[position] != courier_id:
+            return None
+        return self._to_dtos([position])[0]
+
+    def get_range(self, offset: int, limit: int) -> list[CourierDto]:
+        """Returns couriers ordered by ID like an `OFFSET`/`LIMIT` query."""
+        return self._to_dtos(range(offset, min(offset + limit, len(self.ids))))
+
+    def find(
+        self,
+        *,
+        region: Optional[int] = None,
+        courier_type: Optional[CourierTypeEnum] = None,
+    ) -> list[int]:
+        """
+        Finds couriers by region and type with the indexes.
+
+        Returns:
+            The sorted IDs of the couriers that work in the region and have
+            the type, all couriers if neither is given.
+        """
+        postings = []
+        if region is not None:
+            postings.append(self.by_region.get(region, array("q")))
+        if courier_type is not None:
+            postings.append(self.by_type[TYPE_CODES[courier_type.value]])
+        if not postings:
+            return self.ids.tolist()
+        # The shortest posting is looked up in the longer ones, a binary
+        # search is faster than a merge for postings of a type
+        postings.sort(key=len)
+        found = np.frombuffer(postings[0], dtype=np.int64)
+        for posting in postings[1:]:
+            ids = np.frombuffer(posting, dtype=np.int64)
+            if not len(found) or not len(ids):
+                return []
+            positions = np.searchsorted(ids, found).clip(max=len(ids) - 1)
+            found = found[ids[positions] == found]
+        return found.tolist()
+
+    def _intern_hours(self, interval: str) -> int:
+        code = self._hours_codes.get(interval)
+        if code is None:
+            code = self._hours_codes[interval] = len(self.hours)
+            self.hours.append(interval)
+        return code
+
+    def _regions_of(self, row: int) -> list[int]:
+        start = self.region_starts[row]
+        return self.region_values[start:start + self.region_counts[row]]
+
+    def _set_lists(
+        self, row: int, regions: list[int], working_hours: Iterable[str]
+    ) -> None:
+        self.region_starts[row] = len(self.region_values)
+        self.region_counts[row] = len(regions)
+        self.region_values.extend(regions)
+        codes = [
+            self._intern_hours(interval) for interval in working_hours or ()
+        ]
+        self.hours_starts[row] = len(self.hours_values)
+        self.hours_counts[row] = len(codes)
+        self.hours_values.extend(codes)
+
+    def _move_type(
+        self, courier_id: int, old: Optional[int], new: int
+    ) -> None:
+        if old == new:
+            return
+        if old is not None:
+            _discard(self.by_type[old], courier_id)
+        _add(self.by_type[new], courier_id)
+
+    def _move_regions(
+        self, courier_id: int, old: Iterable[int], new: Iterable[int]
+    ) -> None:
+        old, new = set(old), set(new)
+        for region in old - new:
+            _discard(self.by_region[region], courier_id)
+        for region in new - old:
+            _add(self.by_region.setdefault(region, array("q")), courier_id)
+
+    def _collect_garbage(self) -> None:
+        if self._region_garbage * 2 > len(self.region_values):
+            self.region_values = _compact(
+                self.region_values, self.region_starts, self.region_counts
+            )
+            self._region_garbage = 0
+        if self._hours_garbage * 2 > len(self.hours_values):
+            self.hours_values = _compact(
+                self.hours_values, self.hours_starts, self.hours_counts
+            )
+            self._hours_garbage = 0
+
+    def _to_dtos(self, positions: Iterable[int]) -> list[CourierDto]:
+        rows = []
+        for position in positions:
+            row = self.rows[position]
+            start = self.hours_starts[row]
+            hours = self.hours_values[start:start + self.hours_counts[row]]
+            rows.append(
+                (
+                    self.ids[position],
+                    COURIER_TYPES[self.types[row]],
+                    self._regions_of(row).tolist(),
+                    [self.hours[code] for code in hours],
+                )
+            )
+        return construct_many(CourierDto, DTO_FIELDS, rows)
+
+
+def _add(posting: array, courier_id: int) -> None:
+    if not posting or posting[-1] < courier_id:
+        posting.append(courier_id)
+    else:
+        insort(posting, courier_id)
+
+
+def _discard(posting: array, courier_id: int) -> None:
+    position = bisect_left(posting, courier_id)
+    if position < len(posting) and posting[position] == courier_id:
+        del posting[position]
+
+
+def _compact(values: array, starts: array, counts: array) -> array:
+    compacted = array(values.typecode)
+    for row, count in enumerate(counts):
+        start = starts[row]
+        starts[row] = len(compacted)
+        compacted.extend(values[start:start + count])
+    return compacted
+
+
+class CourierReplica:
+    """
+    The in-memory replica of couriers kept fresh with LISTEN/NOTIFY.
+
+    Attributes:
+        columns: The replicated couriers.
+        version: The last version applied, `None` before the first load.
+        poll_interval_s: The interval of checking for missed changes.
+        reconnect_delay_s: The delay before reconnecting to the database.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        poll_interval_s: float = 5.0,
+        reconnect_delay_s: float = 1.0,
+    ) -> None:
+        # asyncpg accepts the URL of the engine without the dialect
+        self._dsn = make_url(database_url).set(drivername="postgresql")
+        self.poll_interval_s = poll_interval_s
+        self.reconnect_delay_s = reconnect_delay_s
+        self.columns = CourierColumns()
+        self.version: Optional[int] = None
+        self._notified_version = 0
+        self._connected = False
+        self._changed = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether reads may be served by the replica."""
+        return self._connected and self.version is not None
+
+    def start(self) -> None:
+        """Starts loading the replica and following the changes."""
+        if self._worker is None:
+            self._changed = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops following the changes."""
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    def get(self, courier_id: int) -> Optional[CourierDto]:
+        """
+        Gets a courier if the replica is ready.
+
+        Returns:
+            The courier, `None` if the replica is not ready or the courier
+            is not replicated, it may be too new.
+        """
+        courier = self.columns.get(courier_id) if self.ready else None
+        replica_reads.observe(courier is not None)
+        return courier
+
+    def get_range(self, offset: int, limit: int) -> Optional[list[CourierDto]]:
+        """
+        Gets couriers ordered by ID if the replica is ready.
+
+        Returns:
+            The couriers, `None` if the replica is not ready.
+        """
+        replica_reads.observe(self.ready)
+        return self.columns.get_range(offset, limit) if self.ready else None
+
+    def apply(self, courier: CourierDto, version: int) -> None:
+        """
+        Applies a courier written by this process before its notification
+        arrives, so that the process reads its own writes.
+
+        Parameters:
+            courier: The committed courier.
+            version: The version the courier was committed with.
+        """
+        if self._worker is None:
+            return
+        self._upsert(
+            courier.courier_id,
+            CourierTypeEnum(courier.courier_type).value,
+            courier.regions,
+            courier.working_hours,
+            version,
+        )
+
+    def _upsert(self, *row) -> None:
+        if self.columns.upsert(*row):
+            replica_updates_total.inc()
+
+    def _on_notify(
+        self, connection: asyncpg.Connection, pid: int, channel: str, payload
+    ) -> None:
+        version = int(payload)
+        if self.version is not None and (
+            version > max(self._notified_version, self.version) + 1
+        ):
+            replica_gaps_total.inc()
+        self._notified_version = max(self._notified_version, version)
+        if self.version is None or version > self.version:
+            self._changed.set()
+
+    def _on_termination(self, connection: asyncpg.Connection) -> None:
+        # Reads go to the database until the replica catches up again
+        self._connected = False
+        self._changed.set()
+
+    async def _run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    self._dsn.render_as_string(hide_password=False),
+                    server_settings={"application_name": APPLICATION_NAME},
+                )
+                connection.add_termination_listener(self._on_termination)
+                # Listen first, no change made during the load is missed
+                await connection.add_listener(CHANNEL, self._on_notify)
+                await self._catch_up(connection)
+                self._connected = True
+                while True:
+                    try:
+                        await asyncio.wait_for(
+                            self._changed.wait(), self.poll_interval_s
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    self._changed.clear()
+                    await self._catch_up(connection)
+            except (
+                OSError,
+                asyncpg.PostgresError,
+                asyncpg.InterfaceError,
+            ) as error:
+                logger.warning("Courier replica disconnected: %s", error)
+            finally:
+                self._connected = False
+                if connection is not None:
+                    connection.terminate()
+            await asyncio.sleep(self.reconnect_delay_s)
+
+    async def _catch_up(self, connection: asyncpg.Connection) -> None:
+        # The counter and the rows are read from one snapshot, every
+        # version up to the counter is committed and visible in it
+        async with connection.transaction(
+            isolation="repeatable_read", readonly=True
+        ):
+            version = await connection.fetchval(
+                "SELECT version FROM courier_version"
+            )
+            if version == self.version:
+                return
+            query = f"SELECT {COURIER_COLUMNS} FROM courier"
+            args = ()
+            if self.version is not None:
+                if version > self.version + 1:
+                    logger.info(
+                        "Courier replica reads versions %d to %d",
+                        self.version + 1,
+                        version,
+                    )
+                query += " WHERE version > $1"
+                args = (self.version,)
+            cursor = connection.cursor(
+                query + " ORDER BY courier_id", *args, prefetch=10_000
+            )
+            changed = []
+            async for row in cursor:
+                self._upsert(*row)
+                changed.append(row[0])
+        if self.version is not None:
+            data_versions.bump(courier_ids=changed)
+        self.version = version
+
+
+courier_replica = CourierReplica(
+    settings.SQLALCHEMY_DATABASE_URI,
+    poll_interval_s=settings.COURIER_REPLICA_POLL_INTERVAL_S,
+)
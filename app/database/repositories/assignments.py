@@ -0,0 +1,464 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import (Result, Select, any_, bindparam, delete, exists, func,
+                        insert, or_, select, update)
+from sqlalchemy.dialects.postgresql import ARRAY, BIGINT
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.operators import eq
+
+from app.assignment.plan import (DayPlan, DeliveryGroup, PlanningCourier,
+                                 PlanningOrder, parse_intervals)
+from app.assignment.simulator import delivery_sequence
+from app.database.change_feed import ChangeEvent, assignment_event, change_feed
+from app.database.models.assignment import AssignmentDB
+from app.database.models.assignment_order import assignment_order_table
+from app.database.models.courier import CourierDB
+from app.database.models.delivery_group import DeliveryGroupDB
+from app.database.models.order import OrderDB, group_order_id_seq
+from app.database.models.order_slot import order_slot_table
+from app.database.repositories.base import BaseRepository
+from app.database.versions import data_versions
+from app.schemas.models.couriers import CourierTypeEnum
+
+# The first key of the advisory locks serializing the writers of a day plan
+DAY_PLAN_LOCK = 1034
+GROUP_COPY_COLUMNS = (
+    "group_id",
+    "assignment_id",
+    "start_minute",
+    "end_minute",
+    "cost",
+)
+LINK_COPY_COLUMNS = ("assignment_id", "order_id")
+ASSIGN_ORDERS_QUERY = (
+    'UPDATE "order" SET courier_id = plan.courier_id, '
+    "group_order_id = plan.group_order_id "
+    "FROM unnest($1::bigint[], $2::bigint[], $3::bigint[]) "
+    "AS plan (order_id, courier_id, group_order_id) "
+    'WHERE "order".order_id = plan.order_id '
+    'AND "order".complete_time IS NULL'
+)
+
+
+class AssignmentsRepository(BaseRepository):
+    def __init__(self, conn: AsyncSession) -> None:
+        super().__init__(conn)
+
+    async def get_planning_couriers(
+        self, *, courier_ids: Optional[list[int]] = None
+    ) -> list[PlanningCourier]:
+        query = select(
+            CourierDB.courier_id,
+            CourierDB.courier_type,
+            CourierDB.regions,
+            CourierDB.working_hours,
+        )
+        if courier_ids is not None:
+            query = query.where(
+                eq(
+                    CourierDB.courier_id,
+                    any_(bindparam("courier_ids", courier_ids, ARRAY(BIGINT))),
+                )
+            )
+        result: Result = await self.connection.execute(query)
+        return [
+            PlanningCourier(
+                courier_id=courier_id,
+                courier_type=CourierTypeEnum(courier_type),
+                regions=frozenset(regions or ()),
+                shifts=parse_intervals(working_hours),
+            )
+            for courier_id, courier_type, regions, working_hours in result
+        ]
+
+    async def get_planning_orders(
+        self, *, replace_date: Optional[date] = None
+    ) -> list[PlanningOrder]:
+        # Распределяются только незавершенные заказы без курьера, при замене
+        # плана дня также его незавершенные заказы
+        free = eq(OrderDB.courier_id, None)
+        if replace_date:
+            free = or_(
+                free,
+                OrderDB.order_id.in_(self._day_plan_order_ids(replace_date)),
+            )
+        result: Result = await self.connection.execute(
+            select(
+                OrderDB.order_id,
+                OrderDB.weight,
+                OrderDB.regions,
+                OrderDB.cost,
+                OrderDB.delivery_hours,
+            ).where(free, eq(OrderDB.complete_time, None))
+        )
+        return self._planning_orders(result)
+
+    async def get_candidate_orders(
+        self, *, region: int, slot: int
+    ) -> list[PlanningOrder]:
+        # Корзина кандидатов читается по первичному ключу order_slot, в ней
+        # только незавершенные заказы, назначенные курьерам исключаются
+        result: Result = await self.connection.execute(
+            select(
+                OrderDB.order_id,
+                OrderDB.weight,
+                OrderDB.regions,
+                OrderDB.cost,
+                OrderDB.delivery_hours,
+            )
+            .join(
+                order_slot_table,
+                eq(order_slot_table.c.order_id, OrderDB.order_id),
+            )
+            .where(
+                eq(order_slot_table.c.region, region),
+                eq(order_slot_table.c.slot, slot),
+                eq(OrderDB.courier_id, None),
+                eq(OrderDB.complete_time, None),
+            )
+        )
+        return self._planning_orders(result)
+
+    async def get_saved_day_plan(
+        self, *, assignment_date: date
+    ) -> tuple[list[PlanningCourier], list[PlanningOrder], DayPlan]:
+        """
+        Loads the saved plan of a day for a simulation.
+
+        The orders of the groups are put in their delivery order by
+        `delivery_sequence`, it is not stored. The orders that are not
+        assigned at the moment are reported as the unassigned orders of
+        the plan.
+
+        Parameters:
+            assignment_date: The day of the plan.
+
+        Returns:
+            The couriers of the plan, the orders of the plan and the
+            unassigned ones, and the plan with its groups ordered by
+            courier and start.
+        """
+        result: Result = await self.connection.execute(
+            select(
+                DeliveryGroupDB.group_id,
+                AssignmentDB.courier_id,
+                DeliveryGroupDB.start_minute,
+                DeliveryGroupDB.end_minute,
+                DeliveryGroupDB.cost,
+                OrderDB.order_id,
+                OrderDB.weight,
+                OrderDB.regions,
+                OrderDB.cost,
+                OrderDB.delivery_hours,
+            )
+            .select_from(DeliveryGroupDB)
+            .join(
+                AssignmentDB,
+                eq(AssignmentDB.assignment_id, DeliveryGroupDB.assignment_id),
+            )
+            .join(
+                OrderDB, eq(OrderDB.group_order_id, DeliveryGroupDB.group_id)
+            )
+            .where(eq(AssignmentDB.assignment_date, assignment_date))
+            .order_by(
+                AssignmentDB.courier_id,
+                DeliveryGroupDB.start_minute,
+                DeliveryGroupDB.group_id,
+            )
+        )
+        groups: dict[int, tuple[DeliveryGroup, list[PlanningOrder]]] = {}
+        for (
+            group_id,
+            courier_id,
+            start_minute,
+            end_minute,
+            group_cost,
+            *order,
+        ) in result:
+            if group_id not in groups:
+                group = DeliveryGroup(
+                    courier_id=courier_id,
+                    start_minute=start_minute,
+                    end_minute=end_minute,
+                    order_ids=[],
+                    cost=group_cost,
+                    group_id=group_id,
+                )
+                groups[group_id] = (group, [])
+            order_id, weight, region, cost, delivery_hours = order
+            groups[group_id][1].append(
+                PlanningOrder(
+                    order_id=order_id,
+                    weight=weight,
+                    region=region,
+                    cost=cost,
+                    windows=parse_intervals(delivery_hours),
+                )
+            )
+        plan, orders = DayPlan(), await self.get_planning_orders()
+        plan.unassigned_order_ids = [order.order_id for order in orders]
+        for group, group_orders in groups.values():
+            group_orders = delivery_sequence(group_orders)
+            group.order_ids = [order.order_id for order in group_orders]
+            plan.groups.append(group)
+            orders.extend(group_orders)
+        couriers = await self.get_planning_couriers(
+            courier_ids=sorted({group.courier_id for group in plan.groups})
+        )
+        return couriers, orders, plan
+
+    async def save_day_plan(
+        self, *, assignment_date: date, plan: DayPlan, replace: bool = False
+    ) -> DayPlan:
+        """
+        Persists the delivery groups of a plan in one transaction.
+
+        The groups and the links of their orders are written with `COPY`
+        and the orders are updated by one statement, so the number of
+        round trips does not depend on the size of the plan. Writers of
+        the same day are serialized.
+
+        Groups with orders taken by a concurrent writer since the plan was
+        made are not saved, their orders are reported as unassigned.
+
+        Parameters:
+            assignment_date: The day the plan is made for.
+            plan: The plan to save.
+            replace: Whether to release the open orders of the saved plan
+                of the day first. Readers see either the old or the new
+                plan, never a mix of them.
+
+        Returns:
+            The plan that was actually saved.
+        """
+        await self.connection.execute(
+            select(
+                func.pg_advisory_xact_lock(
+                    DAY_PLAN_LOCK, assignment_date.toordinal()
+                )
+            )
+        )
+        changed_courier_ids = set()
+        if replace:
+            changed_courier_ids.update(
+                await self._release_day_plan(assignment_date)
+            )
+        order_ids = [
+            order_id for group in plan.groups for order_id in group.order_ids
+        ]
+        # Заблокировать заказы, которые все еще свободны
+        result: Result = await self.connection.execute(
+            select(OrderDB.order_id)
+            .where(
+                eq(
+                    OrderDB.order_id,
+                    any_(bindparam("order_ids", order_ids, ARRAY(BIGINT))),
+                ),
+                eq(OrderDB.courier_id, None),
+                eq(OrderDB.complete_time, None),
+            )
+            .with_for_update()
+        )
+        free_order_ids = set(result.scalars())
+        saved = DayPlan(unassigned_order_ids=list(plan.unassigned_order_ids))
+        for group in plan.groups:
+            if free_order_ids.issuperset(group.order_ids):
+                saved.groups.append(group)
+            else:
+                saved.unassigned_order_ids.extend(
+                    order_id
+                    for order_id in group.order_ids
+                    if order_id in free_order_ids
+                )
+        saved.unassigned_order_ids.sort()
+        if not saved.groups:
+            events = self._day_plan_events(
+                assignment_date, changed_courier_ids, saved.groups
+            )
+            await change_feed.notify(self.connection, events)
+            await self.connection.commit()
+            data_versions.bump(
+                courier_ids=changed_courier_ids,
+                assignment_dates=[assignment_date] if replace else [],
+            )
+            change_feed.publish(events)
+            return saved
+        assignment_ids = await self._get_assignment_ids(
+            assignment_date, {group.courier_id for group in saved.groups}
+        )
+        result = await self.connection.execute(
+            select(group_order_id_seq.next_value()).select_from(
+                func.generate_series(1, len(saved.groups))
+            )
+        )
+        group_ids = result.scalars().all()
+        groups, links, updates = [], [], ([], [], [])
+        for group, group_id in zip(saved.groups, group_ids):
+            assignment_id = assignment_ids[group.courier_id]
+            groups.append(
+                (
+                    group_id,
+                    assignment_id,
+                    group.start_minute,
+                    group.end_minute,
+                    group.cost,
+                )
+            )
+            for order_id in group.order_ids:
+                links.append((assignment_id, order_id))
+                updates[0].append(order_id)
+                updates[1].append(group.courier_id)
+                updates[2].append(group_id)
+        driver_connection = await self._get_driver_connection()
+        await driver_connection.copy_records_to_table(
+            DeliveryGroupDB.__tablename__,
+            records=groups,
+            columns=GROUP_COPY_COLUMNS,
+        )
+        await driver_connection.copy_records_to_table(
+            assignment_order_table.name,
+            records=links,
+            columns=LINK_COPY_COLUMNS,
+        )
+        await driver_connection.execute(ASSIGN_ORDERS_QUERY, *updates)
+        changed_courier_ids.update(assignment_ids)
+        events = self._day_plan_events(
+            assignment_date, changed_courier_ids, saved.groups
+        )
+        await change_feed.notify(self.connection, events)
+        await self.connection.commit()
+        data_versions.bump(
+            courier_ids=changed_courier_ids, assignment_dates=[assignment_date]
+        )
+        change_feed.publish(events)
+        return saved
+
+    @staticmethod
+    def _day_plan_events(
+        assignment_date: date,
+        courier_ids: set[int],
+        groups: list[DeliveryGroup],
+    ) -> list[ChangeEvent]:
+        # Событие на каждого курьера, чье назначение изменилось, с
+        # назначенными ему заказами
+        order_ids = {courier_id: [] for courier_id in sorted(courier_ids)}
+        for group in groups:
+            order_ids[group.courier_id].extend(group.order_ids)
+        return [
+            assignment_event(courier_id, assignment_date, courier_order_ids)
+            for courier_id, courier_order_ids in order_ids.items()
+        ]
+
+    async def _release_day_plan(self, assignment_date: date) -> list[int]:
+        # Курьеры, чьи заказы возвращаются в распределение
+        result: Result = await self.connection.execute(
+            select(OrderDB.courier_id)
+            .where(
+                OrderDB.order_id.in_(
+                    self._day_plan_order_ids(assignment_date)
+                ),
+                eq(OrderDB.complete_time, None),
+            )
+            .distinct()
+        )
+        courier_ids = result.scalars().all()
+        # Вернуть незавершенные заказы плана дня в распределение
+        result = await self.connection.execute(
+            update(OrderDB.__table__)
+            .where(
+                OrderDB.__table__.c.order_id.in_(
+                    self._day_plan_order_ids(assignment_date)
+                ),
+                OrderDB.__table__.c.complete_time.is_(None),
+            )
+            .values(courier_id=None, group_order_id=None)
+            .returning(OrderDB.__table__.c.order_id)
+        )
+        released_ids = result.scalars().all()
+        day_assignment_ids = select(AssignmentDB.assignment_id).where(
+            eq(AssignmentDB.assignment_date, assignment_date)
+        )
+        await self.connection.execute(
+            delete(assignment_order_table).where(
+                assignment_order_table.c.assignment_id.in_(day_assignment_ids),
+                eq(
+                    assignment_order_table.c.order_id,
+                    any_(
+                        bindparam("released_ids", released_ids, ARRAY(BIGINT))
+                    ),
+                ),
+            )
+        )
+        # Группы с завершенными заказами остаются в истории
+        await self.connection.execute(
+            delete(DeliveryGroupDB).where(
+                DeliveryGroupDB.assignment_id.in_(day_assignment_ids),
+                ~exists().where(
+                    eq(OrderDB.group_order_id, DeliveryGroupDB.group_id)
+                ),
+            )
+        )
+        return courier_ids
+
+    @staticmethod
+    def _day_plan_order_ids(assignment_date: date) -> Select:
+        return (
+            select(assignment_order_table.c.order_id)
+            .join(
+                AssignmentDB,
+                eq(
+                    AssignmentDB.assignment_id,
+                    assignment_order_table.c.assignment_id,
+                ),
+            )
+            .where(eq(AssignmentDB.assignment_date, assignment_date))
+        )
+
+    async def _get_assignment_ids(
+        self, assignment_date: date, courier_ids: set[int]
+    ) -> dict[int, int]:
+        # Использовать существующие назначения курьеров на эту дату
+        result: Result = await self.connection.execute(
+            select(AssignmentDB.courier_id, AssignmentDB.assignment_id).where(
+                eq(AssignmentDB.assignment_date, assignment_date),
+                eq(
+                    AssignmentDB.courier_id,
+                    any_(
+                        bindparam(
+                            "courier_ids", list(courier_ids), ARRAY(BIGINT)
+                        )
+                    ),
+                ),
+            )
+        )
+        assignment_ids = dict(result.all())
+        missing = sorted(courier_ids - assignment_ids.keys())
+        if missing:
+            result = await self.connection.execute(
+                insert(AssignmentDB).returning(
+                    AssignmentDB.courier_id, AssignmentDB.assignment_id
+                ),
+                [
+                    {
+                        "assignment_date": assignment_date,
+                        "courier_id": courier_id,
+                    }
+                    for courier_id in missing
+                ],
+            )
+            assignment_ids.update(result.all())
+        return assignment_ids
+
+    @staticmethod
+    def _planning_orders(result: Result) -> list[PlanningOrder]:
+        return [
+            PlanningOrder(
+                order_id=order_id,
+                weight=weight,
+                region=region,
+                cost=cost,
+                windows=parse_intervals(delivery_hours),
+            )
+            for order_id, weight, region, cost, delivery_hours in result
+        ]
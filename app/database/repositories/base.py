@@ -6,6 +6,7 @@ The `connection` property provides a way to get the current connection to the da
 This can be used to execute queries and perform other database operations.
 """
 
+import asyncpg
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -38,3 +39,10 @@ class BaseRepository:
             The connection to the database.
         """
         return self._conn
+
+    async def _get_driver_connection(self) -> asyncpg.Connection:
+        # Соединение драйвера участвует в уже открытой транзакции сессии,
+        # через него доступны COPY и подготовленные запросы asyncpg
+        connection = await self.connection.connection()
+        raw_connection = await connection.get_raw_connection()
+        return raw_connection.driver_connection
@@ -1,17 +1,21 @@
 from collections import defaultdict
 from datetime import datetime
+from typing import AsyncIterator, Optional
 
-from sqlalchemy import Result, select
+from sqlalchemy import Result, Row, and_, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, BIGINT
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql.operators import eq
+from sqlalchemy.sql.operators import eq, ge, gt, lt
 
 from app.database.error import NotFoundInDBError
 from app.database.models.assignment import AssignmentDB
 from app.database.models.assignment_order import assignment_order_table
 from app.database.models.courier import CourierDB
 from app.database.models.order import OrderDB
+from app.database.replica import courier_replica
 from app.database.repositories.base import BaseRepository
 from app.database.repositories.orders import OrdersRepository
+from app.database.versions import data_versions
 from app.schemas.models.couriers import CourierDto, CreateCourierDto
 from app.schemas.models.orders import CouriersGroupOrders, GroupOrders, OrderDto
 
@@ -32,12 +36,21 @@ class CouriersRepository(BaseRepository):
             self.connection.add(new_courier)
             await self.connection.commit()
             await self.connection.refresh(new_courier)
-            couriers_dto.append(
-                await self._get_courier_from_db_row(new_courier)
-            )
+            courier = await self._get_courier_from_db_row(new_courier)
+            # The process reads its own writes before the notification
+            courier_replica.apply(courier, new_courier.version)
+            couriers_dto.append(courier)
+        data_versions.bump(
+            courier_ids=[courier.courier_id for courier in couriers_dto]
+        )
         return couriers_dto
 
     async def get_courier(self, *, courier_id: int) -> CourierDto:
+        # A courier missing in the replica may be committed by another
+        # process after the last applied version, it is read from the DB
+        courier = courier_replica.get(courier_id)
+        if courier is not None:
+            return courier
         result: Result = await self.connection.execute(
             select(CourierDB).where(eq(CourierDB.courier_id, courier_id))
         )
@@ -49,11 +62,60 @@ class CouriersRepository(BaseRepository):
         courier: CourierDto = await self._get_courier_from_db_row(courier_row)
         return courier
 
+    async def get_couriers_by_ids(
+        self, *, courier_ids: list[int]
+    ) -> tuple[list[CourierDto], list[int]]:
+        # Курьеры, которых нет в реплике, читаются из БД одним запросом,
+        # ответ и отсутствующие ID возвращаются в порядке запроса
+        couriers = {}
+        for courier_id in courier_ids:
+            courier = courier_replica.get(courier_id)
+            if courier is not None:
+                couriers[courier_id] = courier
+        not_replicated = [
+            courier_id
+            for courier_id in courier_ids
+            if courier_id not in couriers
+        ]
+        if not_replicated:
+            result: Result = await self.connection.execute(
+                select(CourierDB).where(
+                    eq(
+                        CourierDB.courier_id,
+                        any_(
+                            bindparam(
+                                "courier_ids", not_replicated, ARRAY(BIGINT)
+                            )
+                        ),
+                    )
+                )
+            )
+            for courier_row in result.scalars().all():
+                courier = await self._get_courier_from_db_row(courier_row)
+                couriers[courier.courier_id] = courier
+        found = [
+            couriers[courier_id]
+            for courier_id in courier_ids
+            if courier_id in couriers
+        ]
+        missing_ids = [
+            courier_id
+            for courier_id in courier_ids
+            if courier_id not in couriers
+        ]
+        return found, missing_ids
+
     async def get_couriers_in_range(
         self, *, limit: int, offset: int
     ) -> list[CourierDto]:
+        couriers = courier_replica.get_range(offset, limit)
+        if couriers is not None:
+            return couriers
         result: Result = await self.connection.execute(
-            select(CourierDB).offset(offset).limit(limit)
+            select(CourierDB)
+            .order_by(CourierDB.courier_id)
+            .offset(offset)
+            .limit(limit)
         )
         courier_rows = result.scalars().all()
         orders = [
@@ -69,16 +131,116 @@ class CouriersRepository(BaseRepository):
             courier_id=courier_id, start_date=start_date, end_date=end_date
         )
 
+    async def iter_couriers_order_stats(
+        self,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        courier_ids: Optional[list[int]],
+        offset: int,
+        limit: Optional[int],
+        page_size: int,
+    ) -> AsyncIterator[list[Row]]:
+        """
+        Counts the completed orders of couriers and sums their cost.
+
+        Couriers are read in pages ordered by ID, every page is one grouped
+        aggregate query over the couriers of the page.
+
+        Parameters:
+            start_date: The start of the range, inclusive.
+            end_date: The end of the range, exclusive.
+            courier_ids: The couriers to count orders of, all couriers if
+                not given. Unknown IDs are skipped.
+            offset: The number of couriers to skip.
+            limit: The maximum number of couriers, all if not given.
+            page_size: The number of couriers per query.
+
+        Yields:
+            Lists of rows with `courier_id`, `courier_type`, `regions`,
+            `working_hours`, `orders_count` and `cost_sum`.
+        """
+        last_courier_id = None
+        while limit is None or limit > 0:
+            conditions = []
+            if courier_ids is not None:
+                conditions.append(
+                    eq(
+                        CourierDB.courier_id,
+                        any_(
+                            bindparam(
+                                "courier_ids", courier_ids, ARRAY(BIGINT)
+                            )
+                        ),
+                    )
+                )
+            # Keyset pagination after the first page
+            if last_courier_id is not None:
+                conditions.append(gt(CourierDB.courier_id, last_courier_id))
+            page = (
+                select(
+                    CourierDB.courier_id,
+                    CourierDB.courier_type,
+                    CourierDB.regions,
+                    CourierDB.working_hours,
+                )
+                .where(*conditions)
+                .order_by(CourierDB.courier_id)
+                .offset(offset if last_courier_id is None else 0)
+                .limit(page_size if limit is None else min(page_size, limit))
+                .subquery()
+            )
+            result: Result = await self.connection.execute(
+                select(
+                    page,
+                    func.count(OrderDB.order_id).label("orders_count"),
+                    func.coalesce(func.sum(OrderDB.cost), 0).label("cost_sum"),
+                )
+                .select_from(page)
+                .outerjoin(
+                    OrderDB,
+                    and_(
+                        eq(OrderDB.courier_id, page.c.courier_id),
+                        ge(OrderDB.complete_time, start_date),
+                        lt(OrderDB.complete_time, end_date),
+                    ),
+                )
+                .group_by(*page.c)
+                .order_by(page.c.courier_id)
+            )
+            rows = result.all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            last_courier_id = rows[-1].courier_id
+            if limit is not None:
+                limit -= len(rows)
+
     async def get_couriers_assignments(
         self, date: datetime.date, courier_id: int | None
     ):
         # Join orders with assignments where date is correct and select OrderDB
         query = select(OrderDB).select_from(
-            assignment_order_table.join(OrderDB).join(
-                AssignmentDB, onclause=eq(AssignmentDB.assignment_date, date)
+            assignment_order_table.join(
+                OrderDB,
+                onclause=eq(
+                    OrderDB.order_id, assignment_order_table.c.order_id
+                ),
+            ).join(
+                AssignmentDB,
+                onclause=and_(
+                    eq(
+                        AssignmentDB.assignment_id,
+                        assignment_order_table.c.assignment_id,
+                    ),
+                    eq(AssignmentDB.assignment_date, date),
+                ),
             )
         )
-        # Where clause to take courier with given id if given
+        # Where clause to take courier with given id if given, the condition
+        # on complete_time limits the scan to the partition of open orders
         where_conditions = [eq(OrderDB.complete_time, None)]
         if courier_id:
             where_conditions.append(eq(OrderDB.courier_id, courier_id))
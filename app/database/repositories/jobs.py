@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import Result, and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.operators import eq
+
+from app.database.error import ConflictWithRequestDBError, NotFoundInDBError
+from app.database.models.job import ACTIVE_JOB_STATUSES, JobDB
+from app.database.repositories.base import BaseRepository
+from app.schemas.models.jobs import JobDto, JobStatusEnum
+
+
+class JobsRepository(BaseRepository):
+    def __init__(self, conn: AsyncSession) -> None:
+        super().__init__(conn)
+
+    async def enqueue_job(
+        self, *, kind: str, dedup_key: str, params: dict[str, Any]
+    ) -> JobDto:
+        """
+        Creates a pending job unless the same work is already queued.
+
+        Returns:
+            The new job, or the active job with the same kind and key.
+        """
+        # Partial unique index allows only one active job per key, a
+        # concurrent enqueue of the same work gets the existing job
+        result: Result = await self.connection.execute(
+            insert(JobDB)
+            .values(kind=kind, dedup_key=dedup_key, params=params)
+            .on_conflict_do_nothing(
+                index_elements=[JobDB.kind, JobDB.dedup_key],
+                index_where=JobDB.status.in_(ACTIVE_JOB_STATUSES),
+            )
+            .returning(JobDB)
+        )
+        job_row: JobDB | None = result.scalars().one_or_none()
+        if job_row is None:
+            result = await self.connection.execute(
+                select(JobDB).where(
+                    eq(JobDB.kind, kind),
+                    eq(JobDB.dedup_key, dedup_key),
+                    JobDB.status.in_(ACTIVE_JOB_STATUSES),
+                )
+            )
+            job_row = result.scalars().one()
+        job = self._get_job_from_db_row(job_row)
+        await self.connection.commit()
+        return job
+
+    async def get_job(self, *, job_id: int, kind: str) -> JobDto:
+        return self._get_job_from_db_row(await self._get_job_row(job_id, kind))
+
+    async def cancel_job(self, *, job_id: int, kind: str) -> JobDto:
+        """
+        Cancels a pending job or asks a running one to stop.
+
+        Raises:
+            NotFoundInDBError: If there is no such job.
+            ConflictWithRequestDBError: If the job is already finished.
+        """
+        job_row = await self._get_job_row(job_id, kind, for_update=True)
+        if job_row.status not in ACTIVE_JOB_STATUSES:
+            raise ConflictWithRequestDBError(
+                message=f"Job {job_id} is already {job_row.status}"
+            )
+        job_row.cancel_requested = True
+        if job_row.status == JobStatusEnum.pending.value:
+            job_row.status = JobStatusEnum.cancelled.value
+            job_row.finished_at = datetime.now(timezone.utc)
+        await self.connection.flush()
+        job = self._get_job_from_db_row(job_row)
+        await self.connection.commit()
+        return job
+
+    async def claim_next_job(
+        self, *, kinds: list[str], stale_after: timedelta, max_attempts: int
+    ) -> Optional[JobDto]:
+        """
+        Takes the oldest job to run.
+
+        Jobs whose worker stopped sending heartbeats, e.g. because the
+        service was restarted, are taken again until they run out of
+        attempts.
+
+        Returns:
+            The claimed job, or `None` if there is nothing to run.
+        """
+        now = datetime.now(timezone.utc)
+        result: Result = await self.connection.execute(
+            select(JobDB)
+            .where(
+                JobDB.kind.in_(kinds),
+                or_(
+                    eq(JobDB.status, JobStatusEnum.pending.value),
+                    and_(
+                        eq(JobDB.status, JobStatusEnum.running.value),
+                        JobDB.heartbeat_at < now - stale_after,
+                    ),
+                ),
+            )
+            .order_by(JobDB.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job_row: JobDB | None = result.scalars().one_or_none()
+        if job_row is None:
+            await self.connection.rollback()
+            return None
+        if job_row.attempts >= max_attempts:
+            job_row.status = JobStatusEnum.failed.value
+            job_row.error = "The job was interrupted too many times"
+            job_row.finished_at = now
+            await self.connection.commit()
+            return await self.claim_next_job(
+                kinds=kinds, stale_after=stale_after, max_attempts=max_attempts
+            )
+        job_row.status = JobStatusEnum.running.value
+        job_row.attempts += 1
+        job_row.progress = 0
+        job_row.started_at = job_row.heartbeat_at = now
+        await self.connection.flush()
+        job = self._get_job_from_db_row(job_row)
+        await self.connection.commit()
+        return job
+
+    async def heartbeat_job(
+        self, *, job_id: int, attempts: int, progress: float
+    ) -> bool:
+        """
+        Records the progress of a running job.
+
+        The job is identified by its id and the number of the attempt it was
+        claimed with: a job that went stale and was claimed again belongs to
+        the new attempt.
+
+        Returns:
+            Whether the job was asked to stop or was taken by another
+            attempt.
+        """
+        result: Result = await self.connection.execute(
+            update(JobDB)
+            .where(*self._claimed_by(job_id, attempts))
+            .values(progress=progress, heartbeat_at=datetime.now(timezone.utc))
+            .returning(JobDB.cancel_requested)
+        )
+        cancel_requested = result.scalar_one_or_none()
+        await self.connection.commit()
+        return cancel_requested is None or cancel_requested
+
+    async def release_job(self, *, job_id: int, attempts: int) -> None:
+        """Returns a running job to the queue without using an attempt."""
+        await self.connection.execute(
+            update(JobDB)
+            .where(*self._claimed_by(job_id, attempts))
+            .values(
+                status=JobStatusEnum.pending.value,
+                attempts=JobDB.attempts - 1,
+                progress=0,
+                heartbeat_at=None,
+            )
+        )
+        await self.connection.commit()
+
+    async def finish_job(
+        self,
+        *,
+        job_id: int,
+        attempts: int,
+        status: JobStatusEnum,
+        result: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        values = {
+            "status": status.value,
+            "result": result,
+            "error": error,
+            "finished_at": datetime.now(timezone.utc),
+        }
+        if status == JobStatusEnum.succeeded.value:
+            values["progress"] = 1
+        # A job claimed again by another attempt is not overwritten
+        await self.connection.execute(
+            update(JobDB)
+            .where(*self._claimed_by(job_id, attempts))
+            .values(**values)
+        )
+        await self.connection.commit()
+
+    @staticmethod
+    def _claimed_by(job_id: int, attempts: int) -> tuple:
+        return (
+            eq(JobDB.job_id, job_id),
+            eq(JobDB.status, JobStatusEnum.running.value),
+            eq(JobDB.attempts, attempts),
+        )
+
+    async def _get_job_row(
+        self, job_id: int, kind: str, for_update: bool = False
+    ) -> JobDB:
+        query = select(JobDB).where(
+            eq(JobDB.job_id, job_id), eq(JobDB.kind, kind)
+        )
+        if for_update:
+            query = query.with_for_update()
+        result: Result = await self.connection.execute(query)
+        job_row: JobDB | None = result.scalars().one_or_none()
+        if not job_row:
+            raise NotFoundInDBError(
+                message=f"Job {job_id} not found in database"
+            )
+        return job_row
+
+    @staticmethod
+    def _get_job_from_db_row(job_row: JobDB) -> JobDto:
+        return JobDto(
+            job_id=job_row.job_id,
+            kind=job_row.kind,
+            status=job_row.status,
+            progress=job_row.progress,
+            params=job_row.params,
+            result=job_row.result,
+            error=job_row.error,
+            cancel_requested=job_row.cancel_requested,
+            attempts=job_row.attempts,
+            created_at=job_row.created_at,
+            started_at=job_row.started_at,
+            finished_at=job_row.finished_at,
+        )
@@ -1,15 +1,28 @@
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Result, select
+from sqlalchemy import (Result, any_, bindparam, delete, func, insert, select,
+                        update)
+from sqlalchemy.dialects.postgresql import ARRAY, BIGINT
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.sql.operators import eq, ge, lt
 
-from app.database.error import ConflictWithRequestDBError, NotFoundInDBError
+from app.core.config import settings
+from app.core.structured_logging import audit
+from app.database.change_feed import change_feed, completion_event
+from app.database.error import (BaseDBError, ConflictWithRequestDBError,
+                                NotFoundInDBError)
 from app.database.models.assignment import AssignmentDB
 from app.database.models.order import OrderDB
+from app.database.models.order_slot import order_slot_table
+from app.database.order_slots import order_slot_rows
 from app.database.repositories.base import BaseRepository
-from app.schemas.models.orders import CompleteOrder, CreateOrderDto, OrderDto
+from app.database.retries import retry_transaction
+from app.database.versions import data_versions
+from app.schemas.models.orders import (CompleteOrder, CompletionHistoryBucket,
+                                       CreateOrderDto, HistoryBucketEnum,
+                                       OrderDto)
 
 
 class OrdersRepository(BaseRepository):
@@ -27,6 +40,33 @@ class OrdersRepository(BaseRepository):
             message=f"Order {order_id} not found in database"
         )
 
+    async def get_orders_by_ids(
+        self, *, order_ids: list[int]
+    ) -> tuple[list[OrderDto], list[int]]:
+        # Все заказы читаются одним запросом, ответ и отсутствующие ID
+        # возвращаются в порядке запроса
+        result: Result = await self.connection.execute(
+            select(OrderDB).where(
+                eq(
+                    OrderDB.order_id,
+                    any_(bindparam("order_ids", order_ids, ARRAY(BIGINT))),
+                )
+            )
+        )
+        order_rows = {
+            order_row.order_id: order_row
+            for order_row in result.scalars().all()
+        }
+        orders = [
+            await self._get_order_from_db_row(order_rows[order_id])
+            for order_id in order_ids
+            if order_id in order_rows
+        ]
+        missing_ids = [
+            order_id for order_id in order_ids if order_id not in order_rows
+        ]
+        return orders, missing_ids
+
     async def get_orders_in_range(
         self, *, limit: int, offset: int
     ) -> list[OrderDto]:
@@ -57,6 +97,62 @@ class OrdersRepository(BaseRepository):
         ]
         return orders
 
+    async def get_completion_history(
+        self,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        bucket: HistoryBucketEnum,
+        courier_id: Optional[int] = None,
+    ) -> list[CompletionHistoryBucket]:
+        """
+        Counts completed orders and sums their cost per time bucket.
+
+        Buckets are aligned to UTC hours or days. The range scan uses the
+        BRIN index on complete_time for all couriers and the
+        `(courier_id, complete_time)` index for one courier, and only the
+        partitions of the range are read.
+
+        Parameters:
+            start_date: The start of the range, inclusive.
+            end_date: The end of the range, exclusive.
+            bucket: The size of the buckets.
+            courier_id: The courier to count orders of, all couriers if
+                not given.
+
+        Returns:
+            A list of `CompletionHistoryBucket` objects ordered by start,
+            empty buckets are omitted.
+        """
+        bucket_start = func.date_trunc(
+            bucket.value, OrderDB.complete_time, "UTC"
+        ).label("bucket_start")
+        conditions = [
+            ge(OrderDB.complete_time, start_date),
+            lt(OrderDB.complete_time, end_date),
+        ]
+        if courier_id is not None:
+            conditions.append(eq(OrderDB.courier_id, courier_id))
+        result: Result = await self.connection.execute(
+            select(
+                bucket_start,
+                func.count().label("orders_count"),
+                func.coalesce(func.sum(OrderDB.cost), 0).label("cost_sum"),
+            )
+            .where(*conditions)
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+        return [
+            CompletionHistoryBucket(
+                bucket_start=row.bucket_start,
+                courier_id=courier_id,
+                orders_count=row.orders_count,
+                cost_sum=row.cost_sum,
+            )
+            for row in result
+        ]
+
     async def add_orders(
         self, *, orders: list[CreateOrderDto]
     ) -> list[OrderDto]:
@@ -64,6 +160,17 @@ class OrdersRepository(BaseRepository):
         for order in orders:
             order_row: OrderDB = await self._get_db_row_from_create_order(order)
             self.connection.add(order_row)
+            await self.connection.flush()
+            # Заказ попадает в корзины кандидатов в той же транзакции
+            slot_rows = order_slot_rows(
+                order_row.order_id,
+                order_row.regions,
+                order_row.delivery_hours,
+            )
+            if slot_rows:
+                await self.connection.execute(
+                    insert(order_slot_table), slot_rows
+                )
             await self.connection.commit()
             await self.connection.refresh(order_row)
             orders_dto.append(await self._get_order_from_db_row(order_row))
@@ -72,38 +179,185 @@ class OrdersRepository(BaseRepository):
     async def complete_orders(
         self, *, complete_orders: list[CompleteOrder]
     ) -> list[OrderDto]:
-        complete_orders_result = []
-        # Получить ID для всех заказов, которые следует завершить
-        complete_orders_ids = (
-            complete_order.order_id for complete_order in complete_orders
+        (result,) = await self.complete_orders_batch(
+            complete_orders_batch=[complete_orders]
+        )
+        if isinstance(result, BaseDBError):
+            raise result
+        return result
+
+    async def complete_orders_batch(
+        self, *, complete_orders_batch: list[list[CompleteOrder]]
+    ) -> list[list[OrderDto] | BaseDBError]:
+        # Транзакция, прерванная конкурентной (перенос заблокированного
+        # заказа в другую партицию, взаимная блокировка), повторяется
+        return await retry_transaction(
+            self.connection,
+            lambda: self._complete_orders_batch(complete_orders_batch),
+            attempts=settings.ORDER_COMPLETION_ATTEMPTS,
+            backoff_ms=settings.ORDER_COMPLETION_RETRY_BACKOFF_MS,
         )
-        # Извлечь из базы данных записи с соответсвующими ID
-        complete_orders_db_rows: Result = await self.connection.execute(
+
+    async def _complete_orders_batch(
+        self, complete_orders_batch: list[list[CompleteOrder]]
+    ) -> list[list[OrderDto] | BaseDBError]:
+        # Получить ID для всех заказов из всех запросов пачки
+        complete_orders_ids = {
+            complete_order.order_id
+            for complete_orders in complete_orders_batch
+            for complete_order in complete_orders
+        }
+        # Извлечь из базы данных незавершенные заказы с соответсвующими ID
+        # одним запросом, условие на complete_time оставляет только
+        # партицию открытых заказов. Строки блокируются до конца транзакции,
+        # конкурентное завершение тех же заказов ждет ее и видит их
+        # завершенными. Блокировки берутся в порядке ID, поэтому пересекающиеся
+        # запросы не блокируют друг друга взаимно
+        complete_orders_db_rows_dict = await self._get_order_rows(
+            complete_orders_ids, eq(OrderDB.complete_time, None), lock=True
+        )
+        # Заказы, которых нет среди открытых, уже завершены или не
+        # существуют, их ищем во всех партициях
+        missing_ids = complete_orders_ids - complete_orders_db_rows_dict.keys()
+        if missing_ids:
+            complete_orders_db_rows_dict.update(
+                await self._get_order_rows(missing_ids)
+            )
+        # Каждый запрос пачки применяется целиком или не применяется вовсе,
+        # ошибка одного запроса не влияет на остальные
+        results, updates, batch_completed_ids = [], [], set()
+        for complete_orders in complete_orders_batch:
+            try:
+                completed_rows = await self._check_complete_orders(
+                    complete_orders,
+                    complete_orders_db_rows_dict,
+                    batch_completed_ids,
+                )
+            except BaseDBError as error:
+                results.append(error)
+                continue
+            # Обновить время завершения у заказов и id курьера завершившего
+            # заказ, привести заказы к модели OrderDto
+            complete_orders_result = []
+            for order, order_row in completed_rows:
+                batch_completed_ids.add(order.order_id)
+                updates.append(
+                    {
+                        "b_order_id": order.order_id,
+                        "complete_time": order.complete_time,
+                        "courier_id": order.courier_id,
+                    }
+                )
+                order_dto = await self._get_order_from_db_row(order_row)
+                order_dto.completed_time = order.complete_time
+                complete_orders_result.append(order_dto)
+            results.append(complete_orders_result)
+        # Применить все изменения одной транзакцией. Обновление меняет ключ
+        # партиционирования и переносит заказ в партицию его месяца
+        if updates:
+            await self.connection.execute(
+                update(OrderDB.__table__)
+                .where(
+                    OrderDB.__table__.c.order_id == bindparam("b_order_id"),
+                    OrderDB.__table__.c.complete_time.is_(None),
+                )
+                .values(
+                    complete_time=bindparam("complete_time"),
+                    courier_id=bindparam("courier_id"),
+                ),
+                updates,
+            )
+            # Завершенные заказы больше не кандидаты для распределения
+            await self.connection.execute(
+                delete(order_slot_table).where(
+                    eq(
+                        order_slot_table.c.order_id,
+                        any_(
+                            bindparam(
+                                "order_ids",
+                                [update["b_order_id"] for update in updates],
+                                ARRAY(BIGINT),
+                            )
+                        ),
+                    )
+                )
+            )
+        # Уведомить подписчиков других процессов в той же транзакции
+        events = [
+            completion_event(
+                update["b_order_id"],
+                update["courier_id"],
+                update["complete_time"],
+            )
+            for update in updates
+        ]
+        await change_feed.notify(self.connection, events)
+        await self.connection.commit()
+        # Отметить изменение данных курьеров и их назначений после фиксации
+        data_versions.bump(
+            courier_ids=[update["courier_id"] for update in updates],
+            assignment_dates=[
+                update["complete_time"].date() for update in updates
+            ],
+        )
+        change_feed.publish(events)
+        # Записать завершения в журнал аудита, запись пишет поток журнала
+        for completed in updates:
+            audit(
+                "order_completed",
+                order_id=completed["b_order_id"],
+                courier_id=completed["courier_id"],
+                complete_time=completed["complete_time"],
+            )
+        # Вернуть список резульататов в порядке запросов
+        return results
+
+    async def _get_order_rows(
+        self, order_ids: set[int], *conditions, lock: bool = False
+    ) -> dict[int, OrderDB]:
+        query = (
             select(OrderDB)
-            .where(OrderDB.order_id.in_(complete_orders_ids))
+            .where(OrderDB.order_id.in_(order_ids), *conditions)
             .options(selectinload(OrderDB.assignments))
         )
-        # Записать все ID в словарь для быстрого доступа при проходе по заказам
-        # из запроса
-        complete_orders_db_rows_dict: dict[int, OrderDB] = {
-            row.order_id: row
-            for row in complete_orders_db_rows.scalars()
-            if row
-        }
+        if lock:
+            query = (
+                query.order_by(OrderDB.order_id)
+                .with_for_update(of=OrderDB)
+                .execution_options(populate_existing=True)
+            )
+        result: Result = await self.connection.execute(query)
+        # Записать все ID в словарь для быстрого доступа при проходе по
+        # заказам из запроса
+        return {row.order_id: row for row in result.scalars() if row}
+
+    async def _check_complete_orders(
+        self,
+        complete_orders: list[CompleteOrder],
+        order_rows: dict[int, OrderDB],
+        batch_completed_ids: set[int],
+    ) -> list[tuple[CompleteOrder, OrderDB]]:
+        completed_rows = []
+        completed_ids = set()
         # Пройтись по всем заказам из запроса
         for order in complete_orders:
             # Безопасно извлечь заказ из словаря
-            order_row: OrderDB = complete_orders_db_rows_dict.get(
-                order.order_id
-            )
+            order_row: OrderDB = order_rows.get(order.order_id)
             # Вывести ошибку, если заказ не найден в базе данных
             if not order_row:
                 raise NotFoundInDBError(
                     message=f"Order {order.order_id} not found in database"
                 )
-            # Проверить что заказ не завершен и заказ из запроса имеет время
-            # для завершения. В случае несоответсвия вызвать исключение
-            if order_row.complete_time or not order.complete_time:
+            # Проверить что заказ не завершен (в том числе ранее в этом же
+            # запросе или в предыдущем запросе пачки) и заказ из запроса
+            # имеет время для завершения.
+            # В случае несоответсвия вызвать исключение
+            if (
+                order_row.complete_time
+                or order.order_id in completed_ids
+                or order.order_id in batch_completed_ids
+                or not order.complete_time
+            ):
                 raise ConflictWithRequestDBError(
                     message=f"Order {order.order_id} is conflicting with database"
                 )
@@ -119,17 +373,9 @@ class OrdersRepository(BaseRepository):
                 raise ConflictWithRequestDBError(
                     message=f"Order {order.order_id} is conflicting with database"
                 )
-            # Обновить время завершения у заказа в базе данных и id курьера завершившего заказ
-            order_row.complete_time = order.complete_time
-            order_row.courier_id = order.courier_id
-            # Добавить заказ приведенных к модели OrderDto в список результатов
-            complete_orders_result.append(
-                await self._get_order_from_db_row(order_row)
-            )
-        # Применить все изменения
-        await self.connection.commit()
-        # Вернуть список резульататов
-        return complete_orders_result
+            completed_ids.add(order.order_id)
+            completed_rows.append((order, order_row))
+        return completed_rows
 
     @staticmethod
     async def _get_assignment_by_date(
@@ -0,0 +1,218 @@
+"""
+This module provides the repositories serving the hottest reads with asyncpg.
+
+The `asyncpg` repository backend replaces the ORM path of the lookups of an
+order, of a courier and of the assignments of a date: the SQL is written
+by hand, sent through the driver connection of the session and the records
+are mapped to the DTOs without validation, the database constraints already
+hold. asyncpg prepares every statement once per connection and keeps it in
+the statement cache of the connection, so the pooled connections reuse the
+prepared statements across requests. All other calls are inherited from the
+ORM repositories.
+
+The backend is selected by `REPOSITORY_BACKEND`, see `repository_class`.
+"""
+
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Type
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.error import NotFoundInDBError
+from app.database.replica import courier_replica
+from app.database.repositories.base import BaseRepository
+from app.database.repositories.couriers import CouriersRepository
+from app.database.repositories.orders import OrdersRepository
+from app.schemas.models.common import construct_many
+from app.schemas.models.couriers import CourierDto, CourierTypeEnum
+from app.schemas.models.orders import (CouriersGroupOrders, GroupOrders,
+                                       OrderDto)
+
+# The columns follow the fields of the DTOs, so that the DTOs are encoded
+# with the fields in the same order as by the ORM backend
+ORDER_COLUMNS = (
+    "weight, regions, delivery_hours, cost, order_id, complete_time"
+)
+ORDER_FIELDS = (
+    "weight",
+    "regions",
+    "delivery_hours",
+    "cost",
+    "order_id",
+    "completed_time",
+)
+COURIER_COLUMNS = "courier_type, regions, working_hours, courier_id"
+COURIER_FIELDS = ("courier_type", "regions", "working_hours", "courier_id")
+
+GET_ORDER_QUERY = f'SELECT {ORDER_COLUMNS} FROM "order" WHERE order_id = $1'
+GET_ORDERS_QUERY = (
+    f'SELECT {ORDER_COLUMNS} FROM "order" WHERE order_id = ANY($1::bigint[])'
+)
+GET_COURIER_QUERY = (
+    f"SELECT {COURIER_COLUMNS} FROM courier WHERE courier_id = $1"
+)
+GET_COURIERS_QUERY = (
+    f"SELECT {COURIER_COLUMNS} FROM courier "
+    "WHERE courier_id = ANY($1::bigint[])"
+)
+# The condition on complete_time limits the scan to the partition of open
+# orders, as in `CouriersRepository.get_couriers_assignments`
+GET_ASSIGNMENTS_QUERY = (
+    "SELECT o.weight, o.regions, o.delivery_hours, o.cost, o.order_id, "
+    "o.complete_time, o.courier_id, o.group_order_id "
+    'FROM assignment_order ao JOIN "order" o ON o.order_id = ao.order_id '
+    "JOIN assignment a ON a.assignment_id = ao.assignment_id "
+    "AND a.assignment_date = $1 WHERE o.complete_time IS NULL"
+)
+GET_COURIER_ASSIGNMENTS_QUERY = (
+    GET_ASSIGNMENTS_QUERY + " AND o.courier_id = $2"
+)
+
+
+def orders_from_records(records: Iterable[asyncpg.Record]) -> list[OrderDto]:
+    """Maps `ORDER_COLUMNS` records to orders without validation."""
+    return construct_many(
+        OrderDto, ORDER_FIELDS, (tuple(record)[:6] for record in records)
+    )
+
+
+def couriers_from_records(
+    records: Iterable[asyncpg.Record],
+) -> list[CourierDto]:
+    """Maps `COURIER_COLUMNS` records to couriers without validation."""
+    types = CourierTypeEnum._value2member_map_
+    return construct_many(
+        CourierDto,
+        COURIER_FIELDS,
+        (
+            (types[courier_type], regions, working_hours, courier_id)
+            for courier_type, regions, working_hours, courier_id in records
+        ),
+    )
+
+
+class RawOrdersRepository(OrdersRepository):
+    async def get_order_by_order_id(self, *, order_id: int) -> OrderDto:
+        connection = await self._get_driver_connection()
+        record = await connection.fetchrow(GET_ORDER_QUERY, order_id)
+        if record is None:
+            raise NotFoundInDBError(
+                message=f"Order {order_id} not found in database"
+            )
+        return orders_from_records([record])[0]
+
+    async def get_orders_by_ids(
+        self, *, order_ids: list[int]
+    ) -> tuple[list[OrderDto], list[int]]:
+        connection = await self._get_driver_connection()
+        records = await connection.fetch(GET_ORDERS_QUERY, order_ids)
+        orders = {
+            order.order_id: order for order in orders_from_records(records)
+        }
+        return [
+            orders[order_id] for order_id in order_ids if order_id in orders
+        ], [order_id for order_id in order_ids if order_id not in orders]
+
+
+class RawCouriersRepository(CouriersRepository):
+    def __init__(self, conn: AsyncSession) -> None:
+        super().__init__(conn)
+        self._orders_repo = RawOrdersRepository(conn)
+
+    async def get_courier(self, *, courier_id: int) -> CourierDto:
+        courier = courier_replica.get(courier_id)
+        if courier is not None:
+            return courier
+        connection = await self._get_driver_connection()
+        record = await connection.fetchrow(GET_COURIER_QUERY, courier_id)
+        if record is None:
+            raise NotFoundInDBError(
+                message=f"Courier {courier_id} not found in database"
+            )
+        return couriers_from_records([record])[0]
+
+    async def get_couriers_by_ids(
+        self, *, courier_ids: list[int]
+    ) -> tuple[list[CourierDto], list[int]]:
+        couriers = {}
+        for courier_id in courier_ids:
+            courier = courier_replica.get(courier_id)
+            if courier is not None:
+                couriers[courier_id] = courier
+        not_replicated = [
+            courier_id
+            for courier_id in courier_ids
+            if courier_id not in couriers
+        ]
+        if not_replicated:
+            connection = await self._get_driver_connection()
+            records = await connection.fetch(
+                GET_COURIERS_QUERY, not_replicated
+            )
+            for courier in couriers_from_records(records):
+                couriers[courier.courier_id] = courier
+        return [
+            couriers[courier_id]
+            for courier_id in courier_ids
+            if courier_id in couriers
+        ], [
+            courier_id
+            for courier_id in courier_ids
+            if courier_id not in couriers
+        ]
+
+    async def get_couriers_assignments(
+        self, date: date, courier_id: int | None
+    ) -> list[CouriersGroupOrders]:
+        connection = await self._get_driver_connection()
+        if courier_id:
+            records = await connection.fetch(
+                GET_COURIER_ASSIGNMENTS_QUERY, date, courier_id
+            )
+        else:
+            records = await connection.fetch(GET_ASSIGNMENTS_QUERY, date)
+        # Группы курьеров и заказов в порядке первых записей, как в ORM пути
+        groups: dict[int, dict[int, list[OrderDto]]] = {}
+        for record, order in zip(records, orders_from_records(records)):
+            groups.setdefault(record["courier_id"], defaultdict(list))[
+                record["group_order_id"]
+            ].append(order)
+        return [
+            CouriersGroupOrders.construct(
+                courier_id=courier_id_key,
+                orders=[
+                    GroupOrders.construct(
+                        group_order_id=group_order_id, orders=orders
+                    )
+                    for group_order_id, orders in courier_groups.items()
+                ],
+            )
+            for courier_id_key, courier_groups in groups.items()
+        ]
+
+
+RAW_REPOSITORIES: dict[Type[BaseRepository], Type[BaseRepository]] = {
+    OrdersRepository: RawOrdersRepository,
+    CouriersRepository: RawCouriersRepository,
+}
+
+
+def repository_class(
+    repo: Type[BaseRepository], backend: str
+) -> Type[BaseRepository]:
+    """
+    Gets the implementation of a repository for a backend.
+
+    Parameters:
+        repo: The ORM repository class.
+        backend: `orm` or `asyncpg`.
+
+    Returns:
+        The `asyncpg` variant of the repository if there is one and the
+        backend is `asyncpg`, the repository itself otherwise.
+    """
+    if backend == "asyncpg":
+        return RAW_REPOSITORIES.get(repo, repo)
+    return repo
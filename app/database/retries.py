@@ -0,0 +1,101 @@
+"""
+The retries module - retrying transactions aborted by concurrent ones.
+
+Functions:
+    is_retryable - checks whether a database error aborted the transaction
+    only because of a concurrent one.
+    retry_transaction - runs a transaction on a session until it commits.
+
+Notes:
+    Postgres aborts a transaction with a serialization failure, e.g. when a
+    row it locks was moved to another partition by a concurrent `UPDATE`,
+    and with a deadlock error when it is chosen as the victim of a deadlock.
+    Both leave the database unchanged and succeed when run again, the
+    transaction is rolled back and rerun after a short random delay that
+    doubles with every attempt, so that the conflicting transactions do not
+    meet again.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_SQLSTATES = {
+    "40001": "serialization_failure",
+    "40P01": "deadlock_detected",
+}
+
+retries_total = metrics.counter(
+    "db_transaction_retries_total",
+    "Transactions rerun after a serialization failure or a deadlock",
+)
+
+Result = TypeVar("Result")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Checks whether an error aborted the transaction because of a concurrent
+    one.
+
+    Parameters:
+        error: The error raised by the session.
+
+    Returns:
+        `True` for serialization failures and deadlocks.
+    """
+    return (
+        isinstance(error, DBAPIError)
+        and getattr(error.orig, "sqlstate", None) in RETRYABLE_SQLSTATES
+    )
+
+
+async def retry_transaction(
+    session: AsyncSession,
+    transaction: Callable[[], Awaitable[Result]],
+    *,
+    attempts: int,
+    backoff_ms: float,
+) -> Result:
+    """
+    Runs a transaction until it is not aborted by a concurrent one.
+
+    Parameters:
+        session: The session the transaction runs on, rolled back before
+            every retry.
+        transaction: Runs the transaction and commits it.
+        attempts: The maximum number of runs.
+        backoff_ms: The upper bound of the delay before the first retry.
+
+    Returns:
+        The result of the transaction.
+
+    Raises:
+        DBAPIError: If the last attempt was aborted or the error is not a
+            serialization failure or a deadlock.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await transaction()
+        except DBAPIError as error:
+            await session.rollback()
+            if attempt == attempts or not is_retryable(error):
+                raise
+            retries_total.inc()
+            logger.info(
+                "Transaction aborted by %s, retry %d of %d",
+                RETRYABLE_SQLSTATES[error.orig.sqlstate],
+                attempt,
+                attempts - 1,
+            )
+            await asyncio.sleep(
+                random.uniform(0, backoff_ms * 2 ** (attempt - 1)) / 1000
+            )
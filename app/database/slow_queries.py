@@ -0,0 +1,228 @@
+"""
+The slow queries module - the module that records statements executed
+longer than the configured threshold.
+
+Classes:
+    SlowQueryRecorder - class that listens to engine events, logs slow
+    statements and captures their execution plans.
+
+Notes:
+    Bound parameters are never logged or stored, only their types. Plans are
+    captured with `EXPLAIN (ANALYZE, BUFFERS)` on a separate connection for a
+    sampled subset of slow read-only statements, inside a transaction that
+    is always rolled back. Statements taking row or advisory locks are never
+    explained: run again on another connection they would wait behind the
+    transaction that was slow or take its locks. Neither are statements
+    writing in a `WITH` clause or calling sequence functions: the rollback
+    undoes their rows, but not their locks, triggers and sequence values.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, ExecutionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import metrics
+from app.schemas.models.queries import QueryPlanDto, SlowQueryDto
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+EXPLAINABLE_STATEMENTS = ("SELECT", "WITH")
+LOCKING_STATEMENT = re.compile(
+    r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b"
+    r"|\bpg_(try_)?advisory_",
+    re.IGNORECASE,
+)
+WRITING_STATEMENT = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE)\b|\b(nextval|setval)\s*\(",
+    re.IGNORECASE,
+)
+SKIP_OPTION = "skip_slow_query_log"
+
+queries_total = metrics.counter(
+    "db_queries_total", "Statements executed by the database engine"
+)
+slow_queries_total = metrics.counter(
+    "db_slow_queries_total", "Statements slower than the threshold"
+)
+plans_captured_total = metrics.counter(
+    "db_query_plans_captured_total",
+    "Execution plans captured for slow statements",
+)
+query_duration = metrics.histogram(
+    "db_query_duration_ms", "Statement execution time in milliseconds"
+)
+
+
+def redact_parameters(parameters: Any) -> list[str]:
+    """
+    Replaces bound parameters with the names of their types.
+
+    Parameters:
+        parameters: DBAPI parameters, a sequence or a mapping, or a list of
+            them for `executemany` calls.
+
+    Returns:
+        A list of type placeholders such as `<int>` in parameter order.
+    """
+    if not parameters:
+        return []
+    if isinstance(parameters, dict):
+        return [
+            f"{key}=<{type(value).__name__}>"
+            for key, value in parameters.items()
+        ]
+    if isinstance(parameters, list) and isinstance(
+        parameters[0], (tuple, list, dict)
+    ):
+        return [f"<{len(parameters)} rows>"] + redact_parameters(parameters[0])
+    return [f"<{type(value).__name__}>" for value in parameters]
+
+
+class SlowQueryRecorder:
+    """
+    A recorder of slow database statements.
+
+    __engine(AsyncEngine):
+        The engine whose statements are recorded.
+    threshold_ms(float):
+        The minimum duration of a statement to be recorded.
+    explain_sample_rate(float):
+        The share of slow statements to capture plans for, from 0 to 1.
+    queries(deque):
+        The last slow statements.
+    plans(deque):
+        The last captured execution plans.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        threshold_ms: float,
+        explain_sample_rate: float,
+        history_size: int,
+    ) -> None:
+        self.__engine = engine
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.queries: deque[SlowQueryDto] = deque(maxlen=history_size)
+        self.plans: deque[QueryPlanDto] = deque(maxlen=history_size)
+        self.__pending: set[asyncio.Task] = set()
+        event.listen(
+            engine.sync_engine, "before_cursor_execute", self._before_execute
+        )
+        event.listen(
+            engine.sync_engine, "after_cursor_execute", self._after_execute
+        )
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    @staticmethod
+    def _before_execute(
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: ExecutionContext,
+        executemany: bool,
+    ) -> None:
+        conn.info.setdefault("query_start_time", []).append(
+            time.perf_counter()
+        )
+
+    @staticmethod
+    def _on_error(context: Any) -> None:
+        if context.connection is not None:
+            start_times = context.connection.info.get("query_start_time")
+            if start_times:
+                start_times.pop()
+
+    def _after_execute(
+        self,
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: ExecutionContext,
+        executemany: bool,
+    ) -> None:
+        duration_ms = (
+            time.perf_counter() - conn.info["query_start_time"].pop()
+        ) * 1000
+        if context.execution_options.get(SKIP_OPTION):
+            return
+        queries_total.inc()
+        query_duration.observe(duration_ms)
+        if duration_ms < self.threshold_ms:
+            return
+        slow_queries_total.inc()
+        slow_query = SlowQueryDto(
+            statement=statement,
+            parameters=redact_parameters(parameters),
+            duration_ms=duration_ms,
+            recorded_at=datetime.now(timezone.utc),
+        )
+        self.queries.append(slow_query)
+        logger.warning(
+            "Slow query (%.1f ms): %s; parameters: %s",
+            duration_ms,
+            statement,
+            ", ".join(slow_query.parameters),
+        )
+        if self._should_explain(statement, executemany):
+            self._schedule_explain(slow_query, statement, parameters)
+
+    def _should_explain(self, statement: str, executemany: bool) -> bool:
+        if executemany or random.random() >= self.explain_sample_rate:
+            return False
+        return (
+            statement.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS)
+            and not LOCKING_STATEMENT.search(statement)
+            and not WRITING_STATEMENT.search(statement)
+        )
+
+    def _schedule_explain(
+        self, slow_query: SlowQueryDto, statement: str, parameters: Any
+    ) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(
+            self._explain(slow_query, statement, parameters)
+        )
+        self.__pending.add(task)
+        task.add_done_callback(self.__pending.discard)
+
+    async def _explain(
+        self, slow_query: SlowQueryDto, statement: str, parameters: Any
+    ) -> None:
+        try:
+            async with self.__engine.connect() as conn:
+                conn = await conn.execution_options(**{SKIP_OPTION: True})
+                transaction = await conn.begin()
+                try:
+                    result = await conn.exec_driver_sql(
+                        EXPLAIN_PREFIX + statement, parameters
+                    )
+                    plan = result.scalar()
+                finally:
+                    await transaction.rollback()
+        except Exception:
+            logger.exception("Failed to capture plan for a slow query")
+            return
+        plans_captured_total.inc()
+        self.plans.append(QueryPlanDto(**slow_query.dict(), plan=plan))
+
+    async def finalize(self) -> None:
+        """Waits for the plans that are being captured."""
+        if self.__pending:
+            await asyncio.gather(*self.__pending, return_exceptions=True)
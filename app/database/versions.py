@@ -0,0 +1,92 @@
+"""
+The versions module - version counters of the data served to pollers.
+
+Classes:
+    DataVersions - counters bumped by the writes of couriers, assignments
+    and order completions.
+
+Notes:
+    The counters live in the memory of the process and are bumped after the
+    write is committed, so a response built from the database is never
+    older than the version read before it. An entity tag built from the
+    counters therefore changes whenever the data behind a response may have
+    changed, and can be checked without touching the database.
+
+    The epoch changes on every start of the process, so tags issued by a
+    previous process, or by another process of the service, never match.
+    Writes made by other processes bump the counters when their
+    notifications arrive: the change feed relays the assignments and
+    completions, the courier replica the couriers. Several processes need
+    the relay of the change feed, `EVENT_STREAM_NOTIFY`, and the replica
+    enabled, otherwise their tags may stay the same after the writes of the
+    other processes.
+"""
+
+from collections import defaultdict
+from datetime import date
+from secrets import token_hex
+from typing import Iterable, Optional
+
+
+class DataVersions:
+    """
+    Version counters per courier and per assignment date.
+
+    A courier version changes with the courier, its assignments and its
+    completed orders. An assignment date version changes with any
+    assignment of the date and with completions of orders on the date.
+    """
+
+    def __init__(self) -> None:
+        self._epoch = token_hex(4)
+        self._couriers: defaultdict[int, int] = defaultdict(int)
+        self._dates: defaultdict[date, int] = defaultdict(int)
+        self._couriers_total = 0
+
+    def courier_tag(self, courier_id: int) -> str:
+        version = self._couriers.get(courier_id, 0)
+        return f'"{self._epoch}-c{courier_id}-{version}"'
+
+    def assignments_tag(
+        self, assignment_date: date, courier_id: Optional[int] = None
+    ) -> str:
+        if courier_id is None:
+            version = self._dates.get(assignment_date, 0)
+            return f'"{self._epoch}-d{assignment_date:%Y%m%d}-{version}"'
+        version = self._couriers.get(courier_id, 0)
+        return (
+            f'"{self._epoch}-d{assignment_date:%Y%m%d}-c{courier_id}-'
+            f'{version}"'
+        )
+
+    def couriers_tag(self) -> str:
+        return f'"{self._epoch}-c-{self._couriers_total}"'
+
+    def bump(
+        self,
+        *,
+        courier_ids: Iterable[int] = (),
+        assignment_dates: Iterable[date] = (),
+    ) -> None:
+        """
+        Marks the data of couriers and assignment dates as changed.
+
+        Parameters:
+            courier_ids: The couriers whose data changed.
+            assignment_dates: The assignment dates whose data changed.
+        """
+        for courier_id in set(courier_ids):
+            self._couriers[courier_id] += 1
+            self._couriers_total += 1
+        for assignment_date in set(assignment_dates):
+            self._dates[assignment_date] += 1
+
+    def reset(self) -> None:
+        """Marks all the data as changed, e.g. after order archival."""
+        self._epoch = token_hex(4)
+        self._couriers.clear()
+        self._dates.clear()
+        self._couriers_total = 0
+
+
+data_versions = DataVersions()
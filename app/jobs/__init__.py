@@ -0,0 +1,26 @@
+"""
+This module provides the `JobRunner` instance executing background jobs.
+
+Jobs are stored in the `job` table and run by worker tasks of the service,
+CPU-bound parts of them in a process pool. The runner is started on startup
+when `JOBS_WORKER_ENABLED` is set.
+"""
+
+from app.core.config import settings
+from app.database import db_engine
+from app.jobs.archival import ARCHIVAL_JOB, run_archival_job
+from app.jobs.assignment import ASSIGNMENT_JOB, run_assignment_job
+from app.jobs.export import EXPORT_JOB, run_export_job
+from app.jobs.runner import JobRunner
+
+job_runner = JobRunner(
+    db_engine,
+    workers=settings.JOBS_WORKERS,
+    poll_interval_s=settings.JOBS_POLL_INTERVAL_S,
+    heartbeat_interval_s=settings.JOBS_HEARTBEAT_INTERVAL_S,
+    stale_after_s=settings.JOBS_STALE_AFTER_S,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+)
+job_runner.register(ASSIGNMENT_JOB, run_assignment_job)
+job_runner.register(ARCHIVAL_JOB, run_archival_job)
+job_runner.register(EXPORT_JOB, run_export_job)
@@ -0,0 +1,50 @@
+"""
+This module provides the order archival job.
+
+The job creates the `order` partitions for the months ahead and detaches the
+partitions of orders completed more than `ORDER_ARCHIVE_AFTER_MONTHS` ago,
+moving them to the archive schema.
+"""
+
+from datetime import date
+from typing import Any
+
+from app.core.config import settings
+from app.database.change_feed import change_feed, reset_event
+from app.database.partitions import (archive_order_partitions,
+                                     ensure_order_partitions, month_start)
+from app.database.versions import data_versions
+from app.jobs.runner import JobContext
+
+ARCHIVAL_JOB = "order_archival"
+
+
+async def run_archival_job(context: JobContext) -> dict[str, Any]:
+    """
+    Maintains the partitions of the `order` table.
+
+    Parameters:
+        context: The context of the running job.
+
+    Returns:
+        The names of the created and the archived partitions.
+    """
+    today = date.today()
+    async with context.db_engine.begin() as conn:
+        created = await ensure_order_partitions(
+            conn, month_start(today, context.db_engine.order_partitions_ahead)
+        )
+    context.progress = 0.5
+    async with context.db_engine.begin() as conn:
+        archived = await archive_order_partitions(
+            conn,
+            before=month_start(today, -settings.ORDER_ARCHIVE_AFTER_MONTHS),
+            archive_schema=settings.ORDER_ARCHIVE_SCHEMA,
+        )
+        if archived:
+            # The other processes reset their versions on the commit
+            await change_feed.notify(conn, [reset_event()])
+    if archived:
+        # The history of couriers served from the archived partitions is gone
+        data_versions.reset()
+    return {"created": created, "archived": archived}
@@ -0,0 +1,90 @@
+"""
+This module provides the assignment job.
+
+The job loads the couriers and the unassigned orders, builds a day plan in a
+worker process with the greedy or the time-budgeted optimal strategy and
+saves it. Loading and saving are short set-based
+statements on the event loop, the CPU-bound planning never runs on it.
+"""
+
+from datetime import date
+from typing import Any
+
+from app.assignment.greedy import assign_greedy
+from app.assignment.optimal import assign_optimal
+from app.core.response_cache import assignments_cache
+from app.core.structured_logging import audit
+from app.database.repositories.assignments import AssignmentsRepository
+from app.jobs.runner import JobContext
+
+ASSIGNMENT_JOB = "assignment"
+
+
+async def run_assignment_job(context: JobContext) -> dict[str, Any]:
+    """
+    Assigns the unassigned orders for the date of the job.
+
+    With the `replace` parameter the open orders of the saved plan of the
+    date are planned again and the plan is replaced. With the `optimal` mode
+    the plan is optimised for `budget_ms` milliseconds and the summary
+    reports the distance of its objective to a lower bound.
+
+    Parameters:
+        context: The context of the running job.
+
+    Returns:
+        A summary of the saved plan.
+    """
+    assignment_date = date.fromisoformat(context.job.params["date"])
+    replace = context.job.params.get("replace", False)
+    mode = context.job.params.get("mode", "greedy")
+    async with context.db_engine.create_session() as session:
+        repo = AssignmentsRepository(session)
+        couriers = await repo.get_planning_couriers()
+        orders = await repo.get_planning_orders(
+            replace_date=assignment_date if replace else None
+        )
+    context.progress = 0.1
+    summary: dict[str, Any] = {"mode": mode}
+    if mode == "optimal":
+        result = await context.run_in_pool(
+            assign_optimal,
+            couriers,
+            orders,
+            context.job.params["budget_ms"],
+            share=(0.1, 0.9),
+        )
+        plan = result.plan
+        summary.update(
+            objective=round(result.objective, 2),
+            greedy_objective=round(result.greedy_objective, 2),
+            lower_bound=round(result.lower_bound, 2),
+            gap=round(result.gap, 4),
+            timed_out=result.timed_out,
+            fell_back=result.fell_back,
+        )
+    else:
+        plan = await context.run_in_pool(
+            assign_greedy, couriers, orders, share=(0.1, 0.9)
+        )
+    async with context.db_engine.create_session() as session:
+        saved = await AssignmentsRepository(session).save_day_plan(
+            assignment_date=assignment_date, plan=plan, replace=replace
+        )
+    if replace:
+        assignments_cache.invalidate(lambda key: key[0] == assignment_date)
+    summary.update(
+        date=assignment_date.isoformat(),
+        couriers=len({group.courier_id for group in saved.groups}),
+        groups=len(saved.groups),
+        assigned_orders=saved.assigned_orders,
+        unassigned_orders=len(saved.unassigned_order_ids),
+        cost=round(saved.cost, 2),
+    )
+    audit(
+        "assignment_run",
+        job_id=context.job.job_id,
+        replace=replace,
+        **summary,
+    )
+    return summary
@@ -0,0 +1,248 @@
+"""
+This module provides the export job of completed orders for analytics.
+
+Every UTC day of the requested range is read with binary `COPY` and written
+to a columnar file of its own in `EXPORT_DIR`: an Arrow IPC (Feather) file
+when `pyarrow` is installed, a gzip compressed CSV file otherwise. The
+manifest of the directory keeps the last exported `complete_time` of every
+day, a later export of the day reads only the orders completed after it
+and adds them to the file. The last `EXPORT_LAG_S` seconds are left for the
+next export, so that the completions still being committed are not skipped.
+An order completed with a `complete_time` older than the exported one of
+its day is not exported.
+
+Decoding and writing run in the process pool of the job runner.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.database.exports import (EXPORT_COLUMNS, copy_completed_orders,
+                                  copy_is_empty, decode_copy_binary)
+from app.jobs.runner import JobContext
+
+try:
+    import pyarrow
+    from pyarrow import feather
+except ImportError:
+    pyarrow = None
+
+EXPORT_JOB = "order_export"
+MANIFEST = "manifest.json"
+FORMATS = {"arrow": ".arrow", "csv": ".csv.gz"}
+
+COLUMN_NAMES = tuple(name for name, _, _ in EXPORT_COLUMNS)
+COLUMN_TYPES = tuple(column_type for _, _, column_type in EXPORT_COLUMNS)
+
+
+def export_format(requested: str) -> str:
+    """
+    Chooses the format of new export files.
+
+    Parameters:
+        requested: `arrow`, `csv` or `auto`, Arrow if `pyarrow` is installed.
+
+    Raises:
+        RuntimeError: If Arrow is requested without `pyarrow`.
+    """
+    if requested == "auto":
+        return "csv" if pyarrow is None else "arrow"
+    if requested == "arrow" and pyarrow is None:
+        raise RuntimeError("EXPORT_FORMAT=arrow requires pyarrow")
+    return requested
+
+
+def read_manifest(directory: str) -> dict[str, Any]:
+    """Reads the manifest of an export directory, empty if there is none."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"days": {}}
+
+
+def write_manifest(directory: str, manifest: dict[str, Any]) -> None:
+    """Replaces the manifest of an export directory atomically."""
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _arrow_table(columns: list[list[Any]]):
+    types = {
+        "int4": pyarrow.int32(),
+        "int8": pyarrow.int64(),
+        "float8": pyarrow.float64(),
+        "text": pyarrow.string(),
+        "date": pyarrow.date32(),
+        "timestamptz": pyarrow.timestamp("us", tz="UTC"),
+    }
+    return pyarrow.table(
+        {
+            name: pyarrow.array(values, type=types[column_type])
+            for name, column_type, values in zip(
+                COLUMN_NAMES, COLUMN_TYPES, columns
+            )
+        }
+    )
+
+
+def _csv_member(columns: list[list[Any]], header: bool) -> bytes:
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator="\n")
+    if header:
+        writer.writerow(COLUMN_NAMES)
+    writer.writerows(
+        [_csv_value(value) for value in row] for row in zip(*columns)
+    )
+    return gzip.compress(text.getvalue().encode())
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def write_day_file(
+    path: str,
+    data: bytes,
+    *,
+    progress: Callable[[float], None],
+) -> tuple[int, Optional[str]]:
+    """
+    Adds the rows of a binary `COPY` to the export file of a day.
+
+    The file is written next to the old one and replaces it, a CSV file
+    gets a new gzip member, an Arrow file is rewritten with the new rows
+    appended. The format follows the extension of the path.
+
+    Parameters:
+        path: The path of the file of the day.
+        data: The output of `copy_completed_orders`.
+        progress: The callable reporting the share of the work done.
+
+    Returns:
+        The number of the added rows and the last `complete_time` among
+        them in ISO format, `None` if there are no rows.
+    """
+    columns = decode_copy_binary(data, COLUMN_TYPES)
+    progress(0.5)
+    rows = len(columns[0])
+    if not rows:
+        return 0, None
+    exists = os.path.exists(path)
+    if path.endswith(FORMATS["arrow"]):
+        if pyarrow is None:
+            raise RuntimeError(f"Adding to {path} requires pyarrow")
+        table = _arrow_table(columns)
+        if exists:
+            table = pyarrow.concat_tables([feather.read_table(path), table])
+        feather.write_feather(table, path + ".tmp")
+    else:
+        with open(path + ".tmp", "wb") as file:
+            if exists:
+                with open(path, "rb") as old:
+                    shutil.copyfileobj(old, file)
+            file.write(_csv_member(columns, header=not exists))
+    os.replace(path + ".tmp", path)
+    progress(1)
+    return rows, columns[COLUMN_NAMES.index("complete_time")][-1].isoformat()
+
+
+def day_range(day: date) -> tuple[datetime, datetime]:
+    """Gets the start and the end of a UTC day."""
+    start = datetime.combine(day, time(), tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+async def run_export_job(context: JobContext) -> dict[str, Any]:
+    """
+    Exports the orders completed in the days of the job.
+
+    Without a start date the export continues from the last exported day.
+
+    Parameters:
+        context: The context of the running job.
+
+    Returns:
+        The format and the files of the export and the numbers of the
+        exported rows.
+    """
+    directory = settings.EXPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    new_format = export_format(settings.EXPORT_FORMAT)
+    end_date = date.fromisoformat(context.job.params["end_date"])
+    if context.job.params.get("start_date"):
+        start_date = date.fromisoformat(context.job.params["start_date"])
+    else:
+        # The last exported day may have got more orders since
+        start_date = min(
+            max(map(date.fromisoformat, manifest["days"]), default=end_date),
+            end_date,
+        )
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.EXPORT_LAG_S
+    )
+    days = [
+        start_date + timedelta(days=number)
+        for number in range((end_date - start_date).days + 1)
+    ]
+    files, total_rows = [], 0
+    for number, day in enumerate(days):
+        start, end = day_range(day)
+        end = min(end, cutoff)
+        if end <= start:
+            break
+        exported = manifest["days"].get(day.isoformat())
+        file_name = (
+            exported["file"]
+            if exported
+            else f"orders-{day.isoformat()}{FORMATS[new_format]}"
+        )
+        async with context.db_engine.begin() as conn:
+            raw_connection = await conn.get_raw_connection()
+            data = await copy_completed_orders(
+                raw_connection.driver_connection,
+                (
+                    datetime.fromisoformat(exported["exported_until"])
+                    if exported
+                    else start - timedelta(microseconds=1)
+                ),
+                end,
+            )
+        if copy_is_empty(data):
+            context.progress = (number + 1) / len(days)
+            continue
+        rows, exported_until = await context.run_in_pool(
+            write_day_file,
+            os.path.join(directory, file_name),
+            data,
+            share=(number / len(days), (number + 1) / len(days)),
+        )
+        manifest["days"][day.isoformat()] = {
+            "file": file_name,
+            "rows": (exported["rows"] if exported else 0) + rows,
+            "exported_until": exported_until,
+        }
+        write_manifest(directory, manifest)
+        files.append(file_name)
+        total_rows += rows
+    return {
+        "format": new_format,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "files": files,
+        "rows": total_rows,
+    }
@@ -0,0 +1,344 @@
+"""
+The runner module - the module that executes background jobs stored in the
+`job` table.
+
+Classes:
+    JobContext - class passed to a job handler, runs CPU-bound work in the
+    process pool and tracks progress.
+    JobRunner - class that claims pending jobs and runs their handlers.
+
+Notes:
+    The table is the queue: a job is claimed with `FOR UPDATE SKIP LOCKED`,
+    so several service instances can share it. A running job sends
+    heartbeats with its progress; a job whose heartbeats stop, e.g. because
+    the service was killed, is claimed again by any runner. On a graceful
+    shutdown running jobs are put back to the queue right away.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.metrics import metrics
+from app.database.engine import DatabaseEngine
+from app.database.repositories.jobs import JobsRepository
+from app.schemas.models.jobs import JobDto, JobStatusEnum
+
+logger = logging.getLogger(__name__)
+
+jobs_finished_total = {
+    status: metrics.counter(
+        f"jobs_{status.value}_total", f"Background jobs {status.value}"
+    )
+    for status in (
+        JobStatusEnum.succeeded,
+        JobStatusEnum.failed,
+        JobStatusEnum.cancelled,
+    )
+}
+job_duration = metrics.histogram(
+    "job_duration_ms",
+    "Background job run time in milliseconds",
+    buckets=(100, 500, 1000, 5000, 10000, 30000, 60000, 300000),
+)
+
+_shared_progress = None
+_shared_cancelled = None
+
+
+class JobCancelledError(Exception):
+    """Raised in a job handler that was asked to stop."""
+
+
+def _init_process(progress: Any, cancelled: Any) -> None:
+    global _shared_progress, _shared_cancelled
+    _shared_progress, _shared_cancelled = progress, cancelled
+
+
+def report_progress(slot: int, value: float) -> None:
+    """
+    Records the progress of the work running in a pool process.
+
+    Raises:
+        JobCancelledError: If the job was asked to stop, so that the process
+            is freed for the next job.
+    """
+    if _shared_progress is None:
+        return
+    if _shared_cancelled[slot]:
+        raise JobCancelledError()
+    _shared_progress[slot] = value
+
+
+class JobContext:
+    """
+    The context of a running job.
+
+    job(JobDto):
+        The job being run.
+    db_engine(DatabaseEngine):
+        The engine to open sessions with.
+    progress(float):
+        The share of the work done, reported with heartbeats.
+    """
+
+    def __init__(
+        self,
+        job: JobDto,
+        db_engine: DatabaseEngine,
+        pool: ProcessPoolExecutor,
+        shared_progress: Any,
+        shared_cancelled: Any,
+        slot: int,
+    ) -> None:
+        self.job = job
+        self.db_engine = db_engine
+        self.__pool = pool
+        self.__shared_progress = shared_progress
+        self.__shared_cancelled = shared_cancelled
+        self.__slot = slot
+        self.__progress = 0.0
+        self.__pool_share: Optional[tuple[float, float]] = None
+
+    @property
+    def progress(self) -> float:
+        if self.__pool_share is None:
+            return self.__progress
+        start, end = self.__pool_share
+        return start + (end - start) * self.__shared_progress[self.__slot]
+
+    @progress.setter
+    def progress(self, value: float) -> None:
+        self.__progress = value
+
+    async def run_in_pool(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        share: tuple[float, float] = (0, 1),
+    ) -> Any:
+        """
+        Runs a function in a worker process.
+
+        The function gets a `progress` keyword argument, a callable taking
+        the share of its work done from 0 to 1. If the job is cancelled the
+        callable raises, and the cancellation completes once the function
+        has stopped.
+
+        Parameters:
+            func: A picklable function.
+            args: Picklable arguments of the function.
+            share: The part of the job progress covered by the function.
+
+        Returns:
+            The result of the function.
+        """
+        self.__shared_progress[self.__slot] = 0
+        self.__shared_cancelled[self.__slot] = False
+        self.__pool_share = share
+        future = asyncio.get_running_loop().run_in_executor(
+            self.__pool,
+            partial(
+                func, *args, progress=partial(report_progress, self.__slot)
+            ),
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.__shared_cancelled[self.__slot] = True
+            await asyncio.gather(future, return_exceptions=True)
+            raise
+        finally:
+            self.__progress = share[1]
+            self.__pool_share = None
+
+
+JobHandler = Callable[[JobContext], Awaitable[dict[str, Any]]]
+
+
+class JobRunner:
+    """
+    A runner of background jobs.
+
+    __db_engine(DatabaseEngine):
+        The engine used to claim and update jobs.
+    __handlers(dict):
+        The handlers by job kind.
+    workers(int):
+        The number of jobs run at the same time, and of pool processes.
+    """
+
+    def __init__(
+        self,
+        db_engine: DatabaseEngine,
+        workers: int,
+        poll_interval_s: float,
+        heartbeat_interval_s: float,
+        stale_after_s: float,
+        max_attempts: int,
+    ) -> None:
+        self.__db_engine = db_engine
+        self.__handlers: dict[str, JobHandler] = {}
+        self.workers = workers
+        self.poll_interval = poll_interval_s
+        self.heartbeat_interval = heartbeat_interval_s
+        self.stale_after = timedelta(seconds=stale_after_s)
+        self.max_attempts = max_attempts
+        self.__pool: Optional[ProcessPoolExecutor] = None
+        self.__shared_progress = None
+        self.__shared_cancelled = None
+        self.__wakeup: Optional[asyncio.Event] = None
+        self.__tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self.__tasks)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Registers the handler of a job kind."""
+        self.__handlers[kind] = handler
+
+    def start(self) -> None:
+        """Starts the worker tasks and the process pool."""
+        if self.__tasks:
+            return
+        context = multiprocessing.get_context("spawn")
+        self.__shared_progress = context.Array("d", self.workers, lock=False)
+        self.__shared_cancelled = context.Array("b", self.workers, lock=False)
+        self.__pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_process,
+            initargs=(self.__shared_progress, self.__shared_cancelled),
+        )
+        self.__wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self.__tasks = [
+            loop.create_task(self._work(slot)) for slot in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stops the workers and returns their jobs to the queue."""
+        if not self.__tasks:
+            return
+        tasks, self.__tasks = self.__tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+        self.__pool = None
+
+    def notify(self) -> None:
+        """Wakes the workers up after a job was enqueued."""
+        if self.__wakeup is not None:
+            self.__wakeup.set()
+
+    async def _work(self, slot: int) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                self.__wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self.__wakeup.wait(), self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job, slot)
+            except Exception:
+                # The job is taken again once its heartbeats go stale
+                logger.exception("Failed to finish job %s", job.job_id)
+
+    async def _claim(self) -> Optional[JobDto]:
+        async with self.__db_engine.create_session() as session:
+            return await JobsRepository(session).claim_next_job(
+                kinds=list(self.__handlers),
+                stale_after=self.stale_after,
+                max_attempts=self.max_attempts,
+            )
+
+    async def _run(self, job: JobDto, slot: int) -> None:
+        context = JobContext(
+            job,
+            self.__db_engine,
+            self.__pool,
+            self.__shared_progress,
+            self.__shared_cancelled,
+            slot,
+        )
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        handler = loop.create_task(self.__handlers[job.kind](context))
+        heartbeat = loop.create_task(self._heartbeat(context, handler))
+        try:
+            result = await asyncio.shield(handler)
+        except asyncio.CancelledError:
+            if not handler.cancelled():
+                # The runner is stopping, the job goes back to the queue
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+                await self._release(job)
+                raise
+            await self._finish(job, JobStatusEnum.cancelled)
+        except JobCancelledError:
+            await self._finish(job, JobStatusEnum.cancelled)
+        except Exception as error:
+            logger.exception("Job %s failed", job.job_id)
+            await self._finish(job, JobStatusEnum.failed, error=str(error))
+        else:
+            await self._finish(job, JobStatusEnum.succeeded, result=result)
+        finally:
+            heartbeat.cancel()
+            job_duration.observe((loop.time() - started) * 1000)
+
+    async def _heartbeat(
+        self, context: JobContext, handler: asyncio.Task
+    ) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with self.__db_engine.create_session() as session:
+                    cancel_requested = await JobsRepository(
+                        session
+                    ).heartbeat_job(
+                        job_id=context.job.job_id,
+                        attempts=context.job.attempts,
+                        progress=context.progress,
+                    )
+            except Exception:
+                logger.exception(
+                    "Failed to send a heartbeat of job %s", context.job.job_id
+                )
+                continue
+            if cancel_requested:
+                handler.cancel()
+                return
+
+    async def _finish(self, job: JobDto, status: JobStatusEnum, **kwargs):
+        jobs_finished_total[status].inc()
+        async with self.__db_engine.create_session() as session:
+            await JobsRepository(session).finish_job(
+                job_id=job.job_id,
+                attempts=job.attempts,
+                status=status,
+                **kwargs,
+            )
+
+    async def _release(self, job: JobDto) -> None:
+        try:
+            async with self.__db_engine.create_session() as session:
+                await JobsRepository(session).release_job(
+                    job_id=job.job_id, attempts=job.attempts
+                )
+        except Exception:
+            logger.exception("Failed to release job %s", job.job_id)
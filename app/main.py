@@ -3,15 +3,25 @@ from fastapi.exceptions import RequestValidationError
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-from app.api.middlewares import get_middleware
+from app.api.middlewares import (AccessLogMiddleware,
+                                 ConcurrencyLimitMiddleware,
+                                 LoopStallMiddleware, get_middleware)
 from app.api.utils import get_limiter, get_router
+from app.core.concurrency import AdaptiveConcurrencyLimiter
 from app.core.config import settings
 from app.core.events import create_shutdown_handler, create_startup_handler
-from app.core.exceptions import (create_not_found_handler,
+from app.core.exceptions import (NotModifiedError, create_not_found_handler,
+                                 create_not_modified_handler,
                                  create_request_db_conflict_handler,
                                  create_validation_exception_handler)
-from app.database import db_engine
+from app.core.loop_monitor import loop_monitor
+from app.core.response_cache import assignments_cache
+from app.core.structured_logging import access_logger, log_queue
+from app.database import completion_coalescer, db_engine
+from app.database.change_feed import change_feed
 from app.database.error import ConflictWithRequestDBError, NotFoundInDBError
+from app.database.replica import courier_replica
+from app.jobs import job_runner
 
 
 def get_application() -> FastAPI:
@@ -19,14 +29,58 @@ def get_application() -> FastAPI:
         title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION
     )
     application.state.limiter = get_limiter()
+    # Added first to run last, in the task of the endpoint: the middlewares
+    # built on `BaseHTTPMiddleware` run the inner application in another task
+    application.add_middleware(LoopStallMiddleware, monitor=loop_monitor)
     application.add_middleware(get_middleware())
+    if settings.CONCURRENCY_LIMIT_ENABLED:
+        application.state.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=settings.CONCURRENCY_LIMIT_INITIAL,
+            min_limit=settings.CONCURRENCY_LIMIT_MIN,
+            max_limit=settings.CONCURRENCY_LIMIT_MAX,
+            latency_tolerance=settings.CONCURRENCY_LATENCY_TOLERANCE,
+            pool_wait_threshold_ms=settings.CONCURRENCY_POOL_WAIT_THRESHOLD_MS,
+            low_priority_share=settings.CONCURRENCY_LOW_PRIORITY_SHARE,
+            normal_priority_share=settings.CONCURRENCY_NORMAL_PRIORITY_SHARE,
+            queue_timeout_s=settings.CONCURRENCY_QUEUE_TIMEOUT_S,
+            pool_wait_ms=db_engine.pool_wait_ms,
+        )
+        # Added last to run first, shed requests skip the rate limiter
+        application.add_middleware(
+            ConcurrencyLimitMiddleware,
+            limiter=application.state.concurrency_limiter,
+            retry_after_s=settings.CONCURRENCY_RETRY_AFTER_S,
+        )
+    if settings.ACCESS_LOG_ENABLED:
+        # Outermost, shed and rate limited requests are logged too
+        application.add_middleware(AccessLogMiddleware, logger=access_logger)
 
     application.add_event_handler(
-        event_type="startup", func=create_startup_handler(db_engine)
+        event_type="startup",
+        func=create_startup_handler(
+            db_engine,
+            completion_coalescer,
+            job_runner,
+            assignments_cache,
+            loop_monitor,
+            courier_replica,
+            change_feed,
+            log_queue,
+        ),
     )
 
     application.add_event_handler(
-        event_type="shutdown", func=create_shutdown_handler(db_engine)
+        event_type="shutdown",
+        func=create_shutdown_handler(
+            db_engine,
+            completion_coalescer,
+            job_runner,
+            assignments_cache,
+            loop_monitor,
+            courier_replica,
+            change_feed,
+            log_queue,
+        ),
     )
 
     application.add_exception_handler(
@@ -44,6 +98,11 @@ def get_application() -> FastAPI:
         handler=create_request_db_conflict_handler(),
     )
 
+    application.add_exception_handler(
+        exc_class_or_status_code=NotModifiedError,
+        handler=create_not_modified_handler(),
+    )
+
     application.add_exception_handler(
         exc_class_or_status_code=RequestValidationError,
         handler=create_validation_exception_handler(),
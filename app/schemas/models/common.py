@@ -1,11 +1,24 @@
 import re
 from datetime import time
+from operator import itemgetter
+from typing import Any, Iterable, Optional, Type, TypeVar
 
 from pydantic import BaseModel, validator
 from pydantic.types import conint, constr
 
-int32 = conint(strict=False, ge=-(2**31), le=2**31 - 1)
-int64 = conint(strict=False, ge=-(2**63), le=2**63 - 1)
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+INT64_MIN, INT64_MAX = -(2**63), 2**63 - 1
+
+int32 = conint(strict=False, ge=INT32_MIN, le=INT32_MAX)
+int64 = conint(strict=False, ge=INT64_MIN, le=INT64_MAX)
+
+# Minutes since midnight for every valid "HH:MM" string, so that bulk
+# validation parses interval halves with a dictionary lookup.
+MINUTES_BY_TIME = {
+    f"{hour:02d}:{minute:02d}": hour * 60 + minute
+    for hour in range(24)
+    for minute in range(60)
+}
 
 
 class Hours(BaseModel):
@@ -78,3 +91,92 @@ class HoursList(list[Hours]):
         if errors:
             raise ValueError(errors)
         return hours
+
+
+def ints_in_range(column: Iterable[Any], minimum: int, maximum: int) -> bool:
+    """
+    Checks that every value of a column is a plain integer within bounds.
+
+    Booleans and floats are rejected even though pydantic would coerce
+    them, so that such values go through the regular validation.
+    """
+    return all(
+        type(value) is int and minimum <= value <= maximum for value in column
+    )
+
+
+def parse_hours(hours: Any) -> Optional[tuple[int, int]]:
+    """
+    Parses an "HH:MM-HH:MM" string into start and end minutes.
+
+    Returns:
+        The interval in minutes since midnight, or `None` if the string is
+        not in the canonical format or ends before it starts.
+    """
+    if type(hours) is not str or len(hours) != 11 or hours[5] != "-":
+        return None
+    start = MINUTES_BY_TIME.get(hours[:5])
+    end = MINUTES_BY_TIME.get(hours[6:])
+    if start is None or end is None or end < start:
+        return None
+    return start, end
+
+
+def hours_lists_are_valid(column: Iterable[Any]) -> bool:
+    """
+    Checks a column of hours lists in a single pass.
+
+    Every string is parsed into integer minutes and the lists are checked
+    with the same rules as `HoursList.working_hours_validator`: an interval
+    can not end before it starts and neighbouring intervals sorted by start
+    can not intersect.
+
+    Returns:
+        `True` if `HoursList` would accept every list of the column as is.
+    """
+    by_start = itemgetter(0)
+    for hours in column:
+        if type(hours) is not list:
+            return False
+        intervals = [parse_hours(hour) for hour in hours]
+        if None in intervals:
+            return False
+        if len(intervals) < 2:
+            continue
+        intervals.sort(key=by_start)
+        for (start, end), (next_start, next_end) in zip(
+            intervals, intervals[1:]
+        ):
+            if next_start < end < next_end or start < next_start < end:
+                return False
+    return True
+
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+def construct_many(
+    model: Type[Model], fields: tuple[str, ...], rows: Iterable[tuple]
+) -> list[Model]:
+    """
+    Creates models from already validated values without validation.
+
+    It is a cheaper equivalent of calling `model.construct` for every row
+    when all the model fields are given.
+
+    Parameters:
+        model: The model class to create.
+        fields: The names of the fields in the order of the row values.
+        rows: Tuples of field values.
+
+    Returns:
+        A list of the created models.
+    """
+    new, set_attribute = model.__new__, object.__setattr__
+    models = []
+    for row in rows:
+        instance = new(model)
+        set_attribute(instance, "__dict__", dict(zip(fields, row)))
+        set_attribute(instance, "__fields_set__", set(fields))
+        models.append(instance)
+    return models
@@ -1,9 +1,11 @@
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
-from app.schemas.models.common import HoursList, int32, int64
+from app.schemas.models.common import (INT32_MAX, INT32_MIN, HoursList,
+                                       construct_many, hours_lists_are_valid,
+                                       int32, int64, ints_in_range)
 
 
 class CourierTypeEnum(str, Enum):
@@ -17,6 +19,47 @@ class CreateCourierDto(BaseModel):
     regions: list[int32]
     working_hours: HoursList
 
+    @classmethod
+    def validate_batch(
+        cls, items: Any
+    ) -> Optional[list["CreateCourierDto"]]:
+        """
+        Validates a whole list of couriers column by column.
+
+        Returns:
+            The constructed couriers, or `None` if any item needs the regular
+            per-item validation, either to be coerced or to be reported.
+        """
+        if type(items) is not list or not all(
+            type(item) is dict for item in items
+        ):
+            return None
+        try:
+            courier_types = [item["courier_type"] for item in items]
+            regions = [item["regions"] for item in items]
+            working_hours = [item["working_hours"] for item in items]
+        except KeyError:
+            return None
+        types = CourierTypeEnum._value2member_map_
+        if not (
+            all(
+                type(courier_type) is str and courier_type in types
+                for courier_type in courier_types
+            )
+            and all(type(region) is list for region in regions)
+            and all(
+                ints_in_range(region, INT32_MIN, INT32_MAX)
+                for region in regions
+            )
+            and hours_lists_are_valid(working_hours)
+        ):
+            return None
+        return construct_many(
+            cls,
+            ("courier_type", "regions", "working_hours"),
+            zip(map(types.get, courier_types), regions, working_hours),
+        )
+
 
 class CourierDto(CreateCourierDto):
     courier_id: Optional[int64]
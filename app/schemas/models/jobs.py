@@ -0,0 +1,30 @@
+from datetime import datetime
+from enum import Enum
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from app.schemas.models.common import int64
+
+
+class JobStatusEnum(str, Enum):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    cancelled = "cancelled"
+
+
+class JobDto(BaseModel):
+    job_id: int64
+    kind: str
+    status: JobStatusEnum
+    progress: float
+    params: dict[str, Any]
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class LoopStallDto(BaseModel):
+    route: Optional[str]
+    endpoint: Optional[str]
+    blocked_ms: float
+    stack: list[str]
+    recorded_at: datetime
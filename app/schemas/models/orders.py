@@ -1,9 +1,12 @@
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
-from app.schemas.models.common import HoursList, int32, int64
+from app.schemas.models.common import (INT32_MAX, INT32_MIN, HoursList,
+                                       construct_many, hours_lists_are_valid,
+                                       int32, int64, ints_in_range)
 
 
 class CreateOrderDto(BaseModel):
@@ -12,6 +15,41 @@ class CreateOrderDto(BaseModel):
     delivery_hours: HoursList
     cost: int32
 
+    @classmethod
+    def validate_batch(
+        cls, items: Any
+    ) -> Optional[list["CreateOrderDto"]]:
+        """
+        Validates a whole list of orders column by column.
+
+        Returns:
+            The constructed orders, or `None` if any item needs the regular
+            per-item validation, either to be coerced or to be reported.
+        """
+        if type(items) is not list or not all(
+            type(item) is dict for item in items
+        ):
+            return None
+        try:
+            weights = [item["weight"] for item in items]
+            regions = [item["regions"] for item in items]
+            delivery_hours = [item["delivery_hours"] for item in items]
+            costs = [item["cost"] for item in items]
+        except KeyError:
+            return None
+        if not (
+            all(type(weight) in (int, float) for weight in weights)
+            and ints_in_range(regions, INT32_MIN, INT32_MAX)
+            and ints_in_range(costs, INT32_MIN, INT32_MAX)
+            and hours_lists_are_valid(delivery_hours)
+        ):
+            return None
+        return construct_many(
+            cls,
+            ("weight", "regions", "delivery_hours", "cost"),
+            zip(map(float, weights), regions, delivery_hours, costs),
+        )
+
 
 class OrderDto(CreateOrderDto):
     order_id: int64
@@ -32,3 +70,54 @@ class GroupOrders(BaseModel):
 class CouriersGroupOrders(BaseModel):
     courier_id: int64
     orders: list[GroupOrders]
+
+
+class DeliveryScoreDto(BaseModel):
+    order_id: int64
+    delivered_minute: int
+    on_time: bool
+
+
+class GroupScoreDto(BaseModel):
+    group_order_id: int64
+    start_minute: int
+    end_minute: int
+    cost: float
+    violations: list[str]
+    deliveries: list[DeliveryScoreDto]
+
+
+class CourierScoreDto(BaseModel):
+    courier_id: int64
+    groups: int
+    orders: int
+    cost: float
+    busy_minutes: int
+    shift_minutes: int
+    utilisation: float
+    timeline: Optional[list[GroupScoreDto]] = None
+
+
+class CandidateGroupDto(BaseModel):
+    order_ids: list[int64]
+    start_minute: int
+    end_minute: int
+    weight: float
+    cost: float
+
+
+class AssignmentModeEnum(str, Enum):
+    greedy = "greedy"
+    optimal = "optimal"
+
+
+class HistoryBucketEnum(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+class CompletionHistoryBucket(BaseModel):
+    bucket_start: datetime
+    courier_id: Optional[int64] = None
+    orders_count: int
+    cost_sum: int
@@ -0,0 +1,15 @@
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class SlowQueryDto(BaseModel):
+    statement: str
+    parameters: list[str]
+    duration_ms: float
+    recorded_at: datetime
+
+
+class QueryPlanDto(SlowQueryDto):
+    plan: Any
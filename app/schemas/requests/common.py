@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+from app.schemas.models.common import int64
+
+
+class IdsRequest(BaseModel):
+    ids: list[int64]
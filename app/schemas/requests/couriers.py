@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic import BaseModel
 
 from app.schemas.models.couriers import CreateCourierDto
@@ -5,3 +7,12 @@ from app.schemas.models.couriers import CreateCourierDto
 
 class CreateCourierRequest(BaseModel):
     couriers: list[CreateCourierDto]
+
+    @classmethod
+    def validate(cls, value: Any) -> "CreateCourierRequest":
+        # See `CreateOrderRequest.validate`.
+        if type(value) is dict:
+            couriers = CreateCourierDto.validate_batch(value.get("couriers"))
+            if couriers is not None:
+                return cls.construct(couriers=couriers)
+        return super().validate(value)
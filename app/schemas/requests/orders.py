@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic import BaseModel
 
 from app.schemas.models.orders import CompleteOrder, CreateOrderDto
@@ -6,6 +8,17 @@ from app.schemas.models.orders import CompleteOrder, CreateOrderDto
 class CreateOrderRequest(BaseModel):
     orders: list[CreateOrderDto]
 
+    @classmethod
+    def validate(cls, value: Any) -> "CreateOrderRequest":
+        # Bulk uploads are checked column by column first; requests that need
+        # coercion or have errors fall back to the per-item validation, which
+        # builds the error payload.
+        if type(value) is dict:
+            orders = CreateOrderDto.validate_batch(value.get("orders"))
+            if orders is not None:
+                return cls.construct(orders=orders)
+        return super().validate(value)
+
 
 class CompleteOrderRequestDto(BaseModel):
     complete_info: list[CompleteOrder]
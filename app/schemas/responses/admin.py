@@ -0,0 +1,21 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.schemas.models.loop import LoopStallDto
+from app.schemas.models.queries import QueryPlanDto, SlowQueryDto
+
+
+class SlowQueriesResponse(BaseModel):
+    threshold_ms: float
+    queries: list[SlowQueryDto]
+    plans: list[QueryPlanDto]
+
+
+class LoopStallsResponse(BaseModel):
+    threshold_ms: float
+    stalls: list[LoopStallDto]
+
+
+class MetricsResponse(BaseModel):
+    metrics: dict[str, dict[str, Any]]
@@ -2,7 +2,7 @@ from typing import Optional
 
 from pydantic import BaseModel
 
-from app.schemas.models.common import int32
+from app.schemas.models.common import int32, int64
 from app.schemas.models.couriers import CourierDto
 
 
@@ -16,6 +16,17 @@ class GetCouriersResponse(BaseModel):
     offset: int32
 
 
+class GetCouriersByIdsResponse(BaseModel):
+    couriers: list[CourierDto]
+    missing_ids: list[int64]
+
+
 class GetCourierMetaInfoResponse(CourierDto):
     rating: Optional[int32]
     earnings: Optional[int32]
+
+
+class GetCouriersMetaInfoResponse(BaseModel):
+    couriers: list[GetCourierMetaInfoResponse]
+    limit: Optional[int32]
+    offset: int32
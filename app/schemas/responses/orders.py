@@ -1,10 +1,41 @@
 from datetime import date
+from typing import Optional
 
 from pydantic import BaseModel
 
-from app.schemas.models.orders import CouriersGroupOrders
+from app.schemas.models.common import int64
+from app.schemas.models.couriers import CourierTypeEnum
+from app.schemas.models.orders import (CandidateGroupDto, CourierScoreDto,
+                                       CouriersGroupOrders, OrderDto)
+
+
+class GetOrdersByIdsResponse(BaseModel):
+    orders: list[OrderDto]
+    missing_ids: list[int64]
 
 
 class OrderAssignResponse(BaseModel):
     date: date
     couriers: list[CouriersGroupOrders]
+
+
+class AssignmentScoreResponse(BaseModel):
+    date: date
+    groups: int
+    assigned_orders: int
+    unassigned_orders: int
+    late_orders: int
+    cost: float
+    saved_cost: float
+    objective: Optional[float]
+    feasible: bool
+    utilisation: float
+    violations: dict[str, int]
+    couriers: list[CourierScoreDto]
+
+
+class CandidateGroupsResponse(BaseModel):
+    region: int
+    slot_start_minute: int
+    courier_type: CourierTypeEnum
+    groups: list[CandidateGroupDto]
@@ -0,0 +1,120 @@
+"""
+Greedy and optimal assignment compared on synthetic days.
+
+Every day has couriers of random types working one or two disjoint
+intervals in up to three of `--regions` regions and orders with a delivery
+window of two to four hours. For every day size and budget the report shows
+the runtime, the objective (the cost of the groups plus the penalised cost of
+the unassigned orders) and the number of assigned orders of both modes, and
+the gap of the optimal plan to the lower bound.
+
+Usage:
+
+    python -m benchmarks.assignment_modes --days 20:500 50:1500 --budget-ms 500 2000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.assignment.greedy import assign_greedy
+from app.assignment.optimal import assign_optimal
+from app.assignment.plan import PlanningCourier, PlanningOrder
+from app.assignment.rules import COURIER_RULES
+from app.assignment.simulator import score_plan
+from app.schemas.models.couriers import CourierTypeEnum
+
+SHIFTS = [((480, 1200),), ((480, 720), (780, 1200)), ((600, 900),)]
+
+
+def synthetic_day(couriers: int, orders: int, regions: int, rng):
+    """Creates the couriers and the orders of a day."""
+    day_couriers = []
+    for courier_id in range(1, couriers + 1):
+        courier_type = rng.choice(list(CourierTypeEnum))
+        day_couriers.append(
+            PlanningCourier(
+                courier_id=courier_id,
+                courier_type=courier_type,
+                regions=frozenset(
+                    rng.sample(
+                        range(1, regions + 1),
+                        min(regions, COURIER_RULES[courier_type].max_regions),
+                    )
+                ),
+                shifts=rng.choice(SHIFTS),
+            )
+        )
+    day_orders = []
+    for order_id in range(1, orders + 1):
+        start = rng.randrange(480, 1080, 30)
+        day_orders.append(
+            PlanningOrder(
+                order_id=order_id,
+                weight=rng.uniform(0.5, 15),
+                region=rng.randint(1, regions),
+                cost=rng.randint(50, 500),
+                windows=((start, start + rng.choice((120, 180, 240))),),
+            )
+        )
+    return day_couriers, day_orders
+
+
+def main(args: argparse.Namespace) -> list[dict]:
+    rng = random.Random(args.seed)
+    reports = []
+    for day in args.days:
+        couriers, orders = synthetic_day(*day, args.regions, rng)
+        started = time.perf_counter()
+        greedy = assign_greedy(couriers, orders)
+        greedy_ms = (time.perf_counter() - started) * 1000
+        greedy_score = score_plan(couriers, orders, greedy)
+        for budget_ms in args.budget_ms:
+            started = time.perf_counter()
+            result = assign_optimal(couriers, orders, budget_ms)
+            optimal_ms = (time.perf_counter() - started) * 1000
+            reports.append(
+                {
+                    "couriers": len(couriers),
+                    "orders": len(orders),
+                    "budget_ms": budget_ms,
+                    "greedy_ms": round(greedy_ms, 1),
+                    "optimal_ms": round(optimal_ms, 1),
+                    "greedy_objective": round(greedy_score.objective(), 1),
+                    "optimal_objective": round(result.objective, 1),
+                    "improvement": round(
+                        1 - result.objective / greedy_score.objective(), 4
+                    ),
+                    "lower_bound": round(result.lower_bound, 1),
+                    "gap": round(result.gap, 4),
+                    "greedy_assigned": greedy.assigned_orders,
+                    "optimal_assigned": result.plan.assigned_orders,
+                    "searched_subproblems": result.searched_subproblems,
+                    "subproblems": result.subproblems,
+                    "timed_out": result.timed_out,
+                }
+            )
+    return reports
+
+
+def day_size(value: str) -> tuple[int, int]:
+    couriers, orders = value.split(":")
+    return int(couriers), int(orders)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--days",
+        type=day_size,
+        nargs="+",
+        default=[(20, 500), (50, 1500), (100, 3000)],
+        help="Day sizes as COURIERS:ORDERS",
+    )
+    parser.add_argument(
+        "--budget-ms", type=float, nargs="+", default=[500, 2000]
+    )
+    parser.add_argument("--regions", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,121 @@
+"""
+Microbenchmarks of request validation, DB-row-to-DTO conversion and
+response serialization.
+
+Run with `make bench`; `make bench-baseline` stores the JSON baseline the
+runs are compared against.
+"""
+
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.database.repositories.couriers import CouriersRepository
+from app.database.repositories.orders import OrdersRepository
+from app.schemas.models.common import Hours, HoursList
+from app.schemas.models.orders import CouriersGroupOrders, GroupOrders
+from app.schemas.requests.couriers import CreateCourierRequest
+from app.schemas.requests.orders import CreateOrderRequest
+from app.schemas.responses.orders import OrderAssignResponse
+from benchmarks.conftest import (SIZES, make_couriers, make_orders,
+                                 run_coroutine)
+
+
+def test_hours(benchmark):
+    benchmark(Hours, hours="10:00-12:30")
+
+
+@pytest.mark.parametrize("size", [1, 4, 16])
+def test_hours_list(benchmark, size):
+    hours = [f"{hour:02d}:00-{hour:02d}:30" for hour in range(size)]
+    benchmark(HoursList.working_hours_validator, hours)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_create_order_request(benchmark, rng, size):
+    payload = {"orders": make_orders(rng, size)}
+    benchmark(CreateOrderRequest.validate, payload)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_create_courier_request(benchmark, rng, size):
+    payload = {"couriers": make_couriers(rng, size)}
+    benchmark(CreateCourierRequest.validate, payload)
+
+
+def order_rows(rng, size):
+    return [
+        SimpleNamespace(
+            **order, order_id=order_id, complete_time=None, courier_id=1
+        )
+        for order_id, order in enumerate(make_orders(rng, size), start=1)
+    ]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_order_rows_to_dto(benchmark, rng, size):
+    rows = order_rows(rng, size)
+
+    def convert():
+        return [
+            run_coroutine(OrdersRepository._get_order_from_db_row(row))
+            for row in rows
+        ]
+
+    benchmark(convert)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_courier_rows_to_dto(benchmark, rng, size):
+    rows = [
+        SimpleNamespace(**courier, courier_id=courier_id)
+        for courier_id, courier in enumerate(make_couriers(rng, size), 1)
+    ]
+
+    def convert():
+        return [
+            run_coroutine(CouriersRepository._get_courier_from_db_row(row))
+            for row in rows
+        ]
+
+    benchmark(convert)
+
+
+def assignment_response(rng, size):
+    orders = [
+        run_coroutine(OrdersRepository._get_order_from_db_row(row))
+        for row in order_rows(rng, size)
+    ]
+    couriers = [
+        CouriersGroupOrders(
+            courier_id=courier_id,
+            orders=[
+                GroupOrders(
+                    group_order_id=courier_id,
+                    orders=orders[courier_id::10],
+                )
+            ],
+        )
+        for courier_id in range(min(size, 10))
+    ]
+    return OrderAssignResponse(date=date(2023, 1, 20), couriers=couriers)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_assignments_response_serialization(benchmark, rng, size):
+    response = assignment_response(rng, size)
+    field = create_response_field(
+        name="response", type_=OrderAssignResponse
+    )
+
+    def serialize():
+        return run_coroutine(
+            serialize_response(
+                field=field, response_content=response, exclude_none=True
+            )
+        )
+
+    benchmark(serialize)
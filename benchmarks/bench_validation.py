@@ -0,0 +1,43 @@
+"""
+Benchmarks of bulk request validation: the column-wise batch path against
+the regular per-item pydantic validation, at 50k items.
+"""
+
+import pytest
+from pydantic import BaseModel
+
+from app.schemas.requests.couriers import CreateCourierRequest
+from app.schemas.requests.orders import CreateOrderRequest
+from benchmarks.conftest import make_couriers, make_orders
+
+BULK_SIZE = 50_000
+
+
+def per_item(request_cls, payload):
+    return BaseModel.validate.__func__(request_cls, payload)
+
+
+@pytest.fixture(scope="module")
+def orders_payload(rng):
+    return {"orders": make_orders(rng, BULK_SIZE)}
+
+
+@pytest.fixture(scope="module")
+def couriers_payload(rng):
+    return {"couriers": make_couriers(rng, BULK_SIZE)}
+
+
+def test_orders_batch(benchmark, orders_payload):
+    benchmark(CreateOrderRequest.validate, orders_payload)
+
+
+def test_orders_per_item(benchmark, orders_payload):
+    benchmark(per_item, CreateOrderRequest, orders_payload)
+
+
+def test_couriers_batch(benchmark, couriers_payload):
+    benchmark(CreateCourierRequest.validate, couriers_payload)
+
+
+def test_couriers_per_item(benchmark, couriers_payload):
+    benchmark(per_item, CreateCourierRequest, couriers_payload)
@@ -0,0 +1,30 @@
+import random
+from typing import Any, Coroutine
+
+import pytest
+
+from benchmarks.load import random_courier, random_order
+
+SIZES = [1, 100, 10_000]
+
+
+def run_coroutine(coroutine: Coroutine) -> Any:
+    """Drives a coroutine that never suspends without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("The coroutine suspended")
+
+
+@pytest.fixture(scope="session")
+def rng() -> random.Random:
+    return random.Random(2023)
+
+
+def make_orders(rng: random.Random, size: int) -> list[dict[str, Any]]:
+    return [random_order(rng, regions=20) for _ in range(size)]
+
+
+def make_couriers(rng: random.Random, size: int) -> list[dict[str, Any]]:
+    return [random_courier(rng, regions=20) for _ in range(size)]
@@ -0,0 +1,133 @@
+"""
+Memory footprint and lookup latency of the in-memory courier replica.
+
+Couriers with 1-3 regions out of `--regions` and 1-3 working hours out of a
+few dozen intervals are generated, then loaded into `CourierColumns` and,
+for comparison, into a list of `CourierDto` objects as the database reads
+build them. The footprints are measured with `tracemalloc`, the DTO list is
+measured for `--dto-sample` couriers and extrapolated.
+
+Usage:
+
+    python -m benchmarks.courier_replica --couriers 1000000
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from app.database.replica import COURIER_TYPES, DTO_FIELDS, CourierColumns
+from app.schemas.models.common import construct_many
+from app.schemas.models.couriers import CourierDto
+from benchmarks.load import percentile
+
+HOURS = [
+    f"{start:02}:{minute:02}-{start + length:02}:{minute:02}"
+    for start in range(6, 20)
+    for minute in (0, 30)
+    for length in (1, 2, 4)
+    if start + length < 24
+]
+
+
+def generate(count: int, regions: int, seed: int):
+    """Yields couriers in the order of the load query."""
+    generator = random.Random(seed)
+    for courier_id in range(1, count + 1):
+        yield (
+            courier_id,
+            generator.choice(COURIER_TYPES).value,
+            generator.sample(range(1, regions + 1), generator.randint(1, 3)),
+            generator.sample(HOURS, generator.randint(1, 3)),
+            1,
+        )
+
+
+def measure_memory(build) -> tuple[object, int]:
+    """Returns the built object and the memory it took."""
+    tracemalloc.start()
+    built = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, size
+
+
+def lookups(call, keys: list) -> dict:
+    latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        call(key)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    return {
+        "p50_us": percentile(latencies, 0.50),
+        "p99_us": percentile(latencies, 0.99),
+    }
+
+
+def load_columns(rows) -> CourierColumns:
+    columns = CourierColumns()
+    for row in rows:
+        columns.upsert(*row)
+    return columns
+
+
+def load_dtos(args: argparse.Namespace) -> list[CourierDto]:
+    return construct_many(
+        CourierDto,
+        DTO_FIELDS,
+        [
+            row[:-1]
+            for row in generate(args.dto_sample, args.regions, args.seed)
+        ],
+    )
+
+
+def main(args: argparse.Namespace) -> dict:
+    # Tracing slows the allocations down, the load is timed separately
+    rows = list(generate(args.couriers, args.regions, args.seed))
+    started = time.perf_counter()
+    load_columns(rows)
+    load_s = time.perf_counter() - started
+    del rows
+    columns, columns_bytes = measure_memory(
+        lambda: load_columns(generate(args.couriers, args.regions, args.seed))
+    )
+    _, dto_bytes = measure_memory(lambda: load_dtos(args))
+    dto_bytes = dto_bytes * args.couriers // args.dto_sample
+    generator = random.Random(args.seed)
+    ids = [generator.randint(1, args.couriers) for _ in range(args.lookups)]
+    regions = [
+        generator.randint(1, args.regions) for _ in range(args.lookups // 10)
+    ]
+    return {
+        "couriers": len(columns),
+        "columns": {
+            "nbytes": columns.nbytes,
+            "traced_bytes": columns_bytes,
+            "bytes_per_courier": columns_bytes / len(columns),
+            "load_s": load_s,
+        },
+        "dto_list": {
+            "traced_bytes_extrapolated": dto_bytes,
+            "bytes_per_courier": dto_bytes / args.couriers,
+        },
+        "get": lookups(columns.get, ids),
+        "find_region": lookups(lambda r: columns.find(region=r), regions),
+        "find_region_and_type": lookups(
+            lambda r: columns.find(region=r, courier_type=COURIER_TYPES[0]),
+            regions,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--couriers", type=int, default=1_000_000)
+    parser.add_argument("--regions", type=int, default=500)
+    parser.add_argument("--dto-sample", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    print(json.dumps(main(parser.parse_args()), indent=2))
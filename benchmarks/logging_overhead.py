@@ -0,0 +1,156 @@
+"""
+The time the access log adds to a request on the event loop.
+
+A minimal ASGI application answering with a small JSON body is called
+`--requests` times on the loop in every mode: without the access log
+middleware (`off`), with the middleware and the log level above INFO
+(`disabled`), with the records sent through the bounded queue to a file
+written by the listener thread (`queue`) and with a file handler formatting
+and writing the records on the loop (`direct`). With `--sink-delay-ms` every
+write of the file handler is slowed down, like a congested disk or pipe: the
+direct handler stalls the loop, the queue drops the records it can not keep
+up with. The report shows the time of a request in microseconds, the written
+and the dropped records.
+
+Usage:
+
+    python -m benchmarks.logging_overhead --requests 20000 --sink-delay-ms 0 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from app.api.middlewares import AccessLogMiddleware
+from app.core.structured_logging import (DroppingQueueHandler, JsonFormatter,
+                                         records_dropped_total)
+from benchmarks.load import percentile
+
+MODES = ["off", "disabled", "queue", "direct"]
+BODY = json.dumps({"order_id": 1, "cost": 100}).encode()
+
+
+class SlowFileHandler(logging.FileHandler):
+    """A file handler sleeping before every write."""
+
+    def __init__(self, path: str, delay_s: float) -> None:
+        super().__init__(path)
+        self.delay_s = delay_s
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        super().emit(record)
+
+
+async def application(scope, receive, send) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send({"type": "http.response.body", "body": BODY})
+
+
+async def send(message) -> None:
+    pass
+
+
+async def serve(app, requests: int) -> list[float]:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/orders/1",
+        "query_string": b"",
+        "client": ("127.0.0.1", 50000),
+    }
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await app(scope, None, send)
+        timings.append((time.perf_counter() - started) * 1e6)
+        # Let other tasks run between the requests, like a server does
+        await asyncio.sleep(0)
+    return timings
+
+
+def run_mode(
+    mode: str, requests: int, delay_ms: float, queue_size: int, path: str
+) -> dict:
+    logger = logging.getLogger(f"benchmarks.access.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.WARNING if mode == "disabled" else logging.INFO)
+    target = SlowFileHandler(path, delay_ms / 1000)
+    target.setFormatter(JsonFormatter())
+    listener = None
+    if mode == "queue":
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, target)
+        listener.start()
+        logger.addHandler(DroppingQueueHandler(records, queue_size))
+    else:
+        logger.addHandler(target)
+    app = (
+        application
+        if mode == "off"
+        else AccessLogMiddleware(application, logger)
+    )
+    dropped = records_dropped_total.value
+
+    started = time.perf_counter()
+    timings = sorted(asyncio.run(serve(app, requests)))
+    loop_s = time.perf_counter() - started
+    if listener is not None:
+        listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    target.close()
+    with open(path) as file:
+        written = sum(1 for _ in file)
+    os.remove(path)
+
+    return {
+        "mode": mode,
+        "sink_delay_ms": delay_ms,
+        "requests": requests,
+        "loop_s": round(loop_s, 3),
+        "mean_us": round(sum(timings) / len(timings), 2),
+        "p50_us": round(percentile(timings, 0.5), 2),
+        "p99_us": round(percentile(timings, 0.99), 2),
+        "max_us": round(timings[-1], 2),
+        "written": written,
+        "dropped": records_dropped_total.value - dropped,
+    }
+
+
+def main(args: argparse.Namespace) -> list[dict]:
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "access.log")
+        for delay_ms in args.sink_delay_ms:
+            for mode in args.modes:
+                reports.append(
+                    run_mode(
+                        mode, args.requests, delay_ms, args.queue_size, path
+                    )
+                )
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument(
+        "--sink-delay-ms", type=float, nargs="+", default=[0, 0.2]
+    )
+    parser.add_argument("--queue-size", type=int, default=10_000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,104 @@
+"""
+Runtime of the shift simulator on large synthetic days.
+
+Every courier works from 08:00 to 20:00 in up to three regions and gets
+back-to-back groups of one to seven orders of its regions. The report shows
+the time to flatten the plan from the planning dataclasses and the time of
+the simulation itself, the best of `--repeat` runs.
+
+Usage:
+
+    python -m benchmarks.shift_simulator --groups 10000 50000 100000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.assignment.plan import (DayPlan, DeliveryGroup, PlanningCourier,
+                                 PlanningOrder)
+from app.assignment.rules import COURIER_RULES
+from app.assignment.simulator import PlanArrays, simulate
+from app.schemas.models.couriers import CourierTypeEnum
+
+
+def synthetic_day(groups: int, rng: random.Random):
+    """Creates a feasible day plan with the given number of groups."""
+    couriers, orders, plan = [], [], DayPlan()
+    courier, minute = None, 0
+    for _ in range(groups):
+        if courier is None or minute > 1080:
+            courier_type = rng.choice(list(CourierTypeEnum))
+            courier = PlanningCourier(
+                courier_id=len(couriers) + 1,
+                courier_type=courier_type,
+                regions=frozenset(
+                    rng.sample(
+                        range(1, 200),
+                        COURIER_RULES[courier_type].max_regions,
+                    )
+                ),
+                shifts=((480, 1200),),
+            )
+            couriers.append(courier)
+            minute = 480
+        rules = COURIER_RULES[courier.courier_type]
+        region = rng.choice(sorted(courier.regions))
+        group = DeliveryGroup(courier.courier_id, minute, minute, [], 0)
+        for _ in range(rng.randint(1, rules.max_orders)):
+            order = PlanningOrder(
+                order_id=len(orders) + 1,
+                weight=rules.max_weight / rules.max_orders,
+                region=region,
+                cost=rng.randint(50, 500),
+                windows=((480, 1200),),
+            )
+            orders.append(order)
+            group.order_ids.append(order.order_id)
+        plan.groups.append(group)
+        minute += rules.first_order_minutes + rules.next_order_minutes * (
+            len(group.order_ids) - 1
+        )
+    return couriers, orders, plan
+
+
+def best_of(repeat: int, call) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(args: argparse.Namespace) -> list[dict]:
+    rng = random.Random(args.seed)
+    reports = []
+    for groups in args.groups:
+        couriers, orders, plan = synthetic_day(groups, rng)
+        build_s, arrays = best_of(
+            args.repeat, lambda: PlanArrays.build(couriers, orders, plan)
+        )
+        simulate_s, simulation = best_of(args.repeat, lambda: simulate(arrays))
+        reports.append(
+            {
+                "groups": groups,
+                "couriers": len(couriers),
+                "orders": len(orders),
+                "feasible": simulation.feasible,
+                "build_ms": build_s * 1000,
+                "simulate_ms": simulate_s * 1000,
+            }
+        )
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--groups", type=int, nargs="+", default=[10_000, 50_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    print(json.dumps(main(parser.parse_args()), indent=2))
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from app.assignment.greedy import assign_greedy
+from app.assignment.plan import PlanningCourier, PlanningOrder
+from app.assignment.rules import COURIER_RULES
+from app.schemas.models.couriers import CourierTypeEnum
+
+HOURS = [(540, 660), (600, 1080), (900, 1020), (480, 1200)]
+
+
+def random_day(rng: random.Random):
+    couriers = [
+        PlanningCourier(
+            courier_id=courier_id,
+            courier_type=rng.choice(list(CourierTypeEnum)),
+            regions=frozenset(rng.sample(range(1, 6), rng.randint(1, 3))),
+            shifts=tuple(sorted(rng.sample(HOURS, rng.randint(1, 2)))),
+        )
+        for courier_id in range(1, 21)
+    ]
+    orders = [
+        PlanningOrder(
+            order_id=order_id,
+            weight=rng.uniform(0.5, 15),
+            region=rng.randint(1, 5),
+            cost=rng.randint(50, 500),
+            windows=(rng.choice(HOURS),),
+        )
+        for order_id in range(1, 501)
+    ]
+    return couriers, orders
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_greedy_plan_respects_courier_rules(seed: int):
+    couriers, orders = random_day(random.Random(seed))
+    by_id = {order.order_id: order for order in orders}
+    courier_by_id = {courier.courier_id: courier for courier in couriers}
+    plan = assign_greedy(couriers, orders)
+
+    assigned = [
+        order_id for group in plan.groups for order_id in group.order_ids
+    ]
+    assert sorted(assigned + plan.unassigned_order_ids) == sorted(by_id)
+    assert plan.assigned_orders > 0
+    for group in plan.groups:
+        courier = courier_by_id[group.courier_id]
+        rules = COURIER_RULES[courier.courier_type]
+        group_orders = [by_id[order_id] for order_id in group.order_ids]
+        regions = {order.region for order in group_orders}
+        assert len(group_orders) <= rules.max_orders
+        assert len(regions) <= rules.max_regions
+        assert regions <= courier.regions
+        assert sum(order.weight for order in group_orders) <= rules.max_weight
+        assert any(
+            start <= group.start_minute and group.end_minute <= end
+            for start, end in courier.shifts
+        )
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.schemas.requests.couriers import CreateCourierRequest
+from app.schemas.requests.orders import CreateOrderRequest
+
+HOURS = [
+    '10:00-12:00', '11:00-13:00', '12:00-14:00', '10:00-09:00', '23:59-23:59',
+    '24:00-25:00', '10:00-12:00 ', '9:00-10:00', 10, None, '',
+]
+VALUES = [1, 0, -1, 2**31, 1.5, 2.0, True, '3', None, 'x', [1]]
+
+
+def random_order(rng):
+    order = {
+        'weight': rng.choice(VALUES + [0.5, 12.25]),
+        'regions': rng.choice(VALUES),
+        'delivery_hours': rng.sample(HOURS, k=rng.randint(0, 3)),
+        'cost': rng.choice(VALUES),
+    }
+    if rng.random() < 0.05:
+        order.pop(rng.choice(list(order)))
+    return order
+
+
+def random_courier(rng):
+    return {
+        'courier_type': rng.choice(['FOOT', 'BIKE', 'AUTO', 'foot', 1]),
+        'regions': rng.sample(VALUES, k=rng.randint(0, 3)),
+        'working_hours': rng.sample(HOURS, k=rng.randint(0, 3)),
+    }
+
+
+def validate(validator, payload):
+    try:
+        return validator(payload).dict()
+    except ValidationError as error:
+        return error.errors()
+
+
+@pytest.mark.parametrize(
+    'request_cls, key, factory',
+    [
+        (CreateOrderRequest, 'orders', random_order),
+        (CreateCourierRequest, 'couriers', random_courier),
+    ],
+)
+@pytest.mark.parametrize('seed', range(200))
+def test_batch_validation_matches_per_item(request_cls, key, factory, seed):
+    rng = random.Random(seed)
+
+    def per_item(value):
+        return BaseModel.validate.__func__(request_cls, value)
+
+    valid_only = seed % 2 == 0
+    size = rng.randint(1, 5)
+    items = []
+    while len(items) < size:
+        item = factory(rng)
+        is_valid = isinstance(validate(per_item, {key: [item]}), dict)
+        if is_valid or not valid_only:
+            items.append(item)
+    payload = {key: items}
+
+    assert validate(request_cls.validate, payload) == validate(
+        per_item, payload
+    )
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from app.assignment.candidates import (SLOT_MINUTES, CandidateIndex,
+                                       candidate_groups, window_slots)
+from app.assignment.plan import PlanningOrder, delivery_window_end
+from app.assignment.rules import COURIER_RULES
+from app.schemas.models.couriers import CourierTypeEnum
+from tests.test_assignment import random_day
+
+
+def order(order_id, region=1, weight=1.0, cost=100, windows=((600, 720),)):
+    return PlanningOrder(order_id, weight, region, cost, windows)
+
+
+def test_window_slots():
+    assert window_slots([(600, 659)]) == [20, 21]
+    assert window_slots([(600, 660)]) == [20, 21, 22]
+    assert window_slots([(0, 10), (5, 29), (700, 700)]) == [0, 23]
+    assert window_slots([]) == []
+
+
+def test_candidate_groups_respect_limits_and_windows():
+    rules = COURIER_RULES[CourierTypeEnum.bike]
+    orders = [
+        order(1, weight=15, cost=300),
+        order(2, weight=10, cost=200),
+        order(3, weight=4),
+        order(4, weight=1),
+        order(5, weight=1),
+        order(6, weight=1),
+        # Can not be delivered after the first order of a group
+        order(7, windows=((600, 612),)),
+        order(8, weight=25),
+        order(9, windows=((800, 900),)),
+    ]
+
+    groups = candidate_groups(orders, rules, 600)
+
+    assert [group.order_ids for group in groups] == [(7, 1, 3), (2, 4, 5, 6)]
+    for group in groups:
+        assert len(group.order_ids) <= rules.max_orders
+        assert group.weight <= rules.max_weight
+    assert groups[0].end_minute == 600 + 12 + 2 * 8
+    assert groups[0].weight == pytest.approx(20)
+    assert groups[1].cost == pytest.approx(200 + 0.8 * 300)
+
+
+@pytest.mark.parametrize('courier_type', list(CourierTypeEnum))
+def test_candidate_groups_are_feasible(courier_type):
+    rules = COURIER_RULES[courier_type]
+    _, orders = random_day(random.Random(1))
+    by_id = {order.order_id: order for order in orders}
+    index = CandidateIndex(orders)
+
+    for region in range(1, 6):
+        for slot in range(16, 40):
+            for group in index.groups(region, slot, courier_type):
+                group_orders = [
+                    by_id[order_id] for order_id in group.order_ids
+                ]
+                assert {order.region for order in group_orders} == {region}
+                assert len(group_orders) <= rules.max_orders
+                assert group.weight <= rules.max_weight
+                for position, item in enumerate(group_orders):
+                    delivered = (
+                        slot * SLOT_MINUTES
+                        + rules.first_order_minutes
+                        + position * rules.next_order_minutes
+                    )
+                    assert delivery_window_end(item, delivered) is not None
+
+
+def test_index_is_updated_incrementally():
+    index = CandidateIndex([order(1), order(2, region=2)])
+    groups = index.groups(1, 20, CourierTypeEnum.auto)
+    assert [group.order_ids for group in groups] == [(1,)]
+
+    index.add(order(3, cost=200))
+    assert [
+        group.order_ids for group in index.groups(1, 20, CourierTypeEnum.auto)
+    ] == [(3, 1)]
+    index.remove(3)
+    index.remove(42)
+    assert index.groups(1, 20, CourierTypeEnum.auto) == groups
+    # A changed order moves to the buckets of its new windows
+    index.add(order(1, windows=((900, 960),)))
+    assert index.bucket(1, 20) == []
+    assert [item.order_id for item in index.bucket(1, 31)] == [1]
+    assert len(index) == 2 and 2 in index
+
+
+def test_candidates_lookup():
+    orders = [
+        order(1, windows=((600, 620),)),
+        order(2, windows=((660, 720),)),
+        order(3, region=2, windows=((600, 720),)),
+        order(4, region=3, windows=((600, 720),)),
+    ]
+    index = CandidateIndex(orders)
+
+    found = index.candidates([1, 2], 600, 629)
+
+    assert sorted(item.order_id for item in found) == [1, 3]
+    assert sorted(
+        item.order_id for item in index.candidates([1, 2, 3], 0, 1439)
+    ) == [1, 2, 3, 4]
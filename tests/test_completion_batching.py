@@ -0,0 +1,246 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Select
+
+from app.database import batching
+from app.database.batching import CompletionCoalescer
+from app.database.error import ConflictWithRequestDBError, NotFoundInDBError
+from app.database.repositories.orders import OrdersRepository
+from app.schemas.models.orders import CompleteOrder
+
+DAY = date(2023, 5, 1)
+COMPLETE_TIME = datetime(2023, 5, 1, 10, tzinfo=timezone.utc)
+
+
+def order_row(order_id, courier_id, complete_time=None):
+    return SimpleNamespace(
+        order_id=order_id,
+        weight=2.5,
+        regions=3,
+        delivery_hours=['10:00-12:00'],
+        cost=120,
+        complete_time=complete_time,
+        assignments=[
+            SimpleNamespace(assignment_date=DAY, courier_id=courier_id)
+        ],
+    )
+
+
+def complete(order_id, courier_id):
+    return CompleteOrder(
+        courier_id=courier_id, order_id=order_id, complete_time=COMPLETE_TIME
+    )
+
+
+class CompletionSession:
+    """Returns the order rows of the completion queries."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+        self.commits = 0
+
+    async def execute(self, query, params=None):
+        if isinstance(query, Select):
+            # The locking query reads the open orders only
+            lock = query._for_update_arg is not None
+            return SimpleNamespace(
+                scalars=lambda: [
+                    row
+                    for row in self.rows
+                    if not lock or row.complete_time is None
+                ]
+            )
+        if query.is_dml and query.table.name == 'order':
+            self.updates.extend(params)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def complete_batch(rows, batch):
+    session = CompletionSession(rows)
+    results = asyncio.run(
+        OrdersRepository(session).complete_orders_batch(
+            complete_orders_batch=batch
+        )
+    )
+    return session, results
+
+
+def test_failed_request_does_not_affect_the_batch():
+    rows = [
+        order_row(1, courier_id=1),
+        order_row(2, courier_id=1),
+        order_row(3, courier_id=1, complete_time=COMPLETE_TIME),
+    ]
+
+    session, results = complete_batch(
+        rows,
+        [
+            [complete(1, 1)],
+            # The order is assigned to another courier
+            [complete(2, 2)],
+            [complete(3, 1)],
+            [complete(4, 1)],
+            [complete(2, 1)],
+        ],
+    )
+
+    first, wrong_courier, completed, missing, last = results
+    assert [order.order_id for order in first] == [1]
+    assert first[0].completed_time == COMPLETE_TIME
+    assert isinstance(wrong_courier, ConflictWithRequestDBError)
+    assert isinstance(completed, ConflictWithRequestDBError)
+    assert isinstance(missing, NotFoundInDBError)
+    assert [order.order_id for order in last] == [2]
+    assert [update['b_order_id'] for update in session.updates] == [1, 2]
+    assert session.commits == 1
+
+
+def test_request_fails_as_a_whole():
+    rows = [order_row(1, courier_id=1), order_row(2, courier_id=2)]
+
+    session, (result,) = complete_batch(
+        rows, [[complete(1, 1), complete(2, 1)]]
+    )
+
+    assert isinstance(result, ConflictWithRequestDBError)
+    assert session.updates == []
+
+
+def test_order_completed_by_an_earlier_request_of_the_batch():
+    session, (first, second) = complete_batch(
+        [order_row(1, courier_id=1)], [[complete(1, 1)], [complete(1, 1)]]
+    )
+
+    assert [order.order_id for order in first] == [1]
+    assert isinstance(second, ConflictWithRequestDBError)
+    assert session.updates == [
+        {'b_order_id': 1, 'complete_time': COMPLETE_TIME, 'courier_id': 1}
+    ]
+
+
+class FakeEngine:
+    @asynccontextmanager
+    async def create_session(self):
+        yield None
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Makes the coalescer complete the orders of a fake repository."""
+    batches = []
+
+    class Repository:
+        def __init__(self, session):
+            pass
+
+        async def complete_orders_batch(self, *, complete_orders_batch):
+            batches.append(complete_orders_batch)
+            return [
+                (
+                    ConflictWithRequestDBError(message='Conflict')
+                    if request == ['conflict']
+                    else [request]
+                )
+                for request in complete_orders_batch
+            ]
+
+    monkeypatch.setattr(batching, 'OrdersRepository', Repository)
+    return batches
+
+
+def coalesce(requests, window_ms=10, max_batch_size=100):
+    async def run():
+        coalescer = CompletionCoalescer(
+            FakeEngine(), window_ms=window_ms, max_batch_size=max_batch_size
+        )
+        coalescer.start()
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(
+                    *map(coalescer.submit, requests), return_exceptions=True
+                ),
+                timeout=1,
+            )
+        finally:
+            await coalescer.stop()
+
+    return asyncio.run(run())
+
+
+def test_requests_of_a_window_share_a_batch(batches):
+    results = coalesce([['a'], ['conflict'], ['b']])
+
+    assert batches == [[['a'], ['conflict'], ['b']]]
+    assert results[0] == [['a']]
+    assert isinstance(results[1], ConflictWithRequestDBError)
+    assert results[2] == [['b']]
+
+
+def test_batches_are_limited(batches):
+    # A full batch is committed without waiting for the window
+    results = coalesce(
+        [[number] for number in range(5)], window_ms=10_000, max_batch_size=5
+    )
+
+    assert [len(batch) for batch in batches] == [5]
+    assert results == [[[number]] for number in range(5)]
+
+
+def test_batch_size_limit_splits_requests(batches):
+    coalesce([[number] for number in range(5)], max_batch_size=2)
+
+    assert batches == [[[0], [1]], [[2], [3]], [[4]]]
+
+
+def test_window_collects_later_requests(batches):
+    async def run():
+        coalescer = CompletionCoalescer(
+            FakeEngine(), window_ms=100, max_batch_size=100
+        )
+        coalescer.start()
+        first = asyncio.create_task(coalescer.submit(['a']))
+        await asyncio.sleep(0.02)
+        second = asyncio.create_task(coalescer.submit(['b']))
+        await asyncio.gather(first, second)
+        await coalescer.stop()
+
+    asyncio.run(run())
+
+    assert batches == [[['a'], ['b']]]
+
+
+def test_failed_batch_fails_every_request(monkeypatch):
+    class Repository:
+        def __init__(self, session):
+            pass
+
+        async def complete_orders_batch(self, *, complete_orders_batch):
+            raise ConnectionError('The database is unavailable')
+
+    monkeypatch.setattr(batching, 'OrdersRepository', Repository)
+
+    results = coalesce([['a'], ['b']])
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_cancelled_requests_are_skipped(batches):
+    async def run():
+        coalescer = CompletionCoalescer(
+            FakeEngine(), window_ms=10, max_batch_size=100
+        )
+        loop = asyncio.get_running_loop()
+        cancelled, waiting = loop.create_future(), loop.create_future()
+        cancelled.cancel()
+        await coalescer._commit([(['a'], cancelled), (['b'], waiting)])
+        return cancelled.cancelled(), waiting.result()
+
+    assert asyncio.run(run()) == (True, [['b']])
+    assert batches == [[['a'], ['b']]]
@@ -0,0 +1,228 @@
+import asyncio
+import time
+
+import pytest
+
+from app.api.middlewares import ConcurrencyLimitMiddleware, classify_request
+from app.core.concurrency import AdaptiveConcurrencyLimiter, Priority
+
+SERVICE_TIME_S = 0.02
+POOL_SIZE = 5
+CAPACITY_RPS = POOL_SIZE / SERVICE_TIME_S
+SLO_S = 0.2
+CLIENT_TIMEOUT_S = 0.5
+DURATION_S = 1.0
+# Share of the traffic by path, completions and polls are critical
+TRAFFIC_MIX = [
+    ('POST', '/orders/complete', 3),
+    ('GET', '/couriers/assignments', 3),
+    ('GET', '/orders/', 2),
+    ('GET', '/couriers/meta-info', 2),
+]
+
+
+class FakeBackend:
+    """An application whose every request holds one of few connections."""
+
+    def __init__(self):
+        self.pool = asyncio.Semaphore(POOL_SIZE)
+        self.wait_ms = 0.0
+
+    def pool_wait_ms(self):
+        return self.wait_ms
+
+    async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
+        async with self.pool:
+            wait_ms = (time.perf_counter() - started) * 1000
+            self.wait_ms += (wait_ms - self.wait_ms) * 0.2
+            await asyncio.sleep(SERVICE_TIME_S)
+        await send({'type': 'http.response.start', 'status': 200})
+        await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+async def call(app, method, path):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': []}
+    await app(scope, receive, send)
+    return messages
+
+
+async def run_load(load_factor, limited):
+    backend = FakeBackend()
+    app = backend
+    if limited:
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=20,
+            pool_wait_threshold_ms=SERVICE_TIME_S * 1000,
+            queue_timeout_s=SERVICE_TIME_S * 5,
+            pool_wait_ms=backend.pool_wait_ms,
+        )
+        app = ConcurrencyLimitMiddleware(backend, limiter)
+    paths = [
+        (method, path)
+        for method, path, weight in TRAFFIC_MIX
+        for _ in range(weight)
+    ]
+    results = {path: [] for _, path, _ in TRAFFIC_MIX}
+
+    async def client(method, path):
+        started = time.perf_counter()
+        try:
+            messages = await asyncio.wait_for(
+                call(app, method, path), CLIENT_TIMEOUT_S
+            )
+        except asyncio.TimeoutError:
+            results[path].append((504, CLIENT_TIMEOUT_S))
+            return
+        results[path].append(
+            (messages[0]['status'], time.perf_counter() - started)
+        )
+
+    tick_s = 0.005
+    per_tick = CAPACITY_RPS * load_factor * tick_s
+    clients, credit, index = [], 0.0, 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < DURATION_S:
+        credit += per_tick
+        while credit >= 1:
+            method, path = paths[index % len(paths)]
+            clients.append(asyncio.create_task(client(method, path)))
+            credit -= 1
+            index += 1
+        await asyncio.sleep(tick_s)
+    await asyncio.gather(*clients)
+    return results
+
+
+def goodput(results, paths=None):
+    return sum(
+        status == 200 and latency <= SLO_S
+        for path, samples in results.items()
+        if paths is None or path in paths
+        for status, latency in samples
+    ) / DURATION_S
+
+
+@pytest.mark.parametrize(
+    'method, path, route, priority',
+    [
+        ('POST', '/orders/complete', 'orders_complete', Priority.CRITICAL),
+        ('GET', '/couriers/assignments', 'couriers_assignments',
+         Priority.CRITICAL),
+        ('GET', '/couriers/17', 'courier', Priority.CRITICAL),
+        ('GET', '/couriers/meta-info', 'couriers_meta_info', Priority.LOW),
+        ('GET', '/couriers/meta-info/17', 'couriers_meta_info', Priority.LOW),
+        ('POST', '/admin/order-exports', 'order_exports', Priority.LOW),
+        ('GET', '/orders/', 'GET orders', Priority.NORMAL),
+        ('POST', '/couriers/', 'POST couriers', Priority.NORMAL),
+    ],
+)
+def test_requests_are_classified_by_route(method, path, route, priority):
+    assert classify_request(method, path) == (route, priority)
+
+
+def test_low_priority_is_shed_before_critical():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+    tickets = [limiter.try_acquire(Priority.NORMAL) for _ in range(5)]
+
+    assert limiter.try_acquire(Priority.LOW) is None
+    assert limiter.try_acquire(Priority.NORMAL) is not None
+    assert limiter.try_acquire(Priority.CRITICAL) is not None
+    assert all(ticket is not None for ticket in tickets)
+    assert limiter.in_flight == 7
+
+
+def test_critical_request_waits_for_a_free_slot():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, queue_timeout_s=1)
+
+    async def main():
+        first = await limiter.acquire(Priority.CRITICAL)
+        await limiter.acquire(Priority.CRITICAL)
+        waiting = asyncio.create_task(limiter.acquire(Priority.CRITICAL))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        limiter.release(first)
+        return await waiting
+
+    assert asyncio.run(main()) is not None
+    assert limiter.in_flight == 2
+
+
+def test_critical_request_is_shed_after_queue_timeout():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout_s=0.01)
+
+    async def main():
+        await limiter.acquire(Priority.CRITICAL)
+        return await limiter.acquire(Priority.CRITICAL)
+
+    assert asyncio.run(main()) is None
+    assert limiter.in_flight == 1
+
+
+def test_limit_backs_off_once_per_round_and_grows_back():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+    for _ in range(10):
+        limiter.release(limiter.try_acquire(Priority.CRITICAL), 'route', 10)
+    tickets = [limiter.try_acquire(Priority.CRITICAL) for _ in range(5)]
+
+    # Every request of the round is slow, the limit is decreased once
+    for ticket in tickets:
+        limiter.release(ticket, 'route', 100)
+    assert limiter.limit == pytest.approx(9.0)
+
+    for _ in range(50):
+        tickets = [limiter.try_acquire(Priority.CRITICAL) for _ in range(8)]
+        for ticket in tickets:
+            limiter.release(ticket, 'route', 10)
+    assert limiter.limit > 10
+
+
+def test_pool_wait_is_congestion():
+    pool_wait_ms = 0.0
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=10,
+        pool_wait_threshold_ms=50,
+        pool_wait_ms=lambda: pool_wait_ms,
+    )
+    limiter.release(limiter.try_acquire(Priority.CRITICAL), 'route', 10)
+    pool_wait_ms = 100.0
+    limiter.release(limiter.try_acquire(Priority.CRITICAL), 'route', 10)
+
+    assert limiter.limit == pytest.approx(9.0)
+
+
+def test_shed_request_gets_retry_after():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+    limiter.try_acquire(Priority.CRITICAL)
+    app = ConcurrencyLimitMiddleware(FakeBackend(), limiter, retry_after_s=3)
+
+    start, body = asyncio.run(call(app, 'GET', '/couriers/meta-info'))
+
+    assert start['status'] == 503
+    assert (b'retry-after', b'3') in start['headers']
+
+
+def test_goodput_is_stable_under_three_times_capacity():
+    nominal = asyncio.run(run_load(1, limited=True))
+    overload = asyncio.run(run_load(3, limited=True))
+    unlimited = asyncio.run(run_load(3, limited=False))
+    critical = {'/orders/complete', '/couriers/assignments'}
+
+    assert goodput(overload) >= 0.8 * goodput(nominal)
+    assert goodput(overload, critical) >= 0.8 * goodput(nominal, critical)
+    # Without the limiter the queue outgrows the latency objective
+    assert goodput(unlimited) < 0.5 * goodput(overload)
+    # Low priority traffic is shed first
+    shed = {
+        path: sum(status == 503 for status, _ in samples) / len(samples)
+        for path, samples in overload.items()
+    }
+    assert shed['/couriers/meta-info'] > shed['/orders/complete']
@@ -0,0 +1,110 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from app.database.replica import CourierColumns, CourierReplica
+from app.database.versions import data_versions
+from app.schemas.models.couriers import CourierTypeEnum
+
+
+def create_columns(*couriers):
+    columns = CourierColumns()
+    for courier in couriers:
+        columns.upsert(*courier)
+    return columns
+
+
+def test_get_and_range_ordered_by_id():
+    columns = create_columns(
+        (3, 'AUTO', [2, 1], ['10:00-12:00'], 1),
+        (1, 'FOOT', [1], ['08:00-09:00', '10:00-12:00'], 1),
+        (2, 'BIKE', [], [], 2),
+    )
+
+    courier = columns.get(1)
+    assert courier.courier_type == CourierTypeEnum.foot
+    assert courier.regions == [1]
+    assert courier.working_hours == ['08:00-09:00', '10:00-12:00']
+    assert columns.get(3).regions == [2, 1]
+    assert columns.get(4) is None
+    assert [c.courier_id for c in columns.get_range(1, 10)] == [2, 3]
+    assert columns.get_range(3, 10) == []
+    assert columns.hours == ['10:00-12:00', '08:00-09:00']
+
+
+def test_older_version_ignored():
+    columns = create_columns((1, 'FOOT', [1], ['08:00-09:00'], 5))
+
+    assert not columns.upsert(1, 'AUTO', [2], ['08:00-09:00'], 4)
+    assert columns.get(1).courier_type == CourierTypeEnum.foot
+    assert columns.upsert(1, 'AUTO', [2], ['08:00-09:00'], 5)
+    assert columns.get(1).courier_type == CourierTypeEnum.auto
+
+
+def test_update_moves_indexes():
+    columns = create_columns(
+        (1, 'FOOT', [1, 2], [], 1),
+        (2, 'FOOT', [2], [], 1),
+        (3, 'AUTO', [2, 3], [], 1),
+    )
+    assert columns.find(region=2) == [1, 2, 3]
+    assert columns.find(region=2, courier_type=CourierTypeEnum.foot) == [1, 2]
+
+    columns.upsert(1, 'AUTO', [3], [], 2)
+
+    assert columns.find(region=2) == [2, 3]
+    assert columns.find(region=3, courier_type=CourierTypeEnum.auto) == [1, 3]
+    assert columns.find(courier_type=CourierTypeEnum.foot) == [2]
+    assert columns.find(region=7) == []
+    assert columns.find() == [1, 2, 3]
+
+
+def test_garbage_compacted():
+    columns = create_columns(
+        (1, 'FOOT', [1, 2, 3], ['08:00-09:00'], 1),
+        (2, 'BIKE', [4], ['09:00-10:00'], 1),
+    )
+
+    for version in range(2, 10):
+        columns.upsert(1, 'FOOT', [version], ['10:00-11:00'], version)
+
+    assert len(columns.region_values) <= 4
+    assert len(columns.hours_values) <= 4
+    assert columns.get(1).regions == [9]
+    assert columns.get(1).working_hours == ['10:00-11:00']
+    assert columns.get(2).regions == [4]
+    assert columns.get(2).working_hours == ['09:00-10:00']
+
+
+class FakeConnection:
+    """Serves the version counter and the courier rows like asyncpg."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.rows = rows
+
+    @asynccontextmanager
+    async def transaction(self, **options):
+        yield
+
+    async def fetchval(self, query):
+        return self.version
+
+    async def cursor(self, query, *args, prefetch):
+        for row in self.rows:
+            if not args or row[-1] > args[0]:
+                yield row
+
+
+def test_catch_up_bumps_data_versions():
+    replica = CourierReplica('postgresql+asyncpg://localhost/postgres')
+    connection = FakeConnection(1, [(1, 'FOOT', [1], ['08:00-10:00'], 1)])
+    asyncio.run(replica._catch_up(connection))
+    tags = data_versions.courier_tag(1), data_versions.courier_tag(2)
+
+    connection.version = 2
+    connection.rows.append((2, 'AUTO', [2], ['10:00-12:00'], 2))
+    asyncio.run(replica._catch_up(connection))
+
+    assert replica.version == 2
+    assert data_versions.courier_tag(1) == tags[0]
+    assert data_versions.courier_tag(2) != tags[1]
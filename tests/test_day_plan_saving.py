@@ -0,0 +1,238 @@
+import asyncio
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.assignment.plan import DayPlan, DeliveryGroup
+from app.database.change_feed import change_feed
+from app.database.repositories.assignments import (ASSIGN_ORDERS_QUERY,
+                                                   DAY_PLAN_LOCK,
+                                                   AssignmentsRepository)
+
+DAY = date(2023, 5, 1)
+
+
+class Rows(list):
+    def all(self):
+        return list(self)
+
+
+class PlanSession:
+    """Answers the queries of a day plan write and records their order."""
+
+    def __init__(self, free, assignments, released_couriers=(), released=()):
+        self.free = free
+        self.assignments = assignments
+        self.released_couriers = released_couriers
+        self.released = released
+        self.steps = []
+        self.params = {}
+        self.last_params = None
+        self.copies = {}
+        self.updates = None
+
+    def answer(self, step, rows=()):
+        self.steps.append(step)
+        self.params[step] = self.last_params
+        return SimpleNamespace(
+            scalars=lambda: Rows(rows), all=lambda: Rows(rows)
+        )
+
+    async def execute(self, query, params=None):
+        compiled = query.compile(dialect=postgresql.dialect())
+        sql = str(compiled)
+        self.last_params = compiled.params
+        if 'pg_advisory_xact_lock' in sql:
+            return self.answer('lock')
+        if sql.startswith('SELECT DISTINCT'):
+            return self.answer(
+                'find released couriers', self.released_couriers
+            )
+        if sql.startswith('UPDATE'):
+            return self.answer('release orders', self.released)
+        if sql.startswith('DELETE FROM assignment_order'):
+            return self.answer('unlink released orders')
+        if sql.startswith('DELETE FROM delivery_group'):
+            return self.answer('delete empty groups')
+        if sql.endswith('FOR UPDATE'):
+            return self.answer('lock free orders', self.free)
+        if sql.startswith('SELECT assignment.courier_id'):
+            return self.answer('find assignments', self.assignments.items())
+        if sql.startswith('INSERT INTO assignment'):
+            return self.answer(
+                'create assignments',
+                [
+                    (row['courier_id'], 100 + row['courier_id'])
+                    for row in params
+                ],
+            )
+        if 'generate_series' in sql:
+            return self.answer('reserve group ids', [501, 502, 503])
+        raise AssertionError(sql)
+
+    async def commit(self):
+        self.steps.append('commit')
+
+    async def connection(self):
+        session = self
+
+        class DriverConnection:
+            async def copy_records_to_table(self, table, records, columns):
+                session.steps.append(f'copy {table}')
+                session.copies[table] = records
+
+            async def execute(self, query, *args):
+                assert query == ASSIGN_ORDERS_QUERY
+                session.steps.append('assign orders')
+                session.updates = args
+
+        raw_connection = SimpleNamespace(driver_connection=DriverConnection())
+
+        async def get_raw_connection():
+            return raw_connection
+
+        return SimpleNamespace(get_raw_connection=get_raw_connection)
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """Collects the published events of the day plans."""
+    published = []
+
+    async def notify(connection, events):
+        connection.steps.append('notify')
+
+    monkeypatch.setattr(change_feed, 'notify', notify)
+    monkeypatch.setattr(change_feed, 'publish', published.extend)
+    return published
+
+
+def event_orders(events):
+    return {
+        event.courier_id: json.loads(event.data)['order_ids']
+        for event in events
+    }
+
+
+def save(session, plan, replace=False):
+    return asyncio.run(
+        AssignmentsRepository(session).save_day_plan(
+            assignment_date=DAY, plan=plan, replace=replace
+        )
+    )
+
+
+def test_plan_rows(events):
+    plan = DayPlan(
+        groups=[
+            DeliveryGroup(1, 600, 640, [3, 1], 250),
+            DeliveryGroup(1, 640, 660, [6], 100),
+            DeliveryGroup(2, 600, 620, [2], 80),
+            # Order 4 was taken by a concurrent writer
+            DeliveryGroup(2, 620, 660, [4, 5], 120),
+        ],
+        unassigned_order_ids=[7],
+    )
+    session = PlanSession(free=[1, 2, 3, 5, 6], assignments={1: 10})
+
+    saved = save(session, plan)
+
+    assert saved.groups == plan.groups[:3]
+    assert saved.unassigned_order_ids == [5, 7]
+    assert session.copies['delivery_group'] == [
+        (501, 10, 600, 640, 250),
+        (502, 10, 640, 660, 100),
+        (503, 102, 600, 620, 80),
+    ]
+    assert session.copies['assignment_order'] == [
+        (10, 3),
+        (10, 1),
+        (10, 6),
+        (102, 2),
+    ]
+    assert session.updates == (
+        [3, 1, 6, 2],
+        [1, 1, 1, 2],
+        [501, 501, 502, 503],
+    )
+    assert event_orders(events) == {1: [1, 3, 6], 2: [2]}
+
+
+def test_writes_are_ordered(events):
+    plan = DayPlan(groups=[DeliveryGroup(1, 600, 640, [1], 100)])
+    session = PlanSession(
+        free=[1], assignments={1: 10}, released_couriers=[1], released=[1]
+    )
+
+    save(session, plan, replace=True)
+
+    # The day lock comes first, the free orders are locked only after the
+    # previous plan is released, the events are sent before the commit
+    assert session.steps == [
+        'lock',
+        'find released couriers',
+        'release orders',
+        'unlink released orders',
+        'delete empty groups',
+        'lock free orders',
+        'find assignments',
+        'reserve group ids',
+        'copy delivery_group',
+        'copy assignment_order',
+        'assign orders',
+        'notify',
+        'commit',
+    ]
+    assert list(session.params['lock'].values()) == [
+        DAY_PLAN_LOCK,
+        DAY.toordinal(),
+    ]
+    assert session.params['release orders'] == {
+        'assignment_date_1': DAY,
+        'courier_id': None,
+        'group_order_id': None,
+    }
+
+
+def test_replaced_plan_releases_orders(events):
+    plan = DayPlan(groups=[DeliveryGroup(1, 600, 640, [1], 100)])
+    session = PlanSession(
+        free=[1, 2],
+        assignments={1: 10},
+        released_couriers=[1, 3],
+        released=[2, 5],
+    )
+
+    save(session, plan, replace=True)
+
+    # The courier whose orders were only released gets an empty assignment
+    assert event_orders(events) == {1: [1], 3: []}
+    unlinked = session.params['unlink released orders']
+    assert unlinked['released_ids'] == [2, 5]
+    assert unlinked['assignment_date_1'] == DAY
+
+
+def test_replaced_plan_without_groups(events):
+    # Every order of the new plan was taken by a concurrent writer
+    plan = DayPlan(groups=[DeliveryGroup(1, 600, 640, [1], 100)])
+    session = PlanSession(
+        free=[], assignments={}, released_couriers=[2], released=[4]
+    )
+
+    saved = save(session, plan, replace=True)
+
+    assert saved.groups == []
+    assert session.steps[-3:] == ['lock free orders', 'notify', 'commit']
+    assert event_orders(events) == {2: []}
+
+
+def test_plan_without_groups_is_not_released(events):
+    session = PlanSession(free=[], assignments={})
+
+    save(session, DayPlan(unassigned_order_ids=[3]))
+
+    assert session.steps == ['lock', 'lock free orders', 'notify', 'commit']
+    assert events == []
@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+
+from app.api.dependencies.couriers import etag_matches
+from app.database.versions import DataVersions
+
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    ('"a-1"', True),
+    ('W/"a-1"', True),
+    ('"b-2", "a-1"', True),
+    ('*', True),
+    ('"a-2"', False),
+    ('a-1', False),
+    ('', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"a-1"') is expected
+
+
+def test_data_versions_change_tags_of_written_data_only():
+    versions = DataVersions()
+    day, other_day = date(2023, 5, 1), date(2023, 5, 2)
+    tags = {
+        'courier': versions.courier_tag(1),
+        'other_courier': versions.courier_tag(2),
+        'day': versions.assignments_tag(day),
+        'day_courier': versions.assignments_tag(day, 1),
+        'other_day': versions.assignments_tag(other_day),
+        'couriers': versions.couriers_tag(),
+    }
+
+    versions.bump(courier_ids=[1], assignment_dates=[day])
+
+    assert versions.courier_tag(1) != tags['courier']
+    assert versions.courier_tag(2) == tags['other_courier']
+    assert versions.assignments_tag(day) != tags['day']
+    assert versions.assignments_tag(day, 1) != tags['day_courier']
+    assert versions.assignments_tag(other_day) == tags['other_day']
+    assert versions.couriers_tag() != tags['couriers']
+
+    tags['other_courier'] = versions.courier_tag(2)
+    versions.reset()
+    assert versions.courier_tag(2) != tags['other_courier']
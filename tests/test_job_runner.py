@@ -0,0 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from app.jobs.runner import JobRunner
+from app.schemas.models.jobs import JobDto
+
+
+class FailingEngine:
+    """An engine whose sessions fail on every statement."""
+
+    def __init__(self):
+        self.queries = []
+
+    @asynccontextmanager
+    async def create_session(self):
+        async def execute(query):
+            self.queries.append(query)
+            raise ConnectionError('The database is unavailable')
+
+        class Session:
+            pass
+
+        session = Session()
+        session.execute = execute
+        yield session
+
+
+def make_job(attempts=2):
+    return JobDto(
+        job_id=7,
+        kind='test',
+        status='running',
+        progress=0,
+        params={},
+        cancel_requested=False,
+        attempts=attempts,
+        created_at=datetime(2023, 5, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_worker_survives_failed_finish():
+    engine = FailingEngine()
+    handled = []
+
+    async def handler(context):
+        handled.append(context.job.job_id)
+        return {}
+
+    async def run():
+        runner = JobRunner(
+            engine,
+            workers=1,
+            poll_interval_s=0.01,
+            heartbeat_interval_s=10,
+            stale_after_s=30,
+            max_attempts=3,
+        )
+        runner.register('test', handler)
+        runner._JobRunner__wakeup = asyncio.Event()
+        jobs = [make_job(), make_job()]
+
+        async def claim():
+            return jobs.pop() if jobs else None
+
+        runner._claim = claim
+        worker = asyncio.create_task(runner._work(0))
+        for _ in range(100):
+            if len(handled) == 2 or worker.done():
+                break
+            await asyncio.sleep(0.01)
+        alive = not worker.done()
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return alive
+
+    assert asyncio.run(run())
+    assert handled == [7, 7]
+    # The finish of a job only updates the attempt that claimed it
+    where = str(engine.queries[0]).split('WHERE')[1]
+    assert 'job.status' in where
+    assert 'job.attempts' in where
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.middlewares import LoopStallMiddleware
+from app.core.loop_monitor import (LoopStallMonitor, describe_request,
+                                   loop_monitor)
+from app.main import get_application
+
+
+def blocking_section():
+    time.sleep(0.3)
+
+
+def create_app(monitor):
+    application = FastAPI()
+
+    @application.get('/blocking', name='test::blocking')
+    async def block():
+        blocking_section()
+        return {}
+
+    @application.get('/sleeping', name='test::sleeping')
+    async def sleep():
+        await asyncio.sleep(0.3)
+        return {}
+
+    application.add_middleware(LoopStallMiddleware, monitor=monitor)
+    return application
+
+
+def run_requests(monitor, *paths, application=None):
+    async def main():
+        monitor.start()
+        transport = httpx.ASGITransport(
+            app=application or create_app(monitor)
+        )
+        async with httpx.AsyncClient(
+            transport=transport, base_url='http://test'
+        ) as client:
+            responses = await asyncio.gather(
+                *(client.get(path) for path in paths)
+            )
+        # Let the heartbeat see the end of the stall
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return responses
+
+    return asyncio.run(main())
+
+
+def test_stall_is_captured_with_route_and_stack():
+    monitor = LoopStallMonitor(threshold_ms=50, interval_ms=10)
+
+    responses = run_requests(monitor, '/blocking', '/sleeping')
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(monitor.stalls) == 1
+    (stall,) = monitor.stalls
+    assert stall.route == 'test::blocking'
+    assert stall.endpoint.endswith('block')
+    assert 'blocking_section' in stall.stack[-1]
+    assert stall.blocked_ms >= 250
+    assert not monitor.requests
+
+
+def test_stall_is_attributed_behind_application_middlewares():
+    # The rate limiter middleware runs the endpoint in another task
+    application = get_application()
+
+    @application.get('/test-blocking', name='test::blocking')
+    async def block():
+        blocking_section()
+        return {}
+
+    stalls = len(loop_monitor.stalls)
+
+    (response,) = run_requests(
+        loop_monitor, '/test-blocking', application=application
+    )
+
+    assert response.status_code == 200
+    assert len(loop_monitor.stalls) == stalls + 1
+    assert loop_monitor.stalls[-1].route == 'test::blocking'
+    assert loop_monitor.stalls[-1].endpoint.endswith('block')
+    assert not loop_monitor.requests
+
+
+def test_awaiting_request_does_not_stall():
+    monitor = LoopStallMonitor(threshold_ms=50, interval_ms=10)
+
+    run_requests(monitor, '/sleeping', '/sleeping')
+
+    assert not monitor.stalls
+
+
+def test_unrouted_request_is_described_by_path():
+    scope = {'type': 'http', 'method': 'GET', 'path': '/couriers/1'}
+
+    assert describe_request(scope) == ('GET /couriers/1', None)
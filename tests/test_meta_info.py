@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.api.endpoints.couriers import (courier_earning_coefficients,
+                                        courier_rating_coefficients,
+                                        couriers_meta_info_columns)
+from app.schemas.models.couriers import CourierTypeEnum
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_meta_info_matches_per_courier(seed):
+    rng = random.Random(seed)
+    size = 500
+    courier_types = [rng.choice(list(CourierTypeEnum)).value for _ in range(size)]
+    orders_counts = [rng.randint(0, 300) for _ in range(size)]
+    cost_sums = [count * rng.randint(1, 500) for count in orders_counts]
+    hours = 24 * rng.randint(1, 30)
+
+    ratings, earnings = couriers_meta_info_columns(
+        courier_types, np.array(orders_counts), np.array(cost_sums), hours
+    )
+
+    for index, courier_type in enumerate(courier_types):
+        if not orders_counts[index]:
+            continue
+        courier_type = CourierTypeEnum(courier_type)
+        assert ratings[index] == round(
+            orders_counts[index] / hours
+            * courier_rating_coefficients[courier_type]
+        )
+        assert earnings[index] == (
+            cost_sums[index] * courier_earning_coefficients[courier_type]
+        )
@@ -0,0 +1,131 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+from app.api.dependencies.common import unique_ids
+from app.core.config import settings
+from app.database.repositories import couriers as couriers_module
+from app.database.repositories.couriers import CouriersRepository
+from app.database.repositories.orders import OrdersRepository
+from app.schemas.models.couriers import CourierDto
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        rows = self.rows
+        return SimpleNamespace(
+            scalars=lambda: SimpleNamespace(all=lambda: rows)
+        )
+
+
+def order_row(order_id):
+    return SimpleNamespace(
+        order_id=order_id,
+        weight=1.0,
+        regions=1,
+        delivery_hours=['10:00-12:00'],
+        cost=100,
+        complete_time=None,
+    )
+
+
+def courier(courier_id):
+    return CourierDto(
+        courier_id=courier_id,
+        courier_type='FOOT',
+        regions=[1],
+        working_hours=['10:00-12:00'],
+    )
+
+
+def test_unique_ids_keep_first_occurrences():
+    assert unique_ids([3, 1, 3, 2, 1], ('query', 'ids')) == [3, 1, 2]
+
+
+@pytest.mark.parametrize('count', [0, settings.MULTI_GET_MAX_IDS + 1])
+def test_unique_ids_limits(count):
+    with pytest.raises(RequestValidationError):
+        unique_ids(list(range(count)), ('query', 'ids'))
+
+
+@pytest.mark.parametrize(
+    'method, path, kwargs',
+    [
+        ('get', '/orders/by-ids', {'params': {'ids': '1,x'}}),
+        ('get', '/orders/by-ids', {'params': {'ids': ''}}),
+        ('get', '/couriers/by-ids', {}),
+        ('get', '/couriers/by-ids', {'params': {'ids': f'{2**63}'}}),
+        ('post', '/orders/by-ids', {'json': {'ids': []}}),
+        ('post', '/couriers/by-ids', {'json': {'ids': ['a']}}),
+    ],
+)
+def test_invalid_ids_rejected(client, method, path, kwargs):
+    response = getattr(client, method)(path, **kwargs)
+
+    assert response.status_code == 400
+
+
+def test_orders_returned_in_requested_order():
+    session = FakeSession([order_row(1), order_row(3)])
+
+    orders, missing_ids = asyncio.run(
+        OrdersRepository(session).get_orders_by_ids(order_ids=[3, 2, 1, 4])
+    )
+
+    assert [order.order_id for order in orders] == [3, 1]
+    assert missing_ids == [2, 4]
+    assert len(session.queries) == 1
+
+
+def test_couriers_read_from_replica_first(monkeypatch):
+    replicated = {1: courier(1), 5: courier(5)}
+    monkeypatch.setattr(
+        couriers_module,
+        'courier_replica',
+        SimpleNamespace(get=replicated.get),
+    )
+    session = FakeSession(
+        [
+            SimpleNamespace(
+                courier_id=2,
+                courier_type='FOOT',
+                regions=[1],
+                working_hours=['10:00-12:00'],
+            )
+        ]
+    )
+
+    couriers, missing_ids = asyncio.run(
+        CouriersRepository(session).get_couriers_by_ids(
+            courier_ids=[5, 2, 7, 1]
+        )
+    )
+
+    assert [item.courier_id for item in couriers] == [5, 2, 1]
+    assert missing_ids == [7]
+    (query,) = session.queries
+    assert query.compile().params['courier_ids'] == [2, 7]
+
+
+def test_replicated_couriers_need_no_query(monkeypatch):
+    monkeypatch.setattr(
+        couriers_module,
+        'courier_replica',
+        SimpleNamespace(get={1: courier(1)}.get),
+    )
+    session = FakeSession([])
+
+    couriers, missing_ids = asyncio.run(
+        CouriersRepository(session).get_couriers_by_ids(courier_ids=[1])
+    )
+
+    assert [item.courier_id for item in couriers] == [1]
+    assert missing_ids == []
+    assert session.queries == []
@@ -0,0 +1,157 @@
+import random
+import time
+from dataclasses import replace
+
+import pytest
+
+from app.assignment.candidates import CandidateIndex
+from app.assignment.greedy import assign_greedy, assign_shift
+from app.assignment.optimal import _search_shift, assign_optimal, lower_bound
+from app.assignment.plan import PlanningCourier, PlanningOrder
+from app.assignment.rules import COURIER_RULES
+from app.assignment.simulator import score_plan
+from app.schemas.models.couriers import CourierTypeEnum
+from tests.test_assignment import random_day
+
+BIKE = PlanningCourier(2, CourierTypeEnum.bike, frozenset({1}), ((600, 720),))
+
+
+def order(order_id, region=1, weight=1.0, cost=100, windows=((0, 1439),)):
+    return PlanningOrder(order_id, weight, region, cost, windows)
+
+
+def feasible_day(seed):
+    couriers, orders = random_day(random.Random(seed))
+    # Working hours of a courier do not intersect
+    couriers = [
+        (
+            replace(courier, shifts=courier.shifts[:1])
+            if len(courier.shifts) > 1
+            and courier.shifts[0][1] >= courier.shifts[1][0]
+            else courier
+        )
+        for courier in couriers
+    ]
+    return couriers, orders
+
+
+def random_shift(rng):
+    start = rng.randrange(0, 1200, 30)
+    shift = (start, start + rng.choice([60, 90, 120]))
+    courier = PlanningCourier(
+        1, rng.choice(list(CourierTypeEnum)), frozenset({1}), (shift,)
+    )
+    orders = []
+    for order_id in range(1, rng.randint(2, 8) + 1):
+        window_start = rng.randrange(start - 30, shift[1], 10)
+        window = (window_start, window_start + rng.choice([30, 60, 120]))
+        orders.append(
+            order(
+                order_id,
+                weight=rng.uniform(0.5, 15),
+                cost=rng.randint(50, 500),
+                windows=(window,),
+            )
+        )
+    return courier, shift, orders
+
+
+def shift_objective(groups, orders, penalty=2):
+    taken = {order_id for group in groups for order_id in group.order_ids}
+    return sum(group.cost for group in groups) + (1 + penalty) * sum(
+        order.cost for order in orders if order.order_id not in taken
+    )
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_optimal_plan_is_feasible_and_not_worse_than_greedy(seed):
+    couriers, orders = feasible_day(seed)
+
+    result = assign_optimal(couriers, orders, budget_ms=300)
+
+    simulation = score_plan(couriers, orders, result.plan)
+    greedy = score_plan(couriers, orders, assign_greedy(couriers, orders))
+    assert simulation.feasible
+    assert simulation.objective() == pytest.approx(result.objective)
+    assert result.objective <= greedy.objective()
+    assert result.greedy_objective == pytest.approx(greedy.objective())
+    assert result.lower_bound <= result.objective
+    assert 0 <= result.gap < 1
+    assigned = [
+        order_id
+        for group in result.plan.groups
+        for order_id in group.order_ids
+    ]
+    assert sorted(assigned + result.plan.unassigned_order_ids) == sorted(
+        order.order_id for order in orders
+    )
+
+
+def test_cheapest_order_goes_first():
+    # The greedy group starts with the expensive order and pays it in full
+    orders = [order(1, cost=100), order(2, cost=500)]
+
+    result = assign_optimal([BIKE], orders, budget_ms=1000)
+
+    assert assign_greedy([BIKE], orders).cost == 580
+    assert result.plan.groups[0].order_ids == [1, 2]
+    assert result.objective == pytest.approx(500)
+    assert result.lower_bound == pytest.approx(500)
+    assert result.gap == pytest.approx(0)
+    assert not result.timed_out
+    assert not result.fell_back
+    assert result.searched_subproblems == result.subproblems == 1
+
+
+def test_budget_is_respected():
+    couriers, orders = feasible_day(0)
+    progress = []
+
+    started = time.perf_counter()
+    result = assign_optimal(couriers, orders, 1, progress.append)
+
+    assert time.perf_counter() - started < 1
+    assert result.timed_out
+    assert result.objective <= result.greedy_objective
+    assert progress[-1] == 1
+
+
+def test_fall_back_to_greedy_without_improvement():
+    orders = [order(1), order(2)]
+
+    result = assign_optimal([BIKE], orders, budget_ms=1000)
+
+    assert result.fell_back
+    assert result.plan.groups == assign_greedy([BIKE], orders).groups
+
+
+def test_lower_bound():
+    orders = [order(1, cost=100), order(2, cost=300), order(3, 7, cost=50)]
+    foot = replace(BIKE, courier_type=CourierTypeEnum.foot, shifts=((0, 10),))
+
+    # One order fits into ten minutes, the order of region 7 has no courier
+    assert lower_bound([foot], orders, penalty=2) == pytest.approx(
+        3 * 50 + 300 + 3 * 100
+    )
+    assert lower_bound([], orders, penalty=2) == pytest.approx(3 * 450)
+
+
+@pytest.mark.parametrize('seeds', [range(0, 250), range(250, 500)])
+def test_shift_search_is_not_worse_than_incumbent(seeds):
+    for seed in seeds:
+        courier, shift, orders = random_shift(random.Random(seed))
+        incumbent = assign_shift(
+            courier,
+            COURIER_RULES[courier.courier_type],
+            CandidateIndex(orders),
+            shift,
+        )
+
+        groups, exhausted = _search_shift(
+            courier, shift, orders, incumbent, 2, float('inf')
+        )
+
+        assert exhausted
+        assert shift_objective(groups, orders) <= shift_objective(
+            incumbent, orders
+        ) + 1e-6, seed
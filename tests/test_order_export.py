@@ -0,0 +1,256 @@
+import asyncio
+import csv
+import gzip
+import json
+import struct
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.database.exports import (COPY_SIGNATURE, POSTGRES_EPOCH,
+                                  POSTGRES_EPOCH_DATE, copy_is_empty,
+                                  decode_copy_binary)
+from app.jobs import export as export_module
+from app.jobs.export import (COLUMN_NAMES, COLUMN_TYPES, export_format,
+                             run_export_job, write_day_file)
+
+DAY = date(2023, 5, 1)
+
+
+def encode_value(value, column_type):
+    if value is None:
+        return struct.pack('!i', -1)
+    if column_type == 'int4':
+        payload = struct.pack('!i', value)
+    elif column_type == 'int8':
+        payload = struct.pack('!q', value)
+    elif column_type == 'float8':
+        payload = struct.pack('!d', value)
+    elif column_type == 'text':
+        payload = value.encode()
+    elif column_type == 'date':
+        payload = struct.pack('!i', (value - POSTGRES_EPOCH_DATE).days)
+    else:
+        payload = struct.pack(
+            '!q', (value - POSTGRES_EPOCH) // timedelta(microseconds=1)
+        )
+    return struct.pack('!i', len(payload)) + payload
+
+
+def encode_copy(rows, types=COLUMN_TYPES):
+    data = COPY_SIGNATURE + struct.pack('!ii', 0, 0)
+    for row in rows:
+        data += struct.pack('!h', len(types))
+        data += b''.join(map(encode_value, row, types))
+    return data + struct.pack('!h', -1)
+
+
+def export_row(order_id, complete_time, assigned=True):
+    return (
+        order_id,
+        7,
+        100 + order_id if assigned else None,
+        complete_time.date() if assigned else None,
+        1000 + order_id,
+        3,
+        2.5,
+        150,
+        '10:00-12:00 14:00-16:00',
+        complete_time,
+    )
+
+
+def at(day, hour, minute=0):
+    return datetime(
+        day.year, day.month, day.day, hour, minute, tzinfo=timezone.utc
+    )
+
+
+def read_csv(path):
+    with gzip.open(path, 'rt') as file:
+        return list(csv.reader(file))
+
+
+def test_decode_copy_binary():
+    rows = [export_row(1, at(DAY, 10)), export_row(2, at(DAY, 11), False)]
+
+    columns = decode_copy_binary(encode_copy(rows), COLUMN_TYPES)
+
+    assert [tuple(row) for row in zip(*columns)] == rows
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_copy_binary(b'order_id\n1\n', COLUMN_TYPES)
+    with pytest.raises(ValueError):
+        decode_copy_binary(encode_copy([(1,)], ('int8',)), COLUMN_TYPES)
+
+
+def test_copy_is_empty():
+    assert copy_is_empty(encode_copy([]))
+    assert not copy_is_empty(encode_copy([export_row(1, at(DAY, 10))]))
+
+
+def test_csv_day_file_is_appended(tmp_path):
+    path = str(tmp_path / 'orders-2023-05-01.csv.gz')
+
+    first = write_day_file(
+        path,
+        encode_copy([export_row(1, at(DAY, 10))]),
+        progress=lambda value: None,
+    )
+    second = write_day_file(
+        path,
+        encode_copy(
+            [export_row(2, at(DAY, 11)), export_row(3, at(DAY, 12), False)]
+        ),
+        progress=lambda value: None,
+    )
+
+    assert first == (1, at(DAY, 10).isoformat())
+    assert second == (2, at(DAY, 12).isoformat())
+    header, *rows = read_csv(path)
+    assert tuple(header) == COLUMN_NAMES
+    assert [row[0] for row in rows] == ['1', '2', '3']
+    assert rows[0][3] == '2023-05-01'
+    assert rows[2][2:4] == ['', '']
+    assert rows[0][-1] == '2023-05-01T10:00:00+00:00'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_arrow_day_file_is_appended(tmp_path):
+    feather = pytest.importorskip('pyarrow.feather')
+    path = str(tmp_path / 'orders-2023-05-01.arrow')
+
+    for order_id in (1, 2):
+        write_day_file(
+            path,
+            encode_copy([export_row(order_id, at(DAY, 9 + order_id))]),
+            progress=lambda value: None,
+        )
+
+    table = feather.read_table(path)
+    assert tuple(table.column_names) == COLUMN_NAMES
+    assert table.column('order_id').to_pylist() == [1, 2]
+    assert str(table.schema.field('complete_time').type) == (
+        'timestamp[us, tz=UTC]'
+    )
+
+
+def test_arrow_needs_pyarrow(monkeypatch):
+    monkeypatch.setattr(export_module, 'pyarrow', None)
+
+    assert export_format('auto') == 'csv'
+    assert export_format('csv') == 'csv'
+    with pytest.raises(RuntimeError):
+        export_format('arrow')
+
+
+class FakeDriver:
+    def __init__(self, rows):
+        self.rows = rows
+        self.copies = []
+
+    async def copy_from_query(self, query, after, before, output, format):
+        assert format == 'binary'
+        self.copies.append((after, before))
+        await output(
+            encode_copy([row for row in self.rows if after < row[-1] < before])
+        )
+
+
+def run_job(driver, **params):
+    @asynccontextmanager
+    async def begin():
+        async def get_raw_connection():
+            return SimpleNamespace(driver_connection=driver)
+
+        yield SimpleNamespace(get_raw_connection=get_raw_connection)
+
+    async def run_in_pool(func, *args, share):
+        return func(*args, progress=lambda value: None)
+
+    context = SimpleNamespace(
+        job=SimpleNamespace(params=params),
+        db_engine=SimpleNamespace(begin=begin),
+        run_in_pool=run_in_pool,
+        progress=0,
+    )
+    return asyncio.run(run_export_job(context))
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(settings, 'EXPORT_FORMAT', 'csv')
+    monkeypatch.setattr(settings, 'EXPORT_LAG_S', 0)
+    return tmp_path
+
+
+def test_export_is_incremental(export_dir):
+    next_day = DAY + timedelta(days=1)
+    driver = FakeDriver(
+        [export_row(1, at(DAY, 10)), export_row(2, at(next_day, 9))]
+    )
+
+    result = run_job(
+        driver,
+        start_date=DAY.isoformat(),
+        end_date=(DAY + timedelta(days=2)).isoformat(),
+    )
+
+    assert result['files'] == [
+        'orders-2023-05-01.csv.gz',
+        'orders-2023-05-02.csv.gz',
+    ]
+    assert result['rows'] == 2
+    assert len(driver.copies) == 3
+    manifest = json.loads((export_dir / 'manifest.json').read_text())
+    assert manifest['days']['2023-05-02'] == {
+        'file': 'orders-2023-05-02.csv.gz',
+        'rows': 1,
+        'exported_until': at(next_day, 9).isoformat(),
+    }
+
+    # A late completion of the last exported day
+    driver.rows.append(export_row(3, at(next_day, 18)))
+    driver.copies.clear()
+    result = run_job(driver, start_date=None, end_date=next_day.isoformat())
+
+    assert result['start_date'] == next_day.isoformat()
+    assert result['rows'] == 1
+    assert driver.copies == [
+        (at(next_day, 9), at(next_day + timedelta(days=1), 0))
+    ]
+    assert [
+        row[0] for row in read_csv(export_dir / 'orders-2023-05-02.csv.gz')[1:]
+    ] == ['2', '3']
+    manifest = json.loads((export_dir / 'manifest.json').read_text())
+    assert manifest['days']['2023-05-02']['rows'] == 2
+
+
+def test_export_skips_the_future(export_dir):
+    driver = FakeDriver([])
+    today = datetime.now(timezone.utc).date()
+
+    result = run_job(
+        driver,
+        start_date=today.isoformat(),
+        end_date=(today + timedelta(days=3)).isoformat(),
+    )
+
+    assert result['files'] == []
+    ((after, before),) = driver.copies
+    assert after < at(today, 0) < before <= datetime.now(timezone.utc)
+
+
+def test_export_range_is_validated(client):
+    response = client.post(
+        '/admin/order-exports',
+        params={'start_date': '2023-05-02', 'end_date': '2023-05-01'},
+    )
+
+    assert response.status_code == 400
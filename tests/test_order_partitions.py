@@ -0,0 +1,239 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.database import partitions
+from app.database.change_feed import RESET_KIND, change_feed
+from app.database.partitions import (archive_order_partitions,
+                                     ensure_order_partitions, month_start,
+                                     partition_name, upgrade_order_table)
+from app.database.versions import data_versions
+from app.jobs import archival
+from app.jobs.archival import run_archival_job
+
+
+class DdlConnection:
+    """Records the statements and answers the catalog queries."""
+
+    def __init__(
+        self,
+        existing=(),
+        attached=True,
+        oldest=None,
+        relkind=None,
+        children=(),
+    ):
+        self.existing = set(existing)
+        self.attached = attached
+        self.oldest = oldest
+        self.relkind = relkind
+        self.children = children
+        self.statements = []
+
+    async def scalar(self, query, params=None):
+        sql = str(query)
+        if 'relkind' in sql:
+            return self.relkind
+        if 'pg_inherits' in sql:
+            return self.attached
+        if 'min(complete_time)' in sql:
+            return self.oldest
+        return params['name'] if params['name'] in self.existing else None
+
+    async def execute(self, query, params=None):
+        sql = str(query)
+        if sql.startswith('SELECT child.relname'):
+            return [(name,) for name in self.children]
+        self.statements.append((sql, params))
+
+
+@pytest.mark.parametrize(
+    'day, months, expected',
+    [
+        (date(2023, 5, 20), 0, date(2023, 5, 1)),
+        (date(2023, 12, 31), 1, date(2024, 1, 1)),
+        (date(2024, 1, 1), -1, date(2023, 12, 1)),
+        (date(2024, 3, 10), -15, date(2022, 12, 1)),
+        (date(2023, 1, 15), -12, date(2022, 1, 1)),
+        (date(2023, 11, 2), 26, date(2026, 1, 1)),
+    ],
+)
+def test_month_start(day, months, expected):
+    assert month_start(day, months) == expected
+
+
+def test_partition_names_sort_by_month():
+    months = [date(2022, 12, 1), date(2023, 1, 1), date(2023, 10, 1)]
+
+    names = [partition_name(month) for month in months]
+
+    assert names == ['order_p202212', 'order_p202301', 'order_p202310']
+    assert sorted(names) == names
+
+
+def test_missing_partitions_are_created():
+    conn = DdlConnection(
+        existing={'order_p202304'},
+        oldest=datetime(2023, 3, 5, 10, tzinfo=timezone.utc),
+    )
+
+    created = asyncio.run(
+        ensure_order_partitions(
+            conn, until=date(2023, 5, 1), since=date(2023, 4, 1)
+        )
+    )
+
+    # The completed orders left in the default partition start in March
+    assert created == ['order_p202303', 'order_p202305']
+    statements = [sql for sql, _ in conn.statements]
+    assert statements[:4] == [
+        'CREATE TABLE order_p202303 (LIKE "order" INCLUDING DEFAULTS '
+        'INCLUDING CONSTRAINTS)',
+        'LOCK TABLE order_open IN SHARE ROW EXCLUSIVE MODE',
+        'WITH moved AS (DELETE FROM order_open WHERE complete_time >= :start '
+        'AND complete_time < :end RETURNING *) '
+        'INSERT INTO order_p202303 SELECT * FROM moved',
+        'ALTER TABLE "order" ATTACH PARTITION order_p202303 '
+        "FOR VALUES FROM ('2023-03-01 00:00:00+00:00') "
+        "TO ('2023-04-01 00:00:00+00:00')",
+    ]
+    assert conn.statements[2][1] == {
+        'start': datetime(2023, 3, 1, tzinfo=timezone.utc),
+        'end': datetime(2023, 4, 1, tzinfo=timezone.utc),
+    }
+    assert len(statements) == 8
+    assert statements[4].startswith('CREATE TABLE order_p202305 ')
+
+
+@pytest.mark.parametrize(
+    'existing, statement',
+    [
+        ((), 'CREATE TABLE order_open PARTITION OF "order" DEFAULT'),
+        # The plain table renamed by `upgrade_order_table`
+        (
+            ('order_open',),
+            'ALTER TABLE "order" ATTACH PARTITION order_open DEFAULT',
+        ),
+    ],
+)
+def test_default_partition(existing, statement):
+    conn = DdlConnection(existing={'order_p202305', *existing}, attached=False)
+
+    created = asyncio.run(
+        ensure_order_partitions(
+            conn, until=date(2023, 5, 1), since=date(2023, 5, 1)
+        )
+    )
+
+    assert created == []
+    assert [sql for sql, _ in conn.statements] == [statement]
+
+
+def test_old_partitions_are_archived():
+    conn = DdlConnection(
+        children=['order_p202212', 'order_p202301', 'order_p202302']
+    )
+
+    archived = asyncio.run(
+        archive_order_partitions(conn, date(2023, 2, 15), 'archive')
+    )
+
+    assert archived == ['order_p202212', 'order_p202301']
+    statements = [sql for sql, _ in conn.statements]
+    assert statements[:2] == [
+        'CREATE SCHEMA IF NOT EXISTS archive',
+        'CREATE TABLE IF NOT EXISTS archive.assignment_order '
+        '(LIKE assignment_order)',
+    ]
+    assert statements[2:5] == [
+        'ALTER TABLE "order" DETACH PARTITION order_p202212',
+        'ALTER TABLE order_p202212 SET SCHEMA archive',
+        # The assignment rows of the archived orders go with them
+        'WITH moved AS (DELETE FROM assignment_order WHERE order_id '
+        'IN (SELECT order_id FROM archive.order_p202212) RETURNING *) '
+        'INSERT INTO archive.assignment_order SELECT * FROM moved',
+    ]
+    assert len(statements) == 8
+    assert 'archive.order_p202301' in statements[-1]
+
+
+def test_nothing_to_archive():
+    conn = DdlConnection(children=['order_p202301'])
+
+    archived = asyncio.run(
+        archive_order_partitions(conn, date(2023, 1, 31), 'archive')
+    )
+
+    assert archived == []
+    assert conn.statements == []
+
+
+@pytest.mark.parametrize('relkind', [None, 'p'])
+def test_partitioned_table_is_not_upgraded(relkind):
+    conn = DdlConnection(relkind=relkind)
+
+    assert not asyncio.run(upgrade_order_table(conn))
+    assert conn.statements == []
+
+
+def test_plain_table_is_upgraded():
+    conn = DdlConnection(relkind='r')
+
+    assert asyncio.run(upgrade_order_table(conn))
+
+    statements = [sql for sql, _ in conn.statements]
+    assert statements[:2] == [
+        'ALTER TABLE assignment_order '
+        'DROP CONSTRAINT IF EXISTS assignment_order_order_id_fkey',
+        'ALTER TABLE "order" RENAME TO order_open',
+    ]
+    assert statements[2:] == [
+        f'ALTER INDEX IF EXISTS {index} RENAME TO {name}'
+        for index, name in partitions.LEGACY_INDEXES.items()
+    ]
+
+
+@pytest.mark.parametrize('archived', [[], ['order_p202212']])
+def test_archival_job(archived, monkeypatch):
+    calls, notified, resets = [], [], []
+
+    async def ensure(conn, until):
+        calls.append(('ensure', until))
+        return ['order_p202307']
+
+    async def archive(conn, before, archive_schema):
+        calls.append(('archive', before, archive_schema))
+        return archived
+
+    async def notify(conn, events):
+        notified.extend(event.kind for event in events)
+
+    class Engine:
+        order_partitions_ahead = 2
+
+        @asynccontextmanager
+        async def begin(self):
+            yield None
+
+    monkeypatch.setattr(archival, 'ensure_order_partitions', ensure)
+    monkeypatch.setattr(archival, 'archive_order_partitions', archive)
+    monkeypatch.setattr(archival.settings, 'ORDER_ARCHIVE_AFTER_MONTHS', 12)
+    monkeypatch.setattr(archival.settings, 'ORDER_ARCHIVE_SCHEMA', 'archive')
+    monkeypatch.setattr(change_feed, 'notify', notify)
+    monkeypatch.setattr(data_versions, 'reset', lambda: resets.append(1))
+    context = SimpleNamespace(db_engine=Engine(), progress=0)
+
+    result = asyncio.run(run_archival_job(context))
+
+    today = date.today()
+    assert result == {'created': ['order_p202307'], 'archived': archived}
+    assert calls == [
+        ('ensure', month_start(today, 2)),
+        ('archive', month_start(today, -12), 'archive'),
+    ]
+    assert context.progress == 0.5
+    assert notified == ([RESET_KIND] if archived else [])
+    assert len(resets) == len(notified)
@@ -0,0 +1,331 @@
+import asyncio
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api.dependencies.database import get_repository
+from app.core.config import settings
+from app.database.error import NotFoundInDBError
+from app.database.repositories import couriers as couriers_module
+from app.database.repositories import raw as raw_module
+from app.database.repositories.couriers import CouriersRepository
+from app.database.repositories.jobs import JobsRepository
+from app.database.repositories.orders import OrdersRepository
+from app.database.repositories.raw import (RawCouriersRepository,
+                                           RawOrdersRepository)
+from app.schemas.models.couriers import CourierDto, CourierTypeEnum
+from app.schemas.models.orders import (CompletionHistoryBucket,
+                                       HistoryBucketEnum, OrderDto)
+
+BACKENDS = {
+    'orm': {
+        'orders': OrdersRepository,
+        'couriers': CouriersRepository,
+    },
+    'asyncpg': {
+        'orders': RawOrdersRepository,
+        'couriers': RawCouriersRepository,
+    },
+}
+
+COMPLETED = datetime(2023, 5, 1, 12, tzinfo=timezone.utc)
+
+
+class OrmSession:
+    """Returns the rows the database would return to the ORM."""
+
+    def __init__(self, rows):
+        self.rows = [SimpleNamespace(**row) for row in rows]
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        return OrmResult(self.rows)
+
+
+class OrmResult(list):
+    """Iterates over rows like a `Result` of a Core query."""
+
+    def scalars(self):
+        return SimpleNamespace(
+            all=lambda: list(self),
+            one_or_none=lambda: self[0] if self else None,
+        )
+
+
+class DriverConnection:
+    """Returns the rows the database would return to asyncpg."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        # The records have the columns of the query in its order
+        selected = query[len('SELECT '):query.index(' FROM ')]
+        columns = [
+            column.strip().removeprefix('o.') for column in selected.split(',')
+        ]
+        return [
+            Record((column, row[column]) for column in columns)
+            for row in self.rows
+        ]
+
+    async def fetchrow(self, query, *args):
+        records = await self.fetch(query, *args)
+        return records[0] if records else None
+
+
+class Record(dict):
+    """Keeps the column order for positional access like asyncpg."""
+
+    def __iter__(self):
+        return iter(self.values())
+
+
+class DriverSession:
+    def __init__(self, rows):
+        self.driver = DriverConnection(rows)
+        self.queries = self.driver.queries
+
+    async def connection(self):
+        raw_connection = SimpleNamespace(driver_connection=self.driver)
+
+        async def get_raw_connection():
+            return raw_connection
+
+        return SimpleNamespace(get_raw_connection=get_raw_connection)
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def no_replica(monkeypatch):
+    replica = SimpleNamespace(get=lambda courier_id: None)
+    monkeypatch.setattr(couriers_module, 'courier_replica', replica)
+    monkeypatch.setattr(raw_module, 'courier_replica', replica)
+
+
+def repository(backend, name, rows):
+    session = (OrmSession if backend == 'orm' else DriverSession)(rows)
+    return BACKENDS[backend][name](session), session
+
+
+def order_row(order_id, **extra):
+    return {
+        'order_id': order_id,
+        'weight': 2.5,
+        'regions': 3,
+        'delivery_hours': ['10:00-12:00'],
+        'cost': 120,
+        'complete_time': COMPLETED if order_id % 2 else None,
+        **extra,
+    }
+
+
+def courier_row(courier_id):
+    return {
+        'courier_id': courier_id,
+        'courier_type': 'BIKE',
+        'regions': [1, 2],
+        'working_hours': ['08:00-20:00'],
+    }
+
+
+def test_order_by_id(backend):
+    repo, session = repository(backend, 'orders', [order_row(7)])
+
+    order = asyncio.run(repo.get_order_by_order_id(order_id=7))
+
+    assert order == OrderDto(
+        order_id=7,
+        weight=2.5,
+        regions=3,
+        delivery_hours=['10:00-12:00'],
+        cost=120,
+        completed_time=COMPLETED,
+    )
+    assert len(session.queries) == 1
+
+
+def test_missing_order(backend):
+    repo, _ = repository(backend, 'orders', [])
+
+    with pytest.raises(NotFoundInDBError):
+        asyncio.run(repo.get_order_by_order_id(order_id=7))
+
+
+def test_orders_by_ids(backend):
+    repo, session = repository(backend, 'orders', [order_row(1), order_row(4)])
+
+    orders, missing_ids = asyncio.run(
+        repo.get_orders_by_ids(order_ids=[4, 2, 1])
+    )
+
+    assert [order.order_id for order in orders] == [4, 1]
+    assert orders[0].completed_time is None
+    assert missing_ids == [2]
+    assert len(session.queries) == 1
+
+
+def test_courier_by_id(backend, no_replica):
+    repo, session = repository(backend, 'couriers', [courier_row(3)])
+
+    courier = asyncio.run(repo.get_courier(courier_id=3))
+
+    assert courier == CourierDto(
+        courier_id=3,
+        courier_type='BIKE',
+        regions=[1, 2],
+        working_hours=['08:00-20:00'],
+    )
+    assert courier.courier_type is CourierTypeEnum.bike
+    assert len(session.queries) == 1
+
+
+def test_missing_courier(backend, no_replica):
+    repo, _ = repository(backend, 'couriers', [])
+
+    with pytest.raises(NotFoundInDBError):
+        asyncio.run(repo.get_courier(courier_id=3))
+
+
+def test_replicated_courier_needs_no_query(backend, monkeypatch):
+    courier = CourierDto(**courier_row(3))
+    replica = SimpleNamespace(get={3: courier}.get)
+    monkeypatch.setattr(couriers_module, 'courier_replica', replica)
+    monkeypatch.setattr(raw_module, 'courier_replica', replica)
+    repo, session = repository(backend, 'couriers', [])
+
+    assert asyncio.run(repo.get_courier(courier_id=3)) is courier
+    assert session.queries == []
+
+
+def test_couriers_by_ids(backend, no_replica):
+    repo, session = repository(
+        backend, 'couriers', [courier_row(5), courier_row(2)]
+    )
+
+    couriers, missing_ids = asyncio.run(
+        repo.get_couriers_by_ids(courier_ids=[2, 9, 5])
+    )
+
+    assert [courier.courier_id for courier in couriers] == [2, 5]
+    assert missing_ids == [9]
+    assert len(session.queries) == 1
+
+
+def test_couriers_assignments(backend):
+    rows = [
+        order_row(1, courier_id=10, group_order_id=100),
+        order_row(2, courier_id=20, group_order_id=200),
+        order_row(3, courier_id=10, group_order_id=101),
+        order_row(4, courier_id=10, group_order_id=100),
+    ]
+    repo, _ = repository(backend, 'couriers', rows)
+
+    couriers = asyncio.run(
+        repo.get_couriers_assignments(date=date(2023, 5, 1), courier_id=None)
+    )
+
+    assert [
+        (
+            courier.courier_id,
+            [
+                (group.group_order_id, [o.order_id for o in group.orders])
+                for group in courier.orders
+            ],
+        )
+        for courier in couriers
+    ] == [(10, [(100, [1, 4]), (101, [3])]), (20, [(200, [2])])]
+    assert couriers[0].orders[0].orders[0] == OrderDto(
+        order_id=1,
+        weight=2.5,
+        regions=3,
+        delivery_hours=['10:00-12:00'],
+        cost=120,
+        completed_time=COMPLETED,
+    )
+
+
+def test_raw_assignments_of_one_courier():
+    repo, session = repository('asyncpg', 'couriers', [])
+
+    asyncio.run(
+        repo.get_couriers_assignments(date=date(2023, 5, 1), courier_id=10)
+    )
+
+    ((query, args),) = session.queries
+    assert query.endswith('o.courier_id = $2')
+    assert args == (date(2023, 5, 1), 10)
+
+
+@pytest.mark.parametrize(
+    'backend, repo, expected',
+    [
+        ('orm', OrdersRepository, OrdersRepository),
+        ('asyncpg', OrdersRepository, RawOrdersRepository),
+        ('asyncpg', CouriersRepository, RawCouriersRepository),
+        ('asyncpg', JobsRepository, JobsRepository),
+    ],
+)
+def test_backend_is_selected_in_settings(monkeypatch, backend, repo, expected):
+    monkeypatch.setattr(settings, 'REPOSITORY_BACKEND', backend)
+
+    assert type(get_repository(repo)(session=None)) is expected
+
+
+def history_row(hour, orders_count, cost_sum):
+    return {
+        'bucket_start': datetime(2023, 5, 1, hour, tzinfo=timezone.utc),
+        'orders_count': orders_count,
+        'cost_sum': cost_sum,
+    }
+
+
+@pytest.mark.parametrize('bucket', list(HistoryBucketEnum))
+@pytest.mark.parametrize('courier_id', [None, 3])
+def test_completion_history(bucket, courier_id):
+    rows = [history_row(10, 2, 300), history_row(11, 1, 120)]
+    repo, session = repository('orm', 'orders', rows)
+
+    history = asyncio.run(
+        repo.get_completion_history(
+            start_date=datetime(2023, 5, 1, tzinfo=timezone.utc),
+            end_date=datetime(2023, 5, 2, tzinfo=timezone.utc),
+            bucket=bucket,
+            courier_id=courier_id,
+        )
+    )
+
+    assert history == [
+        CompletionHistoryBucket(courier_id=courier_id, **row) for row in rows
+    ]
+    (query,) = session.queries
+    compiled = query.compile(dialect=postgresql.dialect())
+    # Buckets are truncated in UTC by the database
+    assert bucket.value in compiled.params.values()
+    assert 'UTC' in compiled.params.values()
+    where = str(compiled).split('WHERE')[1]
+    assert ('courier_id' in where) is (courier_id is not None)
+    assert 'GROUP BY' in str(compiled)
+
+
+def test_empty_completion_history():
+    repo, _ = repository('orm', 'orders', [])
+
+    history = asyncio.run(
+        repo.get_completion_history(
+            start_date=datetime(2023, 5, 1, tzinfo=timezone.utc),
+            end_date=datetime(2023, 5, 1, tzinfo=timezone.utc),
+            bucket=HistoryBucketEnum.hour,
+        )
+    )
+
+    assert history == []
@@ -0,0 +1,80 @@
+from datetime import date
+
+from app.core.response_cache import ENTRY_OVERHEAD, ResponseCache
+
+DAY, OTHER_DAY = date(2023, 5, 1), date(2023, 5, 2)
+
+
+def body(index, size=100):
+    return bytes([index % 256]) * size
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = ResponseCache(memory_budget=3 * (100 + ENTRY_OVERHEAD))
+    for courier_id in range(3):
+        cache.put((DAY, courier_id), 't', body(courier_id))
+    assert cache.get((DAY, 0), 't') == body(0)
+
+    cache.put((DAY, 3), 't', body(3))
+
+    assert cache.get((DAY, 1), 't') is None
+    assert cache.get((DAY, 0), 't') == body(0)
+    assert cache.get((DAY, 3), 't') == body(3)
+
+
+def test_entry_of_another_version_is_not_served():
+    cache = ResponseCache(memory_budget=10_000)
+    cache.put((DAY, None), 't1', body(1))
+
+    assert cache.get((DAY, None), 't2') is None
+    assert cache.get((DAY, None), 't1') is None
+
+
+def test_evicted_entries_are_spilled_and_promoted(tmp_path):
+    cache = ResponseCache(
+        memory_budget=2 * (100 + ENTRY_OVERHEAD),
+        spill_path=str(tmp_path / 'spill'),
+        spill_size=1000,
+    )
+    cache.start()
+    for courier_id in range(4):
+        cache.put((DAY, courier_id), 't', body(courier_id))
+
+    assert sorted(cache.spill.keys()) == [(DAY, 0), (DAY, 1)]
+    assert cache.get((DAY, 0), 't') == body(0)
+    assert (DAY, 0) not in cache.spill.keys()
+    cache.close()
+    assert not (tmp_path / 'spill').exists()
+
+
+def test_spill_ring_overwrites_oldest_entries(tmp_path):
+    cache = ResponseCache(
+        memory_budget=0, spill_path=str(tmp_path / 'spill'), spill_size=350
+    )
+    cache.start()
+    for courier_id in range(5):
+        cache.put((DAY, courier_id), 't', body(courier_id))
+
+    assert sorted(cache.spill.keys()) == [(DAY, 2), (DAY, 3), (DAY, 4)]
+    for courier_id in (2, 3, 4):
+        assert cache.get((DAY, courier_id), 't') == body(courier_id)
+    cache.close()
+
+
+def test_invalidate_drops_entries_of_a_date(tmp_path):
+    cache = ResponseCache(
+        memory_budget=100 + ENTRY_OVERHEAD,
+        spill_path=str(tmp_path / 'spill'),
+        spill_size=1000,
+    )
+    cache.start()
+    cache.put((DAY, 1), 't', body(1))
+    cache.put((OTHER_DAY, 1), 't', body(2))
+    cache.put((DAY, None), 't', body(3))
+
+    cache.invalidate(lambda key: key[0] == DAY)
+
+    assert cache.get((DAY, 1), 't') is None
+    assert cache.get((DAY, None), 't') is None
+    assert cache.get((OTHER_DAY, 1), 't') == body(2)
+    cache.close()
@@ -0,0 +1,199 @@
+import random
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.assignment.greedy import assign_greedy
+from app.assignment.plan import (DayPlan, DeliveryGroup, PlanningCourier,
+                                 PlanningOrder)
+from app.assignment.simulator import (PlanArrays, Violation, delivery_sequence,
+                                      score_plan, simulate)
+from app.schemas.models.couriers import CourierTypeEnum
+from tests.test_assignment import random_day
+
+FOOT = PlanningCourier(1, CourierTypeEnum.foot, frozenset({1}), ((600, 720),))
+BIKE = PlanningCourier(
+    2, CourierTypeEnum.bike, frozenset({1, 2}), ((600, 720), (900, 960))
+)
+
+
+def order(order_id, region=1, weight=1.0, cost=100, windows=((0, 1439),)):
+    return PlanningOrder(order_id, weight, region, cost, windows)
+
+
+def group(courier_id, start, *order_ids):
+    return DeliveryGroup(courier_id, start, start, list(order_ids), 0)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_greedy_plans_are_feasible(seed):
+    couriers, orders = random_day(random.Random(seed))
+    # Working hours of a courier do not intersect
+    couriers = [
+        replace(courier, shifts=courier.shifts[:1])
+        if len(courier.shifts) > 1
+        and courier.shifts[0][1] >= courier.shifts[1][0]
+        else courier
+        for courier in couriers
+    ]
+    plan = assign_greedy(couriers, orders)
+
+    simulation = score_plan(couriers, orders, plan)
+
+    assert simulation.feasible
+    assert simulation.violation_counts() == dict.fromkeys(
+        (violation.name.lower() for violation in Violation), 0
+    )
+    assert simulation.group_ends.tolist() == [
+        group.end_minute for group in plan.groups
+    ]
+    assert simulation.cost == pytest.approx(plan.cost)
+    assert simulation.courier_orders.sum() == plan.assigned_orders
+
+
+def test_timeline_and_cost():
+    orders = [order(1, cost=100), order(2, cost=50), order(3, 2, cost=10)]
+    plan = DayPlan(groups=[group(2, 600, 1, 2, 3)], unassigned_order_ids=[])
+
+    simulation = score_plan([FOOT, BIKE], orders, plan)
+
+    # 12 minutes to the first order, 8 to the next one in the region, 12 to
+    # the first one in another region
+    assert simulation.delivered.tolist() == [612, 620, 632]
+    assert simulation.group_costs.tolist() == pytest.approx([148])
+    assert simulation.courier_busy_minutes.tolist() == [0, 32]
+    assert simulation.utilisation.tolist() == pytest.approx([0, 32 / 180])
+    assert simulation.objective() == pytest.approx(148)
+
+
+def test_violations():
+    orders = [
+        order(1, windows=((600, 610),)),
+        order(2, weight=9.5),
+        order(3, region=2),
+        order(4),
+        order(5),
+        order(6),
+    ]
+    plan = DayPlan(
+        groups=[
+            group(1, 600, 1, 2),
+            group(1, 700, 3),
+            group(1, 705, 4),
+            group(2, 620, 5),
+        ],
+        unassigned_order_ids=[6],
+    )
+
+    simulation = score_plan([FOOT, BIKE], orders, plan)
+
+    assert simulation.group_violations.tolist() == [
+        Violation.LATE | Violation.OVERWEIGHT,
+        Violation.FOREIGN_REGION | Violation.OUT_OF_SHIFT,
+        Violation.OVERLAP | Violation.OUT_OF_SHIFT,
+        0,
+    ]
+    assert simulation.on_time.tolist() == [False, True, True, True, True]
+    assert not simulation.feasible
+    assert simulation.objective() == float('inf')
+
+
+def test_trip_overlapping_an_earlier_longer_trip():
+    orders = [order(order_id) for order_id in range(1, 7)]
+    plan = DayPlan(
+        groups=[
+            group(2, 600, 1, 2, 3),
+            group(2, 601, 4),
+            group(2, 620, 5),
+            # The running end starts over with the next courier
+            group(1, 610, 6),
+        ],
+    )
+
+    simulation = score_plan([FOOT, BIKE], orders, plan)
+
+    assert simulation.group_ends.tolist() == [628, 613, 632, 635]
+    assert simulation.group_violations.tolist() == [
+        0,
+        Violation.OVERLAP,
+        Violation.OVERLAP,
+        0,
+    ]
+
+
+def test_group_limits():
+    orders = [order(order_id, region=order_id) for order_id in range(1, 4)]
+    plan = DayPlan(groups=[group(2, 600, 1, 2, 3)])
+
+    simulation = score_plan([FOOT, BIKE], orders, plan)
+
+    assert simulation.group_violations.tolist() == [
+        Violation.TOO_MANY_REGIONS | Violation.FOREIGN_REGION
+    ]
+
+
+def test_unassigned_orders_priced_at_penalty():
+    orders = [order(1, cost=100), order(2, cost=40)]
+    plan = DayPlan(groups=[group(1, 600, 1)], unassigned_order_ids=[2])
+
+    simulation = score_plan([FOOT], orders, plan)
+
+    assert simulation.objective(penalty=1.5) == pytest.approx(100 + 100)
+
+
+def test_empty_plan():
+    simulation = simulate(PlanArrays.build([FOOT], [], DayPlan()))
+
+    assert simulation.feasible
+    assert simulation.cost == 0
+    assert simulation.delivered.tolist() == []
+    assert simulation.courier_shift_minutes.tolist() == [120]
+
+
+def test_delivery_sequence_visits_region_of_most_urgent_order_first():
+    orders = [
+        order(1, region=1, windows=((600, 900),)),
+        order(2, region=2, windows=((600, 700),)),
+        order(3, region=1, windows=((600, 650),)),
+        order(4, region=2, windows=((600, 800),)),
+    ]
+
+    sequence = delivery_sequence(orders)
+
+    assert [item.order_id for item in sequence] == [3, 1, 2, 4]
+
+
+def test_large_day_is_simulated_at_once():
+    rng = np.random.default_rng(1)
+    groups = 20_000
+    sizes = rng.integers(1, 4, groups)
+    plan = PlanArrays(
+        courier_ids=np.arange(1, 5001),
+        courier_types=np.full(5000, 2),
+        courier_region_couriers=np.arange(5000),
+        courier_region_values=np.ones(5000, dtype=np.int64),
+        shift_couriers=np.arange(5000),
+        shift_starts=np.full(5000, 480),
+        shift_ends=np.full(5000, 1200),
+        group_ids=np.arange(groups),
+        group_couriers=np.arange(groups) % 5000,
+        group_starts=480 + np.arange(groups) // 5000 * 30,
+        order_ids=np.arange(sizes.sum()),
+        order_groups=np.repeat(np.arange(groups), sizes),
+        weights=np.ones(sizes.sum()),
+        regions=np.ones(sizes.sum(), dtype=np.int64),
+        costs=np.full(sizes.sum(), 100),
+        window_orders=np.arange(sizes.sum()),
+        window_starts=np.full(sizes.sum(), 480),
+        window_ends=np.full(sizes.sum(), 1200),
+        unassigned_costs=np.zeros(0, dtype=np.int64),
+    )
+
+    simulation = simulate(plan)
+
+    assert simulation.feasible
+    assert simulation.courier_groups.tolist() == [4] * 5000
+    assert simulation.cost == pytest.approx(
+        (100 + 80 * (sizes - 1)).sum()
+    )
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+def run_concurrently(flights, key, func, callers):
+    async def main():
+        return await asyncio.gather(
+            *(flights.do(key, func) for _ in range(callers)),
+            return_exceptions=True,
+        )
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize('enabled, expected_runs', [(True, 1), (False, 10)])
+def test_concurrent_calls_share_one_run(enabled, expected_runs):
+    runs = []
+
+    async def load():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return len(runs)
+
+    results = run_concurrently(SingleFlight(enabled), 'key', load, 10)
+
+    assert len(runs) == expected_runs
+    if enabled:
+        assert results == [1] * 10
+
+
+def test_error_is_shared_by_concurrent_calls():
+    async def load():
+        await asyncio.sleep(0.01)
+        raise LookupError('not found')
+
+    results = run_concurrently(SingleFlight(), 'key', load, 5)
+
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+def test_followers_take_over_when_leader_is_cancelled():
+    flights, runs = SingleFlight(), []
+
+    async def load():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def main():
+        leader = asyncio.create_task(flights.do('key', load))
+        await asyncio.sleep(0)
+        followers = [
+            asyncio.create_task(flights.do('key', load)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ['result'] * 3
+    assert len(runs) == 2
+
+
+def test_sequential_calls_run_again():
+    flights, runs = SingleFlight(), []
+
+    async def load():
+        runs.append(1)
+        return len(runs)
+
+    async def main():
+        return [await flights.do('key', load) for _ in range(3)]
+
+    assert asyncio.run(main()) == [1, 2, 3]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+
+from app.api.middlewares import AccessLogMiddleware
+from app.core.structured_logging import (DroppingQueueHandler, JsonFormatter,
+                                         LogQueue, audit,
+                                         records_dropped_total)
+
+
+def make_record(message='done', fields=None, name='app.audit'):
+    record = logging.LogRecord(
+        name, logging.INFO, __file__, 1, message, (), None
+    )
+    if fields is not None:
+        record.fields = fields
+    return record
+
+
+def test_formatter_writes_fields_as_json():
+    record = make_record(
+        fields={
+            'event': 'order_completed',
+            'order_id': 1,
+            'complete_time': datetime(2023, 5, 1, 10, tzinfo=timezone.utc),
+        }
+    )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'app.audit'
+    assert entry['message'] == 'done'
+    assert entry['time'].endswith('+00:00')
+    assert entry['order_id'] == 1
+    assert entry['complete_time'] == '2023-05-01T10:00:00+00:00'
+
+
+def test_full_queue_drops_records():
+    handler = DroppingQueueHandler(queue.SimpleQueue(), max_size=2)
+    dropped = records_dropped_total.value
+
+    for number in range(5):
+        handler.handle(make_record(str(number)))
+
+    assert handler.queue.qsize() == 2
+    assert records_dropped_total.value - dropped == 3
+    assert handler.queue.get().msg == '0'
+
+
+def test_log_queue_writes_json_lines(tmp_path):
+    path = tmp_path / 'app.log'
+    log_queue = LogQueue(max_size=100, path=str(path))
+
+    log_queue.start()
+    audit('assignment_run', job_id=7, assigned_orders=3)
+    logging.getLogger('app.database').warning('slow %s', 'query')
+    log_queue.stop()
+    audit('assignment_run', job_id=8)
+
+    first, second = map(json.loads, path.read_text().splitlines())
+    assert first['event'] == 'assignment_run'
+    assert first['job_id'] == 7
+    assert first['assigned_orders'] == 3
+    assert second['level'] == 'WARNING'
+    assert second['message'] == 'slow query'
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_access_log_middleware():
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 201})
+        await send({'type': 'http.response.body', 'body': b'{"id":1}'})
+
+    async def send(message):
+        pass
+
+    logger = logging.getLogger('tests.access')
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'path': '/orders',
+        'query_string': b'limit=1',
+        'client': ('10.0.0.1', 5000),
+    }
+    try:
+        asyncio.run(AccessLogMiddleware(app, logger)(scope, None, send))
+    finally:
+        logger.removeHandler(handler)
+
+    (record,) = handler.records
+    assert record.getMessage() == 'POST /orders 201'
+    fields = record.fields
+    assert fields['status'] == 201
+    assert fields['bytes'] == 8
+    assert fields['query'] == 'limit=1'
+    assert fields['client'] == '10.0.0.1'
+    assert fields['duration_ms'] >= 0
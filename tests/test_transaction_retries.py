@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.database.retries import is_retryable, retry_transaction
+
+
+class PostgresError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+class FakeSession:
+    def __init__(self):
+        self.rollbacks = 0
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def failing_transaction(*sqlstates):
+    errors = [DBAPIError('UPDATE', {}, PostgresError(s)) for s in sqlstates]
+
+    async def transaction():
+        if errors:
+            raise errors.pop(0)
+        return 'committed'
+
+    return transaction
+
+
+@pytest.mark.parametrize(
+    'sqlstate, expected', [('40001', True), ('40P01', True), ('23505', False)]
+)
+def test_is_retryable(sqlstate, expected):
+    error = DBAPIError('UPDATE', {}, PostgresError(sqlstate))
+    assert is_retryable(error) is expected
+
+
+def test_serialization_failures_and_deadlocks_retried():
+    session = FakeSession()
+    result = asyncio.run(
+        retry_transaction(
+            session,
+            failing_transaction('40001', '40P01'),
+            attempts=3,
+            backoff_ms=1,
+        )
+    )
+    assert result == 'committed'
+    assert session.rollbacks == 2
+
+
+def test_last_attempt_raises():
+    session = FakeSession()
+    with pytest.raises(DBAPIError):
+        asyncio.run(
+            retry_transaction(
+                session,
+                failing_transaction('40001', '40001'),
+                attempts=2,
+                backoff_ms=1,
+            )
+        )
+    assert session.rollbacks == 2
+
+
+def test_other_errors_not_retried():
+    session = FakeSession()
+    with pytest.raises(DBAPIError):
+        asyncio.run(
+            retry_transaction(
+                session,
+                failing_transaction('23505'),
+                attempts=3,
+                backoff_ms=1,
+            )
+        )
+    assert session.rollbacks == 1